@@ -5,11 +5,12 @@ Uso:
   python manage.py cache_admin --warm-up
   python manage.py cache_admin --clear
   python manage.py cache_admin --clear-pattern "balances*"
+  python manage.py cache_admin --invalidate ventas cxc
 """
 
 from django.core.management.base import BaseCommand
 from django.core.cache import cache
-from app.services.cache_service import cache_service, CacheUtils
+from app.services.cache_service import cache_service, CacheService, CacheUtils
 import time
 
 
@@ -37,6 +38,12 @@ class Command(BaseCommand):
             type=str,
             help='Limpiar cache que coincida con el patrón',
         )
+        parser.add_argument(
+            '--invalidate',
+            nargs='+',
+            choices=CacheService.DOMAINS,
+            help='Invalidar dominios de cache (incrementa su versión)',
+        )
         parser.add_argument(
             '--test',
             action='store_true',
@@ -61,6 +68,9 @@ class Command(BaseCommand):
         elif options['clear_pattern']:
             self._clear_pattern(options['clear_pattern'])
         
+        elif options['invalidate']:
+            self._invalidate_domains(options['invalidate'])
+        
         elif options['test']:
             self._test_performance()
         
@@ -98,7 +108,19 @@ class Command(BaseCommand):
             from django.core.cache import cache
             backend_type = type(cache._cache).__name__ if hasattr(cache, '_cache') else type(cache).__name__
             self.stdout.write(f"📦 Backend actual: {backend_type}")
-        
+
+        # Contadores de get_or_compute (hit / miss / stale por reporte)
+        compute_stats = cache_service.get_compute_stats()
+        if compute_stats:
+            self.stdout.write("")
+            self.stdout.write(self.style.HTTP_INFO("🧮 Reportes cacheados (get_or_compute)"))
+            for name, counts in sorted(compute_stats.items()):
+                self.stdout.write(
+                    f"  {name:<20} hits: {counts['hit']:>7}  stale: {counts['stale']:>6}  "
+                    f"espera: {counts['wait']:>5}  misses: {counts['miss']:>6}  "
+                    f"recálculos: {counts['refresh']:>5}  ({counts['hit_rate']:.1f}%)"
+                )
+
         # Probar conexión
         try:
             cache.set('test_connection', 'OK', 10)
@@ -158,6 +180,15 @@ class Command(BaseCommand):
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"❌ Error: {e}"))
 
+    def _invalidate_domains(self, domains):
+        """Invalidar dominios de cache versionados"""
+        self.stdout.write(self.style.WARNING(f"🔄 INVALIDANDO DOMINIOS: {', '.join(domains)}"))
+        self.stdout.write("-" * 70)
+        
+        cache_service.invalidate_domains(*domains)
+        for domain, version in cache_service.get_versions(*domains).items():
+            self.stdout.write(self.style.SUCCESS(f"✅ {domain}: versión {version}"))
+
     def _test_performance(self):
         """Probar rendimiento con/sin cache"""
         self.stdout.write(self.style.HTTP_INFO("⚡ PRUEBA DE RENDIMIENTO"))
@@ -170,7 +201,7 @@ class Command(BaseCommand):
         filters = {'fecha__year': 2025}
         
         # Limpiar cache específico para la prueba
-        cache_service.clear_pattern('*balances_gastos*')
+        cache_service.invalidate_domains('gastos')
         
         # Prueba 1: Sin cache (primera vez)
         start_time = time.time()
@@ -243,6 +274,7 @@ class Command(BaseCommand):
         self.stdout.write("🔥 --warm-up            Precalentar cache con datos importantes")
         self.stdout.write("🗑️  --clear              Limpiar todo el cache")
         self.stdout.write("🎯 --clear-pattern X    Limpiar cache que coincida con patrón")
+        self.stdout.write("🔄 --invalidate D [D..] Invalidar dominios (ventas, cxc, gastos, compras, forecast)")
         self.stdout.write("⚡ --test               Probar rendimiento con/sin cache")
         self.stdout.write()
         self.stdout.write("Ejemplos:")
@@ -0,0 +1,77 @@
+"""
+Comando de gestión Django para consultar la instrumentación por vista
+(app.middleware.instrumentacion): percentiles de duración sobre las últimas
+INSTRUMENTACION_MUESTRAS peticiones de cada vista, consultas y tiempo de BD
+promedio y tasa de aciertos de cache.
+
+Uso:
+  python manage.py metricas_vistas
+  python manage.py metricas_vistas --orden p50 --top 10
+  python manage.py metricas_vistas --vista admin:ventas_ventas_balances
+  python manage.py metricas_vistas --reset
+"""
+
+from django.core.management.base import BaseCommand
+
+from app.services.instrumentacion_service import metricas_vistas
+
+
+class Command(BaseCommand):
+    help = 'Percentiles de duración, consultas y cache por vista'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orden',
+            choices=['p50', 'p95', 'p99', 'max', 'muestras', 'consultas', 'bd_ms'],
+            default='p95',
+            help='Columna por la que se ordena (default: p95)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=25,
+            help='Número de vistas a mostrar (default: 25)',
+        )
+        parser.add_argument(
+            '--vista',
+            type=str,
+            help='Mostrar solo las vistas cuyo nombre contenga este texto',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Borrar las muestras acumuladas',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("=" * 100)
+        self.stdout.write(self.style.SUCCESS("⏱️  MÉTRICAS POR VISTA"))
+        self.stdout.write("=" * 100)
+
+        if options['reset']:
+            metricas_vistas.reiniciar()
+            self.stdout.write(self.style.SUCCESS("✅ Muestras borradas"))
+            return
+
+        resumen = metricas_vistas.resumen()
+        if options['vista']:
+            resumen = {vista: datos for vista, datos in resumen.items() if options['vista'] in vista}
+        if not resumen:
+            self.stdout.write(self.style.WARNING("⚠️  Sin muestras (¿INSTRUMENTACION_ACTIVA = False?)"))
+            return
+
+        self.stdout.write(
+            f"{'Vista':<45} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} "
+            f"{'consultas':>9} {'BD ms':>8} {'cache':>6}"
+        )
+        self.stdout.write("-" * 100)
+        filas = sorted(resumen.items(), key=lambda item: item[1][options['orden']], reverse=True)
+        for vista, datos in filas[:options['top']]:
+            hit_rate = '-' if datos['cache_hit_rate'] is None else f"{datos['cache_hit_rate']:.0f}%"
+            self.stdout.write(
+                f"{vista[:45]:<45} {datos['muestras']:>6} {datos['p50']:>8.1f} {datos['p95']:>8.1f} "
+                f"{datos['p99']:>8.1f} {datos['max']:>8.1f} {datos['consultas']:>9.1f} "
+                f"{datos['bd_ms']:>8.1f} {hit_rate:>6}"
+            )
+        self.stdout.write("")
+        self.stdout.write(self.style.HTTP_INFO("ℹ️  Tiempos en milisegundos; 'cache' es la tasa de aciertos de get/get_many"))
@@ -0,0 +1,80 @@
+"""
+Management command: procesar_recalculos
+Worker de la cola de recálculo (TareaRecalculo): cartera CxC, aging y
+forecasts. Varios workers pueden correr a la vez; cada tarea se reclama con
+select_for_update(skip_locked=True).
+
+Uso:
+    python manage.py procesar_recalculos                 # procesa lo pendiente y termina
+    python manage.py procesar_recalculos --loop          # worker permanente
+    python manage.py procesar_recalculos --programar     # cron: encola el recálculo completo
+    python manage.py procesar_recalculos --purgar 7      # borra tareas terminadas de más de 7 días
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.services.recalculo_service import RecalculoService
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de recálculo de reportes pesados (CxC, aging y forecasts)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Mantiene el worker esperando tareas nuevas.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='Segundos de espera entre consultas cuando la cola está vacía (default: 5).',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Máximo de tareas a procesar sin --loop (default: 100).',
+        )
+        parser.add_argument(
+            '--programar',
+            action='store_true',
+            help='Encola el recálculo completo (aging, CxC y forecast por defecto) antes de procesar.',
+        )
+        parser.add_argument(
+            '--purgar',
+            type=int,
+            metavar='DIAS',
+            help='Elimina las tareas terminadas o con error más antiguas que DIAS.',
+        )
+
+    def handle(self, *args, **options):
+        if options['purgar'] is not None:
+            eliminadas = RecalculoService.purgar(options['purgar'])
+            self.stdout.write(f"{eliminadas} tarea(s) antiguas eliminadas.")
+
+        if options['programar']:
+            encoladas = RecalculoService.programar_periodicos()
+            self.stdout.write(f"{encoladas} tarea(s) de recálculo programadas.")
+
+        count = 0
+        while True:
+            tarea = RecalculoService.procesar_siguiente()
+            if tarea is not None:
+                count += 1
+                duracion = (tarea.terminada_en - tarea.iniciada_en).total_seconds()
+                estilo = self.style.SUCCESS if tarea.estado == tarea.Estado.TERMINADA else self.style.ERROR
+                self.stdout.write(estilo(
+                    f"Tarea {tarea.pk} ({tarea.tipo}): {tarea.get_estado_display()} en {duracion:.2f}s"
+                    + (f" - {tarea.error}" if tarea.error else "")
+                ))
+                if not options['loop'] and count >= options['limit']:
+                    return
+                continue
+            if not options['loop']:
+                if count == 0:
+                    self.stdout.write("No hay tareas pendientes.")
+                return
+            time.sleep(options['sleep'])
@@ -2,8 +2,14 @@
 Middleware para cache automático de vistas
 """
 
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.deprecation import MiddlewareMixin
-from django.core.cache import cache
+from django.utils.translation import get_language_from_path
+import hashlib
 import time
 import logging
 
@@ -14,95 +20,179 @@ class CacheMiddleware(MiddlewareMixin):
     """
     Middleware para cache automático de respuestas de vistas
     Cache páginas completas para usuarios específicos
+
+    La entrada guardada es un diccionario con el estado, los encabezados y el
+    cuerpo en bytes (no el HttpResponse), así que la puede codificar
+    cualquier serializador binario (pickle o msgpack). Se guarda en el alias
+    settings.PAGE_CACHE_ALIAS. Cada respuesta lleva un ETag fuerte (hash del
+    cuerpo). Si el navegador manda If-None-Match con ese ETag, la respuesta
+    es 304 sin cuerpo.
     """
-    
+
+    # Encabezados que no se guardan con la página
+    HEADERS_EXCLUIDOS = {'set-cookie', 'x-cache', 'x-db-queries', 'x-response-time'}
+    CONTENT_TYPES = ('text/html', 'application/json')
+
     def __init__(self, get_response):
         self.get_response = get_response
-        # Configuración de cache por vista
+        # Configuración de cache por vista. La ruta se compara completa y sin
+        # el prefijo de idioma de i18n_patterns (/es/, /en/).
         self.cache_settings = {
-            '/balances/': 600,          # 10 minutos para balances
-            '/compras-balances/': 600,  # 10 minutos para compras
-            '/ventas-balances/': 600,   # 10 minutos para ventas
-            '/admin/': 300,             # 5 minutos para admin
+            '/ventas/balances/': 600,               # 10 minutos para ventas
+            '/admin/ventas/ventas/balances/': 600,  # 10 minutos para ventas (admin)
+            '/admin/gastos/gastos/balances/': 600,  # 10 minutos para balances de gastos
+        }
+        # Dominios de datos de los que depende cada página; su versión forma
+        # parte de la clave, así que invalidar el dominio invalida la página.
+        self.cache_domains = {
+            '/ventas/balances/': ('ventas', 'cxc'),
+            '/admin/ventas/ventas/balances/': ('ventas', 'cxc'),
+            '/admin/gastos/gastos/balances/': ('gastos',),
         }
         super().__init__(get_response)
-    
+
+    @property
+    def cache(self):
+        """Cache de páginas; el alias 'default' si PAGE_CACHE_ALIAS no está configurado"""
+        try:
+            return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'pages')]
+        except InvalidCacheBackendError:
+            return caches['default']
+
     def process_request(self, request):
         """Verificar si hay respuesta cacheada antes de procesar vista"""
         # Solo cachear para usuarios autenticados
         if not request.user.is_authenticated:
             return None
-        
+
         # Solo cachear GET requests
         if request.method != 'GET':
             return None
-        
+
         # Verificar si la URL debe ser cacheada
         cache_timeout = self._get_cache_timeout(request.path)
         if not cache_timeout:
             return None
-        
+
+        # El HTML lleva el token CSRF enmascarado con el secreto de la cookie;
+        # sin cookie la vista crea un secreto nuevo que la clave no incluiría
+        if not request.META.get('CSRF_COOKIE'):
+            return None
+
         # Generar clave de cache única por usuario y parámetros
         cache_key = self._generate_cache_key(request)
-        
+
         # Intentar obtener respuesta del cache
-        cached_response = cache.get(cache_key)
-        if cached_response:
+        entrada = self.cache.get(cache_key)
+        if entrada:
             logger.debug(f"Cache hit para: {request.path}")
+            cached_response = self._respuesta(entrada)
             # Agregar header para identificar respuesta cacheada
             cached_response['X-Cache'] = 'HIT'
-            return cached_response
-        
+            return get_conditional_response(request, etag=entrada['etag'], response=cached_response)
+
         # Marcar que se debe cachear esta request
         request._cache_key = cache_key
         request._cache_timeout = cache_timeout
         return None
-    
+
     def process_response(self, request, response):
         """Cachear respuesta si es necesario"""
         # Solo cachear si se marcó en process_request
         if not hasattr(request, '_cache_key'):
             return response
-        
+
         # Solo cachear respuestas exitosas
-        if response.status_code != 200:
+        if response.status_code != 200 or response.streaming:
             return response
-        
-        # Solo cachear HTML (no AJAX, JSON, etc.)
+
+        # Solo cachear HTML y JSON (las peticiones AJAX de la misma página)
         content_type = response.get('Content-Type', '')
-        if 'text/html' not in content_type:
+        if not any(tipo in content_type for tipo in self.CONTENT_TYPES):
             return response
-        
+
+        entrada = self._entrada(response)
+        response['ETag'] = entrada['etag']
+        # Las vistas del admin usan never_cache (no-store); el navegador puede
+        # guardar estas páginas siempre que las revalide con If-None-Match
+        del response['Expires']
+        del response['Cache-Control']
+        patch_cache_control(response, private=True, no_cache=True)
+        entrada['headers'] = self._headers(response)
+
         try:
             # Cachear la respuesta
-            cache.set(request._cache_key, response, request._cache_timeout)
+            self.cache.set(request._cache_key, entrada, request._cache_timeout)
             logger.debug(f"Cache set para: {request.path} (timeout: {request._cache_timeout}s)")
-            
+
             # Agregar header para identificar respuesta no cacheada
             response['X-Cache'] = 'MISS'
-            
+
         except Exception as e:
             logger.error(f"Error cacheando respuesta: {e}")
-        
+
+        return get_conditional_response(request, etag=entrada['etag'], response=response)
+
+    @staticmethod
+    def _etag(contenido: bytes) -> str:
+        return '"%s"' % hashlib.blake2b(contenido, digest_size=16).hexdigest()
+
+    def _entrada(self, response):
+        """Estado, encabezados y cuerpo de la respuesta como tipos simples"""
+        contenido = bytes(response.content)
+        return {
+            'status': response.status_code,
+            'headers': self._headers(response),
+            'content': contenido,
+            'etag': self._etag(contenido),
+        }
+
+    def _headers(self, response):
+        return [
+            [nombre, valor] for nombre, valor in response.items()
+            if nombre.lower() not in self.HEADERS_EXCLUIDOS
+        ]
+
+    @staticmethod
+    def _respuesta(entrada):
+        response = HttpResponse(entrada['content'], status=entrada['status'])
+        for nombre, valor in entrada['headers']:
+            response[nombre] = valor
         return response
-    
+
+    @staticmethod
+    def _ruta(path):
+        """Ruta sin el prefijo de idioma"""
+        idioma = get_language_from_path(path)
+        return path[len(idioma) + 1:] if idioma else path
+
     def _get_cache_timeout(self, path):
         """Obtiene el timeout de cache para una URL específica"""
-        for url_pattern, timeout in self.cache_settings.items():
-            if path.startswith(url_pattern):
-                return timeout
-        return None
-    
+        return self.cache_settings.get(self._ruta(path))
+
+    def _get_cache_domains(self, path):
+        """Dominios de cache de los que depende una URL"""
+        from app.services.cache_service import CacheService
+        return self.cache_domains.get(self._ruta(path)) or CacheService.DOMAINS
+
     def _generate_cache_key(self, request):
         """Genera clave de cache única"""
-        # Incluir usuario, path, y parámetros GET
+        from app.services.cache_service import cache_service
+        versions = cache_service.get_versions(*self._get_cache_domains(request.path))
+        # Si el secreto CSRF cambia (nuevo login) la página guardada ya no sirve
+        csrf = request.META.get('CSRF_COOKIE') or ''
+
+        # Incluir usuario, path, versiones de datos y parámetros GET
         key_parts = [
             'page_cache',
             str(request.user.id),
+            hashlib.blake2b(csrf.encode(), digest_size=8).hexdigest(),
+            'xhr' if request.headers.get('X-Requested-With') == 'XMLHttpRequest' else 'html',
             request.path,
+            '-'.join(f"{domain}{version}" for domain, version in sorted(versions.items())),
             request.GET.urlencode()
         ]
-        
+
         return ':'.join(filter(None, key_parts))
 
 
@@ -115,11 +205,6 @@ class DatabaseCacheInvalidationMiddleware(MiddlewareMixin):
         self.get_response = get_response
         super().__init__(get_response)
     
-    def process_request(self, request):
-        """Marcar timestamp de inicio de request"""
-        request._start_time = time.time()
-        return None
-    
     def process_response(self, request, response):
         """Invalidar cache si hubo escritura a BD en request POST"""
         # Solo procesar requests que modifican datos
@@ -143,25 +228,24 @@ class DatabaseCacheInvalidationMiddleware(MiddlewareMixin):
             
             path = request.path
             
+            # Las páginas cacheadas incluyen la versión de sus dominios en la
+            # clave, así que basta con invalidar el dominio.
+            
             # Admin de gastos
             if '/admin/gastos/gastos/' in path:
                 cache_service.invalidate_related_caches('gastos')
-                cache_service.clear_pattern('page_cache:*:balances*')
             
             # Admin de compras
             elif '/admin/gastos/compra/' in path:
                 cache_service.invalidate_related_caches('compra')
-                cache_service.clear_pattern('page_cache:*:compras*')
             
             # Admin de ventas
             elif '/admin/ventas/ventas/' in path:
                 cache_service.invalidate_related_caches('ventas')
-                cache_service.clear_pattern('page_cache:*:ventas*')
             
             # Catálogos
             elif any(model in path for model in ['/admin/catalogo/', '/admin/gastos/cuenta/']):
                 cache_service.invalidate_related_caches('catalogos')
-                cache_service.clear_pattern('page_cache:*')
             
             logger.info(f"Cache invalidado para operación: {path}")
             
@@ -175,6 +259,8 @@ class QueryCountDebugMiddleware(MiddlewareMixin):
     """
     Middleware para debug - cuenta queries de BD por request
     Solo activo en DEBUG mode
+
+    En producción usar app.middleware.instrumentacion.InstrumentacionMiddleware
     """
     
     def __init__(self, get_response):
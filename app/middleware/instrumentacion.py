@@ -0,0 +1,116 @@
+"""
+Middleware de instrumentación por petición, apto para producción.
+
+A diferencia de QueryCountDebugMiddleware no depende de DEBUG ni de
+connection.queries. Mide con connection.execute_wrapper (consultas y tiempo
+de BD) y con los backends instrumentados de cache (aciertos y fallos).
+Con cada respuesta:
+
+- agrega el encabezado Server-Timing (db, cache, app, total), visible en
+  las herramientas de desarrollo del navegador;
+- escribe una línea JSON en el logger app.instrumentacion si la petición
+  tarda más de INSTRUMENTACION_UMBRAL_LENTO segundos;
+- guarda la medición en la ventana de percentiles de su vista
+  (``manage.py metricas_vistas``).
+"""
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from app.services.instrumentacion_service import MedicionPeticion, metricas_vistas
+
+logger = logging.getLogger('app.instrumentacion')
+
+
+class InstrumentacionMiddleware:
+    """Mide consultas, cache y tiempo total de cada petición por vista resuelta"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACION_ACTIVA', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.umbral_lento = getattr(settings, 'INSTRUMENTACION_UMBRAL_LENTO', 1.0)
+        self.server_timing = getattr(settings, 'INSTRUMENTACION_SERVER_TIMING', 'staff')
+
+    def __call__(self, request):
+        medicion = MedicionPeticion()
+        token = medicion.activar()
+        try:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(medicion))
+                response = self.get_response(request)
+        finally:
+            medicion.desactivar(token)
+
+        total = medicion.total
+        vista = medicion.vista or self._vista(request)
+        try:
+            if self._mostrar_server_timing(request):
+                response['Server-Timing'] = self._server_timing(medicion, total)
+            if total >= self.umbral_lento:
+                self._registrar_lenta(request, response, medicion, vista, total)
+            if vista:
+                metricas_vistas.registrar(vista, medicion, total)
+        except Exception as e:
+            logger.error(f"Error registrando instrumentación de {request.path}: {e}")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicion = MedicionPeticion.actual()
+        if medicion is not None and request.resolver_match:
+            medicion.vista = request.resolver_match.view_name or request.resolver_match._func_path
+        return None
+
+    @staticmethod
+    def _vista(request):
+        """Nombre de la vista cuando la respuesta salió antes de process_view (p. ej. cache de página)"""
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        return match.view_name or match._func_path
+
+    def _mostrar_server_timing(self, request):
+        if self.server_timing == 'todos':
+            return True
+        if self.server_timing == 'staff':
+            usuario = getattr(request, 'user', None)
+            return bool(usuario and usuario.is_authenticated and usuario.is_staff)
+        return False
+
+    @staticmethod
+    def _server_timing(medicion, total):
+        bd = medicion.tiempo_bd * 1000
+        cache = medicion.tiempo_cache * 1000
+        return ', '.join([
+            f'db;dur={bd:.1f};desc="{medicion.consultas} consultas"',
+            f'cache;dur={cache:.1f};desc="{medicion.cache_aciertos} hit {medicion.cache_fallos} miss"',
+            f'app;dur={max(total * 1000 - bd - cache, 0):.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+    @staticmethod
+    def _registrar_lenta(request, response, medicion, vista, total):
+        usuario = getattr(request, 'user', None)
+        logger.warning(json.dumps({
+            'evento': 'peticion_lenta',
+            'fecha': timezone.now().isoformat(),
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': vista,
+            'estado': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'bd_ms': round(medicion.tiempo_bd * 1000, 1),
+            'consultas': medicion.consultas,
+            'cache_ms': round(medicion.tiempo_cache * 1000, 1),
+            'cache_aciertos': medicion.cache_aciertos,
+            'cache_fallos': medicion.cache_fallos,
+            'usuario_id': usuario.pk if usuario is not None and usuario.is_authenticated else None,
+        }, ensure_ascii=False))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=40, unique=True, verbose_name='Clave (SHA-1)')),
+                ('token', models.CharField(max_length=32, verbose_name='Token del dueño')),
+                ('expira', models.DateTimeField(db_index=True, verbose_name='Expira')),
+            ],
+            options={
+                'verbose_name': 'Lock de cache',
+                'verbose_name_plural': 'Locks de cache',
+                'db_table': 'app_cache_lock',
+            },
+        ),
+    ]
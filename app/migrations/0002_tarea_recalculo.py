@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_cache_lock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaRecalculo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('aging', 'Aging de cartera'), ('cxc', 'Métricas de cuentas por cobrar'), ('forecast', 'Predicciones')], max_length=16)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('clave', models.CharField(max_length=64, verbose_name='Clave de deduplicación')),
+                ('estado', models.CharField(choices=[('pending', 'Pendiente'), ('processing', 'Procesando'), ('done', 'Terminada'), ('error', 'Error')], default='pending', max_length=16)),
+                ('programada_para', models.DateTimeField(default=django.utils.timezone.now)),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_en', models.DateTimeField(blank=True, null=True)),
+                ('terminada_en', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Tarea de recálculo',
+                'verbose_name_plural': 'Tareas de recálculo',
+                'db_table': 'app_tarea_recalculo',
+                'ordering': ['programada_para', 'id'],
+                'indexes': [models.Index(fields=['estado', 'programada_para'], name='app_tarea_estado_prog_idx'), models.Index(fields=['clave', 'estado'], name='app_tarea_clave_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+"""
+Modelos de soporte de la app principal
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+
+class CacheLock(models.Model):
+    """
+    Lock de recálculo para CacheService.get_or_compute cuando el backend de
+    cache no es compartido entre procesos (LocMemCache). La unicidad de
+    `clave` garantiza que solo un proceso obtiene el lock; los locks vencidos
+    se reemplazan al siguiente intento.
+    """
+
+    clave = models.CharField(max_length=40, unique=True, verbose_name="Clave (SHA-1)")
+    token = models.CharField(max_length=32, verbose_name="Token del dueño")
+    expira = models.DateTimeField(db_index=True, verbose_name="Expira")
+
+    class Meta:
+        verbose_name = "Lock de cache"
+        verbose_name_plural = "Locks de cache"
+        db_table = 'app_cache_lock'
+
+    def __str__(self):
+        return f"{self.clave} (expira {self.expira:%Y-%m-%d %H:%M:%S})"
+
+    @staticmethod
+    def _hash(clave: str) -> str:
+        return hashlib.sha1(clave.encode()).hexdigest()
+
+    @classmethod
+    def adquirir(cls, clave: str, token: str, segundos: int) -> bool:
+        """Intenta tomar el lock; False si otro proceso lo tiene vigente"""
+        ahora = timezone.now()
+        clave = cls._hash(clave)
+        try:
+            with transaction.atomic():
+                cls.objects.filter(clave=clave, expira__lt=ahora).delete()
+                cls.objects.create(clave=clave, token=token, expira=ahora + timedelta(seconds=segundos))
+            return True
+        except IntegrityError:
+            return False
+
+    @classmethod
+    def liberar(cls, clave: str, token: str) -> None:
+        """Libera el lock solo si sigue perteneciendo a `token`"""
+        cls.objects.filter(clave=cls._hash(clave), token=token).delete()
+
+
+class TareaRecalculo(models.Model):
+    """
+    Cola de recálculo en segundo plano de los reportes pesados (cartera CxC,
+    aging y forecasts). Los workers reclaman tareas con
+    select_for_update(skip_locked=True), igual que la cola de OCR de
+    ComprobanteGasto; las vistas solo leen los resultados cacheados.
+    """
+
+    class Tipo(models.TextChoices):
+        AGING = 'aging', 'Aging de cartera'
+        CXC = 'cxc', 'Métricas de cuentas por cobrar'
+        FORECAST = 'forecast', 'Predicciones'
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'pending', 'Pendiente'
+        PROCESANDO = 'processing', 'Procesando'
+        TERMINADA = 'done', 'Terminada'
+        ERROR = 'error', 'Error'
+
+    tipo = models.CharField(max_length=16, choices=Tipo.choices)
+    parametros = models.JSONField(default=dict, blank=True)
+    clave = models.CharField(max_length=64, verbose_name="Clave de deduplicación")
+    estado = models.CharField(max_length=16, choices=Estado.choices, default=Estado.PENDIENTE)
+    programada_para = models.DateTimeField(default=timezone.now)
+    creada_en = models.DateTimeField(auto_now_add=True)
+    iniciada_en = models.DateTimeField(null=True, blank=True)
+    terminada_en = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Tarea de recálculo"
+        verbose_name_plural = "Tareas de recálculo"
+        db_table = 'app_tarea_recalculo'
+        ordering = ['programada_para', 'id']
+        indexes = [
+            models.Index(fields=['estado', 'programada_para'], name='app_tarea_estado_prog_idx'),
+            models.Index(fields=['clave', 'estado'], name='app_tarea_clave_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.parametros or ''} - {self.get_estado_display()}"
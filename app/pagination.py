@@ -0,0 +1,236 @@
+"""
+Paginadores para listados grandes del admin
+"""
+import base64
+import binascii
+import json
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator que evita el COUNT(*) exacto sobre tablas grandes.
+
+    Sin filtros, el total se toma de las estadísticas del motor
+    (information_schema en MySQL, pg_class en PostgreSQL). Si la estimación
+    queda por debajo de `umbral_exacto`, o hay filtros/búsqueda, o el motor no
+    ofrece estadísticas (SQLite), se cuenta de forma exacta.
+    """
+
+    umbral_exacto = 10000
+
+    @cached_property
+    def count(self):
+        estimado = self._conteo_estimado()
+        if estimado is None or estimado < self.umbral_exacto:
+            return super().count
+        return estimado
+
+    def _conteo_estimado(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or query.distinct or query.combinator:
+            return None
+        connection = connections[self.object_list.db]
+        tabla = self.object_list.model._meta.db_table
+        if connection.vendor == 'mysql':
+            sql = ("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s")
+        elif connection.vendor == 'postgresql':
+            sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+        else:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tabla])
+            fila = cursor.fetchone()
+        return int(fila[0]) if fila and fila[0] is not None and fila[0] >= 0 else None
+
+
+CURSOR_VAR = 'cursor'
+
+
+class PaginaKeyset:
+    """Página de KeysetPaginator: filas y cursores de la anterior/siguiente"""
+
+    def __init__(self, object_list, anterior=None, siguiente=None, es_primera=True):
+        self.object_list = object_list
+        self.anterior = anterior
+        self.siguiente = siguiente
+        self.es_primera = es_primera
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.siguiente is not None
+
+    def has_previous(self):
+        return not self.es_primera
+
+
+class KeysetPaginator(EstimatedCountPaginator):
+    """
+    Paginación por llave (keyset) sobre el orden del queryset.
+
+    En lugar de OFFSET, cada página continúa desde los valores de orden de la
+    última fila mostrada (WHERE (fecha_hora, id) < (...)), así que la página
+    1000 cuesta lo mismo que la primera. Los cursores viajan en el parámetro
+    `cursor`. Solo aplica si el orden termina en una llave única, no usa
+    columnas nulas ni de modelos relacionados y su primera columna tiene
+    índice; si no, `orden_keyset` es None y se usa la paginación clásica
+    (`page`). El total se estima igual que en EstimatedCountPaginator.
+    """
+
+    @cached_property
+    def orden_keyset(self):
+        """Lista de (campo, descendente) del orden del queryset, o None"""
+        query = getattr(self.object_list, 'query', None)
+        if query is None or not query.order_by:
+            return None
+        opts = self.object_list.model._meta
+        orden = []
+        for parte in query.order_by:
+            if isinstance(parte, str):
+                nombre, descendente = parte.lstrip('-'), parte.startswith('-')
+            elif isinstance(parte, OrderBy) and isinstance(parte.expression, F):
+                nombre, descendente = parte.expression.name, parte.descending
+            else:
+                return None
+            try:
+                campo = opts.pk if nombre == 'pk' else opts.get_field(nombre)
+            except FieldDoesNotExist:
+                return None
+            if not campo.concrete or campo.null or (campo.remote_field and nombre == campo.name):
+                return None
+            orden.append((campo, descendente))
+            if campo.primary_key or campo.unique:
+                return orden if self._indexado(opts, orden[0][0]) else None
+        return None
+
+    @staticmethod
+    def _indexado(opts, campo):
+        return (
+            campo.primary_key or campo.unique or campo.db_index
+            or any(index.fields and index.fields[0].lstrip('-') == campo.name for index in opts.indexes)
+        )
+
+    def _cursor(self, direccion, fila):
+        # value_to_string conserva los microsegundos que DjangoJSONEncoder recorta
+        valores = [campo.value_to_string(fila) for campo, _ in self.orden_keyset]
+        contenido = json.dumps([direccion, valores])
+        return base64.urlsafe_b64encode(contenido.encode()).decode().rstrip('=')
+
+    def _leer_cursor(self, cursor):
+        try:
+            contenido = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direccion, valores = json.loads(contenido)
+            if direccion not in ('n', 'p') or len(valores) != len(self.orden_keyset):
+                raise ValueError(cursor)
+            return direccion, [campo.to_python(valor) for (campo, _), valor in zip(self.orden_keyset, valores)]
+        except (TypeError, ValueError, binascii.Error, ValidationError) as exc:
+            raise ValueError(f'Cursor inválido: {cursor}') from exc
+
+    def _despues_de(self, valores, adelante):
+        condicion, iguales = Q(), {}
+        for (campo, descendente), valor in zip(self.orden_keyset, valores):
+            operador = 'lt' if descendente == adelante else 'gt'
+            condicion |= Q(**iguales, **{f'{campo.attname}__{operador}': valor})
+            iguales[campo.attname] = valor
+        return condicion
+
+    def pagina_keyset(self, cursor=None):
+        """Página que sigue (o precede) al cursor; sin cursor, la primera"""
+        if self.orden_keyset is None:
+            raise ValueError('El orden del queryset no admite paginación por llave')
+        direccion, valores = self._leer_cursor(cursor) if cursor else ('n', None)
+        adelante = direccion == 'n'
+
+        queryset = self.object_list
+        if valores is not None:
+            queryset = queryset.filter(self._despues_de(valores, adelante))
+        queryset = queryset.order_by(*(
+            f"{'-' if descendente == adelante else ''}{campo.attname}" for campo, descendente in self.orden_keyset
+        ))
+        filas = list(queryset[:self.per_page + 1])
+        hay_mas, filas = len(filas) > self.per_page, filas[:self.per_page]
+
+        if adelante:
+            return PaginaKeyset(
+                filas,
+                anterior=self._cursor('p', filas[0]) if valores is not None and filas else None,
+                siguiente=self._cursor('n', filas[-1]) if hay_mas else None,
+                es_primera=valores is None,
+            )
+        filas.reverse()
+        return PaginaKeyset(
+            filas,
+            anterior=self._cursor('p', filas[0]) if hay_mas else None,
+            siguiente=self._cursor('n', filas[-1]) if filas else None,
+            es_primera=not hay_mas,
+        )
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList que pagina con KeysetPaginator cuando el orden lo permite"""
+
+    keyset = None
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Cambiar filtros u orden vuelve a la primera página
+        if not new_params or CURSOR_VAR not in new_params:
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        if (
+            self.show_all or self.model_admin.list_editable
+            or getattr(paginator, 'orden_keyset', None) is None
+        ):
+            return super().get_results(request)
+        try:
+            pagina = paginator.pagina_keyset(request.GET.get(CURSOR_VAR))
+        except ValueError:
+            raise IncorrectLookupParameters
+
+        self.keyset = pagina
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = pagina.object_list
+        self.can_show_all = False
+        self.multi_page = pagina.has_next() or pagina.has_previous()
+        self.paginator = paginator
+        self.primera_url = self.get_query_string() if pagina.has_previous() else None
+        self.anterior_url = self.get_query_string({CURSOR_VAR: pagina.anterior}) if pagina.anterior else None
+        self.siguiente_url = self.get_query_string({CURSOR_VAR: pagina.siguiente}) if pagina.siguiente else None
+
+
+class KeysetPaginationMixin:
+    """
+    Mixin de ModelAdmin para changelists de tablas grandes: paginación por
+    llave con total estimado. Requiere la plantilla
+    admin/<app>/<modelo>/pagination.html que incluye admin/keyset_pagination.html.
+    """
+
+    paginator = KeysetPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
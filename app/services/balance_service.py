@@ -89,27 +89,22 @@ class BalanceAnalysisService(BaseReportServiceWithCategories):
         - Información adicional (número secuencial, cuenta_info)
         """
         # Generar clave de cache
-        cache_key = cache_service._generate_cache_key(
+        cache_key = cache_service.versioned_key('gastos', cache_service._generate_cache_key(
             'balances_gastos', periodo, **filters
-        )
-        
-        # Intentar obtener del cache
-        cached_data = cache_service.get(cache_key)
-        if cached_data is not None:
-            logger.debug(f"Cache hit para balances gastos: {cache_key}")
-            return self._sort_balances_by_period(cached_data, periodo)
-        
-        # Ejecutar consulta
-        logger.debug(f"Cache miss para balances gastos: {cache_key}")
-        balances = self._get_balances_queryset(filters, periodo)
-        balances_list = self._sort_balances_by_period(list(balances), periodo)
+        ))
         
-        # Añadir información adicional específica de Gastos
-        self._enrich_balance_data(balances_list, filters)
-        
-        # Cachear resultado
-        timeout = cache_service.timeouts.get('balances', 900)
-        cache_service.set(cache_key, balances_list, timeout)
+        def calcular():
+            balances = self._get_balances_queryset(filters, periodo)
+            balances_list = self._sort_balances_by_period(list(balances), periodo)
+            # Añadir información adicional específica de Gastos
+            self._enrich_balance_data(balances_list, filters)
+            return balances_list
+
+        # Un solo proceso recalcula al vencer; el resto recibe el valor anterior
+        balances_list = cache_service.get_or_compute(
+            cache_key, calcular, cache_service.timeouts.get('balances', 900)
+        )
+        balances_list = self._sort_balances_by_period(balances_list, periodo)
         
         return balances_list
 
@@ -184,7 +179,7 @@ class BalanceAnalysisService(BaseReportServiceWithCategories):
                 else:
                     balance['cuenta_info'] = "Única cuenta para esta categoría"
     
-    @cache_result('balances', 900, 'estadisticas_gastos')
+    @cache_result('balances', 900, 'estadisticas_gastos', domain='gastos')
     def calculate_statistics(self, filters):
         """
         Override para añadir estadísticas específicas de Gastos
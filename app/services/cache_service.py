@@ -4,14 +4,22 @@ Maneja todas las operaciones de cache Redis con patrones optimizados
 """
 
 from django.core.cache import caches, cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
 from django.conf import settings
+from django.utils.connection import ConnectionProxy
 from django.utils import timezone
 from django.db.models import QuerySet
+from collections import Counter
 import hashlib
 import json
 import logging
+import math
+import random
+import threading
+import uuid
 from functools import wraps
-from typing import Any, Optional, Union, List, Dict
+from typing import Any, Callable, Optional, Union, List, Dict, Tuple
 import time
 
 logger = logging.getLogger(__name__)
@@ -19,10 +27,42 @@ logger = logging.getLogger(__name__)
 class CacheService:
     """Servicio centralizado de cache con Redis"""
     
+    # Dominios con namespace versionado. Cada uno tiene un contador entero y
+    # las claves del dominio incluyen la versión vigente: invalidar es un INCR
+    # O(1) (sin SCAN ni delete_pattern) y las claves viejas expiran por TTL.
+    # Funciona igual en Redis y en LocMemCache.
+    DOMAINS = ('ventas', 'cxc', 'gastos', 'compras', 'forecast')
+    VERSION_KEY = 'cache_ns_version:{}'
+    
+    # Dominios afectados por cambios en cada modelo
+    RELATED_DOMAINS = {
+        'gastos': ('gastos', 'forecast'),
+        'compra': ('compras', 'forecast'),
+        'ventas': ('ventas', 'cxc', 'forecast'),
+    }
+    CATALOG_MODELS = ('catalogos', 'productor', 'producto', 'sucursal', 'cuenta')
+
+    # get_or_compute: marca del sobre guardado, espera máxima de quien no
+    # obtiene el lock y contadores de hit/miss/stale por nombre
+    ENVELOPE_MARKER = '__swr__'
+    # Último valor calculado de una clave versionada, fuera del namespace:
+    # sobrevive a las invalidaciones y se sirve marcado como desactualizado
+    LATEST_KEY = '{}:latest:{}'
+    LOCK_KEY = 'lock:{}'
+    LOCK_WAIT = 2.0
+    STATS_KEY = 'cache_stats:{}:{}'
+    STATS_NAMES_KEY = 'cache_stats:names'
+    STATS_EVENTS = ('hit', 'miss', 'stale', 'refresh', 'wait')
+    STATS_FLUSH_EVERY = 50
+    STATS_FLUSH_INTERVAL = 30
+
     def __init__(self):
         self.default_cache = cache
         self.static_cache = caches['static_data'] if 'static_data' in caches else cache
         self.timeouts = getattr(settings, 'CACHE_TIMEOUTS', {})
+        self._stats_lock = threading.Lock()
+        self._stats_pending = Counter()
+        self._stats_last_flush = time.time()
     
     def _generate_cache_key(self, prefix: str, *args, **kwargs) -> str:
         """Genera una clave de cache única y consistente"""
@@ -90,32 +130,343 @@ class CacheService:
             logger.error(f"Error al limpiar patrón cache {pattern}: {e}")
             return False
     
+    # =========================================================================
+    # Namespaces versionados
+    # =========================================================================
+    
+    def _version_key(self, domain: str) -> str:
+        if domain not in self.DOMAINS:
+            raise ValueError(f"Dominio de cache desconocido: {domain}")
+        return self.VERSION_KEY.format(domain)
+    
+    def _init_version(self, version_key: str) -> int:
+        """
+        Crea el contador de un dominio. La semilla es el tiempo en ms: si el
+        contador se pierde (eviction, reinicio de Redis) nunca reaparece una
+        versión ya usada, así que no se resucitan claves obsoletas.
+        """
+        seed = int(time.time() * 1000)
+        try:
+            # add() no pisa el valor si otro proceso lo creó primero
+            self.default_cache.add(version_key, seed, None)
+            return int(self.default_cache.get(version_key, seed))
+        except Exception as e:
+            logger.error(f"Error inicializando versión {version_key}: {e}")
+            return seed
+    
+    def get_versions(self, *domains: str) -> Dict[str, int]:
+        """Versiones vigentes de varios dominios en un solo round-trip"""
+        keys = {self._version_key(domain): domain for domain in domains}
+        try:
+            found = self.default_cache.get_many(list(keys))
+        except Exception as e:
+            logger.error(f"Error al obtener versiones de cache: {e}")
+            found = {}
+        
+        versions = {}
+        for key, domain in keys.items():
+            version = found.get(key)
+            versions[domain] = int(version) if version is not None else self._init_version(key)
+        return versions
+    
+    def get_version(self, domain: str) -> int:
+        """Versión vigente del namespace de un dominio"""
+        return self.get_versions(domain)[domain]
+    
+    def versioned_key(self, domain: str, key: str) -> str:
+        """Clave dentro del namespace vigente del dominio"""
+        return f"{domain}:v{self.get_version(domain)}:{key}"
+    
+    def invalidate_domains(self, *domains: str) -> None:
+        """Invalida todas las claves de los dominios incrementando su versión"""
+        for domain in domains:
+            key = self._version_key(domain)
+            try:
+                self.default_cache.incr(key)
+            except ValueError:
+                # El contador no existía: crearlo equivale a una versión nueva
+                self._init_version(key)
+            except Exception as e:
+                logger.error(f"Error invalidando dominio de cache {domain}: {e}")
+        if domains:
+            logger.debug(f"Dominios de cache invalidados: {', '.join(domains)}")
+            self._schedule_recompute(domains)
+    
+    def _schedule_recompute(self, domains) -> None:
+        """Programa en la cola de recálculo los reportes pesados de los dominios"""
+        try:
+            from app.services.recalculo_service import RecalculoService
+            RecalculoService.programar_por_dominios(domains)
+        except Exception as e:
+            logger.error(f"Error programando recálculo de {domains}: {e}")
+    
+    # =========================================================================
+    # get_or_compute: protección contra estampidas (stale-while-revalidate)
+    # =========================================================================
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], timeout: Optional[int] = None,
+                       cache_alias: str = 'default', stale_ttl: Optional[int] = None,
+                       beta: Optional[float] = None, lock_timeout: Optional[int] = None,
+                       force: bool = False, stats_name: Optional[str] = None,
+                       latest_key: Optional[str] = None) -> Any:
+        """
+        Obtiene un valor del cache o lo calcula sin provocar estampidas.
+
+        El valor se guarda en un sobre con su vencimiento suave (`timeout`) y
+        vive en el cache `stale_ttl` segundos más. Al vencer, solo el proceso
+        que obtiene el lock recalcula; los demás reciben el valor anterior.
+        Con `beta` > 0 cada lectura puede adelantar el recálculo con una
+        probabilidad que crece al acercarse el vencimiento y con lo que tardó
+        el último cálculo (XFetch), de modo que rara vez se llega a vencer.
+
+        Si no hay valor, quien obtiene el lock calcula y los demás esperan
+        hasta LOCK_WAIT segundos a que aparezca antes de calcular por su cuenta.
+        `force` ignora el valor cacheado y lo reemplaza. Con `latest_key`
+        (ver latest_key()) cada cálculo se copia también ahí para peek_latest.
+        """
+        if timeout is None:
+            timeout = 300
+        if stale_ttl is None:
+            stale_ttl = getattr(settings, 'CACHE_STALE_TTL', 300)
+        if beta is None:
+            beta = getattr(settings, 'CACHE_EARLY_RECOMPUTE_BETA', 1.0)
+        if lock_timeout is None:
+            lock_timeout = getattr(settings, 'CACHE_LOCK_TIMEOUT', 30)
+        stats_name = stats_name or key.split(':', 1)[0]
+        cache_instance = caches[cache_alias] if cache_alias != 'default' else self.default_cache
+        store = (cache_instance, key, compute, timeout + stale_ttl, timeout, latest_key)
+
+        if force:
+            return self._compute_and_store(*store)
+
+        entry = self._get_envelope(cache_instance, key)
+        if entry is not None:
+            now = time.time()
+            expires = entry['soft_expires']
+            early = beta > 0 and now - entry['compute_time'] * beta * math.log(1.0 - random.random()) >= expires
+            if now < expires and not early:
+                self._record_stat(stats_name, 'hit')
+                return entry['value']
+
+            # Vencido o recálculo anticipado: solo el dueño del lock recalcula
+            token = self._acquire_lock(cache_instance, key, lock_timeout)
+            if token is None:
+                self._record_stat(stats_name, 'stale' if now >= expires else 'hit')
+                return entry['value']
+            try:
+                self._record_stat(stats_name, 'refresh')
+                return self._compute_and_store(*store)
+            except Exception as e:
+                logger.error(f"Error recalculando {key}, se sirve el valor anterior: {e}")
+                return entry['value']
+            finally:
+                self._release_lock(cache_instance, key, token)
+
+        self._record_stat(stats_name, 'miss')
+        token = self._acquire_lock(cache_instance, key, lock_timeout)
+        if token is not None:
+            try:
+                return self._compute_and_store(*store)
+            finally:
+                self._release_lock(cache_instance, key, token)
+
+        # Otro proceso está calculando: esperar a que publique el valor
+        deadline = time.time() + min(lock_timeout, self.LOCK_WAIT)
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = self._get_envelope(cache_instance, key)
+            if entry is not None:
+                self._record_stat(stats_name, 'wait')
+                return entry['value']
+        logger.warning(f"Timeout esperando el cálculo de {key}; se calcula sin lock")
+        return self._compute_and_store(*store)
+
+    def peek(self, key: str, cache_alias: str = 'default') -> Any:
+        """
+        Valor guardado por get_or_compute sin calcular nunca, aunque esté
+        vencido (stale). None si no hay valor; para vistas que solo leen
+        resultados precalculados por la cola de recálculo.
+        """
+        cache_instance = caches[cache_alias] if cache_alias != 'default' else self.default_cache
+        entry = self._get_envelope(cache_instance, key)
+        if entry is None:
+            return None
+        self._record_stat(key.split(':', 1)[0], 'hit' if time.time() < entry['soft_expires'] else 'stale')
+        return entry['value']
+
+    def latest_key(self, domain: str, name: str) -> str:
+        """Clave del último valor calculado de `name`, independiente de la versión del dominio"""
+        self._version_key(domain)  # valida el dominio
+        return self.LATEST_KEY.format(domain, name)
+
+    def peek_latest(self, domain: str, name: str, cache_alias: str = 'default') -> Tuple[Any, bool]:
+        """
+        (valor, desactualizado) sin calcular nunca. Primero el valor de la
+        versión vigente; si el dominio se invalidó después, el último
+        calculado (guardado por get_or_compute con latest_key) con
+        desactualizado=True. (None, False) si nunca se calculó.
+        """
+        value = self.peek(self.versioned_key(domain, name), cache_alias)
+        if value is not None:
+            return value, False
+        cache_instance = caches[cache_alias] if cache_alias != 'default' else self.default_cache
+        try:
+            latest = cache_instance.get(self.latest_key(domain, name))
+        except Exception as e:
+            logger.error(f"Error al obtener el último valor de {domain}:{name}: {e}")
+            latest = None
+        return latest, latest is not None
+
+    def _get_envelope(self, cache_instance, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            entry = cache_instance.get(key)
+        except Exception as e:
+            logger.error(f"Error al obtener cache {key}: {e}")
+            return None
+        # Valores guardados con set() plano se tratan como miss
+        if isinstance(entry, dict) and entry.get(self.ENVELOPE_MARKER):
+            return entry
+        return None
+
+    def _compute_and_store(self, cache_instance, key: str, compute: Callable[[], Any],
+                           hard_timeout: int, soft_timeout: int, latest_key: Optional[str] = None) -> Any:
+        start_time = time.time()
+        value = compute()
+        compute_time = time.time() - start_time
+        logger.info(f"Valor calculado en {compute_time:.2f}s: {key}")
+
+        entry = {
+            self.ENVELOPE_MARKER: 1,
+            'value': value,
+            'soft_expires': time.time() + soft_timeout,
+            'compute_time': compute_time,
+        }
+        try:
+            cache_instance.set(key, entry, hard_timeout)
+            if latest_key is not None and value is not None:
+                cache_instance.set(latest_key, value, getattr(settings, 'CACHE_LATEST_TTL', 7 * 86400))
+        except Exception as e:
+            logger.error(f"Error al establecer cache {key}: {e}")
+        return value
+
+    def is_shared(self, cache_alias: str = 'default') -> bool:
+        """
+        Si el cache lo ven todos los procesos (Redis). Con LocMemCache o
+        DummyCache lo que calcula un worker no llega a las vistas. CACHE_SHARED
+        True/False fuerza la respuesta; 'auto' la deduce del backend.
+        """
+        shared = getattr(settings, 'CACHE_SHARED', 'auto')
+        if shared != 'auto':
+            return bool(shared)
+        return not self._es_local(caches[cache_alias])
+
+    @staticmethod
+    def _es_local(cache_instance) -> bool:
+        # django.core.cache.cache es un proxy: isinstance no ve el backend real
+        if isinstance(cache_instance, ConnectionProxy):
+            cache_instance = caches[cache_instance._alias]
+        return isinstance(cache_instance, (LocMemCache, DummyCache))
+
+    def _lock_backend(self, cache_instance) -> str:
+        backend = getattr(settings, 'CACHE_LOCK_BACKEND', 'auto')
+        if backend != 'auto':
+            return backend
+        # LocMemCache no se comparte entre procesos: el lock va a la base de datos
+        return 'db' if self._es_local(cache_instance) else 'cache'
+
+    def _acquire_lock(self, cache_instance, key: str, lock_timeout: int) -> Optional[str]:
+        """Token del lock de recálculo de `key`, o None si lo tiene otro proceso"""
+        token = uuid.uuid4().hex
+        lock_key = self.LOCK_KEY.format(key)
+        try:
+            if self._lock_backend(cache_instance) == 'db':
+                from app.models import CacheLock
+                acquired = CacheLock.adquirir(lock_key, token, lock_timeout)
+            else:
+                # add() es SET NX con expiración en django-redis
+                acquired = cache_instance.add(lock_key, token, lock_timeout)
+        except Exception as e:
+            # Sin lock disponible se calcula igual: peor una estampida que un error
+            logger.error(f"Error adquiriendo lock {lock_key}: {e}")
+            return token
+        return token if acquired else None
+
+    def _release_lock(self, cache_instance, key: str, token: str) -> None:
+        lock_key = self.LOCK_KEY.format(key)
+        try:
+            if self._lock_backend(cache_instance) == 'db':
+                from app.models import CacheLock
+                CacheLock.liberar(lock_key, token)
+            elif cache_instance.get(lock_key) == token:
+                cache_instance.delete(lock_key)
+        except Exception as e:
+            logger.error(f"Error liberando lock {lock_key}: {e}")
+
+    def _record_stat(self, name: str, event: str) -> None:
+        """Acumula el evento en memoria y lo vuelca al cache por lotes"""
+        with self._stats_lock:
+            self._stats_pending[(name, event)] += 1
+            if (sum(self._stats_pending.values()) < self.STATS_FLUSH_EVERY
+                    and time.time() - self._stats_last_flush < self.STATS_FLUSH_INTERVAL):
+                return
+            pending, self._stats_pending = self._stats_pending, Counter()
+            self._stats_last_flush = time.time()
+        self._flush_stats(pending)
+
+    def _flush_stats(self, pending: Counter) -> None:
+        try:
+            names = set(self.default_cache.get(self.STATS_NAMES_KEY) or [])
+            new_names = {name for name, _ in pending} - names
+            if new_names:
+                self.default_cache.set(self.STATS_NAMES_KEY, sorted(names | new_names), None)
+            for (name, event), count in pending.items():
+                key = self.STATS_KEY.format(name, event)
+                try:
+                    self.default_cache.incr(key, count)
+                except ValueError:
+                    if not self.default_cache.add(key, count, None):
+                        self.default_cache.incr(key, count)
+        except Exception as e:
+            logger.error(f"Error guardando estadísticas de cache: {e}")
+
+    def get_compute_stats(self) -> Dict[str, Dict[str, int]]:
+        """Contadores de get_or_compute por nombre, incluyendo los pendientes de este proceso"""
+        with self._stats_lock:
+            pending, self._stats_pending = self._stats_pending, Counter()
+            self._stats_last_flush = time.time()
+        if pending:
+            self._flush_stats(pending)
+
+        names = self.default_cache.get(self.STATS_NAMES_KEY) or []
+        keys = {self.STATS_KEY.format(name, event): (name, event)
+                for name in names for event in self.STATS_EVENTS}
+        values = self.default_cache.get_many(list(keys))
+
+        stats = {}
+        for name in names:
+            counts = {event: 0 for event in self.STATS_EVENTS}
+            for key, (key_name, event) in keys.items():
+                if key_name == name:
+                    counts[event] = int(values.get(key) or 0)
+            # refresh y miss implican calcular en la petición; el resto se sirvió del cache
+            served = counts['hit'] + counts['stale'] + counts['wait']
+            counts['hit_rate'] = round(served * 100 / max(sum(counts.values()), 1), 1)
+            stats[name] = counts
+        return stats
+
     def get_or_set_balances(self, cache_key: str, query_function, timeout: Optional[int] = None, **query_kwargs) -> Any:
         """Obtiene balances del cache o ejecuta la consulta"""
         if timeout is None:
             timeout = self.timeouts.get('balances', 900)
-        
-        # Intentar obtener del cache
-        cached_data = self.get(cache_key)
-        if cached_data is not None:
-            logger.debug(f"Cache hit: {cache_key}")
-            return cached_data
-        
-        # Ejecutar consulta y cachear
-        logger.debug(f"Cache miss: {cache_key} - Ejecutando consulta")
-        start_time = time.time()
-        
-        data = query_function(**query_kwargs)
-        
-        execution_time = time.time() - start_time
-        logger.info(f"Consulta ejecutada en {execution_time:.2f}s: {cache_key}")
-        
-        # Serializar QuerySet a lista para cache
-        if isinstance(data, QuerySet):
-            data = list(data.values())
-        
-        self.set(cache_key, data, timeout)
-        return data
+
+        def compute():
+            data = query_function(**query_kwargs)
+            # Serializar QuerySet a lista para cache
+            if isinstance(data, QuerySet):
+                data = list(data.values())
+            return data
+
+        return self.get_or_compute(cache_key, compute, timeout)
     
     def get_or_set_catalogos(self, cache_key: str, query_function, **query_kwargs) -> Any:
         """Cache específico para datos de catálogo (productores, productos, etc.)"""
@@ -129,35 +480,15 @@ class CacheService:
     
     def invalidate_related_caches(self, model_name: str, action: str = 'update') -> None:
         """Invalida caches relacionados cuando se actualiza un modelo"""
-        patterns_to_clear = []
-        
-        if model_name == 'gastos':
-            patterns_to_clear = [
-                'agricola:balances_gastos:*',
-                'agricola:dashboard:*',
-                'agricola:saldos:*'
-            ]
-        elif model_name == 'compra':
-            patterns_to_clear = [
-                'agricola:balances_compras:*',
-                'agricola:compras:*',
-                'agricola:dashboard:*'
-            ]
-        elif model_name == 'ventas':
-            patterns_to_clear = [
-                'agricola:balances_ventas:*',
-                'agricola:ventas:*',
-                'agricola:dashboard:*'
-            ]
-        elif model_name in ['productor', 'producto', 'sucursal', 'cuenta']:
-            patterns_to_clear = [
-                'agricola:catalogos:*',
-                'agricola:balances:*'
-            ]
-        
-        for pattern in patterns_to_clear:
-            self.clear_pattern(pattern)
+        if model_name in self.RELATED_DOMAINS:
+            domains = self.RELATED_DOMAINS[model_name]
+        elif model_name in self.CATALOG_MODELS:
+            # Los nombres de catálogo aparecen en balances de todos los dominios
+            domains = self.DOMAINS
+        else:
+            domains = ()
         
+        self.invalidate_domains(*domains)
         logger.info(f"Invalidado cache para modelo: {model_name}")
 
 
@@ -165,12 +496,16 @@ class CacheService:
 cache_service = CacheService()
 
 
-def cache_result(cache_type: str = 'default', timeout: Optional[int] = None, key_prefix: str = ''):
+def cache_result(cache_type: str = 'default', timeout: Optional[int] = None, key_prefix: str = '',
+                 domain: Optional[str] = None):
     """
     Decorador para cachear resultados de funciones
     
+    Si se indica `domain`, la clave vive en el namespace versionado de ese
+    dominio y se invalida con cache_service.invalidate_domains(domain).
+    
     Uso:
-        @cache_result('balances', 900, 'gastos')
+        @cache_result('balances', 900, 'gastos', domain='gastos')
         def get_balances_gastos(**kwargs):
             return expensive_query()
     """
@@ -182,6 +517,8 @@ def cache_result(cache_type: str = 'default', timeout: Optional[int] = None, key
                 f"{key_prefix}:{func.__name__}" if key_prefix else func.__name__,
                 *args, **kwargs
             )
+            if domain:
+                cache_key = cache_service.versioned_key(domain, cache_key)
             
             # Usar timeout específico o del tipo
             actual_timeout = timeout or cache_service.timeouts.get(cache_type, 300)
@@ -245,9 +245,9 @@ class ComprasAnalysisService(BaseReportService):
         from django.db.models.functions import TruncMonth, TruncDay, TruncWeek
         
         # Generar clave de cache
-        cache_key = cache_service._generate_cache_key(
+        cache_key = cache_service.versioned_key('compras', cache_service._generate_cache_key(
             'balances_compras', periodo, **filters
-        )
+        ))
         
         # Intentar obtener del cache
         cached_data = cache_service.get(cache_key)
@@ -329,7 +329,7 @@ class ComprasAnalysisService(BaseReportService):
             group_field='tipo_pago'
         )
     
-    @cache_result('compras', 900, 'estadisticas_compras')
+    @cache_result('compras', 900, 'estadisticas_compras', domain='compras')
     def calculate_statistics(self, filters):
         """
         Override para añadir estadísticas específicas de compras
@@ -0,0 +1,199 @@
+"""
+Proveedor de métricas del dashboard del admin
+
+Obtiene los totales y conteos mensuales de cada modelo con una sola
+consulta agrupada por TruncMonth y cachea el resultado por (año, mes):
+los meses cerrados en el alias ``static_data`` y el mes en curso con un
+TTL corto en el cache por defecto. Las claves incluyen la versión de los
+dominios gastos/compras/ventas/cxc de CacheService, por lo que cualquier
+invalidación de esos dominios descarta también los meses cacheados.
+"""
+
+import calendar
+import logging
+from datetime import date
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardMetricsService:
+    """Métricas agregadas del dashboard principal del admin"""
+
+    PREFIJO_MES = 'dashboard_mes'
+    CLAVE_RESUMEN = 'dashboard_resumen'
+    DOMINIOS = ('gastos', 'compras', 'ventas', 'cxc')
+
+    # Valores por mes; todos los montos se guardan como float para que el
+    # serializador JSON del cache los conserve.
+    METRICAS_VACIAS = {
+        'gastos_total': 0.0,
+        'gastos_count': 0,
+        'ventas_total': 0.0,
+        'ventas_count': 0,
+        'compras_total': 0.0,
+        'compras_count': 0,
+        'productos': 0.0,
+        'clientes_nuevos': 0,
+    }
+
+    @staticmethod
+    def periodos(meses: int = 6) -> List[Tuple[int, int]]:
+        """Lista de (año, mes) de los últimos N meses, del más antiguo al actual"""
+        hoy = timezone.localdate()
+        año, mes = hoy.year, hoy.month
+        periodos = []
+        for _ in range(meses):
+            periodos.insert(0, (año, mes))
+            mes -= 1
+            if mes == 0:
+                mes, año = 12, año - 1
+        return periodos
+
+    @staticmethod
+    def _cache_historico():
+        return caches['static_data'] if 'static_data' in caches else cache
+
+    @classmethod
+    def _sufijo_version(cls) -> str:
+        versiones = cache_service.get_versions(*cls.DOMINIOS)
+        return '-'.join(str(versiones[dominio]) for dominio in cls.DOMINIOS)
+
+    @classmethod
+    def _clave_mes(cls, periodo: Tuple[int, int], version: str) -> str:
+        return f"{cls.PREFIJO_MES}:{periodo[0]}:{periodo[1]:02d}:{version}"
+
+    @classmethod
+    def metricas_mensuales(cls, periodos: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Dict]:
+        """
+        Métricas por mes para los períodos indicados.
+
+        Los meses que no estén en cache se calculan juntos, con una consulta
+        por modelo sin importar cuántos falten.
+        """
+        timeouts = getattr(settings, 'CACHE_TIMEOUTS', {})
+        hoy = timezone.localdate()
+        actual = (hoy.year, hoy.month)
+        historico = cls._cache_historico()
+        version = cls._sufijo_version()
+
+        resultado = {}
+        cerrados = {cls._clave_mes(p, version): p for p in periodos if p != actual}
+        if cerrados:
+            for clave, valor in historico.get_many(list(cerrados)).items():
+                resultado[cerrados[clave]] = valor
+        if actual in periodos:
+            valor = cache.get(cls._clave_mes(actual, version))
+            if valor is not None:
+                resultado[actual] = valor
+
+        faltantes = [p for p in periodos if p not in resultado]
+        if faltantes:
+            calculados = cls._calcular_meses(faltantes)
+            historico.set_many(
+                {cls._clave_mes(p, version): v for p, v in calculados.items() if p != actual},
+                timeouts.get('dashboard_historico', 86400)
+            )
+            if actual in calculados:
+                cache.set(cls._clave_mes(actual, version), calculados[actual], timeouts.get('dashboard', 300))
+            resultado.update(calculados)
+
+        return resultado
+
+    @classmethod
+    def _calcular_meses(cls, periodos: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Dict]:
+        """Agrega por TruncMonth una vez por modelo el rango que cubre los períodos"""
+        from gastos.models import Compra, Gastos
+        from ventas.models import Cliente, Ventas
+
+        inicio = date(*min(periodos), 1)
+        año_fin, mes_fin = max(periodos)
+        fin = date(año_fin, mes_fin, calendar.monthrange(año_fin, mes_fin)[1])
+
+        metricas = {p: dict(cls.METRICAS_VACIAS) for p in periodos}
+        consultas = (
+            (Gastos.objects.filter(fecha__range=[inicio, fin]), 'fecha',
+             {'gastos_total': Sum('monto'), 'gastos_count': Count('id')}),
+            (Ventas.objects.filter(fecha_salida_manifiesto__range=[inicio, fin]), 'fecha_salida_manifiesto',
+             {'ventas_total': Sum('monto_mxn'), 'ventas_count': Count('id')}),
+            (Compra.objects.filter(fecha_compra__range=[inicio, fin]), 'fecha_compra',
+             {'compras_total': Sum('monto_total'), 'compras_count': Count('id'),
+              'productos': Sum('cantidad')}),
+            (Cliente.objects.filter(fecha_registro__date__range=[inicio, fin]), 'fecha_registro',
+             {'clientes_nuevos': Count('id')}),
+        )
+
+        for queryset, campo_fecha, agregados in consultas:
+            filas = queryset.annotate(
+                periodo=TruncMonth(campo_fecha)
+            ).values('periodo').annotate(**agregados).order_by()
+
+            for fila in filas:
+                periodo = (fila['periodo'].year, fila['periodo'].month)
+                if periodo not in metricas:
+                    continue
+                for nombre in agregados:
+                    valor = fila[nombre] or 0
+                    metricas[periodo][nombre] = valor if isinstance(valor, int) else float(valor)
+
+        return metricas
+
+    @classmethod
+    def resumen_actual(cls) -> Dict:
+        """
+        Datos del dashboard que no dependen del mes: categorías de gasto del
+        mes en curso, cartera vigente/vencida y totales de usuarios y clientes.
+        Se cachea con el TTL corto del dashboard.
+        """
+        clave = f"{cls.CLAVE_RESUMEN}:{cls._sufijo_version()}"
+        resumen = cache.get(clave)
+        if resumen is not None:
+            return resumen
+
+        from gastos.models import Gastos
+        from ventas.models import Cliente, Ventas
+
+        hoy = timezone.localdate()
+
+        gastos_por_categoria = Gastos.objects.filter(
+            fecha__year=hoy.year,
+            fecha__month=hoy.month
+        ).values(
+            'id_cat_gastos__nombre'
+        ).annotate(
+            total=Sum('monto')
+        ).order_by('-total')[:6]
+
+        vigentes = Q(estado_cobranza__in=['Pendiente', 'Parcial'])
+        vencidas = Q(estado_cobranza='Vencido')
+        cartera = Ventas.objects.filter(vigentes | vencidas).aggregate(
+            vigentes=Sum('monto', filter=vigentes),
+            vigentes_count=Count('id', filter=vigentes),
+            vencidas=Sum('monto', filter=vencidas),
+            vencidas_count=Count('id', filter=vencidas),
+        )
+
+        resumen = {
+            'gastos_categorias_labels': [item['id_cat_gastos__nombre'] for item in gastos_por_categoria],
+            'gastos_categorias_data': [float(item['total']) for item in gastos_por_categoria],
+            'ventas_vigentes': float(cartera['vigentes'] or 0),
+            'ventas_vigentes_count': cartera['vigentes_count'],
+            'ventas_vencidas': float(cartera['vencidas'] or 0),
+            'ventas_vencidas_count': cartera['vencidas_count'],
+            'total_users': User.objects.count(),
+            'total_clientes': Cliente.objects.filter(activo=True).count(),
+        }
+        cache.set(
+            clave, resumen,
+            getattr(settings, 'CACHE_TIMEOUTS', {}).get('dashboard', 300)
+        )
+        return resumen
@@ -233,20 +233,35 @@ class ForecastService:
         model_name = service.get_model()._meta.model_name
         months_ahead = max(1, min(months_ahead, 12))
 
-        cache_key = cache_service._generate_cache_key(
+        cache_key = cache_service.versioned_key('forecast', cache_service._generate_cache_key(
             'forecast', model_name,
             months_ahead=months_ahead,
             model_type=model_type,
             degree=polynomial_degree,
             **filters
+        ))
+
+        # Un solo proceso reentrena el modelo al vencer; el resto recibe el
+        # forecast anterior mientras tanto
+        return cache_service.get_or_compute(
+            cache_key,
+            lambda: self._build_forecast(
+                service, filters, months_ahead, model_type, polynomial_degree
+            ),
+            cache_service.timeouts.get('reportes', 1800),
+            force=force_refresh,
         )
 
-        if not force_refresh:
-            cached = cache_service.get(cache_key)
-            if cached is not None:
-                logger.debug(f"Cache hit para forecast {model_name}")
-                return cached
-
+    def _build_forecast(
+        self,
+        service,
+        filters: Dict[str, Any],
+        months_ahead: int,
+        model_type: str,
+        polynomial_degree: int
+    ) -> Dict[str, Any]:
+        """Entrena el modelo y arma el resultado de forecast_from_service"""
+        model_name = service.get_model()._meta.model_name
         logger.info(
             f"Generando forecast para {model_name} "
             f"({months_ahead} meses, modelo={model_type})"
@@ -317,10 +332,7 @@ class ForecastService:
             },
         }
 
-        timeout = cache_service.timeouts.get('reportes', 1800)
-        cache_service.set(cache_key, result, timeout)
-        logger.info(f"Forecast generado y cacheado para {model_name}")
-
+        logger.info(f"Forecast generado para {model_name}")
         return result
 
     def generate_all_forecasts(
@@ -350,7 +362,39 @@ class ForecastService:
         if year is None:
             year = datetime.now().year
 
-        cache_key = cache_service._generate_cache_key(
+        nombre = self._all_forecasts_name(year, sucursal_id, months_ahead, model_type)
+        return cache_service.get_or_compute(
+            cache_service.versioned_key('forecast', nombre),
+            lambda: self._build_all_forecasts(
+                year, sucursal_id, months_ahead, model_type, force_refresh
+            ),
+            cache_service.timeouts.get('reportes', 1800),
+            force=force_refresh,
+            latest_key=cache_service.latest_key('forecast', nombre),
+        )
+
+    def read_all_forecasts(
+        self,
+        year: int = None,
+        sucursal_id: Any = None,
+        months_ahead: int = 3,
+        model_type: str = 'polynomial'
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        (resultado, desactualizado) de generate_all_forecasts precalculado
+        por la cola de recálculo, sin entrenar modelos en la petición. Tras
+        una invalidación devuelve el último cálculo con desactualizado=True;
+        None si aún no existe.
+        """
+        if year is None:
+            year = datetime.now().year
+        return cache_service.peek_latest(
+            'forecast', self._all_forecasts_name(year, sucursal_id, months_ahead, model_type)
+        )
+
+    @staticmethod
+    def _all_forecasts_name(year: int, sucursal_id: Any, months_ahead: int, model_type: str) -> str:
+        return cache_service._generate_cache_key(
             'forecast_all',
             year=year,
             sucursal=sucursal_id,
@@ -358,11 +402,15 @@ class ForecastService:
             model_type=model_type
         )
 
-        if not force_refresh:
-            cached = cache_service.get(cache_key)
-            if cached is not None:
-                return cached
-
+    def _build_all_forecasts(
+        self,
+        year: int,
+        sucursal_id: Any,
+        months_ahead: int,
+        model_type: str,
+        force_refresh: bool
+    ) -> Dict[str, Any]:
+        """Consolida los forecasts por dominio para generate_all_forecasts"""
         base_filters = {}
         if year:
             base_filters['fecha__year__gte'] = max(year - 2, 2020)
@@ -449,9 +497,6 @@ class ForecastService:
             },
         }
 
-        timeout = cache_service.timeouts.get('reportes', 1800)
-        cache_service.set(cache_key, result, timeout)
-
         return result
 
     def _compute_net_balance_forecast(
@@ -545,15 +590,11 @@ class ForecastService:
         """
         Invalida el cache de predicciones cuando hay cambios en los datos.
 
+        Las predicciones consolidadas (forecast_all) combinan todos los
+        modelos, por lo que se invalida el dominio completo.
+
         Args:
-            model_name: Nombre del modelo a invalidar (None = todos)
+            model_name: Modelo que originó el cambio (solo para el log)
         """
-        patterns = []
-        if model_name:
-            patterns.append(f"*forecast*{model_name}*")
-        else:
-            patterns.append("*forecast*")
-
-        for pattern in patterns:
-            cache_service.clear_pattern(pattern)
-            logger.info(f"Cache de forecast invalidado: {pattern}")
+        cache_service.invalidate_domains('forecast')
+        logger.info(f"Cache de forecast invalidado ({model_name or 'todos'})")
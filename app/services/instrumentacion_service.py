@@ -0,0 +1,263 @@
+"""
+Instrumentación por petición (app.middleware.instrumentacion).
+
+MedicionPeticion acumula, para la petición en curso, las consultas SQL y su
+tiempo (connection.execute_wrapper), las lecturas de cache con acierto o
+fallo (backends *Instrumentado de este módulo) y el tiempo total. La
+medición vive en un ContextVar: fuera de una petición (comandos, tareas de
+Celery) los backends no registran nada y no agregan costo.
+
+MetricasVistas conserva las últimas INSTRUMENTACION_MUESTRAS mediciones de
+cada vista, en Redis (LPUSH + LTRIM) o, con LocMemCache, en una lista del
+cache. ``manage.py metricas_vistas`` imprime sus percentiles.
+"""
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+try:
+    from django_redis import get_redis_connection
+    from django_redis.cache import RedisCache
+except ImportError:  # django-redis solo se usa con REDIS_URL
+    RedisCache = None
+
+logger = logging.getLogger(__name__)
+
+_medicion = contextvars.ContextVar('medicion_peticion', default=None)
+_FALTANTE = object()
+
+
+class MedicionPeticion:
+    """Contadores de una petición; también es el execute_wrapper de las conexiones"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.vista: Optional[str] = None
+        self.consultas = 0
+        self.tiempo_bd = 0.0
+        self.cache_aciertos = 0
+        self.cache_fallos = 0
+        self.tiempo_cache = 0.0
+
+    @staticmethod
+    def actual() -> Optional['MedicionPeticion']:
+        return _medicion.get()
+
+    def activar(self):
+        return _medicion.set(self)
+
+    @staticmethod
+    def desactivar(token) -> None:
+        _medicion.reset(token)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.tiempo_bd += time.perf_counter() - inicio
+
+    def registrar_cache(self, aciertos: int, fallos: int, duracion: float) -> None:
+        self.cache_aciertos += aciertos
+        self.cache_fallos += fallos
+        self.tiempo_cache += duracion
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.inicio
+
+
+# ----------------------------------------------------------------------
+# Backends de cache instrumentados
+# ----------------------------------------------------------------------
+
+class CacheInstrumentadoMixin:
+    """Cuenta aciertos y fallos de get/get_many en la medición de la petición en curso"""
+
+    def get(self, key, default=None, version=None, **kwargs):
+        medicion = _medicion.get()
+        if medicion is None:
+            return super().get(key, default, version=version, **kwargs)
+        inicio = time.perf_counter()
+        valor = super().get(key, _FALTANTE, version=version, **kwargs)
+        acierto = valor is not _FALTANTE
+        medicion.registrar_cache(int(acierto), int(not acierto), time.perf_counter() - inicio)
+        return valor if acierto else default
+
+    def get_many(self, keys, version=None, **kwargs):
+        medicion = _medicion.get()
+        if medicion is None:
+            return super().get_many(keys, version=version, **kwargs)
+        keys = list(keys)
+        inicio = time.perf_counter()
+        # BaseCache.get_many llama a get() por clave: no contarlas dos veces
+        token = _medicion.set(None)
+        try:
+            valores = super().get_many(keys, version=version, **kwargs)
+        finally:
+            _medicion.reset(token)
+        medicion.registrar_cache(len(valores), len(keys) - len(valores), time.perf_counter() - inicio)
+        return valores
+
+
+class LocMemCacheInstrumentado(CacheInstrumentadoMixin, LocMemCache):
+    pass
+
+
+if RedisCache is not None:
+    class RedisCacheInstrumentado(CacheInstrumentadoMixin, RedisCache):
+        pass
+
+
+# ----------------------------------------------------------------------
+# Percentiles por vista
+# ----------------------------------------------------------------------
+
+class MetricasVistas:
+    """Ventana de las mediciones más recientes de cada vista y sus percentiles"""
+
+    CLAVE = 'metricas_vista:{}'
+    CLAVE_VISTAS = 'metricas_vista:nombres'
+    TTL = 7 * 24 * 3600
+    FLUSH_CADA = 50
+    FLUSH_INTERVALO = 30
+
+    def __init__(self, cache_alias: str = 'default'):
+        self.cache_alias = cache_alias
+        self._lock = threading.Lock()
+        self._pendientes: Dict[str, List[str]] = defaultdict(list)
+        self._ultimo_flush = time.time()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def tamano(self) -> int:
+        return getattr(settings, 'INSTRUMENTACION_MUESTRAS', 500)
+
+    @staticmethod
+    def _muestra(medicion: MedicionPeticion, total: float) -> str:
+        return (
+            f"{total * 1000:.1f},{medicion.tiempo_bd * 1000:.1f},{medicion.consultas},"
+            f"{medicion.cache_aciertos},{medicion.cache_fallos}"
+        )
+
+    def registrar(self, vista: str, medicion: MedicionPeticion, total: float) -> None:
+        """Acumula la medición en memoria y la vuelca al cache por lotes"""
+        with self._lock:
+            self._pendientes[vista].append(self._muestra(medicion, total))
+            if (sum(len(muestras) for muestras in self._pendientes.values()) < self.FLUSH_CADA
+                    and time.time() - self._ultimo_flush < self.FLUSH_INTERVALO):
+                return
+            pendientes, self._pendientes = self._pendientes, defaultdict(list)
+            self._ultimo_flush = time.time()
+        self._guardar(pendientes)
+
+    def vaciar(self) -> None:
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, defaultdict(list)
+            self._ultimo_flush = time.time()
+        if pendientes:
+            self._guardar(pendientes)
+
+    def _redis(self):
+        if RedisCache is not None and isinstance(self.cache, RedisCache):
+            return get_redis_connection(self.cache_alias)
+        return None
+
+    def _guardar(self, pendientes: Dict[str, List[str]]) -> None:
+        cache = self.cache
+        try:
+            redis = self._redis()
+            if redis is not None:
+                pipe = redis.pipeline(transaction=False)
+                for vista, muestras in pendientes.items():
+                    clave = cache.make_key(self.CLAVE.format(vista))
+                    pipe.lpush(clave, *muestras)
+                    pipe.ltrim(clave, 0, self.tamano - 1)
+                    pipe.expire(clave, self.TTL)
+                pipe.sadd(cache.make_key(self.CLAVE_VISTAS), *pendientes)
+                pipe.execute()
+                return
+
+            # Sin Redis: read-modify-write, suficiente para un solo proceso
+            for vista, muestras in pendientes.items():
+                clave = self.CLAVE.format(vista)
+                anteriores = cache.get(clave) or []
+                cache.set(clave, (muestras[::-1] + anteriores)[:self.tamano], self.TTL)
+            vistas = set(cache.get(self.CLAVE_VISTAS) or [])
+            cache.set(self.CLAVE_VISTAS, sorted(vistas | set(pendientes)), self.TTL)
+        except Exception as e:
+            logger.error(f"Error guardando métricas de vistas: {e}")
+
+    def _leer(self) -> Dict[str, List[str]]:
+        cache = self.cache
+        redis = self._redis()
+        if redis is not None:
+            vistas = sorted(v.decode() for v in redis.smembers(cache.make_key(self.CLAVE_VISTAS)))
+            pipe = redis.pipeline(transaction=False)
+            for vista in vistas:
+                pipe.lrange(cache.make_key(self.CLAVE.format(vista)), 0, -1)
+            return {
+                vista: [m.decode() for m in muestras]
+                for vista, muestras in zip(vistas, pipe.execute()) if muestras
+            }
+        vistas = cache.get(self.CLAVE_VISTAS) or []
+        valores = cache.get_many([self.CLAVE.format(vista) for vista in vistas])
+        return {
+            vista: valores[self.CLAVE.format(vista)]
+            for vista in vistas if valores.get(self.CLAVE.format(vista))
+        }
+
+    @staticmethod
+    def percentil(valores: List[float], p: float) -> float:
+        """Percentil por rango más cercano de una lista ordenada"""
+        indice = max(0, min(len(valores), math.ceil(p / 100 * len(valores))) - 1)
+        return valores[indice]
+
+    def resumen(self) -> Dict[str, Dict[str, float]]:
+        """Percentiles de duración y promedios de BD/cache por vista, con lo pendiente de este proceso"""
+        self.vaciar()
+        resumen = {}
+        for vista, muestras in self._leer().items():
+            filas = [[float(x) for x in muestra.split(',')] for muestra in muestras]
+            totales = sorted(fila[0] for fila in filas)
+            aciertos = sum(fila[3] for fila in filas)
+            lecturas = aciertos + sum(fila[4] for fila in filas)
+            resumen[vista] = {
+                'muestras': len(filas),
+                'p50': self.percentil(totales, 50),
+                'p95': self.percentil(totales, 95),
+                'p99': self.percentil(totales, 99),
+                'max': totales[-1],
+                'bd_ms': sum(fila[1] for fila in filas) / len(filas),
+                'consultas': sum(fila[2] for fila in filas) / len(filas),
+                'cache_hit_rate': round(aciertos * 100 / lecturas, 1) if lecturas else None,
+            }
+        return resumen
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._pendientes = defaultdict(list)
+        cache = self.cache
+        redis = self._redis()
+        if redis is not None:
+            vistas = [v.decode() for v in redis.smembers(cache.make_key(self.CLAVE_VISTAS))]
+            claves = [cache.make_key(self.CLAVE.format(vista)) for vista in vistas]
+            redis.delete(cache.make_key(self.CLAVE_VISTAS), *claves)
+            return
+        vistas = cache.get(self.CLAVE_VISTAS) or []
+        cache.delete_many([self.CLAVE.format(vista) for vista in vistas] + [self.CLAVE_VISTAS])
+
+
+metricas_vistas = MetricasVistas()
@@ -0,0 +1,245 @@
+"""
+Cola de recálculo en segundo plano para reportes pesados
+
+Los cambios en ventas/pagos/gastos programan el recálculo de la cartera CxC,
+el aging y los forecasts en TareaRecalculo; un worker
+(``manage.py procesar_recalculos --loop``) reclama las tareas con
+select_for_update(skip_locked=True) y deja los resultados en cache. Las
+vistas solo leen el cache y, si aún no hay resultado, encolan la tarea y
+muestran el estado "calculando" en lugar de bloquear la petición.
+
+Una tarea en PROCESANDO cuyo worker murió (deploy, OOM) vuelve a reclamarse
+cuando su iniciada_en supera RECALCULO_TIMEOUT segundos.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.models import TareaRecalculo
+from app.services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+
+class RecalculoService:
+    """Encola y ejecuta las tareas de recálculo"""
+
+    Tipo = TareaRecalculo.Tipo
+    Estado = TareaRecalculo.Estado
+
+    # Tareas que se programan al invalidar cada dominio de CacheService. El
+    # aging va antes que cxc porque el dashboard global lee el aging del día.
+    TAREAS_POR_DOMINIO = {
+        'cxc': (Tipo.AGING, Tipo.CXC),
+        'forecast': (Tipo.FORECAST,),
+    }
+
+    @staticmethod
+    def parametros_forecast(year: int = None, sucursal_id: Any = None,
+                            months_ahead: int = 3, model_type: str = 'polynomial') -> Dict[str, Any]:
+        """Parámetros de generate_all_forecasts; por defecto los de la vista sin filtros"""
+        return {
+            'year': year or timezone.localdate().year,
+            'sucursal_id': sucursal_id,
+            'months_ahead': months_ahead,
+            'model_type': model_type,
+        }
+
+    @staticmethod
+    def _clave(tipo: str, parametros: Dict[str, Any]) -> str:
+        contenido = json.dumps([tipo, parametros], sort_keys=True, default=str)
+        return hashlib.sha256(contenido.encode()).hexdigest()
+
+    @classmethod
+    def encolar(cls, tipo: str, parametros: Optional[Dict[str, Any]] = None,
+                demora: int = 0) -> TareaRecalculo:
+        """
+        Encola una tarea, salvo que ya haya una pendiente con los mismos
+        parámetros: varios cambios seguidos producen un solo recálculo. Si la
+        pendiente está programada más tarde que `demora`, se adelanta (nunca
+        se atrasa, para no posponer indefinidamente una ráfaga de cambios).
+        """
+        parametros = parametros or {}
+        clave = cls._clave(tipo, parametros)
+        programada_para = timezone.now() + timedelta(seconds=demora)
+        pendiente = TareaRecalculo.objects.filter(clave=clave, estado=cls.Estado.PENDIENTE).first()
+        if pendiente is not None:
+            if pendiente.programada_para > programada_para:
+                TareaRecalculo.objects.filter(
+                    pk=pendiente.pk, estado=cls.Estado.PENDIENTE
+                ).update(programada_para=programada_para)
+                pendiente.programada_para = programada_para
+            return pendiente
+        return TareaRecalculo.objects.create(
+            tipo=tipo,
+            parametros=parametros,
+            clave=clave,
+            programada_para=programada_para,
+        )
+
+    @classmethod
+    def programar_por_dominios(cls, dominios: Iterable[str]) -> None:
+        """
+        Programa tras el commit el recálculo de los dominios invalidados. La
+        demora agrupa ráfagas de cambios (p. ej. una importación) en una tarea.
+        """
+        if not getattr(settings, 'RECALCULO_AUTOMATICO', True):
+            return
+        tipos = []
+        for dominio in dominios:
+            for tipo in cls.TAREAS_POR_DOMINIO.get(dominio, ()):
+                if tipo not in tipos:
+                    tipos.append(tipo)
+        if not tipos:
+            return
+
+        def encolar_tipos():
+            demora = getattr(settings, 'RECALCULO_DEMORA', 30)
+            try:
+                for tipo in tipos:
+                    parametros = cls.parametros_forecast() if tipo == cls.Tipo.FORECAST else {}
+                    cls.encolar(tipo, parametros, demora=demora)
+            except Exception as e:
+                logger.error(f"Error programando recálculo {tipos}: {e}")
+
+        transaction.on_commit(encolar_tipos)
+
+    @classmethod
+    def programar_periodicos(cls) -> int:
+        """Encola el recálculo completo; pensado para el cron"""
+        tareas = (
+            (cls.Tipo.AGING, {}),
+            (cls.Tipo.CXC, {}),
+            (cls.Tipo.FORECAST, cls.parametros_forecast()),
+        )
+        for tipo, parametros in tareas:
+            cls.encolar(tipo, parametros)
+        return len(tareas)
+
+    @classmethod
+    def procesar_siguiente(cls) -> Optional[TareaRecalculo]:
+        """
+        Reclama y ejecuta una tarea; varios workers pueden correr a la vez en
+        MySQL 8. También reclama las tareas en PROCESANDO abandonadas: las que
+        llevan más de RECALCULO_TIMEOUT segundos desde iniciada_en.
+        """
+        ahora = timezone.now()
+        abandonada = ahora - timedelta(seconds=getattr(settings, 'RECALCULO_TIMEOUT', 1800))
+        with transaction.atomic():
+            tarea = (TareaRecalculo.objects.select_for_update(skip_locked=True)
+                     .filter(Q(estado=cls.Estado.PENDIENTE)
+                             | Q(estado=cls.Estado.PROCESANDO, iniciada_en__lt=abandonada),
+                             programada_para__lte=ahora)
+                     .order_by('programada_para', 'id').first())
+            if tarea is None:
+                return None
+            if tarea.estado == cls.Estado.PROCESANDO:
+                logger.warning('Tarea de recálculo %s abandonada desde %s; se reclama de nuevo',
+                               tarea.pk, tarea.iniciada_en)
+            tarea.estado = cls.Estado.PROCESANDO
+            tarea.iniciada_en = timezone.now()
+            tarea.error = ''
+            tarea.save(update_fields=['estado', 'iniciada_en', 'error'])
+
+        inicio = time.perf_counter()
+        try:
+            cls._ejecutar(tarea.tipo, tarea.parametros)
+            tarea.estado = cls.Estado.TERMINADA
+        except Exception as exc:
+            logger.exception('Recálculo %s falló (tarea %s)', tarea.tipo, tarea.pk)
+            tarea.estado, tarea.error = cls.Estado.ERROR, str(exc)[:2000]
+        tarea.terminada_en = timezone.now()
+        tarea.save(update_fields=['estado', 'error', 'terminada_en'])
+        logger.info(f"Recálculo {tarea.tipo} terminado en {time.perf_counter() - inicio:.2f}s ({tarea.estado})")
+        return tarea
+
+    @classmethod
+    def procesar_pendientes(cls, limite: int = 20) -> int:
+        """Procesa tareas hasta vaciar la cola o llegar al límite"""
+        procesadas = 0
+        while procesadas < limite and cls.procesar_siguiente() is not None:
+            procesadas += 1
+        return procesadas
+
+    @classmethod
+    def solicitar(cls, tipo: str, parametros: Optional[Dict[str, Any]] = None) -> TareaRecalculo:
+        """
+        Encola una tarea pedida desde una vista, para ya: si el guardado de
+        un modelo la dejó pendiente con RECALCULO_DEMORA, se adelanta. Docker
+        corre un worker dedicado; en DEBUG se lanza un hilo daemon para que
+        runserver funcione sin una segunda terminal (igual que el OCR de
+        comprobantes).
+        """
+        tarea = cls.encolar(tipo, parametros)
+        if settings.DEBUG:
+            threading.Thread(target=cls._procesar_en_hilo, daemon=True, name='recalculo').start()
+        return tarea
+
+    @classmethod
+    def leer_o_solicitar(cls, tipo: str, parametros: Optional[Dict[str, Any]],
+                         leer: Callable[[], Tuple[Any, bool]],
+                         calcular: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Para las vistas: `leer` devuelve (valor, desactualizado) sin calcular
+        (CacheService.peek_latest). Si falta o está desactualizado se solicita
+        el recálculo; mientras tanto la vista muestra lo que haya.
+
+        Si el cache no es compartido (LocMemCache, DummyCache) el resultado
+        del worker nunca llegaría a este proceso: se usa `calcular`
+        (get_or_compute sin forzar) en la petición.
+        """
+        if not cache_service.is_shared():
+            return calcular(), False
+        valor, desactualizado = leer()
+        if valor is None or desactualizado:
+            cls.solicitar(tipo, parametros)
+        return valor, desactualizado
+
+    @classmethod
+    def _procesar_en_hilo(cls) -> None:
+        try:
+            cls.procesar_pendientes()
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def purgar(cls, dias: int = 7) -> int:
+        """Elimina las tareas terminadas o con error más antiguas que `dias`"""
+        limite = timezone.now() - timedelta(days=dias)
+        eliminadas, _ = TareaRecalculo.objects.filter(
+            estado__in=[cls.Estado.TERMINADA, cls.Estado.ERROR],
+            terminada_en__lt=limite,
+        ).delete()
+        return eliminadas
+
+    # =========================================================================
+    # Ejecución por tipo
+    # =========================================================================
+
+    @classmethod
+    def _ejecutar(cls, tipo: str, parametros: Dict[str, Any]) -> None:
+        if tipo == cls.Tipo.AGING:
+            from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+            fecha_corte = parametros.get('fecha_corte')
+            CuentasPorCobrarService.calcular_aging_masivo(
+                fecha_corte=date.fromisoformat(fecha_corte) if fecha_corte else None
+            )
+        elif tipo == cls.Tipo.CXC:
+            from ventas.services.cache_service import CuentasPorCobrarCache
+            # forzar: recalcula aunque la versión del dominio no haya cambiado
+            CuentasPorCobrarCache.warm_up_cache(forzar=True)
+        elif tipo == cls.Tipo.FORECAST:
+            from app.services.forecast_service import ForecastService
+            ForecastService().generate_all_forecasts(force_refresh=True, **parametros)
+        else:
+            raise ValueError(f"Tipo de recálculo desconocido: {tipo}")
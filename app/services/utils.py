@@ -1,7 +1,9 @@
 """
 Utilidades y funciones auxiliares
 """
-from django.http import HttpResponse
+import tempfile
+
+from django.http import FileResponse
 from datetime import datetime
 
 
@@ -14,15 +16,24 @@ class UtilService:
         return user.is_superuser
     
     @staticmethod
-    def create_excel_response(workbook, filename_prefix="reporte"):
-        """Crea una respuesta HTTP con un archivo Excel"""
-        current_date = datetime.now().strftime("%Y%m%d")
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    def create_excel_response(workbook, filename_prefix="reporte", filename=None):
+        """
+        Crea una respuesta HTTP con un archivo Excel. El libro se guarda en un
+        archivo temporal que FileResponse envía por bloques; el archivo se
+        elimina al cerrar la respuesta.
+        """
+        if filename is None:
+            current_date = datetime.now().strftime("%Y%m%d")
+            filename = f"{filename_prefix}_{current_date}.xlsx"
+        archivo = tempfile.TemporaryFile()
+        workbook.save(archivo)
+        archivo.seek(0)
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=filename,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename_prefix}_{current_date}.xlsx"'
-        workbook.save(response)
-        return response
     
     @staticmethod
     def safe_float_conversion(value):
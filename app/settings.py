@@ -446,6 +446,8 @@ JAZZMIN_UI_TWEAKS = {
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Consultas, cache y tiempo por vista (después de WhiteNoise: no mide estáticos)
+    "app.middleware.instrumentacion.InstrumentacionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",  # Middleware para soporte multiidioma
     "django.middleware.common.CommonMiddleware",
@@ -660,6 +662,10 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'mensaje': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'file': {
@@ -677,6 +683,16 @@ LOGGING = {
             'formatter': 'simple' if DEBUG else 'verbose',
             'stream': 'ext://sys.stdout',
         },
+        # Una línea JSON por petición lenta (app.middleware.instrumentacion)
+        'instrumentacion': {
+            'level': 'INFO',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'logs', 'peticiones_lentas.jsonl'),
+            'maxBytes': 1024*1024*15,  # 15MB
+            'backupCount': 5,
+            'formatter': 'mensaje',
+            'encoding': 'utf-8',
+        },
     },
     'root': {
         'handlers': ['console', 'file'],
@@ -693,6 +709,11 @@ LOGGING = {
             'level': 'DEBUG' if DEBUG else 'INFO',
             'propagate': False,
         },
+        'app.instrumentacion': {
+            'handlers': ['console', 'instrumentacion'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -708,7 +729,8 @@ if REDIS_URL:
     try:
         CACHES = {
             'default': {
-                'BACKEND': 'django_redis.cache.RedisCache',
+                # RedisCache que cuenta aciertos/fallos por petición (instrumentación)
+                'BACKEND': 'app.services.instrumentacion_service.RedisCacheInstrumentado',
                 'LOCATION': REDIS_URL,
                 'OPTIONS': {
                     'CLIENT_CLASS': 'django_redis.client.DefaultClient',
@@ -752,6 +774,25 @@ if REDIS_URL:
                 },
                 'TIMEOUT': 3600,  # 1 hora para datos estáticos
                 'KEY_PREFIX': 'agricola_static',
+            },
+            # Páginas completas (CacheMiddleware). El cuerpo de la respuesta
+            # son bytes, que JSONSerializer no puede codificar.
+            'pages': {
+                'BACKEND': 'django_redis.cache.RedisCache',
+                'LOCATION': REDIS_URL,
+                'OPTIONS': {
+                    'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                    'CONNECTION_POOL_KWARGS': {
+                        'max_connections': 20,
+                        'socket_connect_timeout': 5,
+                        'socket_timeout': 5,
+                    },
+                    'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+                    'SERIALIZER': 'django_redis.serializers.pickle.PickleSerializer',
+                    'IGNORE_EXCEPTIONS': True,
+                },
+                'TIMEOUT': 600,
+                'KEY_PREFIX': 'agricola_pages',
             }
         }
         
@@ -763,19 +804,24 @@ if REDIS_URL:
         # Fallback a cache local
         CACHES = {
             'default': {
-                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'BACKEND': 'app.services.instrumentacion_service.LocMemCacheInstrumentado',
                 'LOCATION': 'default-cache',
                 'TIMEOUT': 300,
                 'OPTIONS': {
                     'MAX_ENTRIES': 1000,
                 }
+            },
+            'pages': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'pages-cache',
+                'TIMEOUT': 600,
             }
         }
 else:
     # Configuración para desarrollo (sin Redis requerido)
     CACHES = {
         'default': {
-            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'BACKEND': 'app.services.instrumentacion_service.LocMemCacheInstrumentado',
             'LOCATION': 'default-cache',
             'TIMEOUT': 300,
             'OPTIONS': {
@@ -791,6 +837,11 @@ else:
             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
             'LOCATION': 'static-cache',
             'TIMEOUT': 3600,
+        },
+        'pages': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pages-cache',
+            'TIMEOUT': 600,
         }
     }
 
@@ -804,8 +855,52 @@ CACHE_TIMEOUTS = {
     'usuarios': 1800,         # 30 minutos - Datos de usuarios
     'saldos_mensuales': 1800, # 30 minutos - Saldos mensuales
     'dashboard': 300,         # 5 minutos - Dashboard principal
+    'dashboard_historico': 86400,  # 24 horas - Meses cerrados del dashboard
 }
 
+# Alias de CACHES para páginas completas (CacheMiddleware). Los fragmentos
+# {% cache %} son texto y usan 'default'.
+PAGE_CACHE_ALIAS = 'pages'
+
+# Instrumentación por petición (app.middleware.instrumentacion)
+INSTRUMENTACION_ACTIVA = os.getenv('INSTRUMENTACION_ACTIVA', 'True').lower() in ['true', '1', 'yes']
+INSTRUMENTACION_UMBRAL_LENTO = 1.0         # Segundos a partir de los cuales se registra la petición como lenta
+INSTRUMENTACION_SERVER_TIMING = 'staff'    # Encabezado Server-Timing: 'todos', 'staff' o '' (desactivado)
+INSTRUMENTACION_MUESTRAS = 500             # Mediciones recientes por vista para los percentiles
+
+# Protección contra estampidas de CacheService.get_or_compute
+CACHE_STALE_TTL = 300             # Segundos extra en que se sirve el valor vencido mientras otro proceso recalcula
+CACHE_EARLY_RECOMPUTE_BETA = 1.0  # Recálculo anticipado probabilístico (XFetch); 0 lo desactiva
+CACHE_LOCK_TIMEOUT = 30           # Vida máxima del lock de recálculo
+CACHE_LOCK_BACKEND = 'auto'       # 'cache' (SET NX en Redis), 'db' (tabla app_cache_lock) o 'auto'
+CACHE_LATEST_TTL = 7 * 86400      # Vida del último valor calculado que las vistas sirven como desactualizado
+CACHE_SHARED = 'auto'             # True/False fuerza si el cache es común a los procesos; 'auto' lo deduce del backend
+
+# Cola de recálculo en segundo plano (app.services.recalculo_service)
+RECALCULO_AUTOMATICO = True       # Encolar CxC/aging/forecast al invalidar sus dominios de cache
+RECALCULO_DEMORA = 30             # Segundos de espera para agrupar ráfagas de cambios en una tarea
+RECALCULO_TIMEOUT = 1800          # Segundos tras los que una tarea en PROCESANDO se da por abandonada
+
+# Worker OCR de comprobantes (manage.py process_receipt_ocr)
+COMPROBANTE_OCR_TIMEOUT = 900     # Segundos tras los que un comprobante en PROCESANDO se da por abandonado
+
+# Buffer de LogActividad (auditoria.buffer)
+AUDITORIA_BUFFER_ACTIVO = os.getenv('AUDITORIA_BUFFER_ACTIVO', 'True').lower() in ['true', '1', 'yes']
+AUDITORIA_BUFFER_TAMANO = 100     # Entradas en cola que disparan el bulk_create
+AUDITORIA_BUFFER_INTERVALO = 5    # Segundos máximos de espera de una entrada (además del fin de cada petición)
+AUDITORIA_SPOOL_PATH = os.getenv('AUDITORIA_SPOOL_PATH', '')  # JSONL de respaldo si la BD falla o está lenta; vacío lo desactiva
+AUDITORIA_SPOOL_UMBRAL = 2.0      # Segundos de bulk_create a partir de los cuales la BD se considera lenta
+AUDITORIA_SPOOL_PAUSA = 60        # Segundos que se escribe al spool tras un fallo o una escritura lenta
+
+# Retención de LogActividad (manage.py archivar_auditoria)
+AUDITORIA_RETENCION_MESES = 12    # Meses completos que se conservan en la tabla
+AUDITORIA_ARCHIVO_DIR = os.getenv('AUDITORIA_ARCHIVO_DIR', os.path.join(BASE_DIR, 'logs', 'auditoria'))
+
+# Categorizador local de gastos (manage.py entrenar_categorizador_gastos)
+CATEGORIZADOR_MODELO_PATH = os.getenv('CATEGORIZADOR_MODELO_PATH', os.path.join(BASE_DIR, 'modelos', 'categorizador_gastos.joblib'))
+CATEGORIZADOR_UMBRAL = float(os.getenv('CATEGORIZADOR_UMBRAL', '0.6'))  # Probabilidad mínima para no consultar a la IA
+CATEGORIZADOR_CONFIRMACIONES_IA = int(os.getenv('CATEGORIZADOR_CONFIRMACIONES_IA', '2'))  # Respuestas de IA coincidentes para usar su memo
+
 # ===============================
 # CONFIGURACIÓN DJANGO MONEY
 # ===============================
@@ -0,0 +1,34 @@
+"""
+Tests de la suite de benchmarks: el generador produce datos coherentes y
+todos los escenarios corren sobre ellos.
+"""
+from django.test import TestCase, override_settings
+
+from benchmarks.datos import ESCALAS, GeneradorDatos
+from benchmarks.escenarios import ESCENARIOS
+from benchmarks.medicion import medir
+from ventas.models import SaldoCliente, Ventas
+
+
+@override_settings(RECALCULO_AUTOMATICO=False)
+class BenchmarksTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.conteos = GeneradorDatos('mini', semilla=7).generar()
+
+    def test_datos_generados(self):
+        self.assertEqual(self.conteos['ventas'], ESCALAS['mini']['ventas'])
+        self.assertEqual(Ventas.objects.count(), ESCALAS['mini']['ventas'])
+        self.assertEqual(
+            SaldoCliente.objects.count(),
+            Ventas.objects.filter(modalidad_pago=Ventas.ModalidadPago.CREDITO).count(),
+        )
+        self.assertGreater(self.conteos['movimientos_diarios'], 0)
+
+    def test_escenarios_corren(self):
+        for nombre, funcion in ESCENARIOS.items():
+            with self.subTest(escenario=nombre):
+                resultado = medir(funcion, repeticiones=1)
+                self.assertGreater(resultado['frio']['consultas'], 0)
+                self.assertGreater(resultado['memoria_pico_kb'], 0)
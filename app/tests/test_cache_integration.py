@@ -302,14 +302,16 @@ class CacheMiddlewareIntegrationTestCase(TestCase):
     """Tests para el middleware de cache"""
     
     def setUp(self):
+        from django.core.cache import caches
         cache.clear()
+        caches['pages'].clear()
         self.user = User.objects.create_superuser(
             username='middleware_test',
             email='middleware@test.com',
             password='testpass123'
         )
         self.client = Client()
-        self.client.login(username='middleware_test', password='testpass123')
+        self.client.force_login(self.user)
     
     def tearDown(self):
         cache.clear()
@@ -323,8 +325,8 @@ class CacheMiddlewareIntegrationTestCase(TestCase):
         
         # Verificar configuración
         middleware = CacheMiddleware(lambda req: None)
-        self.assertIn('/balances/', middleware.cache_settings)
-        self.assertEqual(middleware.cache_settings['/balances/'], 600)
+        self.assertIn('/admin/ventas/ventas/balances/', middleware.cache_settings)
+        self.assertEqual(middleware.cache_settings['/admin/ventas/ventas/balances/'], 600)
     
     def test_cache_middleware_settings(self):
         """Test configuración del middleware de cache"""
@@ -332,11 +334,85 @@ class CacheMiddlewareIntegrationTestCase(TestCase):
         
         middleware = CacheMiddleware(lambda req: None)
         
-        # Verificar timeouts configurados
-        self.assertEqual(middleware.cache_settings['/balances/'], 600)
-        self.assertEqual(middleware.cache_settings['/compras-balances/'], 600)
-        self.assertEqual(middleware.cache_settings['/ventas-balances/'], 600)
-        self.assertEqual(middleware.cache_settings['/admin/'], 300)
+        # Verificar timeouts configurados (rutas sin prefijo de idioma)
+        self.assertEqual(middleware.cache_settings['/ventas/balances/'], 600)
+        self.assertEqual(middleware.cache_settings['/admin/ventas/ventas/balances/'], 600)
+        self.assertEqual(middleware.cache_settings['/admin/gastos/gastos/balances/'], 600)
+        self.assertEqual(middleware._get_cache_timeout('/es/admin/ventas/ventas/balances/'), 600)
+        self.assertIsNone(middleware._get_cache_timeout('/es/admin/ventas/ventas/'))
+    
+    def _middleware(self):
+        from django.http import HttpResponse
+        from app.middleware.cache_middleware import CacheMiddleware
+        
+        llamadas = []
+        
+        def vista(request):
+            llamadas.append(request)
+            return HttpResponse('<p>balances</p>', content_type='text/html; charset=utf-8')
+        
+        return CacheMiddleware(vista), llamadas
+    
+    def _request(self, **headers):
+        from django.test import RequestFactory
+        request = RequestFactory().get('/es/admin/ventas/ventas/balances/', {'year': '2025'}, **headers)
+        request.user = self.user
+        # Secreto que CsrfViewMiddleware toma de la cookie
+        request.META['CSRF_COOKIE'] = 'a' * 32
+        return request
+    
+    def test_respuesta_guardada_como_bytes_con_etag(self):
+        """La entrada es serializable (sin HttpResponse) y la segunda petición es HIT"""
+        import pickle
+        from django.core.cache import caches
+        
+        middleware, llamadas = self._middleware()
+        primera = middleware(self._request())
+        self.assertEqual(primera['X-Cache'], 'MISS')
+        self.assertTrue(primera['ETag'].startswith('"'))
+        self.assertIn('no-cache', primera['Cache-Control'])
+        
+        entrada = caches['pages'].get(middleware._generate_cache_key(self._request()))
+        self.assertIsInstance(entrada['content'], bytes)
+        self.assertEqual(pickle.loads(pickle.dumps(entrada)), entrada)
+        
+        segunda = middleware(self._request())
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(segunda.content, b'<p>balances</p>')
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(len(llamadas), 1)
+    
+    def test_if_none_match_devuelve_304(self):
+        """Con el ETag vigente la respuesta es 304 sin cuerpo"""
+        middleware, llamadas = self._middleware()
+        etag = middleware(self._request())['ETag']
+        
+        respuesta = middleware(self._request(HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.content, b'')
+        self.assertEqual(respuesta['ETag'], etag)
+        self.assertEqual(len(llamadas), 1)
+    
+    def test_invalidar_dominio_descarta_pagina(self):
+        """Invalidar ventas cambia la clave y la vista se vuelve a ejecutar"""
+        middleware, llamadas = self._middleware()
+        middleware(self._request())
+        cache_service.invalidate_domains('ventas')
+        
+        self.assertEqual(middleware(self._request())['X-Cache'], 'MISS')
+        self.assertEqual(len(llamadas), 2)
+    
+    def test_clave_fragmento_tabla_por_version_no_por_usuario(self):
+        """La variante del fragmento cambia con la versión de cxc y con los filtros"""
+        from ventas.services.cache_service import VentasBalancesCache
+        
+        filtros = {'year': '2025', 'cliente_id': ''}
+        clave = VentasBalancesCache.clave_fragmento(filtros)
+        self.assertEqual(VentasBalancesCache.clave_fragmento(dict(filtros)), clave)
+        self.assertNotEqual(VentasBalancesCache.clave_fragmento({'year': '2024', 'cliente_id': ''}), clave)
+        
+        cache_service.invalidate_domains('cxc')
+        self.assertNotEqual(VentasBalancesCache.clave_fragmento(filtros), clave)
 
 
 class CacheInvalidationIntegrationTestCase(TransactionTestCase):
@@ -7,6 +7,8 @@ Verifica el funcionamiento correcto de CacheService en diferentes escenarios:
 - Timeouts y expiración
 - Manejo de errores
 - Invalidación de cache relacionado
+- Namespaces versionados por dominio
+- get_or_compute: stale-while-revalidate, lock de recálculo y contadores
 """
 import pytest
 from unittest.mock import Mock, patch, MagicMock
@@ -183,7 +185,144 @@ class CacheServiceTestCase(TestCase):
         cache.set('agricola:balances_compras:2024', {'total': 3000})
         
         self.cache_service.invalidate_related_caches('compra')
-    
+
+    # ═══════════════════════════════════════════════════════════════
+    # TESTS DE NAMESPACES VERSIONADOS
+    # ═══════════════════════════════════════════════════════════════
+
+    def test_versioned_key_incluye_version_del_dominio(self):
+        """La clave versionada incluye dominio y versión vigente"""
+        version = self.cache_service.get_version('ventas')
+        key = self.cache_service.versioned_key('ventas', 'balances')
+
+        self.assertEqual(key, f'ventas:v{version}:balances')
+
+    def test_invalidate_domains_cambia_la_clave(self):
+        """Invalidar un dominio hace inaccesibles sus claves anteriores"""
+        key = self.cache_service.versioned_key('gastos', 'balances')
+        self.cache_service.set(key, {'total': 1000})
+
+        self.cache_service.invalidate_domains('gastos')
+
+        nueva = self.cache_service.versioned_key('gastos', 'balances')
+        self.assertNotEqual(key, nueva)
+        self.assertIsNone(self.cache_service.get(nueva))
+
+    def test_invalidate_domains_no_afecta_otros_dominios(self):
+        """Cada dominio tiene su propio contador"""
+        antes = self.cache_service.get_versions('ventas', 'cxc', 'compras')
+
+        self.cache_service.invalidate_domains('ventas', 'cxc')
+        despues = self.cache_service.get_versions('ventas', 'cxc', 'compras')
+
+        self.assertEqual(despues['ventas'], antes['ventas'] + 1)
+        self.assertEqual(despues['cxc'], antes['cxc'] + 1)
+        self.assertEqual(despues['compras'], antes['compras'])
+
+    def test_contador_perdido_no_reutiliza_versiones(self):
+        """Si el contador desaparece, la nueva versión es mayor que la anterior"""
+        version = self.cache_service.get_version('forecast')
+        cache.delete(CacheService.VERSION_KEY.format('forecast'))
+        time.sleep(0.002)
+
+        self.assertGreater(self.cache_service.get_version('forecast'), version)
+
+    def test_invalidate_related_caches_incrementa_dominios(self):
+        """Los cambios en ventas invalidan ventas, cxc y forecast"""
+        antes = self.cache_service.get_versions(*CacheService.DOMAINS)
+
+        self.cache_service.invalidate_related_caches('ventas')
+        despues = self.cache_service.get_versions(*CacheService.DOMAINS)
+
+        cambiados = {d for d in CacheService.DOMAINS if despues[d] != antes[d]}
+        self.assertEqual(cambiados, {'ventas', 'cxc', 'forecast'})
+
+    def test_dominio_desconocido(self):
+        """Un dominio no registrado es un error de programación"""
+        with self.assertRaises(ValueError):
+            self.cache_service.versioned_key('inexistente', 'x')
+
+    # ═══════════════════════════════════════════════════════════════
+    # TESTS DE get_or_compute (stale-while-revalidate)
+    # ═══════════════════════════════════════════════════════════════
+
+    def _compute_contado(self, valor='v1'):
+        calls = {'count': 0}
+
+        def compute():
+            calls['count'] += 1
+            return valor
+        return compute, calls
+
+    def test_get_or_compute_calcula_una_vez(self):
+        """Dentro del TTL suave el valor se sirve del cache"""
+        compute, calls = self._compute_contado()
+
+        for _ in range(3):
+            self.assertEqual(self.cache_service.get_or_compute('swr:basico', compute, 60, beta=0), 'v1')
+        self.assertEqual(calls['count'], 1)
+
+    def test_get_or_compute_sirve_stale_si_otro_recalcula(self):
+        """Vencido el TTL suave, quien no obtiene el lock recibe el valor anterior"""
+        self.cache_service.get_or_compute('swr:stale', lambda: 'viejo', timeout=0, stale_ttl=60, beta=0)
+        lock_token = self.cache_service._acquire_lock(cache, 'swr:stale', 30)
+        self.assertIsNotNone(lock_token)
+
+        compute, calls = self._compute_contado('nuevo')
+        valor = self.cache_service.get_or_compute('swr:stale', compute, timeout=0, stale_ttl=60, beta=0)
+
+        self.assertEqual(valor, 'viejo')
+        self.assertEqual(calls['count'], 0)
+        self.cache_service._release_lock(cache, 'swr:stale', lock_token)
+
+    def test_get_or_compute_recalcula_al_vencer(self):
+        """Sin lock tomado, el primer caller tras el vencimiento recalcula"""
+        self.cache_service.get_or_compute('swr:refresh', lambda: 'viejo', timeout=0, stale_ttl=60, beta=0)
+
+        valor = self.cache_service.get_or_compute('swr:refresh', lambda: 'nuevo', timeout=60, beta=0)
+
+        self.assertEqual(valor, 'nuevo')
+        self.assertEqual(self.cache_service.get_or_compute('swr:refresh', lambda: 'otro', 60, beta=0), 'nuevo')
+
+    def test_get_or_compute_error_al_recalcular_conserva_valor(self):
+        """Si el recálculo falla se sigue sirviendo el valor anterior"""
+        self.cache_service.get_or_compute('swr:error', lambda: 'viejo', timeout=0, stale_ttl=60, beta=0)
+
+        def falla():
+            raise RuntimeError('base de datos caída')
+
+        self.assertEqual(self.cache_service.get_or_compute('swr:error', falla, 60, beta=0), 'viejo')
+
+    def test_get_or_compute_force(self):
+        """force ignora el valor vigente y lo reemplaza"""
+        self.cache_service.get_or_compute('swr:force', lambda: 'viejo', 60, beta=0)
+
+        self.assertEqual(self.cache_service.get_or_compute('swr:force', lambda: 'nuevo', 60, force=True), 'nuevo')
+        self.assertEqual(self.cache_service.get_or_compute('swr:force', lambda: 'otro', 60, beta=0), 'nuevo')
+
+    def test_lock_db_es_exclusivo(self):
+        """El lock de base de datos solo lo obtiene un dueño a la vez"""
+        primero = self.cache_service._acquire_lock(cache, 'swr:lock', 30)
+        segundo = self.cache_service._acquire_lock(cache, 'swr:lock', 30)
+
+        self.assertIsNotNone(primero)
+        self.assertIsNone(segundo)
+        self.cache_service._release_lock(cache, 'swr:lock', primero)
+        self.assertIsNotNone(self.cache_service._acquire_lock(cache, 'swr:lock', 30))
+
+    def test_get_compute_stats(self):
+        """Los contadores distinguen hits, misses y valores stale"""
+        self.cache_service.get_or_compute('reporte:a', lambda: 1, timeout=0, stale_ttl=60, beta=0)
+        token = self.cache_service._acquire_lock(cache, 'reporte:a', 30)
+        self.cache_service.get_or_compute('reporte:a', lambda: 2, timeout=0, stale_ttl=60, beta=0)
+        self.cache_service._release_lock(cache, 'reporte:a', token)
+        self.cache_service.get_or_compute('reporte:b', lambda: 1, 60, beta=0, stats_name='reporte')
+        self.cache_service.get_or_compute('reporte:b', lambda: 1, 60, beta=0, stats_name='reporte')
+
+        stats = self.cache_service.get_compute_stats()['reporte']
+
+        self.assertEqual((stats['miss'], stats['stale'], stats['hit']), (2, 1, 1))
+
     # ═══════════════════════════════════════════════════════════════
     # TESTS DE DECORADOR @cache_result
     # ═══════════════════════════════════════════════════════════════
@@ -311,6 +450,12 @@ class CacheServiceTestCase(TestCase):
         except:
             pass  # No crítico en tests
 
+    def test_is_shared_segun_backend(self):
+        """LocMemCache no se comparte entre procesos salvo que CACHE_SHARED lo fuerce"""
+        self.assertFalse(self.cache_service.is_shared())
+        with override_settings(CACHE_SHARED=True):
+            self.assertTrue(self.cache_service.is_shared())
+
 
 class CacheUtilsTestCase(TestCase):
     """Tests para CacheUtils"""
@@ -0,0 +1,118 @@
+"""
+Tests de la instrumentación por petición: middleware, backend de cache
+instrumentado y percentiles por vista.
+"""
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from app.middleware.instrumentacion import InstrumentacionMiddleware
+from app.services.instrumentacion_service import MedicionPeticion, MetricasVistas, metricas_vistas
+
+User = get_user_model()
+
+
+class InstrumentacionMiddlewareTest(TestCase):
+    """Consultas, cache y Server-Timing de una petición"""
+
+    def setUp(self):
+        cache.clear()
+        metricas_vistas.reiniciar()
+        self.staff = User.objects.create_user('instr_staff', password='x', is_staff=True)
+        self.usuario = User.objects.create_user('instr_normal', password='x')
+
+    def tearDown(self):
+        metricas_vistas.reiniciar()
+        cache.clear()
+
+    def _vista(self, request):
+        list(User.objects.all())
+        list(User.objects.filter(is_staff=True))
+        cache.set('instr_presente', 1)
+        cache.get('instr_presente')
+        cache.get('instr_ausente')
+        cache.get_many(['instr_presente', 'instr_otra'])
+        return HttpResponse('ok')
+
+    def _request(self, usuario):
+        request = RequestFactory().get('/api/currency-conversion/')
+        request.user = usuario
+        return request
+
+    def test_server_timing_con_consultas_y_cache(self):
+        response = InstrumentacionMiddleware(self._vista)(self._request(self.staff))
+
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="2 consultas"', timing)
+        self.assertIn('desc="2 hit 2 miss"', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_server_timing_solo_para_staff(self):
+        response = InstrumentacionMiddleware(self._vista)(self._request(self.usuario))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_cache_fuera_de_peticion_no_registra(self):
+        cache.set('instr_presente', 1)
+        self.assertIsNone(MedicionPeticion.actual())
+        self.assertEqual(cache.get('instr_presente'), 1)
+        self.assertEqual(cache.get('instr_ausente', 'defecto'), 'defecto')
+
+    @override_settings(INSTRUMENTACION_UMBRAL_LENTO=0)
+    def test_peticion_lenta_en_json(self):
+        with self.assertLogs('app.instrumentacion', level='WARNING') as logs:
+            InstrumentacionMiddleware(self._vista)(self._request(self.staff))
+
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual(registro['evento'], 'peticion_lenta')
+        self.assertEqual(registro['consultas'], 2)
+        self.assertEqual(registro['cache_fallos'], 2)
+        self.assertEqual(registro['usuario_id'], self.staff.pk)
+
+    def test_registra_muestras_por_vista(self):
+        InstrumentacionMiddleware(self._vista)(self._request(self.staff))
+
+        resumen = metricas_vistas.resumen()
+        self.assertIn('currency_conversion_api', resumen)
+        self.assertEqual(resumen['currency_conversion_api']['muestras'], 1)
+        self.assertEqual(resumen['currency_conversion_api']['consultas'], 2)
+        self.assertEqual(resumen['currency_conversion_api']['cache_hit_rate'], 50.0)
+
+
+class MetricasVistasTest(TestCase):
+    """Ventana de muestras y percentiles"""
+
+    def setUp(self):
+        self.metricas = MetricasVistas()
+        self.metricas.reiniciar()
+
+    def tearDown(self):
+        self.metricas.reiniciar()
+
+    def test_percentiles_y_ventana(self):
+        medicion = MedicionPeticion()
+        with self.settings(INSTRUMENTACION_MUESTRAS=100):
+            for ms in range(1, 121):
+                self.metricas.registrar('ventas:ventas_balances', medicion, ms / 1000)
+            resumen = self.metricas.resumen()['ventas:ventas_balances']
+
+        # Solo quedan las 100 más recientes (21..120 ms)
+        self.assertEqual(resumen['muestras'], 100)
+        self.assertEqual(resumen['p50'], 70.0)
+        self.assertEqual(resumen['p95'], 115.0)
+        self.assertEqual(resumen['max'], 120.0)
+        self.assertIsNone(resumen['cache_hit_rate'])
+
+    def test_comando_imprime_vistas(self):
+        self.metricas.registrar('admin:index', MedicionPeticion(), 0.25)
+        self.metricas.vaciar()
+
+        salida = StringIO()
+        call_command('metricas_vistas', stdout=salida)
+        self.assertIn('admin:index', salida.getvalue())
+        self.assertIn('250.0', salida.getvalue())
@@ -3,6 +3,7 @@ Pruebas de Integración Cross-App — django-custom-admin
 =======================================================
 Prueba flujos que involucran múltiples aplicaciones del sistema:
   - Dashboard administrativo
+  - Métricas del dashboard agregadas por mes con consultas constantes
   - Vista de balances con datos de gastos y ventas
   - API de conversión de moneda
   - Exportación de reportes
@@ -10,10 +11,13 @@ Prueba flujos que involucran múltiples aplicaciones del sistema:
 Ejecución:
     python manage.py test app.tests.test_integration --verbosity=2
 """
+import json
 from datetime import date, timedelta
 
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import translation
 from djmoney.money import Money
 
@@ -122,6 +126,80 @@ class AdminDashboardIntegrationTest(BaseIntegrationTest):
         self.assertEqual(response.status_code, 200)
 
 
+class DashboardMetricsIntegrationTest(BaseIntegrationTest):
+    """El dashboard agrega por mes en un número constante de consultas."""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import caches
+        from django.test import RequestFactory
+        for alias in ('default', 'static_data'):
+            caches[alias].clear()
+        self.request = RequestFactory().get('/en/admin/')
+        self.request.user = self.admin_user
+
+    def _gasto(self, monto, fecha):
+        return Gastos.objects.create(
+            id_sucursal=self.sucursal,
+            id_cat_gastos=self.cat_gastos,
+            id_cuenta_banco=self.cuenta,
+            monto=Money(monto, 'MXN'),
+            fecha=fecha
+        )
+
+    def _dashboard(self):
+        from app.views import dashboard_callback
+        return dashboard_callback(self.request, {})
+
+    def test_totales_mensuales(self):
+        hoy = date.today()
+        mes_anterior = hoy.replace(day=1) - timedelta(days=1)
+        self._gasto('1000.00', hoy)
+        self._gasto('500.00', hoy.replace(day=1))
+        self._gasto('3000.00', mes_anterior)
+
+        context = self._dashboard()
+
+        self.assertEqual(context['total_gastos'], 1500.0)
+        self.assertEqual(context['gastos_count'], 2)
+        self.assertEqual(context['gastos_trend'], -50.0)
+        self.assertEqual(json.loads(context['gastos_mensuales'])[-2:], [3000.0, 1500.0])
+
+    def test_consultas_constantes(self):
+        hoy = date.today()
+        self._gasto('100.00', hoy)
+        with CaptureQueriesContext(connection) as inicial:
+            self._dashboard()
+
+        from django.core.cache import caches
+        for alias in ('default', 'static_data'):
+            caches[alias].clear()
+        for dias in range(0, 180, 10):
+            self._gasto('100.00', hoy - timedelta(days=dias))
+
+        # 4 agregados mensuales + 4 del resumen + actividad reciente (y LogEntry)
+        with self.assertNumQueries(len(inicial.captured_queries)):
+            self._dashboard()
+        self.assertLessEqual(len(inicial.captured_queries), 10)
+
+    def test_meses_cerrados_se_sirven_de_cache(self):
+        self._gasto('100.00', date.today() - timedelta(days=60))
+        self._dashboard()
+
+        from django.core.cache import cache
+        from app.services.dashboard_service import DashboardMetricsService as Dashboard
+        # Expira el mes en curso; los cerrados siguen en static_data
+        hoy = date.today()
+        cache.delete(Dashboard._clave_mes((hoy.year, hoy.month), Dashboard._sufijo_version()))
+        with CaptureQueriesContext(connection) as ctx:
+            context = self._dashboard()
+
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertEqual(sum(json.loads(context['gastos_mensuales'])), 100.0)
+        # Solo se recalcula el mes actual: el rango empieza el día 1 de este mes
+        self.assertIn(date.today().replace(day=1).isoformat(), sql)
+
+
 # ---------------------------------------------------------------------------
 # Vista de balances (cross-app: gastos + ventas)
 # ---------------------------------------------------------------------------
@@ -257,3 +335,65 @@ class AuditoriaIntegrationTest(BaseIntegrationTest):
         # Acceder a una lista del admin (triggea AdminAuditMiddleware)
         response = self.client.get('/en/admin/catalogo/sucursal/')
         self.assertNotEqual(response.status_code, 500)
+
+
+# ---------------------------------------------------------------------------
+# Exportación de reportes a Excel
+# ---------------------------------------------------------------------------
+
+class ExportacionExcelIntegrationTest(BaseIntegrationTest):
+    """Las exportaciones se escriben en modo write-only y se envían desde un archivo temporal."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cat_renta = CatGastos.objects.create(nombre='Renta')
+        for monto, categoria, dias in [('1500.00', cls.cat_gastos, 0),
+                                       ('2300.00', cls.cat_gastos, 40),
+                                       ('800.00', cls.cat_renta, 0)]:
+            Gastos.objects.create(
+                id_sucursal=cls.sucursal,
+                id_cat_gastos=categoria,
+                id_cuenta_banco=cls.cuenta,
+                monto=Money(monto, 'MXN'),
+                fecha=date.today() - timedelta(days=dias)
+            )
+
+    def _libro(self, response):
+        import io
+        import openpyxl
+        self.assertTrue(response.streaming)
+        return openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_reporte_completo(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.post('/en/export-full-report/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('reporte_financiero_', response['Content-Disposition'])
+        wb = self._libro(response)
+        self.assertEqual(wb.sheetnames, ['Gastos', 'Compras', 'Ventas', 'Anticipos',
+                                         'Balance Mensual', 'Evolución de Saldos'])
+        gastos = wb['Gastos']
+        self.assertEqual(gastos.max_row, 5)  # encabezado + 3 gastos + total
+        self.assertEqual(gastos['F5'].value, '=SUM(F2:F4)')
+        # 12 meses de la única cuenta + totales
+        self.assertEqual(wb['Balance Mensual'].max_row, 14)
+
+    def test_exportacion_admin_gastos_resumen_agregado(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get('/en/admin/gastos/gastos/exportar-excel/', {'q': ''})
+
+        self.assertEqual(response.status_code, 200)
+        wb = self._libro(response)
+        detalle = wb['Detalle']
+        self.assertEqual(detalle.max_row, 5)
+        self.assertEqual(sorted(detalle.cell(row=r, column=6).value for r in range(2, 5)),
+                         [800.0, 1500.0, 2300.0])
+
+        resumen = wb['Resumen']
+        self.assertEqual(resumen['B4'].value, 4600.0)  # Total Gastos
+        self.assertEqual(resumen['D4'].value, 3)       # N° de Registros
+        # La categoría con mayor total encabeza su sección
+        self.assertEqual((resumen['A10'].value, resumen['B10'].value, resumen['C10'].value),
+                         ('Servicios', 2, 3800.0))
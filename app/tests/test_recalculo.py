@@ -0,0 +1,190 @@
+"""
+Tests de la cola de recálculo en segundo plano (RecalculoService)
+
+- Deduplicación de tareas pendientes
+- Programación tras invalidar dominios de cache
+- Ejecución de tareas y lectura de resultados precalculados
+- Estado "calculando" del dashboard de ventas y último cálculo desactualizado
+- Cálculo en la petición cuando el cache no es compartido entre procesos
+
+Ejecución:
+    python manage.py test app.tests.test_recalculo --verbosity=2
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import translation
+
+from app.models import TareaRecalculo
+from app.services.cache_service import cache_service
+from app.services.recalculo_service import RecalculoService
+
+
+class RecalculoServiceTest(TestCase):
+    """Cola de recálculo de CxC, aging y forecasts"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_encolar_deduplica_pendientes(self):
+        """Varios cambios seguidos producen una sola tarea pendiente"""
+        primera = RecalculoService.encolar(RecalculoService.Tipo.CXC)
+        segunda = RecalculoService.encolar(RecalculoService.Tipo.CXC)
+        otra = RecalculoService.encolar(RecalculoService.Tipo.FORECAST, RecalculoService.parametros_forecast())
+
+        self.assertEqual(primera.pk, segunda.pk)
+        self.assertNotEqual(primera.pk, otra.pk)
+        self.assertEqual(TareaRecalculo.objects.count(), 2)
+
+    def test_invalidar_dominio_programa_tareas_tras_commit(self):
+        """Invalidar 'cxc' encola aging y cxc al confirmar la transacción"""
+        with self.captureOnCommitCallbacks(execute=True):
+            cache_service.invalidate_domains('cxc')
+            self.assertFalse(TareaRecalculo.objects.exists())
+
+        tipos = list(TareaRecalculo.objects.order_by('id').values_list('tipo', flat=True))
+        self.assertEqual(tipos, [RecalculoService.Tipo.AGING, RecalculoService.Tipo.CXC])
+
+    def test_procesar_tarea_cxc_deja_dashboard_en_cache(self):
+        """El worker calcula el dashboard y la vista ya puede leerlo"""
+        from ventas.services.cache_service import CuentasPorCobrarCache
+
+        self.assertEqual(CuentasPorCobrarCache.leer_dashboard_ventas(), (None, False))
+        RecalculoService.encolar(RecalculoService.Tipo.CXC)
+
+        tarea = RecalculoService.procesar_siguiente()
+
+        self.assertEqual(tarea.estado, TareaRecalculo.Estado.TERMINADA)
+        datos, desactualizado = CuentasPorCobrarCache.leer_dashboard_ventas()
+        self.assertIsNotNone(datos)
+        self.assertFalse(desactualizado)
+        self.assertIsNone(RecalculoService.procesar_siguiente())
+
+    def test_invalidar_conserva_ultimo_dashboard_como_desactualizado(self):
+        """Tras guardar un modelo se sirve el último cálculo en vez de calcular de nuevo"""
+        from ventas.services.cache_service import CuentasPorCobrarCache
+
+        RecalculoService.encolar(RecalculoService.Tipo.CXC)
+        RecalculoService.procesar_siguiente()
+        cache_service.invalidate_domains('cxc')
+
+        datos, desactualizado = CuentasPorCobrarCache.leer_dashboard_ventas()
+
+        self.assertIsNotNone(datos)
+        self.assertTrue(desactualizado)
+
+    def test_tarea_con_error_queda_registrada(self):
+        """Un fallo marca la tarea con error sin detener la cola"""
+        RecalculoService.encolar('desconocido')
+        RecalculoService.encolar(RecalculoService.Tipo.AGING)
+
+        fallida = RecalculoService.procesar_siguiente()
+        siguiente = RecalculoService.procesar_siguiente()
+
+        self.assertEqual(fallida.estado, TareaRecalculo.Estado.ERROR)
+        self.assertIn('desconocido', fallida.error)
+        self.assertEqual(siguiente.estado, TareaRecalculo.Estado.TERMINADA)
+
+    def test_tareas_programadas_a_futuro_esperan(self):
+        """La demora agrupa ráfagas: la tarea no se reclama antes de tiempo"""
+        RecalculoService.encolar(RecalculoService.Tipo.CXC, demora=60)
+
+        self.assertIsNone(RecalculoService.procesar_siguiente())
+
+    def test_solicitar_adelanta_tarea_demorada(self):
+        """Una vista que pide el recálculo no espera la demora de los guardados"""
+        demorada = RecalculoService.encolar(RecalculoService.Tipo.CXC, demora=60)
+        self.assertIsNone(RecalculoService.procesar_siguiente())
+
+        tarea = RecalculoService.solicitar(RecalculoService.Tipo.CXC)
+
+        self.assertEqual(tarea.pk, demorada.pk)
+        self.assertEqual(RecalculoService.procesar_siguiente().pk, demorada.pk)
+
+    def test_encolar_no_atrasa_tarea_pendiente(self):
+        """Una ráfaga de cambios no pospone indefinidamente el recálculo"""
+        primera = RecalculoService.encolar(RecalculoService.Tipo.CXC)
+
+        RecalculoService.encolar(RecalculoService.Tipo.CXC, demora=60)
+
+        self.assertEqual(RecalculoService.procesar_siguiente().pk, primera.pk)
+
+    def test_tarea_abandonada_en_procesando_se_reclama(self):
+        """Una tarea cuyo worker murió vuelve a la cola tras RECALCULO_TIMEOUT"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        reciente = RecalculoService.encolar(RecalculoService.Tipo.AGING)
+        abandonada = RecalculoService.encolar(RecalculoService.Tipo.CXC)
+        TareaRecalculo.objects.filter(pk=reciente.pk).update(
+            estado=TareaRecalculo.Estado.PROCESANDO, iniciada_en=timezone.now() - timedelta(minutes=1),
+        )
+        TareaRecalculo.objects.filter(pk=abandonada.pk).update(
+            estado=TareaRecalculo.Estado.PROCESANDO, iniciada_en=timezone.now() - timedelta(hours=2),
+        )
+
+        with self.settings(RECALCULO_TIMEOUT=3600):
+            tarea = RecalculoService.procesar_siguiente()
+            self.assertIsNone(RecalculoService.procesar_siguiente())
+
+        self.assertEqual(tarea.pk, abandonada.pk)
+        self.assertEqual(tarea.estado, TareaRecalculo.Estado.TERMINADA)
+        reciente.refresh_from_db()
+        self.assertEqual(reciente.estado, TareaRecalculo.Estado.PROCESANDO)
+
+
+@override_settings(CACHE_SHARED=True)
+class DashboardCalculandoTest(TestCase):
+    """Con cache compartido las vistas solo leen resultados precalculados"""
+
+    def setUp(self):
+        cache.clear()
+        translation.activate('en')
+        self.user = User.objects.create_superuser(username='admin_recalculo', password='AdminPass123!')
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        translation.deactivate()
+
+    def test_dashboard_sin_datos_muestra_calculando(self):
+        response = self.client.get(reverse('admin:ventas_dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['calculando'])
+        self.assertTrue(TareaRecalculo.objects.filter(tipo=RecalculoService.Tipo.CXC).exists())
+
+    def test_dashboard_lee_resultado_precalculado(self):
+        RecalculoService.encolar(RecalculoService.Tipo.CXC)
+        RecalculoService.procesar_pendientes()
+
+        response = self.client.get(reverse('admin:ventas_dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('calculando', response.context)
+        self.assertIn('dso_metrics', response.context)
+        self.assertFalse(response.context['desactualizado'])
+
+    def test_dashboard_desactualizado_muestra_ultimo_calculo(self):
+        RecalculoService.encolar(RecalculoService.Tipo.CXC)
+        RecalculoService.procesar_pendientes()
+        cache_service.invalidate_domains('cxc')
+
+        response = self.client.get(reverse('admin:ventas_dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('calculando', response.context)
+        self.assertTrue(response.context['desactualizado'])
+        self.assertTrue(TareaRecalculo.objects.filter(
+            tipo=RecalculoService.Tipo.CXC, estado=TareaRecalculo.Estado.PENDIENTE,
+        ).exists())
+
+    @override_settings(CACHE_SHARED=False)
+    def test_dashboard_sin_cache_compartido_calcula_en_la_peticion(self):
+        """Con LocMemCache el worker no puede dejarle el resultado a la vista"""
+        response = self.client.get(reverse('admin:ventas_dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('calculando', response.context)
+        self.assertFalse(response.context['desactualizado'])
+        self.assertFalse(TareaRecalculo.objects.exists())
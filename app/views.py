@@ -1,7 +1,6 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test, permission_required
 from django.contrib.auth.models import User
-from django.db.models import Sum, Count
 from django.utils import timezone
 from django.http import JsonResponse
 from django.contrib.admin.views.decorators import staff_member_required
@@ -16,8 +15,7 @@ import calendar
 from .services.excel_service import ExcelReportService
 from .services.balance_service import BalanceAnalysisService
 from .services.utils import UtilService
-from gastos.models import Gastos, Compra
-from ventas.models import Ventas, Cliente
+from .services.dashboard_service import DashboardMetricsService
 from auditoria.models import LogActividad, UserProfile
 
 logger = logging.getLogger(__name__)
@@ -113,100 +111,39 @@ def dashboard_callback(request, context):
     now = timezone.now()
     current_month = now.month
     current_year = now.year
-    last_month = current_month - 1 if current_month > 1 else 12
-    last_month_year = current_year if current_month > 1 else current_year - 1
     
     # Calcular métricas principales
     try:
-        # Total gastos del mes actual
-        total_gastos = Gastos.objects.filter(
-            fecha__month=current_month,
-            fecha__year=current_year
-        ).aggregate(total=Sum('monto'))['total'] or 0
+        # Totales mensuales de los últimos 6 meses (una consulta por modelo, cacheados por mes)
+        periodos = DashboardMetricsService.periodos(6)
+        mensual = DashboardMetricsService.metricas_mensuales(periodos)
+        actual = mensual[periodos[-1]]
+        anterior = mensual[periodos[-2]]
+        resumen = DashboardMetricsService.resumen_actual()
         
-        # Total gastos del mes anterior
-        gastos_mes_anterior = Gastos.objects.filter(
-            fecha__month=last_month,
-            fecha__year=last_month_year
-        ).aggregate(total=Sum('monto'))['total'] or 0
+        def _tendencia(valor_actual, valor_anterior):
+            if valor_anterior > 0:
+                return ((valor_actual - valor_anterior) / valor_anterior) * 100
+            return 0
         
-        # Calcular tendencia de gastos
-        gastos_trend = 0
-        if gastos_mes_anterior > 0:
-            gastos_trend = ((total_gastos - gastos_mes_anterior) / gastos_mes_anterior) * 100
-        
-        # Total ventas del mes actual
-        total_ventas = Ventas.objects.filter(
-            fecha_salida_manifiesto__month=current_month,
-            fecha_salida_manifiesto__year=current_year
-        ).aggregate(total=Sum('monto'))['total'] or 0
-        
-        # Total ventas del mes anterior
-        ventas_mes_anterior = Ventas.objects.filter(
-            fecha_salida_manifiesto__month=last_month,
-            fecha_salida_manifiesto__year=last_month_year
-        ).aggregate(total=Sum('monto'))['total'] or 0
-        
-        # Calcular tendencia de ventas
-        ventas_trend = 0
-        if ventas_mes_anterior > 0:
-            ventas_trend = ((total_ventas - ventas_mes_anterior) / ventas_mes_anterior) * 100
-        
-        # Total compras del mes actual
-        total_compras = Compra.objects.filter(
-            fecha_compra__month=current_month,
-            fecha_compra__year=current_year
-        ).aggregate(total=Sum('monto_total'))['total'] or 0
-        
-        # Total compras del mes anterior
-        compras_mes_anterior = Compra.objects.filter(
-            fecha_compra__month=last_month,
-            fecha_compra__year=last_month_year
-        ).aggregate(total=Sum('monto_total'))['total'] or 0
-        
-        # Calcular tendencia de compras
-        compras_trend = 0
-        if compras_mes_anterior > 0:
-            compras_trend = ((total_compras - compras_mes_anterior) / compras_mes_anterior) * 100
+        total_gastos = actual['gastos_total']
+        total_ventas = actual['ventas_total']
+        total_compras = actual['compras_total']
+        gastos_trend = _tendencia(total_gastos, anterior['gastos_total'])
+        ventas_trend = _tendencia(total_ventas, anterior['ventas_total'])
+        compras_trend = _tendencia(total_compras, anterior['compras_total'])
         
         # Balance neto
         balance_neto = total_ventas - total_gastos - total_compras
         
         # Gastos por categoría para el gráfico
-        gastos_por_categoria = Gastos.objects.filter(
-            fecha__month=current_month,
-            fecha__year=current_year
-        ).values(
-            'id_cat_gastos__nombre'
-        ).annotate(
-            total=Sum('monto')
-        ).order_by('-total')[:6]
-        
-        gastos_categorias_labels = [item['id_cat_gastos__nombre'] for item in gastos_por_categoria]
-        gastos_categorias_data = [float(item['total']) for item in gastos_por_categoria]
+        gastos_categorias_labels = resumen['gastos_categorias_labels']
+        gastos_categorias_data = resumen['gastos_categorias_data']
         
         # Datos mensuales para tendencias (últimos 6 meses)
-        meses_labels = []
-        gastos_mensuales = []
-        ventas_mensuales = []
-        
-        for i in range(6):
-            mes = (current_month - i - 1) % 12 + 1
-            año = current_year if current_month - i > 0 else current_year - 1
-            
-            meses_labels.insert(0, f"{mes:02d}/{año}")
-            
-            gastos_mes = Gastos.objects.filter(
-                fecha__month=mes,
-                fecha__year=año
-            ).aggregate(total=Sum('monto'))['total'] or 0
-            gastos_mensuales.insert(0, float(gastos_mes))
-            
-            ventas_mes = Ventas.objects.filter(
-                fecha_salida_manifiesto__month=mes,
-                fecha_salida_manifiesto__year=año
-            ).aggregate(total=Sum('monto'))['total'] or 0
-            ventas_mensuales.insert(0, float(ventas_mes))
+        meses_labels = [f"{mes:02d}/{año}" for año, mes in periodos]
+        gastos_mensuales = [mensual[p]['gastos_total'] for p in periodos]
+        ventas_mensuales = [mensual[p]['ventas_total'] for p in periodos]
         
         # Actividad reciente
         _ACCION_META = {
@@ -220,7 +157,7 @@ def dashboard_callback(request, context):
         }
         recent_activities = []
         try:
-            activities = LogActividad.objects.order_by('-fecha_hora')[:8]
+            activities = LogActividad.objects.select_related('usuario').order_by('-fecha_hora')[:8]
             for activity in activities:
                 icon, color, status = _ACCION_META.get(
                     activity.tipo_accion, ('fa-circle-info', '#586f7c', 'info')
@@ -283,62 +220,35 @@ def dashboard_callback(request, context):
             }]
         
         # Conteos del mes
-        gastos_count = Gastos.objects.filter(
-            fecha__month=current_month, fecha__year=current_year
-        ).count()
-        ventas_count = Ventas.objects.filter(
-            fecha_salida_manifiesto__month=current_month,
-            fecha_salida_manifiesto__year=current_year
-        ).count()
-        compras_count = Compra.objects.filter(
-            fecha_compra__month=current_month, fecha_compra__year=current_year
-        ).count()
+        gastos_count = actual['gastos_count']
+        ventas_count = actual['ventas_count']
+        compras_count = actual['compras_count']
 
         # Cuentas por cobrar: ventas pendientes / vencidas
-        ventas_vigentes = Ventas.objects.filter(
-            estado_cobranza__in=['Pendiente', 'Parcial']
-        ).aggregate(total=Sum('monto'))['total'] or 0
-        ventas_vigentes_count = Ventas.objects.filter(
-            estado_cobranza__in=['Pendiente', 'Parcial']
-        ).count()
-        ventas_vencidas = Ventas.objects.filter(
-            estado_cobranza='Vencido'
-        ).aggregate(total=Sum('monto'))['total'] or 0
-        ventas_vencidas_count = Ventas.objects.filter(
-            estado_cobranza='Vencido'
-        ).count()
+        ventas_vigentes = resumen['ventas_vigentes']
+        ventas_vigentes_count = resumen['ventas_vigentes_count']
+        ventas_vencidas = resumen['ventas_vencidas']
+        ventas_vencidas_count = resumen['ventas_vencidas_count']
 
         # Clientes nuevos este mes vs mes anterior
-        clientes_nuevos = Cliente.objects.filter(
-            fecha_registro__month=current_month, fecha_registro__year=current_year
-        ).count()
-        clientes_mes_anterior = Cliente.objects.filter(
-            fecha_registro__month=last_month, fecha_registro__year=last_month_year
-        ).count()
-        clientes_trend = 0
-        if clientes_mes_anterior > 0:
-            clientes_trend = ((clientes_nuevos - clientes_mes_anterior) / clientes_mes_anterior) * 100
+        clientes_nuevos = actual['clientes_nuevos']
+        clientes_trend = _tendencia(clientes_nuevos, anterior['clientes_nuevos'])
 
         # Productos comprados (toneladas/unidades) este mes
-        productos_mes = Compra.objects.filter(
-            fecha_compra__month=current_month, fecha_compra__year=current_year
-        ).aggregate(total=Sum('cantidad'))['total'] or 0
-        productos_mes_anterior = Compra.objects.filter(
-            fecha_compra__month=last_month, fecha_compra__year=last_month_year
-        ).aggregate(total=Sum('cantidad'))['total'] or 0
-        productos_trend = 0
-        if productos_mes_anterior > 0:
-            productos_trend = ((productos_mes - productos_mes_anterior) / productos_mes_anterior) * 100
+        productos_mes = actual['productos']
+        productos_trend = _tendencia(productos_mes, anterior['productos'])
 
         # Tendencia del balance neto
-        balance_mes_anterior = ventas_mes_anterior - gastos_mes_anterior - compras_mes_anterior
+        balance_mes_anterior = (
+            anterior['ventas_total'] - anterior['gastos_total'] - anterior['compras_total']
+        )
         balance_trend = 0
         if balance_mes_anterior != 0:
             balance_trend = ((balance_neto - balance_mes_anterior) / abs(balance_mes_anterior)) * 100
 
         # Total de usuarios
-        total_users = User.objects.count()
-        total_clientes = Cliente.objects.filter(activo=True).count()
+        total_users = resumen['total_users']
+        total_clientes = resumen['total_clientes']
 
     except Exception as e:
         # En caso de error, usar valores por defecto
@@ -5,11 +5,12 @@ from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib.admin.models import LogEntry, ADDITION, CHANGE, DELETION
 from django.utils.html import format_html
+from app.pagination import KeysetPaginationMixin
 from .models import LogActividad, SiteConfiguration
 
 
 @admin.register(LogActividad)
-class LogActividadAdmin(ModelAdmin):
+class LogActividadAdmin(KeysetPaginationMixin, ModelAdmin):
     """Configuración del admin para los logs de actividad"""
     
     list_display = ('fecha_hora', 'nombre_usuario', 'tipo_accion', 'modelo_afectado', 
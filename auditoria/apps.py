@@ -8,6 +8,8 @@ class AuditoriaConfig(AppConfig):
     verbose_name = _('Auditoría y Registro de Actividad')
 
     def ready(self):
+        # Conecta el vaciado del buffer de LogActividad a request_finished
+        from auditoria import buffer  # noqa: F401
         from django.db.models.signals import post_save
         from django.contrib.auth.models import User
         from django.dispatch import receiver
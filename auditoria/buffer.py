@@ -0,0 +1,202 @@
+"""
+Escritura diferida de LogActividad.
+
+`registrar_actividad(**campos)` encola la entrada en memoria del proceso en vez
+de hacer un INSERT por cada acción. La cola se escribe con un solo bulk_create
+cuando llega a AUDITORIA_BUFFER_TAMANO entradas, cuando la más antigua cumple
+AUDITORIA_BUFFER_INTERVALO segundos, al terminar la petición (señal
+request_finished, después de enviar la respuesta) y al salir del proceso.
+Django cierra las conexiones en request_finished antes que este receptor, así
+que tras vaciar se vuelve a llamar close_old_connections: con CONN_MAX_AGE = 0
+la conexión abierta por el bulk_create no queda ociosa hasta la siguiente
+petición del hilo.
+
+Si el bulk_create falla o tarda más de AUDITORIA_SPOOL_UMBRAL segundos, las
+escrituras de los siguientes AUDITORIA_SPOOL_PAUSA segundos se agregan como
+JSONL a AUDITORIA_SPOOL_PATH (archivo local de solo agregado);
+``manage.py cargar_spool_auditoria`` las pasa después a la BD.
+
+Dentro de transaction.atomic() la entrada se encola con on_commit: si la
+operación se revierte su entrada se descarta, y la cola compartida nunca se
+escribe dentro de la transacción de una petición (un rollback perdería las
+entradas de otros hilos).
+
+Con AUDITORIA_BUFFER_ACTIVO = False cada entrada se escribe en línea.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger('auditoria.buffer')
+
+CAMPOS = (
+    'usuario_id', 'nombre_usuario', 'tipo_accion', 'descripcion', 'modelo_afectado',
+    'objeto_id', 'campos_modificados', 'direccion_ip', 'navegador', 'fecha_hora',
+)
+
+
+class BufferAuditoria:
+    """Cola en memoria de entradas de LogActividad, compartida por los hilos del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pendientes: List[Dict] = []
+        self._primera = None
+        self._spool_hasta = 0.0
+
+    @staticmethod
+    def _config(nombre, defecto):
+        return getattr(settings, nombre, defecto)
+
+    @staticmethod
+    def _entrada(campos) -> Dict:
+        usuario = campos.pop('usuario', None)
+        if usuario is not None:
+            campos['usuario_id'] = usuario.pk
+        campos.setdefault('fecha_hora', timezone.now())
+        desconocidos = set(campos) - set(CAMPOS)
+        if desconocidos:
+            raise TypeError(f"Campos de LogActividad desconocidos: {', '.join(sorted(desconocidos))}")
+        return campos
+
+    def registrar(self, **campos):
+        """
+        Encola una entrada; acepta los mismos argumentos que
+        LogActividad.objects.create.
+
+        Returns:
+            LogActividad guardado si el buffer está inactivo; None si la
+            entrada quedó encolada (todavía no tiene pk)
+        """
+        from auditoria.models import LogActividad
+
+        entrada = self._entrada(campos)
+        if not self._config('AUDITORIA_BUFFER_ACTIVO', True):
+            return LogActividad.objects.create(**entrada)
+
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: self._encolar(entrada))
+        else:
+            self._encolar(entrada)
+        return None
+
+    def _encolar(self, entrada: Dict):
+        # Corre en autocommit (o en on_commit, ya fuera de la transacción):
+        # el vaciado por tamaño o intervalo no queda dentro de un atomic ajeno
+        with self._lock:
+            if not self._pendientes:
+                self._primera = time.monotonic()
+            self._pendientes.append(entrada)
+            lleno = len(self._pendientes) >= self._config('AUDITORIA_BUFFER_TAMANO', 100)
+            vencido = time.monotonic() - self._primera >= self._config('AUDITORIA_BUFFER_INTERVALO', 5)
+        if lleno or vencido:
+            self.vaciar()
+
+    def pendientes(self) -> int:
+        with self._lock:
+            return len(self._pendientes)
+
+    def vaciar(self) -> int:
+        """Escribe la cola con bulk_create (o al spool); devuelve las entradas escritas"""
+        with self._lock:
+            entradas, self._pendientes = self._pendientes, []
+        if not entradas:
+            return 0
+
+        if time.monotonic() < self._spool_hasta and self._escribir_spool(entradas):
+            return len(entradas)
+
+        from auditoria.models import LogActividad
+        inicio = time.monotonic()
+        try:
+            LogActividad.objects.bulk_create([LogActividad(**entrada) for entrada in entradas])
+        except Exception:
+            logger.exception('No se pudieron guardar %s entradas de auditoría', len(entradas))
+            self._pausar_bd()
+            if not self._escribir_spool(entradas):
+                logger.error('Entradas de auditoría descartadas: %s', len(entradas))
+            return len(entradas)
+
+        if time.monotonic() - inicio > self._config('AUDITORIA_SPOOL_UMBRAL', 2.0):
+            logger.warning('bulk_create de auditoría lento (%.2fs); usando spool', time.monotonic() - inicio)
+            self._pausar_bd()
+        return len(entradas)
+
+    def _pausar_bd(self):
+        if self._config('AUDITORIA_SPOOL_PATH', ''):
+            self._spool_hasta = time.monotonic() + self._config('AUDITORIA_SPOOL_PAUSA', 60)
+
+    def _escribir_spool(self, entradas) -> bool:
+        ruta = self._config('AUDITORIA_SPOOL_PATH', '')
+        if not ruta:
+            return False
+        try:
+            os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+            lineas = ''.join(json.dumps(entrada, cls=DjangoJSONEncoder) + '\n' for entrada in entradas)
+            with self._lock, open(ruta, 'a', encoding='utf-8') as spool:
+                spool.write(lineas)
+            return True
+        except OSError:
+            logger.exception('No se pudo escribir el spool de auditoría %s', ruta)
+            return False
+
+    def cargar_spool(self, lote: int = 1000) -> int:
+        """
+        Pasa a la BD las entradas del spool. El archivo se renombra antes de
+        leerlo, así que las escrituras concurrentes van a un spool nuevo.
+        """
+        from auditoria.models import LogActividad
+
+        ruta = self._config('AUDITORIA_SPOOL_PATH', '')
+        if not ruta or not os.path.exists(ruta):
+            return 0
+        en_proceso = f'{ruta}.{os.getpid()}.cargando'
+        os.replace(ruta, en_proceso)
+
+        cargadas, bloque = 0, []
+        with open(en_proceso, encoding='utf-8') as spool:
+            for linea in spool:
+                if not linea.strip():
+                    continue
+                entrada = json.loads(linea)
+                entrada['fecha_hora'] = parse_datetime(entrada['fecha_hora'])
+                bloque.append(LogActividad(**entrada))
+                if len(bloque) >= lote:
+                    LogActividad.objects.bulk_create(bloque)
+                    cargadas, bloque = cargadas + len(bloque), []
+        if bloque:
+            LogActividad.objects.bulk_create(bloque)
+            cargadas += len(bloque)
+        os.remove(en_proceso)
+        return cargadas
+
+
+buffer_auditoria = BufferAuditoria()
+registrar_actividad = buffer_auditoria.registrar
+
+
+def _vaciar_al_terminar(**kwargs):
+    try:
+        if not buffer_auditoria.vaciar():
+            return
+    except Exception:
+        logger.exception('Error al vaciar el buffer de auditoría')
+    # Cierra la conexión del bulk_create si no es persistente (nunca dentro de
+    # una transacción, p. ej. la de un TestCase)
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+request_finished.connect(_vaciar_al_terminar, dispatch_uid='auditoria_buffer_vaciar')
+atexit.register(_vaciar_al_terminar)
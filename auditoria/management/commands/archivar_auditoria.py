@@ -0,0 +1,67 @@
+"""
+Management command: archivar_auditoria
+Exporta a JSONL comprimido los meses de LogActividad anteriores al periodo de
+retención y los elimina de la tabla: DROP PARTITION en MySQL particionado,
+DELETE por lotes en los demás casos. En MySQL particionado también crea por
+adelantado las particiones de los próximos meses, así que conviene
+programarlo una vez al mes.
+
+Uso:
+    python manage.py archivar_auditoria
+    python manage.py archivar_auditoria --meses 6 --destino /backups/auditoria
+    python manage.py archivar_auditoria --dry-run
+    python manage.py archivar_auditoria --particionar   # MySQL: una sola vez, en mantenimiento
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from auditoria.retencion import RetencionAuditoria
+
+
+class Command(BaseCommand):
+    help = "Exporta y elimina los meses de LogActividad fuera del periodo de retención."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=settings.AUDITORIA_RETENCION_MESES,
+                            help='Meses completos que se conservan (default: AUDITORIA_RETENCION_MESES).')
+        parser.add_argument('--destino', default=settings.AUDITORIA_ARCHIVO_DIR,
+                            help='Directorio de los .jsonl.gz (default: AUDITORIA_ARCHIVO_DIR).')
+        parser.add_argument('--dry-run', action='store_true', help='Solo muestra los meses y filas a archivar.')
+        parser.add_argument('--particionar', action='store_true',
+                            help='Convierte la tabla a particiones mensuales (solo MySQL).')
+        parser.add_argument('--meses-futuros', type=int, default=3,
+                            help='Particiones que se crean por adelantado (default: 3).')
+
+    def handle(self, *args, **options):
+        if options['meses'] < 1:
+            raise CommandError('--meses debe ser >= 1.')
+
+        if options['particionar']:
+            inicio = time.perf_counter()
+            try:
+                particionada = RetencionAuditoria.particionar(options['meses_futuros'])
+            except ValueError as e:
+                raise CommandError(f'--particionar: {e}')
+            if particionada:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Tabla particionada por mes en {time.perf_counter() - inicio:.2f}s."
+                ))
+            else:
+                self.stdout.write("La tabla ya estaba particionada.")
+
+        def progreso(mes, filas, modo):
+            self.stdout.write(f"  {mes[0]:04d}-{mes[1]:02d}: {filas} registros ({modo})")
+
+        inicio = time.perf_counter()
+        resultado = RetencionAuditoria.archivar(
+            options['meses'], options['destino'], dry_run=options['dry_run'], progreso=progreso
+        )
+        if resultado['particiones_nuevas']:
+            self.stdout.write(f"Particiones creadas: {', '.join(resultado['particiones_nuevas'])}")
+        accion = 'por archivar' if options['dry_run'] else f"archivados en {options['destino']}"
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(resultado['meses'])} meses / {resultado['filas']} registros {accion} "
+            f"en {time.perf_counter() - inicio:.2f}s."
+        ))
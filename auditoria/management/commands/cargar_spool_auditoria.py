@@ -0,0 +1,26 @@
+"""
+Management command: cargar_spool_auditoria
+Pasa a LogActividad las entradas que auditoria.buffer dejó en el spool JSONL
+(AUDITORIA_SPOOL_PATH) mientras la BD fallaba o respondía lenta.
+
+Uso:
+    python manage.py cargar_spool_auditoria
+    python manage.py cargar_spool_auditoria --lote 5000
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from auditoria.buffer import buffer_auditoria
+
+
+class Command(BaseCommand):
+    help = "Carga en LogActividad las entradas del spool de auditoría."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Entradas por bulk_create (default: 1000).')
+
+    def handle(self, *args, **options):
+        if not settings.AUDITORIA_SPOOL_PATH:
+            raise CommandError('AUDITORIA_SPOOL_PATH no está configurado.')
+        cargadas = buffer_auditoria.cargar_spool(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{cargadas} entradas de auditoría cargadas desde el spool."))
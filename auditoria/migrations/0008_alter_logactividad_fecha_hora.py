@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0007_alter_siteconfiguration_show_ui_builder'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logactividad',
+            name='fecha_hora',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Fecha y hora'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0008_alter_logactividad_fecha_hora'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='logactividad',
+            name='auditoria_l_usuario_ff713f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='logactividad',
+            name='auditoria_l_tipo_ac_a04560_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='logactividad',
+            name='auditoria_l_fecha_h_3e5b3f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='logactividad',
+            name='auditoria_l_modelo__6b97ff_idx',
+        ),
+        migrations.AlterField(
+            model_name='logactividad',
+            name='usuario',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs_actividad', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+        migrations.AddIndex(
+            model_name='logactividad',
+            index=models.Index(fields=['usuario', 'fecha_hora'], name='auditoria_log_usuario_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='logactividad',
+            index=models.Index(fields=['tipo_accion', 'fecha_hora'], name='auditoria_log_accion_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='logactividad',
+            index=models.Index(fields=['modelo_afectado', 'objeto_id'], name='auditoria_log_objeto'),
+        ),
+    ]
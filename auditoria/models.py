@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from app.media_utils import safe_file_url
 
@@ -18,10 +19,13 @@ class LogActividad(models.Model):
         ('other', _('Otra acción')),
     )
     
-    # Usuario que realizó la acción (puede ser null si no hay usuario autenticado)
+    # Usuario que realizó la acción (puede ser null si no hay usuario autenticado).
+    # Sin FK en la BD: MySQL no permite claves foráneas en tablas particionadas
+    # (auditoria.retencion); SET_NULL lo sigue aplicando Django.
     usuario = models.ForeignKey(
         User, 
         on_delete=models.SET_NULL,
+        db_constraint=False,
         null=True, 
         blank=True,
         verbose_name=_('Usuario'),
@@ -83,9 +87,10 @@ class LogActividad(models.Model):
         verbose_name=_('Navegador/Agente')
     )
     
-    # Fecha y hora de la acción
+    # Fecha y hora de la acción (la asigna auditoria.buffer al encolar)
     fecha_hora = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name=_('Fecha y hora'),
         # Usando la zona horaria del servidor (no UTC)
         db_index=True
@@ -95,11 +100,11 @@ class LogActividad(models.Model):
         verbose_name = _('Log de actividad')
         verbose_name_plural = _('Logs de actividad')
         ordering = ['-fecha_hora']
+        # Filtros del admin: por usuario, acción y fecha; historial de un objeto
         indexes = [
-            models.Index(fields=['usuario']),
-            models.Index(fields=['tipo_accion']),
-            models.Index(fields=['fecha_hora']),
-            models.Index(fields=['modelo_afectado']),
+            models.Index(fields=['usuario', 'fecha_hora'], name='auditoria_log_usuario_fecha'),
+            models.Index(fields=['tipo_accion', 'fecha_hora'], name='auditoria_log_accion_fecha'),
+            models.Index(fields=['modelo_afectado', 'objeto_id'], name='auditoria_log_objeto'),
         ]
     
     def __str__(self):
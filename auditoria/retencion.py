@@ -0,0 +1,222 @@
+"""
+Retención de LogActividad por mes.
+
+En MySQL la tabla se puede particionar por RANGE (TO_DAYS(fecha_hora)) con una
+partición por mes (`particionar`). Cada mes vencido se exporta a JSONL
+comprimido (logactividad_AAAA_MM.jsonl.gz) y se elimina con DROP PARTITION,
+cuyo costo no depende del número de filas. Sin particiones (SQLite,
+PostgreSQL o MySQL sin convertir) el mes se exporta igual y se borra por
+lotes de pk.
+
+Los límites de mes se calculan en UTC, igual que se guarda fecha_hora.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone as dt_timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+
+from auditoria.models import LogActividad
+
+logger = logging.getLogger(__name__)
+
+Mes = Tuple[int, int]
+
+
+class RetencionAuditoria:
+    """Exporta y elimina los meses de LogActividad fuera del periodo de retención"""
+
+    TABLA = LogActividad._meta.db_table
+    LOTE = 5000
+
+    # ------------------------------------------------------------------
+    # Meses
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def siguiente(mes: Mes) -> Mes:
+        anio, numero = mes
+        return (anio + 1, 1) if numero == 12 else (anio, numero + 1)
+
+    @staticmethod
+    def inicio(mes: Mes) -> datetime:
+        """Primer instante del mes en el huso en que se guarda fecha_hora"""
+        inicio = datetime(mes[0], mes[1], 1)
+        return inicio.replace(tzinfo=dt_timezone.utc) if settings.USE_TZ else inicio
+
+    @staticmethod
+    def nombre_particion(mes: Mes) -> str:
+        return f'p{mes[0]:04d}{mes[1]:02d}'
+
+    @classmethod
+    def meses_vencidos(cls, retencion_meses: int, hoy=None) -> List[Mes]:
+        """Meses con registros anteriores al inicio del periodo de retención"""
+        hoy = hoy or timezone.now().astimezone(dt_timezone.utc).date()
+        corte = (hoy.year, hoy.month)
+        for _ in range(retencion_meses):
+            corte = (corte[0] - 1, 12) if corte[1] == 1 else (corte[0], corte[1] - 1)
+
+        primera = LogActividad.objects.order_by('fecha_hora').values_list('fecha_hora', flat=True).first()
+        if primera is None:
+            return []
+        if settings.USE_TZ:
+            primera = primera.astimezone(dt_timezone.utc)
+        meses, mes = [], (primera.year, primera.month)
+        while mes < corte:
+            meses.append(mes)
+            mes = cls.siguiente(mes)
+        return meses
+
+    # ------------------------------------------------------------------
+    # Particiones (solo MySQL)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def particiones(cls) -> List[str]:
+        """Nombres de las particiones de la tabla; vacío si no está particionada"""
+        if connection.vendor != 'mysql':
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION",
+                [cls.TABLA],
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+    @classmethod
+    def _definiciones(cls, meses: List[Mes]) -> str:
+        partes = [
+            f"PARTITION {cls.nombre_particion(mes)} VALUES LESS THAN "
+            f"(TO_DAYS('{cls.inicio(cls.siguiente(mes)):%Y-%m-%d}'))"
+            for mes in meses
+        ]
+        partes.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+        return ', '.join(partes)
+
+    @classmethod
+    def _meses_hasta(cls, desde: Mes, meses_futuros: int) -> List[Mes]:
+        hoy = timezone.now().astimezone(dt_timezone.utc).date()
+        tope = (hoy.year, hoy.month)
+        for _ in range(meses_futuros):
+            tope = cls.siguiente(tope)
+        meses, mes = [], desde
+        while mes <= tope:
+            meses.append(mes)
+            mes = cls.siguiente(mes)
+        return meses
+
+    @classmethod
+    def particionar(cls, meses_futuros: int = 3) -> List[str]:
+        """
+        Convierte la tabla a particiones mensuales (desde el mes del registro
+        más antiguo). La llave primaria pasa a (id, fecha_hora) porque MySQL
+        exige que incluya la columna de partición. Reescribe la tabla: usar
+        en una ventana de mantenimiento.
+        """
+        if connection.vendor != 'mysql':
+            raise ValueError('El particionado por rango solo está disponible en MySQL')
+        if cls.particiones():
+            return []
+
+        hoy = timezone.now().astimezone(dt_timezone.utc).date()
+        primera = LogActividad.objects.order_by('fecha_hora').values_list('fecha_hora', flat=True).first()
+        if primera is not None and settings.USE_TZ:
+            primera = primera.astimezone(dt_timezone.utc)
+        desde = (primera.year, primera.month) if primera else (hoy.year, hoy.month)
+
+        sentencias = [
+            f"ALTER TABLE `{cls.TABLA}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `fecha_hora`)",
+            f"ALTER TABLE `{cls.TABLA}` PARTITION BY RANGE (TO_DAYS(`fecha_hora`)) "
+            f"({cls._definiciones(cls._meses_hasta(desde, meses_futuros))})",
+        ]
+        with connection.cursor() as cursor:
+            for sql in sentencias:
+                cursor.execute(sql)
+        logger.info('LogActividad particionada por mes desde %04d-%02d', *desde)
+        return sentencias
+
+    @classmethod
+    def asegurar_particiones(cls, meses_futuros: int = 3) -> List[str]:
+        """Crea las particiones de los próximos meses separándolas de pmax (vacía)"""
+        existentes = cls.particiones()
+        mensuales = sorted(nombre for nombre in existentes if nombre != 'pmax')
+        if not mensuales or 'pmax' not in existentes:
+            return []
+        ultima = (int(mensuales[-1][1:5]), int(mensuales[-1][5:7]))
+        nuevas = cls._meses_hasta(cls.siguiente(ultima), meses_futuros)
+        if not nuevas:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE `{cls.TABLA}` REORGANIZE PARTITION pmax INTO ({cls._definiciones(nuevas)})"
+            )
+        return [cls.nombre_particion(mes) for mes in nuevas]
+
+    # ------------------------------------------------------------------
+    # Exportación y borrado
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def registros_del_mes(cls, mes: Mes):
+        return LogActividad.objects.filter(
+            fecha_hora__gte=cls.inicio(mes), fecha_hora__lt=cls.inicio(cls.siguiente(mes))
+        )
+
+    @classmethod
+    def exportar(cls, mes: Mes, destino: str) -> Tuple[str, int]:
+        """Escribe los registros del mes en destino/logactividad_AAAA_MM.jsonl.gz"""
+        os.makedirs(destino, exist_ok=True)
+        ruta = os.path.join(destino, f'logactividad_{mes[0]:04d}_{mes[1]:02d}.jsonl.gz')
+        temporal = f'{ruta}.tmp'
+        filas = 0
+        with gzip.open(temporal, 'wt', encoding='utf-8') as archivo:
+            for registro in cls.registros_del_mes(mes).order_by('pk').values().iterator(chunk_size=cls.LOTE):
+                archivo.write(json.dumps(registro, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                filas += 1
+        os.replace(temporal, ruta)
+        return ruta, filas
+
+    @classmethod
+    def eliminar(cls, mes: Mes, particiones: Optional[List[str]] = None) -> str:
+        """DROP PARTITION si el mes tiene partición propia; si no, DELETE por lotes de pk"""
+        nombre = cls.nombre_particion(mes)
+        particiones = cls.particiones() if particiones is None else particiones
+        if nombre in particiones:
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE `{cls.TABLA}` DROP PARTITION {nombre}")
+            return 'partición'
+
+        registros = cls.registros_del_mes(mes)
+        while True:
+            ids = list(registros.order_by('pk').values_list('pk', flat=True)[:cls.LOTE])
+            if not ids:
+                return 'lotes'
+            LogActividad.objects.filter(pk__in=ids).delete()
+
+    @classmethod
+    def archivar(cls, retencion_meses: int, destino: str, dry_run: bool = False,
+                 progreso: Optional[Callable[[Mes, int, str], None]] = None) -> Dict:
+        """Exporta y elimina cada mes vencido; devuelve el resumen por mes"""
+        particiones = cls.particiones()
+        resultado = {'meses': [], 'filas': 0, 'particiones_nuevas': []}
+        for mes in cls.meses_vencidos(retencion_meses):
+            if dry_run:
+                filas, modo = cls.registros_del_mes(mes).count(), 'dry-run'
+            else:
+                _, filas = cls.exportar(mes, destino)
+                modo = cls.eliminar(mes, particiones)
+            resultado['meses'].append({'mes': f'{mes[0]:04d}-{mes[1]:02d}', 'filas': filas, 'modo': modo})
+            resultado['filas'] += filas
+            if progreso:
+                progreso(mes, filas, modo)
+        if particiones and not dry_run:
+            resultado['particiones_nuevas'] = cls.asegurar_particiones()
+        return resultado
@@ -2,7 +2,7 @@
 Servicio para gestionar los logs de actividad en el sistema.
 """
 import ipaddress
-from .models import LogActividad
+from .buffer import registrar_actividad
 
 # Rangos de red privada — solo desde estas IPs se confía en X-Forwarded-For
 _TRUSTED_PROXY_NETWORKS = [
@@ -60,7 +60,9 @@ def registrar_log(
         campos_modificados: Diccionario con los campos modificados (opcional)
 
     Returns:
-        LogActividad: El registro creado
+        LogActividad | None: None si se encoló en auditoria.buffer (se guarda
+        al terminar la petición o al llenarse el buffer); el registro guardado
+        si AUDITORIA_BUFFER_ACTIVO = False
     """
     # Obtener datos del usuario
     usuario = request.user if request.user.is_authenticated else None
@@ -72,8 +74,8 @@ def registrar_log(
     # Obtener user agent — limitar longitud para prevenir log injection (LOW-02)
     navegador = request.META.get('HTTP_USER_AGENT', '')[:500]
     
-    # Crear el log
-    log = LogActividad.objects.create(
+    # Encolar el log: se escribe con bulk_create al terminar la petición
+    log = registrar_actividad(
         usuario=usuario,
         nombre_usuario=nombre_usuario,
         tipo_accion=tipo_accion,
@@ -1,3 +1,237 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from unittest.mock import patch
+
+from django.core.signals import request_finished
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from auditoria.buffer import buffer_auditoria, registrar_actividad
+from auditoria.models import LogActividad
+
+
+class BufferAuditoriaTest(TestCase):
+    """registrar_actividad encola y escribe con bulk_create; spool de respaldo."""
+
+    def setUp(self):
+        buffer_auditoria.vaciar()
+
+    def _registrar(self, n, prefijo='entrada'):
+        # Dentro de la transacción del test las entradas se encolan al confirmar
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(n):
+                registrar_actividad(nombre_usuario='Sistema', tipo_accion='other', descripcion=f'{prefijo} {i}')
+
+    @override_settings(AUDITORIA_BUFFER_TAMANO=3, AUDITORIA_BUFFER_INTERVALO=60)
+    def test_escribe_por_lotes(self):
+        self._registrar(2)
+        self.assertEqual(LogActividad.objects.count(), 0)
+        self.assertEqual(buffer_auditoria.pendientes(), 2)
+
+        with self.assertNumQueries(1):
+            self._registrar(1)
+        self.assertEqual(LogActividad.objects.count(), 3)
+
+        self._registrar(1)
+        buffer_auditoria.vaciar()
+        self.assertEqual(LogActividad.objects.count(), 4)
+
+    @override_settings(AUDITORIA_BUFFER_TAMANO=3, AUDITORIA_BUFFER_INTERVALO=60)
+    def test_rollback_no_pierde_entradas_de_otros_hilos(self):
+        otro_hilo = threading.Thread(
+            target=lambda: [
+                registrar_actividad(nombre_usuario='Sistema', tipo_accion='other', descripcion=f'otro hilo {i}')
+                for i in range(2)
+            ]
+        )
+        otro_hilo.start()
+        otro_hilo.join()
+        self.assertEqual(buffer_auditoria.pendientes(), 2)
+
+        # La entrada revertida no llega a la cola ni dispara el vaciado
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                registrar_actividad(nombre_usuario='Sistema', tipo_accion='other', descripcion='revertida')
+                raise RuntimeError('rollback')
+        self.assertEqual(buffer_auditoria.pendientes(), 2)
+        self.assertEqual(LogActividad.objects.count(), 0)
+
+        self._registrar(1, prefijo='confirmada')
+        self.assertEqual(
+            sorted(LogActividad.objects.values_list('descripcion', flat=True)),
+            ['confirmada 0', 'otro hilo 0', 'otro hilo 1'],
+        )
+
+    @override_settings(AUDITORIA_BUFFER_ACTIVO=False)
+    def test_sin_buffer_escribe_en_linea(self):
+        log = registrar_actividad(nombre_usuario='Sistema', tipo_accion='other', descripcion='en línea')
+        self.assertIsNotNone(log.pk)
+
+    def test_spool_cuando_la_bd_esta_pausada(self):
+        ruta = os.path.join(tempfile.mkdtemp(), 'spool.jsonl')
+        with override_settings(AUDITORIA_SPOOL_PATH=ruta, AUDITORIA_BUFFER_INTERVALO=60):
+            buffer_auditoria._pausar_bd()
+            try:
+                self._registrar(2)
+                buffer_auditoria.vaciar()
+            finally:
+                buffer_auditoria._spool_hasta = 0
+            self.assertEqual(LogActividad.objects.count(), 0)
+            with open(ruta, encoding='utf-8') as spool:
+                self.assertEqual(len(spool.readlines()), 2)
+
+            call_command('cargar_spool_auditoria', stdout=StringIO())
+        self.assertEqual(LogActividad.objects.count(), 2)
+        self.assertFalse(os.path.exists(ruta))
+
+
+class BufferAuditoriaConexionesTest(TransactionTestCase):
+    """El vaciado al terminar la petición no deja conexiones ociosas."""
+
+    def setUp(self):
+        buffer_auditoria.vaciar()
+
+    @override_settings(AUDITORIA_BUFFER_INTERVALO=60)
+    def test_vaciado_en_request_finished_cierra_la_conexion(self):
+        resultado = {}
+
+        def peticion():
+            # Hilo propio = conexión propia, como un worker de gunicorn
+            conexion, abiertas = connections['default'], []
+
+            def contar(sender, connection, **kwargs):
+                if connection is conexion:
+                    abiertas.append(connection)
+
+            connection_created.connect(contar)
+            # SQLite en memoria ignora close(); se comporta como MySQL con CONN_MAX_AGE = 0
+            try:
+                with patch.object(conexion, 'is_in_memory_db', return_value=False):
+                    registrar_actividad(nombre_usuario='Sistema', tipo_accion='other', descripcion='petición')
+                    request_finished.send(sender=self.__class__)
+                    resultado['abiertas'] = len(abiertas)
+                    resultado['ociosa'] = conexion.connection is not None
+            finally:
+                connection_created.disconnect(contar)
+                connections.close_all()
+
+        hilo = threading.Thread(target=peticion)
+        hilo.start()
+        hilo.join()
+
+        self.assertEqual(resultado, {'abiertas': 1, 'ociosa': False})
+        self.assertEqual(LogActividad.objects.count(), 1)
+
+
+class RetencionAuditoriaTest(TestCase):
+    """archivar_auditoria exporta a JSONL comprimido y elimina los meses vencidos."""
+
+    def test_particionar_fuera_de_mysql_es_error_del_comando(self):
+        from django.core.management.base import CommandError
+        from auditoria.retencion import RetencionAuditoria
+
+        with self.assertRaises(ValueError):
+            RetencionAuditoria.particionar()
+        with self.assertRaisesMessage(CommandError, 'solo está disponible en MySQL'):
+            call_command('archivar_auditoria', '--particionar', stdout=StringIO())
+
+    def _log(self, fecha_hora, descripcion):
+        return LogActividad.objects.create(
+            nombre_usuario='Sistema', tipo_accion='other', descripcion=descripcion, fecha_hora=fecha_hora,
+        )
+
+    def test_archiva_meses_vencidos(self):
+        import gzip
+        import json
+        from datetime import timedelta
+        from django.utils import timezone
+
+        ahora = timezone.now()
+        self._log(ahora - timedelta(days=800), 'antiguo 1')
+        self._log(ahora - timedelta(days=799), 'antiguo 2')
+        reciente = self._log(ahora - timedelta(days=10), 'reciente')
+        destino = tempfile.mkdtemp()
+
+        salida = StringIO()
+        call_command('archivar_auditoria', '--meses', '12', '--destino', destino, '--dry-run', stdout=salida)
+        self.assertIn('2 registros por archivar', salida.getvalue())
+        self.assertEqual(LogActividad.objects.count(), 3)
+
+        call_command('archivar_auditoria', '--meses', '12', '--destino', destino, stdout=StringIO())
+        self.assertEqual(list(LogActividad.objects.values_list('pk', flat=True)), [reciente.pk])
+
+        exportados = []
+        for nombre in sorted(os.listdir(destino)):
+            self.assertTrue(nombre.endswith('.jsonl.gz'))
+            with gzip.open(os.path.join(destino, nombre), 'rt', encoding='utf-8') as archivo:
+                exportados += [json.loads(linea)['descripcion'] for linea in archivo]
+        self.assertEqual(sorted(exportados), ['antiguo 1', 'antiguo 2'])
+
+
+class KeysetPaginacionTest(TestCase):
+    """KeysetPaginator recorre LogActividad por (fecha_hora, id) sin OFFSET."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        ahora = timezone.now()
+        # Dos pares con la misma fecha_hora para probar el desempate por id
+        cls.logs = [
+            LogActividad.objects.create(
+                nombre_usuario='Sistema', tipo_accion='other', descripcion=f'log {i}',
+                fecha_hora=ahora - timedelta(minutes=i // 2),
+            )
+            for i in range(7)
+        ]
+
+    def _paginador(self, *orden):
+        from app.pagination import KeysetPaginator
+        return KeysetPaginator(LogActividad.objects.order_by(*orden), 3)
+
+    def test_recorre_hacia_adelante_y_atras(self):
+        paginador = self._paginador('-fecha_hora', '-pk')
+        esperado = list(LogActividad.objects.order_by('-fecha_hora', '-pk'))
+
+        vistos, pagina, paginas = [], paginador.pagina_keyset(), []
+        while True:
+            paginas.append(pagina)
+            vistos += pagina.object_list
+            if not pagina.has_next():
+                break
+            pagina = paginador.pagina_keyset(pagina.siguiente)
+        self.assertEqual(vistos, esperado)
+        self.assertEqual([len(p) for p in paginas], [3, 3, 1])
+
+        anterior = paginador.pagina_keyset(paginas[-1].anterior)
+        self.assertEqual(anterior.object_list, paginas[1].object_list)
+        primera = paginador.pagina_keyset(anterior.anterior)
+        self.assertEqual(primera.object_list, paginas[0].object_list)
+        self.assertFalse(primera.has_previous())
+
+    def test_orden_sin_indice_usa_paginacion_clasica(self):
+        self.assertIsNotNone(self._paginador('-fecha_hora', '-pk').orden_keyset)
+        self.assertIsNone(self._paginador('descripcion', '-pk').orden_keyset)
+        self.assertIsNone(self._paginador('-fecha_hora').orden_keyset)
+
+    def test_changelist_del_admin(self):
+        from django.contrib.auth.models import User
+
+        self.client.force_login(User.objects.create_superuser('auditor', password='x'))
+        response = self.client.get('/en/admin/auditoria/logactividad/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.context['cl'].keyset)
+
+        response = self.client.get('/en/admin/auditoria/logactividad/', {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 302)
+
+        # Ordenar por una columna sin índice vuelve a la paginación clásica
+        response = self.client.get('/en/admin/auditoria/logactividad/', {'o': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['cl'].keyset)
@@ -0,0 +1,16 @@
+"""
+Suite de benchmarks de las rutas críticas del ERP.
+
+Crea una base de datos de prueba (la misma que usa ``manage.py test``:
+test_<DB_NAME> en MySQL, o SQLite en memoria con --sqlite). La llena con
+datos sintéticos reproducibles (benchmarks.datos) y mide cada escenario
+(benchmarks.escenarios): tiempo, consultas SQL, lecturas de cache y memoria
+pico. El resultado se escribe como JSON para comparar entre commits.
+
+Uso:
+    python -m benchmarks --sqlite --escala chico
+    python -m benchmarks --escala mediano --salida bench_$(git rev-parse --short HEAD).json
+    python -m benchmarks --sqlite --solo reporte_cobranza,aging_masivo --repeticiones 5
+    python -m benchmarks --sqlite --comparar bench_base.json --umbral 15
+    python -m benchmarks --keepdb        # MySQL: reutiliza test_<DB_NAME> sin migrar
+"""
@@ -0,0 +1,157 @@
+"""
+Punto de entrada de la suite: ``python -m benchmarks`` (ver benchmarks/__init__.py).
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ESCALAS = ['mini', 'chico', 'mediano', 'grande']
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks de las rutas críticas')
+    parser.add_argument('--escala', choices=ESCALAS, default='chico', help='Volumen de datos (default: chico)')
+    parser.add_argument('--semilla', type=int, default=42, help='Semilla del generador (default: 42)')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Corridas en caliente por escenario (default: 3)')
+    parser.add_argument('--solo', type=str, help='Escenarios separados por coma (default: todos)')
+    parser.add_argument('--sqlite', action='store_true', help='SQLite en memoria en lugar de la BD de settings')
+    parser.add_argument('--keepdb', action='store_true', help='Reutilizar la BD de prueba existente')
+    parser.add_argument('--salida', type=str, help='Archivo JSON de resultados (default: benchmarks/resultados/<commit>_<escala>.json)')
+    parser.add_argument('--comparar', type=str, help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--umbral', type=float, default=10.0, help='%% de aumento que cuenta como regresión (default: 10)')
+    parser.add_argument('--fallar-en-regresion', action='store_true', help='Salir con código 1 si hay regresiones')
+    return parser.parse_args()
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def _comparar(actual: dict, anterior: dict, umbral: float) -> list:
+    """Imprime la diferencia de tiempo y consultas por escenario y devuelve las regresiones"""
+    regresiones = []
+    print(f"\n{'Escenario':<28} {'antes ms':>10} {'ahora ms':>10} {'Δ%':>8} {'consultas':>14}")
+    print("-" * 74)
+    for nombre, datos in actual['escenarios'].items():
+        previo = anterior.get('escenarios', {}).get(nombre)
+        if not previo or 'error' in datos or 'error' in previo:
+            continue
+        antes, ahora = previo['caliente']['ms'], datos['caliente']['ms']
+        delta = (ahora - antes) / antes * 100 if antes else 0.0
+        consultas = f"{previo['caliente']['consultas']} → {datos['caliente']['consultas']}"
+        marca = ''
+        if delta > umbral or datos['caliente']['consultas'] > previo['caliente']['consultas']:
+            marca = '  ⚠️'
+            regresiones.append(nombre)
+        print(f"{nombre:<28} {antes:>10.1f} {ahora:>10.1f} {delta:>+7.1f}% {consultas:>14}{marca}")
+    return regresiones
+
+
+def main():
+    args = _argumentos()
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+    import django
+    from django.conf import settings
+
+    if args.sqlite:
+        settings.DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+    django.setup()
+    # Los servicios registran cada cálculo en INFO; solo interesan advertencias y errores
+    logging.disable(logging.INFO)
+
+    from django.db import connection
+    from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+    from benchmarks.datos import GeneradorDatos
+    from benchmarks.escenarios import ESCENARIOS
+    from benchmarks.medicion import medir
+
+    nombres = args.solo.split(',') if args.solo else list(ESCENARIOS)
+    desconocidos = [n for n in nombres if n not in ESCENARIOS]
+    if desconocidos:
+        sys.exit(f"Escenarios desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(ESCENARIOS)}")
+
+    setup_test_environment(debug=False)
+    nombre_original = connection.settings_dict['NAME']
+    keepdb = args.keepdb and not args.sqlite
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    cache_local = {'BACKEND': 'app.services.instrumentacion_service.LocMemCacheInstrumentado'}
+    ajustes = override_settings(
+        CACHES={alias: {**cache_local, 'LOCATION': f'benchmarks-{alias}'} for alias in settings.CACHES},
+        RECALCULO_AUTOMATICO=False,
+    )
+    ajustes.enable()
+    try:
+        if keepdb:
+            from django.core.management import call_command
+            call_command('flush', interactive=False, verbosity=0)
+
+        print(f"Generando datos (escala {args.escala}, semilla {args.semilla})...")
+        inicio = time.perf_counter()
+        generador = GeneradorDatos(args.escala, args.semilla)
+        conteos = generador.generar()
+        print(f"  {json.dumps(conteos)} en {time.perf_counter() - inicio:.1f}s")
+
+        resultado = {
+            'meta': {
+                'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'commit': _commit(),
+                'bd': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'escala': args.escala,
+                'semilla': args.semilla,
+                'repeticiones': args.repeticiones,
+                'conteos': conteos,
+                'tiempos_generacion': generador.tiempos,
+            },
+            'escenarios': {},
+        }
+
+        print(f"\n{'Escenario':<28} {'frío ms':>10} {'caliente ms':>12} {'consultas':>10} {'pico KB':>10}")
+        print("-" * 74)
+        for nombre in nombres:
+            try:
+                datos = medir(ESCENARIOS[nombre], args.repeticiones)
+            except Exception as e:
+                resultado['escenarios'][nombre] = {'error': f'{type(e).__name__}: {e}'}
+                print(f"{nombre:<28} ❌ {type(e).__name__}: {e}")
+                continue
+            resultado['escenarios'][nombre] = datos
+            print(
+                f"{nombre:<28} {datos['frio']['ms']:>10.1f} {datos['caliente']['ms']:>12.1f} "
+                f"{datos['caliente']['consultas']:>10} {datos['memoria_pico_kb']:>10.1f}"
+            )
+    finally:
+        ajustes.disable()
+        connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+    salida = Path(args.salida or Path(__file__).resolve().parent / 'resultados' / f"{resultado['meta']['commit']}_{args.escala}.json")
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+    print(f"\n✅ Resultados en {salida}")
+
+    if args.comparar:
+        regresiones = _comparar(resultado, json.loads(Path(args.comparar).read_text()), args.umbral)
+        if regresiones:
+            print(f"\n⚠️  Regresiones: {', '.join(regresiones)}")
+            if args.fallar_en_regresion:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
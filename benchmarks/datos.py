@@ -0,0 +1,296 @@
+"""
+Generador de datos sintéticos para los benchmarks.
+
+Las cantidades salen de una escala (ESCALAS) y todo lo aleatorio de un
+random.Random(semilla), así que la misma escala y semilla producen los mismos
+datos. Las fechas se reparten en los `meses` anteriores a hoy.
+
+Las filas se insertan con bulk_create y pk explícita (MySQL no devuelve las
+pk de un INSERT múltiple). Lo que en producción mantienen save() y las
+señales se deriva al final con los servicios de mantenimiento:
+- montos MXN (MontosMXNService);
+- SaldoCliente (MantenimientoCxCService);
+- crédito usado (CreditoClienteService);
+- libro diario por cuenta (LibroSaldosService).
+"""
+import hashlib
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, List
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from djmoney.money import Money
+
+from catalogo.models import Estado, Pais, Producto, Productor, Sucursal
+from gastos.models import Banco, CatGastos, ComprobanteGasto, Compra, Cuenta, Gastos
+from gastos.services.saldos_service import LibroSaldosService
+from ventas.models import Anticipo, Cliente, MercadoDestino, PagoVenta, TerminoCredito, Ventas
+from ventas.services.credito_service import CreditoClienteService
+from ventas.services.mantenimiento_cxc_service import MantenimientoCxCService
+from ventas.services.montos_mxn_service import MontosMXNService
+
+ESCALAS = {
+    'mini': {'clientes': 10, 'ventas': 200, 'gastos': 200, 'compras': 100, 'comprobantes': 20},
+    'chico': {'clientes': 50, 'ventas': 2000, 'gastos': 2000, 'compras': 1000, 'comprobantes': 200},
+    'mediano': {'clientes': 300, 'ventas': 20000, 'gastos': 20000, 'compras': 10000, 'comprobantes': 2000},
+    'grande': {'clientes': 2000, 'ventas': 200000, 'gastos': 150000, 'compras': 80000, 'comprobantes': 10000},
+}
+
+LOTE = 2000
+CENTAVO = Decimal('0.01')
+
+
+class GeneradorDatos:
+    """Llena la base de datos con una empresa sintética del tamaño de la escala"""
+
+    def __init__(self, escala: str = 'chico', semilla: int = 42, meses: int = 24):
+        self.escala = escala
+        self.cantidades = ESCALAS[escala]
+        self.rnd = random.Random(semilla)
+        self.meses = meses
+        self.hoy = timezone.now().date()
+        self.desde = self.hoy - timedelta(days=30 * meses)
+        self.resumen: Dict[str, int] = {}
+        self.tiempos: Dict[str, float] = {}
+
+    # ------------------------------------------------------------------
+    # Utilidades
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _insertar(modelo, objetos: List) -> List:
+        """bulk_create con pk asignada desde el máximo actual"""
+        siguiente = (modelo.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+        for indice, objeto in enumerate(objetos):
+            objeto.pk = siguiente + indice
+        modelo.objects.bulk_create(objetos, batch_size=LOTE)
+        return objetos
+
+    def _fecha(self, desde=None, hasta=None):
+        desde, hasta = desde or self.desde, hasta or self.hoy
+        return desde + timedelta(days=self.rnd.randint(0, max((hasta - desde).days, 0)))
+
+    def _importe(self, minimo: int, maximo: int) -> Decimal:
+        return (Decimal(self.rnd.randint(minimo * 100, maximo * 100)) / 100).quantize(CENTAVO)
+
+    def _fase(self, nombre, funcion):
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            funcion()
+        self.tiempos[nombre] = round(time.perf_counter() - inicio, 2)
+
+    # ------------------------------------------------------------------
+    # Generación
+    # ------------------------------------------------------------------
+
+    def generar(self) -> Dict[str, int]:
+        """Crea todos los datos y devuelve las filas por modelo"""
+        self._fase('catalogos', self._catalogos)
+        self._fase('clientes', self._clientes)
+        self._fase('ventas', self._ventas)
+        self._fase('anticipos', self._anticipos)
+        self._fase('gastos', self._gastos)
+        self._fase('compras', self._compras)
+        self._fase('comprobantes', self._comprobantes)
+        self._fase('derivados', self._derivados)
+        return self.resumen
+
+    def _catalogos(self):
+        User = get_user_model()
+        self.usuario = User.objects.create_superuser('benchmark', 'benchmark@example.com', None)
+
+        self.pais_mx = Pais.objects.create(siglas='BMX', nombre='Benchmark México', moneda='MXN')
+        self.pais_us = Pais.objects.create(siglas='BUS', nombre='Benchmark USA', moneda='USD')
+        estado = Estado.objects.create(id='BENCH_SUITE', nombre='Benchmark', pais=self.pais_mx)
+        self.sucursales = self._insertar(Sucursal, [
+            Sucursal(nombre=f'Bench sucursal {i}', id_estado=estado) for i in range(4)
+        ])
+        bancos = self._insertar(Banco, [Banco(nombre=f'Bench banco {i}') for i in range(3)])
+        self.cuentas = self._insertar(Cuenta, [
+            Cuenta(id_banco=banco, id_sucursal=sucursal, numero_cuenta=f'BENCH{banco.pk:03d}{sucursal.pk:03d}')
+            for banco in bancos for sucursal in self.sucursales
+        ])
+        self.categorias = self._insertar(CatGastos, [CatGastos(nombre=f'Bench categoría {i}') for i in range(12)])
+        self.productos = self._insertar(Producto, [
+            Producto(nombre='Mango', variedad=variedad)
+            for variedad in ('Ataulfo', 'Tommy', 'Kent', 'Keitt', 'Haden', 'Manila', 'Palmer', 'Sensación')
+        ])
+        self.productores = self._insertar(Productor, [
+            Productor(nombre_completo=f'Bench productor {i}', id_sucursal=self.rnd.choice(self.sucursales),
+                      nacionalidad=self.pais_mx)
+            for i in range(max(20, self.cantidades['clientes'] // 5))
+        ])
+        self.mercados = self._insertar(MercadoDestino, [
+            MercadoDestino(nombre=nombre) for nombre in ('Bench Nacional', 'Bench USA', 'Bench Canadá', 'Bench Japón')
+        ])
+        self.terminos = self._insertar(TerminoCredito, [
+            TerminoCredito(nombre=f'Bench {dias} días', dias_credito=dias) for dias in (15, 30, 60)
+        ])
+        self.resumen.update({'sucursales': 4, 'cuentas': len(self.cuentas), 'productores': len(self.productores)})
+
+    def _clientes(self):
+        clientes = []
+        for i in range(self.cantidades['clientes']):
+            tipo = self.rnd.choices(
+                [Cliente.TipoCliente.CREDITO, Cliente.TipoCliente.MIXTO, Cliente.TipoCliente.CONTADO],
+                weights=[4, 2, 4],
+            )[0]
+            exportacion = self.rnd.random() < 0.3
+            clientes.append(Cliente(
+                nombre=f'Bench cliente {i}',
+                pais=self.pais_us if exportacion else self.pais_mx,
+                mercado_destino=self.mercados[1] if exportacion else self.mercados[0],
+                tipo_cliente=tipo,
+                limite_credito=Money(self._importe(100000, 5000000), 'MXN'),
+                termino_credito_predeterminado=self.rnd.choice(self.terminos),
+                imagen=None,
+            ))
+        self.clientes = self._insertar(Cliente, clientes)
+        self.resumen['clientes'] = len(clientes)
+
+    def _ventas(self):
+        ventas, pagos = [], []
+        siguiente_venta = (Ventas.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+        for i in range(self.cantidades['ventas']):
+            cliente = self.rnd.choice(self.clientes)
+            exportacion = cliente.pais_id == self.pais_us.pk
+            credito = cliente.tipo_cliente == Cliente.TipoCliente.CREDITO or (
+                cliente.tipo_cliente == Cliente.TipoCliente.MIXTO and self.rnd.random() < 0.5
+            )
+            fecha = self._fecha()
+            moneda = 'USD' if exportacion else 'MXN'
+            monto = self._importe(5000, 500000) if moneda == 'MXN' else self._importe(500, 30000)
+            termino = cliente.termino_credito_predeterminado if credito else None
+            vencimiento = fecha + timedelta(days=termino.dias_credito) if termino else None
+
+            venta = Ventas(
+                pk=siguiente_venta + i,
+                fecha_salida_manifiesto=fecha,
+                fecha_deposito=fecha,
+                producto=self.rnd.choice(self.productos),
+                cantidad=Decimal(self.rnd.randint(100, 5000)),
+                monto=Money(monto, moneda),
+                cliente=cliente,
+                sucursal_id=self.rnd.choice(self.sucursales),
+                cuenta=self.rnd.choice(self.cuentas),
+                tipo_venta=Ventas.TipoVenta.EXPORTACION if exportacion else Ventas.TipoVenta.NACIONAL,
+                mercado_destino=cliente.mercado_destino,
+                modalidad_pago=Ventas.ModalidadPago.CREDITO if credito else Ventas.ModalidadPago.CONTADO,
+                termino_credito=termino,
+                fecha_vencimiento=vencimiento,
+                moneda_venta=moneda,
+                tipo_cambio=Decimal(self.rnd.randint(1700, 2050)) / 100 if moneda == 'USD' else Decimal('1'),
+            )
+
+            pagado = monto
+            if credito:
+                # Mitad liquidadas, un tercio parciales, el resto sin pagos
+                sorteo = self.rnd.random()
+                objetivo = monto if sorteo < 0.5 else (
+                    (monto * Decimal(self.rnd.randint(10, 90)) / 100).quantize(CENTAVO) if sorteo < 0.8 else Decimal('0')
+                )
+                pagado = Decimal('0')
+                numero = self.rnd.randint(1, 3) if objetivo else 0
+                for parte in range(numero):
+                    importe = objetivo - pagado if parte == numero - 1 else (objetivo / numero).quantize(CENTAVO)
+                    pagos.append(PagoVenta(
+                        venta_id=venta.pk,
+                        fecha_pago=self._fecha(fecha, min(self.hoy, vencimiento + timedelta(days=30))),
+                        monto_pago=Money(importe, moneda),
+                        cuenta_destino=self.rnd.choice(self.cuentas),
+                        metodo_pago=self.rnd.choice(PagoVenta.MetodoPago.values),
+                    ))
+                    pagado += importe
+
+            venta.monto_pagado = Money(pagado, 'MXN')
+            venta.estado_cobranza = Ventas.derive_estado_desde_totales(monto, pagado, vencimiento)
+            ventas.append(venta)
+
+        Ventas.objects.bulk_create(ventas, batch_size=LOTE)
+        self._insertar(PagoVenta, pagos)
+        self.ventas_credito = [v.pk for v in ventas if v.modalidad_pago == Ventas.ModalidadPago.CREDITO]
+        self.resumen.update({'ventas': len(ventas), 'pagos': len(pagos)})
+
+    def _anticipos(self):
+        anticipos = []
+        for cliente in self.clientes:
+            for _ in range(self.rnd.randint(0, 4)):
+                monto = self._importe(10000, 200000)
+                aplicado = self.rnd.random() < 0.5
+                anticipos.append(Anticipo(
+                    cliente=cliente,
+                    cuenta=self.rnd.choice(self.cuentas),
+                    monto=Money(monto, 'MXN'),
+                    monto_aplicado=Money(monto if aplicado else Decimal('0'), 'MXN'),
+                    fecha=self._fecha(),
+                    estado_anticipo=(
+                        Anticipo.Estado_anticipo.Aplicado if aplicado else Anticipo.Estado_anticipo.Pendiente
+                    ),
+                ))
+        self._insertar(Anticipo, anticipos)
+        self.resumen['anticipos'] = len(anticipos)
+
+    def _gastos(self):
+        gastos = []
+        for _ in range(self.cantidades['gastos']):
+            cuenta = self.rnd.choice(self.cuentas)
+            gastos.append(Gastos(
+                id_sucursal_id=cuenta.id_sucursal_id,
+                id_cat_gastos=self.rnd.choice(self.categorias),
+                id_cuenta_banco=cuenta,
+                monto=Money(self._importe(500, 80000), 'MXN'),
+                fecha=self._fecha(),
+                descripcion='Gasto sintético',
+            ))
+        self.gastos = self._insertar(Gastos, gastos)
+        self.resumen['gastos'] = len(gastos)
+
+    def _compras(self):
+        compras = []
+        for _ in range(self.cantidades['compras']):
+            cantidad = self.rnd.randint(10, 2000)
+            precio = self._importe(5, 60)
+            compras.append(Compra(
+                fecha_compra=self._fecha(),
+                productor=self.rnd.choice(self.productores),
+                producto=self.rnd.choice(self.productos),
+                cantidad=cantidad,
+                precio_unitario=Money(precio, 'MXN'),
+                monto_total=Money(precio * cantidad, 'MXN'),
+                cuenta=self.rnd.choice(self.cuentas),
+                tipo_pago=self.rnd.choice(['Efectivo', 'Deposito', 'Transferencia', 'Cheque']),
+            ))
+        self._insertar(Compra, compras)
+        self.resumen['compras'] = len(compras)
+
+    def _comprobantes(self):
+        comprobantes = []
+        for i, gasto in enumerate(self.gastos[:self.cantidades['comprobantes']]):
+            registrado = self.rnd.random() < 0.8
+            comprobantes.append(ComprobanteGasto(
+                archivo=f'comprobantes/benchmark/{i}.jpg',
+                nombre_original=f'ticket_{i}.jpg',
+                content_type='image/jpeg',
+                tamano_bytes=self.rnd.randint(80_000, 2_000_000),
+                sha256=hashlib.sha256(f'benchmark-{i}'.encode()).hexdigest(),
+                estado=ComprobanteGasto.Estado.REGISTRADO if registrado else ComprobanteGasto.Estado.REVISION,
+                datos_extraidos={'total': str(gasto.monto.amount), 'fecha': gasto.fecha.isoformat()},
+                texto_ocr='TOTAL ' + str(gasto.monto.amount),
+                error_procesamiento='',
+                gasto=gasto if registrado else None,
+                creado_por=self.usuario,
+            ))
+        self._insertar(ComprobanteGasto, comprobantes)
+        self.resumen['comprobantes'] = len(comprobantes)
+
+    def _derivados(self):
+        MontosMXNService.recalcular()
+        self.resumen['saldos_cliente'] = MantenimientoCxCService.huerfanos()['saldos_creados']
+        MantenimientoCxCService.recalcular()
+        CreditoClienteService.recalcular()
+        self.resumen['movimientos_diarios'] = LibroSaldosService.reconstruir()
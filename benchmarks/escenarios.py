@@ -0,0 +1,120 @@
+"""
+Escenarios medidos por la suite de benchmarks.
+
+Cada escenario es una función sin argumentos que ejecuta una ruta crítica
+completa sobre los datos de benchmarks.datos. Las vistas se llaman con un
+request de RequestFactory con el superusuario 'benchmark', sesión y
+mensajes, y los archivos descargables se consumen completos para incluir el
+costo de generar el contenido.
+"""
+from datetime import timedelta
+from importlib import import_module
+from typing import Callable, Dict
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.db.models import Count
+from django.test import RequestFactory
+from django.utils import timezone
+
+from gastos.models import Gastos
+from ventas.models import Ventas
+
+ESCENARIOS: Dict[str, Callable[[], object]] = {}
+
+
+def escenario(nombre: str):
+    """Registra la función como escenario con el nombre dado"""
+    def decorador(funcion):
+        ESCENARIOS[nombre] = funcion
+        return funcion
+    return decorador
+
+
+def _request(path: str = '/', **params):
+    request = RequestFactory().get(path, params)
+    request.user = get_user_model().objects.get(username='benchmark')
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    request._messages = FallbackStorage(request)
+    return request
+
+
+def _consumir(response) -> int:
+    """Lee el cuerpo completo de la respuesta (también si es streaming)"""
+    try:
+        if getattr(response, 'streaming', False):
+            return sum(len(parte) for parte in response.streaming_content)
+        return len(response.content)
+    finally:
+        response.close()
+
+
+@escenario('ventas_balances_context')
+def ventas_balances_context():
+    from ventas.views import build_ventas_balances_context
+    return build_ventas_balances_context(_request('/ventas/balances/'))
+
+
+@escenario('dashboard_callback')
+def dashboard_callback():
+    from app.views import dashboard_callback
+    return dashboard_callback(_request('/admin/'), {})
+
+
+@escenario('reporte_cobranza')
+def reporte_cobranza():
+    from ventas.services.reporte_cobranza_service import generar_reporte_cobranza
+    return generar_reporte_cobranza()
+
+
+@escenario('aging_masivo')
+def aging_masivo():
+    from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+    return CuentasPorCobrarService.calcular_aging_masivo()
+
+
+@escenario('estado_cuenta')
+def estado_cuenta():
+    """Estado de cuenta del cliente con más ventas, del último año"""
+    from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+    cliente_id = (
+        Ventas.objects.values('cliente_id').annotate(n=Count('pk')).order_by('-n').first()['cliente_id']
+    )
+    hoy = timezone.now().date()
+    return CuentasPorCobrarService.generar_estado_cuenta(
+        cliente_id, hoy - timedelta(days=365), hoy, usuario='benchmark'
+    )
+
+
+@escenario('excel_reporte_completo')
+def excel_reporte_completo():
+    from app.views import export_full_report_to_excel
+    return _consumir(export_full_report_to_excel(_request('/export/full-report/')))
+
+
+@escenario('excel_balances_ventas')
+def excel_balances_ventas():
+    from ventas.views import exportar_balances_xlsx
+    return _consumir(exportar_balances_xlsx(_request('/ventas/balances/exportar/')))
+
+
+@escenario('excel_ventas_admin')
+def excel_ventas_admin():
+    request = _request('/admin/ventas/ventas/')
+    modelo_admin = admin.site._registry[Ventas]
+    return _consumir(modelo_admin.export_to_excel(request, modelo_admin.get_queryset(request)))
+
+
+@escenario('excel_gastos_admin')
+def excel_gastos_admin():
+    request = _request('/admin/gastos/gastos/')
+    modelo_admin = admin.site._registry[Gastos]
+    return _consumir(modelo_admin.export_to_excel(request, modelo_admin.get_queryset(request)))
+
+
+@escenario('forecast')
+def forecast():
+    from app.services.forecast_service import ForecastService
+    return ForecastService().generate_all_forecasts(force_refresh=True)
@@ -0,0 +1,83 @@
+"""
+Medición de un escenario de benchmark.
+
+Cada escenario se ejecuta:
+- una vez en frío (caches vacíos);
+- `repeticiones` veces en caliente, de las que se reportan mediana, mínimo y máximo;
+- una vez más bajo tracemalloc para obtener la memoria pico, que no se mezcla
+  con los tiempos porque tracemalloc los infla.
+
+Las consultas y las lecturas de cache se cuentan con la misma
+MedicionPeticion que usa InstrumentacionMiddleware en producción.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from typing import Callable, Dict
+
+from django.core.cache import caches
+from django.db import connections
+
+from app.services.instrumentacion_service import MedicionPeticion
+
+
+def limpiar_caches() -> None:
+    for cache in caches.all():
+        cache.clear()
+
+
+def _una_vez(funcion: Callable[[], object]) -> MedicionPeticion:
+    medicion = MedicionPeticion()
+    token = medicion.activar()
+    try:
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(medicion))
+            medicion.inicio = time.perf_counter()
+            funcion()
+            medicion.duracion = medicion.total
+    finally:
+        medicion.desactivar(token)
+    return medicion
+
+
+def _resumen(medicion: MedicionPeticion) -> Dict:
+    return {
+        'ms': round(medicion.duracion * 1000, 1),
+        'consultas': medicion.consultas,
+        'bd_ms': round(medicion.tiempo_bd * 1000, 1),
+        'cache_aciertos': medicion.cache_aciertos,
+        'cache_fallos': medicion.cache_fallos,
+    }
+
+
+def medir(funcion: Callable[[], object], repeticiones: int = 3) -> Dict:
+    """Mide `funcion` en frío, en caliente y su memoria pico"""
+    limpiar_caches()
+    gc.collect()
+    frio = _una_vez(funcion)
+
+    calientes = [_una_vez(funcion) for _ in range(repeticiones)]
+    tiempos = [m.duracion * 1000 for m in calientes]
+
+    limpiar_caches()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'frio': _resumen(frio),
+        'caliente': {
+            **_resumen(calientes[len(calientes) // 2]),
+            'ms': round(statistics.median(tiempos), 1),
+            'ms_min': round(min(tiempos), 1),
+            'ms_max': round(max(tiempos), 1),
+        } if calientes else None,
+        'memoria_pico_kb': round(pico / 1024, 1),
+    }
@@ -87,12 +87,13 @@ echo "Configuración completada"
 # cuando se use un contenedor OCR dedicado.
 OCR_WORKER_ENABLED=${OCR_WORKER:-true}
 OCR_WORKER_SLEEP=${OCR_WORKER_SLEEP:-2}
+OCR_WORKERS=${OCR_WORKERS:-1}
 OCR_WORKER_PID=""
 
 case "${OCR_WORKER_ENABLED,,}" in
     1|true|yes|on)
-        echo "Iniciando worker OCR (intervalo: ${OCR_WORKER_SLEEP}s)..."
-        python manage.py process_receipt_ocr --loop --sleep "$OCR_WORKER_SLEEP" &
+        echo "Iniciando worker OCR (procesos: ${OCR_WORKERS}, intervalo: ${OCR_WORKER_SLEEP}s)..."
+        python manage.py process_receipt_ocr --loop --sleep "$OCR_WORKER_SLEEP" --workers "$OCR_WORKERS" &
         OCR_WORKER_PID=$!
         ;;
     *)
@@ -100,12 +101,31 @@ case "${OCR_WORKER_ENABLED,,}" in
         ;;
 esac
 
+# Worker de la cola de recálculo (cartera CxC, aging y forecasts). Las vistas
+# solo leen resultados precalculados, así que debe correr junto al servidor.
+RECALCULO_WORKER_ENABLED=${RECALCULO_WORKER:-true}
+RECALCULO_WORKER_PID=""
+
+case "${RECALCULO_WORKER_ENABLED,,}" in
+    1|true|yes|on)
+        echo "Iniciando worker de recálculo..."
+        python manage.py procesar_recalculos --loop &
+        RECALCULO_WORKER_PID=$!
+        ;;
+    *)
+        echo "Worker de recálculo desactivado (RECALCULO_WORKER=${RECALCULO_WORKER_ENABLED})."
+        ;;
+esac
+
 stop_children() {
     trap - TERM INT
     echo "Deteniendo procesos hijos..."
     if [ -n "$OCR_WORKER_PID" ]; then
         kill -TERM "$OCR_WORKER_PID" 2>/dev/null || true
     fi
+    if [ -n "$RECALCULO_WORKER_PID" ]; then
+        kill -TERM "$RECALCULO_WORKER_PID" 2>/dev/null || true
+    fi
     if [ -n "${GUNICORN_PID:-}" ]; then
         kill -TERM "$GUNICORN_PID" 2>/dev/null || true
     fi
@@ -140,6 +160,10 @@ else
     GUNICORN_STATUS=$?
 fi
 
+if [ -n "$RECALCULO_WORKER_PID" ]; then
+    kill -TERM "$RECALCULO_WORKER_PID" 2>/dev/null || true
+    wait "$RECALCULO_WORKER_PID" 2>/dev/null || true
+fi
 if [ -n "$OCR_WORKER_PID" ]; then
     kill -TERM "$OCR_WORKER_PID" 2>/dev/null || true
     wait "$OCR_WORKER_PID" 2>/dev/null || true
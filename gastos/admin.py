@@ -8,12 +8,13 @@ from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget
 from import_export.admin import ImportExportModelAdmin
 from import_export.forms import ExportForm, ImportForm
-from .models import CatGastos, Banco, Cuenta, Gastos, Compra, SaldoMensual, ComprobanteGasto
+from .models import CatGastos, Banco, Cuenta, Gastos, Compra, SaldoMensual, ComprobanteGasto, MemoCategoriaGasto
 from django.utils.html import format_html
 from django.utils.text import slugify
 from django.utils import timezone
 from catalogo.models import Sucursal, Productor, Producto
 from app.widgets import MoneyWidget
+from .forms import MemoCategoriaGastoAdminForm
 
 
 class SucursalGastoFilter(SimpleListFilter):
@@ -285,10 +286,15 @@ class GastosAdmin(ModelAdmin):
     def export_to_excel(self, request, queryset):
         import openpyxl
         import datetime
+        from openpyxl.cell import WriteOnlyCell
         from openpyxl.styles import Font, PatternFill, Alignment
         from openpyxl.utils import get_column_letter
-        from openpyxl.worksheet.table import Table, TableStyleInfo
-        from collections import defaultdict
+        from openpyxl.worksheet.filters import AutoFilter
+        from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+        from django.db.models import Count, Max, Min, Sum
+        from django.db.models.functions import TruncMonth
+        from app.services.excel_service import EXPORT_CHUNK_SIZE
+        from app.services.utils import UtilService
 
         NAVY  = "1E3A5F"
         TEAL  = "1AADBC"
@@ -296,280 +302,252 @@ class GastosAdmin(ModelAdmin):
         WHITE = "FFFFFF"
         MONEY = '"$"#,##0.00'
 
-        def _nav_hdr(cell, bg=NAVY):
-            cell.font      = Font(bold=True, color=WHITE)
-            cell.fill      = PatternFill("solid", fgColor=bg)
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        def _section_title(ws, row, col_start, col_end, text):
-            cell = ws.cell(row=row, column=col_start, value=text)
-            cell.font = Font(bold=True, color=WHITE, size=11)
-            cell.fill = PatternFill("solid", fgColor=NAVY)
-            cell.alignment = Alignment(horizontal="left", vertical="center")
-            if col_end > col_start:
-                ws.merge_cells(
-                    start_row=row, start_column=col_start,
-                    end_row=row,   end_column=col_end,
-                )
+        # El libro es write-only: cada fila se escribe una sola vez con su
+        # estilo, así que las celdas se construyen completas antes de agregarlas.
+        def _cell(ws, value, font=None, fill=None, alignment=None, number_format=None):
+            cell = WriteOnlyCell(ws, value=value)
+            if font is not None:
+                cell.font = font
+            if fill is not None:
+                cell.fill = fill
+            if alignment is not None:
+                cell.alignment = alignment
+            if number_format is not None:
+                cell.number_format = number_format
+            return cell
+
+        def _nav_hdr(ws, value, bg=NAVY):
+            return _cell(ws, value,
+                         font=Font(bold=True, color=WHITE),
+                         fill=PatternFill("solid", fgColor=bg),
+                         alignment=Alignment(horizontal="center", vertical="center"))
+
+        def _section_title(ws, row, col_end, text):
+            ws.merged_cells.add(f"A{row}:{get_column_letter(col_end)}{row}")
             ws.row_dimensions[row].height = 20
+            ws.append([_cell(ws, text,
+                             font=Font(bold=True, color=WHITE, size=11),
+                             fill=PatternFill("solid", fgColor=NAVY),
+                             alignment=Alignment(horizontal="left", vertical="center"))])
 
-        def _add_table(ws, name, hdr_row, data_end_row, col_end):
+        def _add_table(ws, name, headers, hdr_row, data_end_row, style="TableStyleLight2"):
             if data_end_row < hdr_row + 1:
                 return
             tab = Table(
                 displayName=name,
-                ref=f"A{hdr_row}:{get_column_letter(col_end)}{data_end_row}",
+                ref=f"A{hdr_row}:{get_column_letter(len(headers))}{data_end_row}",
             )
+            # En write-only openpyxl no puede leer los encabezados de la hoja
+            tab.tableColumns = [TableColumn(id=ci, name=h) for ci, h in enumerate(headers, 1)]
+            tab.autoFilter = AutoFilter(ref=tab.ref)
             tab.tableStyleInfo = TableStyleInfo(
-                name="TableStyleLight2",
+                name=style,
                 showFirstColumn=False, showLastColumn=False,
                 showRowStripes=True,   showColumnStripes=False,
             )
             ws.add_table(tab)
 
-        def _fecha_registro_excel(gasto):
-            if not gasto.fecha_registro:
+        def _fecha_registro_excel(fecha_registro):
+            if not fecha_registro:
                 return None
-            if timezone.is_aware(gasto.fecha_registro):
-                return timezone.localtime(gasto.fecha_registro).replace(tzinfo=None)
-            return gasto.fecha_registro
+            if timezone.is_aware(fecha_registro):
+                return timezone.localtime(fecha_registro).replace(tzinfo=None)
+            return fecha_registro
 
-        queryset = queryset.select_related(
-            'id_sucursal', 'id_cat_gastos', 'id_cuenta_banco'
-        ).order_by('fecha', 'fecha_registro', 'id')
-        data = list(queryset)
+        queryset = queryset.order_by('fecha', 'fecha_registro', 'id')
 
-        wb = openpyxl.Workbook()
+        wb = openpyxl.Workbook(write_only=True)
 
         # ── HOJA 1 — Detalle ─────────────────────────────────────────────────
-        ws = wb.active
-        ws.title = "Detalle"
+        ws = wb.create_sheet("Detalle")
 
         COLUMNS = [
-            ("Fecha",        lambda g: g.fecha,                          14,  "DD/MM/YYYY"),
-            ("Fecha registro", lambda g: _fecha_registro_excel(g),        20,  "DD/MM/YYYY HH:MM"),
-            ("Sucursal",     lambda g: g.id_sucursal.nombre,             22,  "@"),
-            ("Categoría",    lambda g: g.id_cat_gastos.nombre,           22,  "@"),
-            ("Cuenta",       lambda g: g.id_cuenta_banco.numero_cuenta,  22,  "@"),
-            ("Monto",        lambda g: float(g.monto.amount),            16,  MONEY),
-            ("Descripción",  lambda g: g.descripcion or "",              40,  "@"),
+            ("Fecha",        lambda g: g.fecha,                                  14,  "DD/MM/YYYY"),
+            ("Fecha registro", lambda g: _fecha_registro_excel(g.fecha_registro), 20,  "DD/MM/YYYY HH:MM"),
+            ("Sucursal",     lambda g: g.id_sucursal__nombre,                    22,  "@"),
+            ("Categoría",    lambda g: g.id_cat_gastos__nombre,                  22,  "@"),
+            ("Cuenta",       lambda g: g.id_cuenta_banco__numero_cuenta,         22,  "@"),
+            ("Monto",        lambda g: float(g.monto),                           16,  MONEY),
+            ("Descripción",  lambda g: g.descripcion or "",                      40,  "@"),
         ]
+        # Filas planas (values_list) leídas por lotes: sin instancias de modelo
+        # ni la lista completa en memoria.
+        FIELDS = (
+            'fecha', 'fecha_registro', 'id_sucursal__nombre', 'id_cat_gastos__nombre',
+            'id_cuenta_banco__numero_cuenta', 'monto', 'descripcion',
+        )
 
         for ci, (hdr, _, width, _) in enumerate(COLUMNS, 1):
-            cell = ws.cell(row=1, column=ci, value=hdr)
-            _nav_hdr(cell)
             ws.column_dimensions[get_column_letter(ci)].width = width
+        ws.freeze_panes = "A2"
+        ws.append([_nav_hdr(ws, hdr) for hdr, _, _, _ in COLUMNS])
 
-        for ri, gasto in enumerate(data, 2):
-            for ci, (_, getter, _, fmt) in enumerate(COLUMNS, 1):
-                cell = ws.cell(row=ri, column=ci, value=getter(gasto))
-                cell.number_format = fmt
-                cell.alignment = Alignment(vertical="center")
+        filas = queryset.values_list(*FIELDS, named=True)
+        row_align = Alignment(vertical="center")
+        count = 0
+        for gasto in filas.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            ws.append([
+                _cell(ws, getter(gasto), alignment=row_align, number_format=fmt)
+                for _, getter, _, fmt in COLUMNS
+            ])
+            count += 1
 
-        last_data = len(data) + 1  # last row containing data
+        last_data = count + 1  # last row containing data
 
         # Tabla dinámica de Excel (activa filtros, ordenamiento y bandas)
-        if data:
-            tab_main = Table(
-                displayName="TablaGastos",
-                ref=f"A1:{get_column_letter(len(COLUMNS))}{last_data}",
-            )
-            tab_main.tableStyleInfo = TableStyleInfo(
-                name="TableStyleMedium2",
-                showFirstColumn=False, showLastColumn=False,
-                showRowStripes=True,   showColumnStripes=False,
-            )
-            ws.add_table(tab_main)
+        _add_table(ws, "TablaGastos", [hdr for hdr, _, _, _ in COLUMNS], 1, last_data,
+                   style="TableStyleMedium2")
 
         # Fila TOTAL fuera de la tabla
-        total_r = last_data + 1
         mc = 6
-        lbl = ws.cell(row=total_r, column=mc - 1, value="TOTAL")
-        lbl.font = Font(bold=True)
-        lbl.alignment = Alignment(horizontal="right")
         mc_ltr = get_column_letter(mc)
-        tc = ws.cell(row=total_r, column=mc,
-                     value=f"=SUM({mc_ltr}2:{mc_ltr}{last_data})")
-        tc.number_format = MONEY
-        tc.font = Font(bold=True)
-        tc.fill = PatternFill("solid", fgColor=LIGHT)
-
-        ws.freeze_panes = "A2"
+        total_line = [None] * (mc - 2)
+        total_line.append(_cell(ws, "TOTAL", font=Font(bold=True),
+                                alignment=Alignment(horizontal="right")))
+        total_line.append(_cell(ws, f"=SUM({mc_ltr}2:{mc_ltr}{last_data})",
+                                font=Font(bold=True),
+                                fill=PatternFill("solid", fgColor=LIGHT),
+                                number_format=MONEY))
+        ws.append(total_line)
 
         # ── HOJA 2 — Resumen ejecutivo ───────────────────────────────────────
         ws2 = wb.create_sheet("Resumen")
 
-        if not data:
-            ws2.cell(row=1, column=1, value="Sin datos seleccionados.")
+        # Los totales se agregan en la base de datos sobre el mismo queryset
+        base = queryset.order_by()
+        resumen = base.aggregate(
+            n=Count('id'), total=Sum('monto'),
+            fecha_min=Min('fecha'), fecha_max=Max('fecha'),
+        )
+
+        if not resumen['n']:
+            ws2.append(["Sin datos seleccionados."])
         else:
-            grand_total = sum(float(g.monto.amount) for g in data)
-            dates = [g.fecha for g in data]
-            fecha_min, fecha_max = min(dates), max(dates)
-            avg = grand_total / len(data)
-
-            by_cat   = defaultdict(lambda: {'count': 0, 'total': 0.0})
-            by_suc   = defaultdict(lambda: {'count': 0, 'total': 0.0})
-            by_month = defaultdict(lambda: {'count': 0, 'total': 0.0})
-
-            for g in data:
-                amt  = float(g.monto.amount)
-                cat  = g.id_cat_gastos.nombre
-                suc  = g.id_sucursal.nombre
-                mkey = f"{g.fecha.year}-{g.fecha.month:02d}"
-                by_cat[cat]['count']    += 1
-                by_cat[cat]['total']    += amt
-                by_suc[suc]['count']    += 1
-                by_suc[suc]['total']    += amt
-                by_month[mkey]['count'] += 1
-                by_month[mkey]['total'] += amt
+            n_registros = resumen['n']
+            grand_total = float(resumen['total'] or 0)
+            fecha_min, fecha_max = resumen['fecha_min'], resumen['fecha_max']
+            avg = grand_total / n_registros
+
+            def _agrupar(qs, campo):
+                return [
+                    (fila[campo], fila['count'], float(fila['total'] or 0))
+                    for fila in qs.values(campo).annotate(count=Count('id'), total=Sum('monto'))
+                ]
+
+            by_cat = sorted(_agrupar(base, 'id_cat_gastos__nombre'), key=lambda x: -x[2])
+            by_suc = sorted(_agrupar(base, 'id_sucursal__nombre'), key=lambda x: -x[2])
+            by_month = sorted(
+                (f"{mes.year}-{mes.month:02d}", n, total)
+                for mes, n, total in _agrupar(base.annotate(mes=TruncMonth('fecha')), 'mes')
+            )
 
             # Anchos de columnas
             for col, w in zip('ABCD', [28, 14, 18, 14]):
                 ws2.column_dimensions[col].width = w
+            ws2.freeze_panes = "A4"
 
             # ── Encabezado del reporte ────────────────────────────────────────
             r = 1
-            hdr_cell = ws2.cell(row=r, column=1,
-                                value="  REPORTE EJECUTIVO DE GASTOS")
-            hdr_cell.font      = Font(bold=True, color=WHITE, size=14)
-            hdr_cell.fill      = PatternFill("solid", fgColor=NAVY)
-            hdr_cell.alignment = Alignment(horizontal="left", vertical="center")
-            ws2.merge_cells(f"A{r}:D{r}")
+            ws2.merged_cells.add(f"A{r}:D{r}")
             ws2.row_dimensions[r].height = 30
+            ws2.append([_cell(ws2, "  REPORTE EJECUTIVO DE GASTOS",
+                              font=Font(bold=True, color=WHITE, size=14),
+                              fill=PatternFill("solid", fgColor=NAVY),
+                              alignment=Alignment(horizontal="left", vertical="center"))])
             r += 1
 
-            sub = ws2.cell(
-                row=r, column=1,
-                value=(f"  Generado: {datetime.date.today().strftime('%d/%m/%Y')}"
-                       f"   |   Período: {fecha_min.strftime('%d/%m/%Y')}"
-                       f" – {fecha_max.strftime('%d/%m/%Y')}"),
-            )
-            sub.font = Font(italic=True, size=9, color="555555")
-            sub.fill = PatternFill("solid", fgColor="EBF5FB")
-            ws2.merge_cells(f"A{r}:D{r}")
+            ws2.merged_cells.add(f"A{r}:D{r}")
+            ws2.append([_cell(ws2,
+                              (f"  Generado: {datetime.date.today().strftime('%d/%m/%Y')}"
+                               f"   |   Período: {fecha_min.strftime('%d/%m/%Y')}"
+                               f" – {fecha_max.strftime('%d/%m/%Y')}"),
+                              font=Font(italic=True, size=9, color="555555"),
+                              fill=PatternFill("solid", fgColor="EBF5FB"))])
+            ws2.append([])
             r += 2  # blank row separator
 
             # ── KPIs — (value, number_format) tuples so cells stay numeric ──
             kpis = [
                 ("Total Gastos",       grand_total,     MONEY),
-                ("N° de Registros",    len(data),       "0"),
+                ("N° de Registros",    n_registros,     "0"),
                 ("Promedio por Gasto", avg,             MONEY),
                 ("Categorías",         len(by_cat),     "0"),
                 ("Sucursales",         len(by_suc),     "0"),
                 ("Meses con gastos",   len(by_month),   "0"),
             ]
             # 2 KPIs per row, 3 rows
-            for i, (label, value, fmt) in enumerate(kpis):
-                kpi_row = r + (i // 2)
-                kpi_col = 1 + (i % 2) * 2
-                lc = ws2.cell(row=kpi_row, column=kpi_col, value=label)
-                lc.font      = Font(bold=True, size=9, color="666666")
-                lc.alignment = Alignment(horizontal="left")
-                lc.fill      = PatternFill("solid", fgColor="F8FBFD")
-                vc = ws2.cell(row=kpi_row, column=kpi_col + 1, value=value)
-                vc.number_format = fmt
-                vc.font      = Font(bold=True, size=11, color=NAVY)
-                vc.alignment = Alignment(horizontal="right")
-                vc.fill      = PatternFill("solid", fgColor="F8FBFD")
+            kpi_fill = PatternFill("solid", fgColor="F8FBFD")
+            for i in range(0, len(kpis), 2):
+                kpi_line = []
+                for label, value, fmt in kpis[i:i + 2]:
+                    kpi_line.append(_cell(ws2, label, font=Font(bold=True, size=9, color="666666"),
+                                          fill=kpi_fill, alignment=Alignment(horizontal="left")))
+                    kpi_line.append(_cell(ws2, value, font=Font(bold=True, size=11, color=NAVY),
+                                          fill=kpi_fill, alignment=Alignment(horizontal="right"),
+                                          number_format=fmt))
+                ws2.append(kpi_line)
+            ws2.append([])
             r += 3 + 1  # 3 KPI rows + blank separator
 
-            # ── Sección: Por Categoría ────────────────────────────────────────
-            _section_title(ws2, r, 1, 4, "  RESUMEN POR CATEGORÍA")
-            r += 1
-            for ci, h in enumerate(["Categoría", "N° Gastos", "Total", "% del Total"], 1):
-                _nav_hdr(ws2.cell(row=r, column=ci, value=h), TEAL)
-            cat_hdr = r
-            r += 1
-            cat_start = r
-            for cat, v in sorted(by_cat.items(), key=lambda x: -x[1]['total']):
-                pct = v['total'] / grand_total if grand_total else 0
-                ws2.cell(row=r, column=1, value=cat)
-                ws2.cell(row=r, column=2, value=v['count']).alignment = Alignment(horizontal="center")
-                c3 = ws2.cell(row=r, column=3, value=v['total'])
-                c3.number_format = MONEY
-                c4 = ws2.cell(row=r, column=4, value=pct)
-                c4.number_format = '0.00%'
+            # ── Secciones: Por Categoría y Por Sucursal ───────────────────────
+            for titulo, etiqueta, filas_seccion, tabla in (
+                ("  RESUMEN POR CATEGORÍA", "Categoría", by_cat, "TablaCategorias"),
+                ("  RESUMEN POR SUCURSAL",  "Sucursal",  by_suc, "TablaSucursales"),
+            ):
+                _section_title(ws2, r, 4, titulo)
                 r += 1
-            cat_end = r - 1
-            # total row
-            ws2.cell(row=r, column=1, value="TOTAL").font = Font(bold=True)
-            ws2.cell(row=r, column=2, value=len(data)).font = Font(bold=True)
-            ct = ws2.cell(row=r, column=3, value=grand_total)
-            ct.number_format = MONEY
-            ct.font = Font(bold=True)
-            ct.fill = PatternFill("solid", fgColor=LIGHT)
-            cp = ws2.cell(row=r, column=4, value=1.0)
-            cp.number_format = '0.00%'
-            cp.font = Font(bold=True)
-            r += 2
-
-            _add_table(ws2, "TablaCategorias", cat_hdr, cat_end, 4)
-
-            # ── Sección: Por Sucursal ─────────────────────────────────────────
-            _section_title(ws2, r, 1, 4, "  RESUMEN POR SUCURSAL")
-            r += 1
-            for ci, h in enumerate(["Sucursal", "N° Gastos", "Total", "% del Total"], 1):
-                _nav_hdr(ws2.cell(row=r, column=ci, value=h), TEAL)
-            suc_hdr = r
-            r += 1
-            suc_start = r
-            for suc, v in sorted(by_suc.items(), key=lambda x: -x[1]['total']):
-                pct = v['total'] / grand_total if grand_total else 0
-                ws2.cell(row=r, column=1, value=suc)
-                ws2.cell(row=r, column=2, value=v['count']).alignment = Alignment(horizontal="center")
-                s3 = ws2.cell(row=r, column=3, value=v['total'])
-                s3.number_format = MONEY
-                s4 = ws2.cell(row=r, column=4, value=pct)
-                s4.number_format = '0.00%'
+                sec_cols = [etiqueta, "N° Gastos", "Total", "% del Total"]
+                ws2.append([_nav_hdr(ws2, h, TEAL) for h in sec_cols])
+                sec_hdr = r
                 r += 1
-            suc_end = r - 1
-            ws2.cell(row=r, column=1, value="TOTAL").font = Font(bold=True)
-            ws2.cell(row=r, column=2, value=len(data)).font = Font(bold=True)
-            st = ws2.cell(row=r, column=3, value=grand_total)
-            st.number_format = MONEY
-            st.font = Font(bold=True)
-            st.fill = PatternFill("solid", fgColor=LIGHT)
-            sp = ws2.cell(row=r, column=4, value=1.0)
-            sp.number_format = '0.00%'
-            sp.font = Font(bold=True)
-            r += 2
-
-            _add_table(ws2, "TablaSucursales", suc_hdr, suc_end, 4)
+                for nombre, n, total in filas_seccion:
+                    pct = total / grand_total if grand_total else 0
+                    ws2.append([
+                        nombre,
+                        _cell(ws2, n, alignment=Alignment(horizontal="center")),
+                        _cell(ws2, total, number_format=MONEY),
+                        _cell(ws2, pct, number_format='0.00%'),
+                    ])
+                    r += 1
+                sec_end = r - 1
+                # total row
+                ws2.append([
+                    _cell(ws2, "TOTAL", font=Font(bold=True)),
+                    _cell(ws2, n_registros, font=Font(bold=True)),
+                    _cell(ws2, grand_total, font=Font(bold=True),
+                          fill=PatternFill("solid", fgColor=LIGHT), number_format=MONEY),
+                    _cell(ws2, 1.0, font=Font(bold=True), number_format='0.00%'),
+                ])
+                ws2.append([])
+                r += 2
+
+                _add_table(ws2, tabla, sec_cols, sec_hdr, sec_end)
 
             # ── Sección: Evolución Mensual ────────────────────────────────────
-            _section_title(ws2, r, 1, 3, "  EVOLUCIÓN MENSUAL")
+            _section_title(ws2, r, 3, "  EVOLUCIÓN MENSUAL")
             r += 1
-            for ci, h in enumerate(["Mes", "N° Gastos", "Total"], 1):
-                _nav_hdr(ws2.cell(row=r, column=ci, value=h), TEAL)
+            mon_cols = ["Mes", "N° Gastos", "Total"]
+            ws2.append([_nav_hdr(ws2, h, TEAL) for h in mon_cols])
             mon_hdr = r
             r += 1
-            mon_start = r
-            for mkey in sorted(by_month):
-                v = by_month[mkey]
-                ws2.cell(row=r, column=1, value=mkey)
-                ws2.cell(row=r, column=2, value=v['count']).alignment = Alignment(horizontal="center")
-                m3 = ws2.cell(row=r, column=3, value=v['total'])
-                m3.number_format = MONEY
+            for mkey, n, total in by_month:
+                ws2.append([
+                    mkey,
+                    _cell(ws2, n, alignment=Alignment(horizontal="center")),
+                    _cell(ws2, total, number_format=MONEY),
+                ])
                 r += 1
             mon_end = r - 1
-            ws2.cell(row=r, column=1, value="TOTAL").font = Font(bold=True)
-            ws2.cell(row=r, column=2, value=len(data)).font = Font(bold=True)
-            mt = ws2.cell(row=r, column=3, value=grand_total)
-            mt.number_format = MONEY
-            mt.font = Font(bold=True)
-            mt.fill = PatternFill("solid", fgColor=LIGHT)
-
-            _add_table(ws2, "TablaMensual", mon_hdr, mon_end, 3)
+            ws2.append([
+                _cell(ws2, "TOTAL", font=Font(bold=True)),
+                _cell(ws2, n_registros, font=Font(bold=True)),
+                _cell(ws2, grand_total, font=Font(bold=True),
+                      fill=PatternFill("solid", fgColor=LIGHT), number_format=MONEY),
+            ])
 
-            ws2.freeze_panes = "A4"
+            _add_table(ws2, "TablaMensual", mon_cols, mon_hdr, mon_end)
 
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        filename = self.get_export_filename(request)
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        wb.save(response)
-        return response
+        return UtilService.create_excel_response(wb, filename=self.get_export_filename(request))
 
     export_to_excel.short_description = "Exportar a Excel (.xlsx)"
 
@@ -764,6 +742,21 @@ class SaldoMensualAdmin(ImportExportModelAdmin, ModelAdmin):
             'fields': ('cuenta', 'año', 'mes', 'saldo_inicial', 'saldo_final')
         }),
     )
+class OrigenResultadoOCRFilter(SimpleListFilter):
+    title = 'Resultado OCR'
+    parameter_name = 'origen_ocr'
+
+    def lookups(self, request, model_admin):
+        return [('reutilizado', 'Reutilizado (mismo archivo)'), ('inferido', 'Inferido')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'reutilizado':
+            return queryset.filter(duplicado_de__isnull=False)
+        if self.value() == 'inferido':
+            return queryset.filter(duplicado_de__isnull=True).exclude(texto_ocr='')
+        return queryset
+
+
 @admin.register(ComprobanteGasto)
 class ComprobanteGastoAdmin(ModelAdmin):
     """Consulta y auditoria de comprobantes cargados por el flujo OCR."""
@@ -772,23 +765,24 @@ class ComprobanteGastoAdmin(ModelAdmin):
         'id', 'vista_previa', 'nombre_original', 'estado_visual', 'confianza',
         'gasto', 'creado_por', 'creado_en',
     )
-    list_filter = ('estado', 'content_type', 'creado_en')
+    list_filter = ('estado', OrigenResultadoOCRFilter, 'content_type', 'creado_en')
     search_fields = ('id', 'nombre_original', 'sha256', 'texto_ocr', 'creado_por__username')
     list_select_related = ('gasto', 'creado_por')
+    change_list_template = 'admin/gastos/comprobantegasto/change_list.html'
     readonly_fields = (
         'storage_key', 'archivo_enlace', 'vista_previa_grande', 'nombre_original',
         'content_type', 'tamano_bytes', 'sha256', 'estado', 'datos_extraidos',
-        'texto_ocr', 'confianza', 'error_procesamiento', 'creado_por', 'gasto',
-        'creado_en', 'procesado_en',
+        'texto_ocr', 'confianza', 'error_procesamiento', 'tiempos_ocr', 'duplicado_de',
+        'creado_por', 'gasto', 'creado_en', 'procesado_en', 'reclamado_en', 'reclamado_por',
     )
     ordering = ('-creado_en',)
     list_per_page = 25
     date_hierarchy = 'creado_en'
     fieldsets = (
         ('Archivo', {'fields': ('vista_previa_grande', 'archivo_enlace', 'nombre_original', 'content_type', 'tamano_bytes', 'sha256')}),
-        ('Procesamiento OCR', {'fields': ('estado', 'confianza', 'datos_extraidos', 'texto_ocr', 'error_procesamiento')}),
-        ('Relacion', {'fields': ('gasto', 'creado_por')}),
-        ('Metadatos', {'fields': ('storage_key', 'creado_en', 'procesado_en')}),
+        ('Procesamiento OCR', {'fields': ('estado', 'confianza', 'datos_extraidos', 'texto_ocr', 'error_procesamiento', 'tiempos_ocr')}),
+        ('Relacion', {'fields': ('gasto', 'duplicado_de', 'creado_por')}),
+        ('Metadatos', {'fields': ('storage_key', 'creado_en', 'procesado_en', 'reclamado_en', 'reclamado_por')}),
     )
 
     @admin.display(description='Archivo')
@@ -835,8 +829,36 @@ class ComprobanteGastoAdmin(ModelAdmin):
         except (ValueError, OSError):
             return 'Imagen no disponible'
 
+    def changelist_view(self, request, extra_context=None):
+        """Agrega la tasa de reutilización de resultados OCR por sha256."""
+        from .services.receipt_service import ocr_cache_stats
+        extra_context = extra_context or {}
+        extra_context['metricas_ocr'] = ocr_cache_stats()
+        return super().changelist_view(request, extra_context=extra_context)
+
     def has_add_permission(self, request):
         return False
 
     def has_change_permission(self, request, obj=None):
         return request.user.has_perm('gastos.view_comprobantegasto')
+
+
+@admin.register(MemoCategoriaGasto)
+class MemoCategoriaGastoAdmin(ModelAdmin):
+    form = MemoCategoriaGastoAdminForm
+    list_display = ('descripcion_normalizada', 'categoria', 'origen', 'confirmaciones', 'usos', 'actualizado_en')
+    search_fields = ('descripcion_normalizada', 'categoria__nombre')
+    list_filter = ('origen', 'categoria')
+    list_select_related = ('categoria',)
+    list_per_page = 25
+    readonly_fields = ('confirmaciones', 'usos', 'actualizado_en')
+    fieldsets = (
+        ('Datos del Registro', {
+            'fields': ('descripcion_normalizada', 'categoria', 'confirmaciones', 'usos', 'actualizado_en')
+        }),
+    )
+
+    def save_model(self, request, obj, form, change):
+        # Una corrección manual tiene la prioridad de una confirmación del usuario
+        obj.origen = MemoCategoriaGasto.Origen.USUARIO
+        super().save_model(request, obj, form, change)
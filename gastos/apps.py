@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class GastosConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "gastos"
+
+    def ready(self):
+        import gastos.signals  # noqa: F401 — mantiene el libro diario de saldos
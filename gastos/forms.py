@@ -1,7 +1,7 @@
 from django import forms
 from django.conf import settings
 from PIL import Image, UnidentifiedImageError
-from .models import Gastos, CatGastos, SaldoMensual, Compra, Cuenta
+from .models import Gastos, CatGastos, SaldoMensual, Compra, Cuenta, MemoCategoriaGasto
 from catalogo.models import Productor, Sucursal
 
 class CompraForm(forms.ModelForm):
@@ -162,6 +162,20 @@ class CatGastoForm(forms.ModelForm):
         }
 
 
+class MemoCategoriaGastoAdminForm(forms.ModelForm):
+    class Meta:
+        model = MemoCategoriaGasto
+        fields = ['descripcion_normalizada', 'categoria']
+
+    def clean_descripcion_normalizada(self):
+        # Normalizar aquí para que la validación de unicidad vea la clave final
+        from .services.categorizador_service import normalizar_descripcion
+        clave = normalizar_descripcion(self.cleaned_data['descripcion_normalizada'])
+        if not clave:
+            raise forms.ValidationError("La descripción no contiene texto utilizable.")
+        return clave
+
+
 class SaldoMensualForm(forms.ModelForm):
     class Meta:
         model = SaldoMensual
@@ -239,7 +253,7 @@ class FacturaUploadForm(forms.Form):
     )
     asignar_categorias = forms.BooleanField(
         label="Asignar categorías automáticamente",
-        help_text="⚠️ ATENCIÓN: Esta opción utiliza IA para sugerir categorías. Puede ser lenta y exceder límites de API para estados de cuenta con muchos movimientos.",
+        help_text="Utiliza IA para sugerir categorías a los gastos del estado de cuenta (un prompt por lote de movimientos).",
         required=False,
         initial=False,
         widget=forms.CheckboxInput(attrs={
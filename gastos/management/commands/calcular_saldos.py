@@ -0,0 +1,77 @@
+"""
+Management command: calcular_saldos
+Verifica el libro diario de saldos (MovimientoDiarioCuenta) contra Gastos y
+Compra, lo reconstruye y recalcula los saldos finales de SaldoMensual.
+
+Las señales mantienen el libro al guardar o borrar movimientos; este comando
+cubre lo que no dispara señales (queryset.update, bulk_create, SQL directo).
+
+Uso:
+    python manage.py calcular_saldos                        # solo verifica
+    python manage.py calcular_saldos --reconstruir
+    python manage.py calcular_saldos --cuenta 3 --reconstruir
+    python manage.py calcular_saldos --encadenar            # SaldoMensual mes a mes
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gastos.services.saldos_service import LibroSaldosService
+
+
+class Command(BaseCommand):
+    help = "Verifica y reconstruye el libro diario de saldos por cuenta."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cuenta',
+            type=int,
+            action='append',
+            help='Limita a la cuenta indicada (se puede repetir).',
+        )
+        parser.add_argument(
+            '--reconstruir',
+            action='store_true',
+            help='Regenera el libro desde las tablas de movimientos antes de verificar.',
+        )
+        parser.add_argument(
+            '--encadenar',
+            action='store_true',
+            help='Recalcula el saldo final de cada SaldoMensual y lo arrastra al mes siguiente.',
+        )
+        parser.add_argument(
+            '--max-diferencias',
+            type=int,
+            default=20,
+            help='Diferencias a listar (default: 20).',
+        )
+
+    def handle(self, *args, **options):
+        cuentas = options['cuenta']
+
+        if options['reconstruir']:
+            inicio = time.perf_counter()
+            filas = LibroSaldosService.reconstruir(cuentas)
+            self.stdout.write(self.style.SUCCESS(
+                f"Libro reconstruido: {filas} filas en {time.perf_counter() - inicio:.2f}s."
+            ))
+
+        inicio = time.perf_counter()
+        diferencias = LibroSaldosService.verificar(cuentas)
+        duracion = time.perf_counter() - inicio
+
+        if diferencias:
+            for diferencia in diferencias[:options['max_diferencias']]:
+                self.stdout.write(
+                    f"  cuenta {diferencia['cuenta_id']} {diferencia['fecha']}: "
+                    f"esperado {diferencia['esperado']} / libro {diferencia['libro']}"
+                )
+            raise CommandError(
+                f"{len(diferencias)} día(s) no coinciden con Gastos/Compra; "
+                f"ejecuta con --reconstruir."
+            )
+        self.stdout.write(self.style.SUCCESS(f"Libro verificado en {duracion:.2f}s: sin diferencias."))
+
+        if options['encadenar']:
+            actualizados = LibroSaldosService.encadenar_saldos_mensuales(cuentas)
+            self.stdout.write(self.style.SUCCESS(f"{actualizados} saldo(s) mensual(es) recalculados."))
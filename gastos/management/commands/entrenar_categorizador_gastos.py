@@ -0,0 +1,73 @@
+"""
+Management command: entrenar_categorizador_gastos
+Entrena el categorizador local de movimientos bancarios (TF-IDF + regresión
+logística) con las descripciones de Gastos y llena el memo de categorías con
+las descripciones que se repiten con la misma categoría.
+
+Las métricas se calculan sobre una fracción de prueba: cobertura es el % de
+movimientos que el modelo resolvería sin la IA con el umbral actual
+(CATEGORIZADOR_UMBRAL) y precisión el % de aciertos entre ellos.
+
+Uso:
+    python manage.py entrenar_categorizador_gastos
+    python manage.py entrenar_categorizador_gastos --min-repeticiones 3 --pureza 0.95
+    python manage.py entrenar_categorizador_gastos --sin-memo --prueba 0
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gastos.services.categorizador_service import CategorizadorGastos
+
+
+class Command(BaseCommand):
+    help = "Entrena el categorizador local de gastos y llena el memo de categorías."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-repeticiones',
+            type=int,
+            default=2,
+            help='Veces que debe repetirse una descripción para memorizarla (default: 2).',
+        )
+        parser.add_argument(
+            '--pureza',
+            type=float,
+            default=0.9,
+            help='Fracción mínima de sus gastos en la misma categoría para memorizarla (default: 0.9).',
+        )
+        parser.add_argument(
+            '--prueba',
+            type=float,
+            default=0.2,
+            help='Fracción reservada para medir precisión y cobertura; 0 la omite (default: 0.2).',
+        )
+        parser.add_argument(
+            '--sin-memo',
+            action='store_true',
+            help='Solo entrena el modelo, sin escribir el memo.',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            resultado = CategorizadorGastos.entrenar(
+                min_repeticiones=options['min_repeticiones'],
+                pureza=options['pureza'],
+                fraccion_prueba=options['prueba'],
+                memo=not options['sin_memo'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Modelo entrenado con {resultado['ejemplos']} gastos de {resultado['categorias']} categorías "
+            f"en {time.perf_counter() - inicio:.2f}s: {resultado['ruta']}"
+        ))
+        if resultado['cobertura'] is not None:
+            precision = '-' if resultado['precision'] is None else f"{resultado['precision']}%"
+            self.stdout.write(
+                f"Umbral {resultado['umbral']}: cobertura {resultado['cobertura']}%, precisión {precision}."
+            )
+        if not options['sin_memo']:
+            self.stdout.write(f"Memo: {resultado['memos']} descripciones creadas o actualizadas.")
@@ -1,23 +1,129 @@
+"""
+Management command: process_receipt_ocr
+Processes queued expense-receipt OCR jobs (ComprobanteGasto).
+
+Each worker claims up to --batch receipts with SKIP LOCKED, runs them through one
+batched PaddleOCR predict() and stores per-stage timings in `tiempos_ocr`. With
+--workers N the command forks N supervised processes, each with its own warmed
+engine (OCR_CPU_THREADS threads each); crashed workers are restarted and the
+batch they held goes back to the queue (receipts abandoned by any other process
+are reclaimed after COMPROBANTE_OCR_TIMEOUT seconds). When the
+queue is empty the poll interval doubles from --sleep up to --max-sleep and
+resets as soon as a job shows up.
+
+Uso:
+    python manage.py process_receipt_ocr                      # one batch and exit
+    python manage.py process_receipt_ocr --loop
+    python manage.py process_receipt_ocr --loop --workers 4 --batch 4
+"""
+import multiprocessing
+import os
+import signal
+import threading
 import time
-from django.core.management.base import BaseCommand
-from gastos.services.receipt_service import process_next_receipt
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from gastos.services.receipt_ocr_service import warm_up
+from gastos.services.receipt_service import process_receipt_batch, release_claims, worker_id
+
+
+def run_worker(options, stop, write):
+    """Claim/process loop shared by the single-process mode and each forked worker."""
+    count, idle = 0, options['sleep']
+    while not stop.is_set():
+        close_old_connections()
+        batch = options['batch'] if options['loop'] else min(options['batch'], options['limit'] - count)
+        receipts = process_receipt_batch(batch)
+        for receipt in receipts:
+            tiempos = ' '.join(f'{stage}={seconds}s' for stage, seconds in receipt.tiempos_ocr.items() if stage != 'lote')
+            write(f'Processed receipt {receipt.pk}: {receipt.estado} ({tiempos})')
+        count += len(receipts)
+        if not options['loop'] and (not receipts or count >= options['limit']):
+            return count
+        if receipts:
+            idle = options['sleep']
+            continue
+        stop.wait(idle)
+        idle = min(idle * 2, options['max_sleep'])
+    return count
+
+
+def _worker_main(index, options, stop):
+    # Ctrl+C/SIGTERM may reach the whole process group; only the supervisor
+    # decides when to stop so that no batch is left half-processed in PROCESANDO.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    os.environ['OCR_CPU_THREADS'] = str(options['threads'])
+    warm_up()
+    run_worker(options, stop, lambda line: print(f'[worker {index}] {line}', flush=True))
+    connections.close_all()
+
 
 class Command(BaseCommand):
     help = 'Processes queued expense-receipt OCR jobs.'
+
     def add_arguments(self, parser):
-        parser.add_argument('--limit', type=int, default=1)
+        parser.add_argument('--limit', type=int, default=1, help='Receipts to process without --loop (default: 1).')
         parser.add_argument('--loop', action='store_true')
-        parser.add_argument('--sleep', type=float, default=2)
+        parser.add_argument('--sleep', type=float, default=2, help='Initial idle poll interval in seconds (default: 2).')
+        parser.add_argument('--max-sleep', type=float, default=30, help='Idle poll interval ceiling in seconds (default: 30).')
+        parser.add_argument('--batch', type=int, default=4, help='Receipts claimed and inferred together (default: 4).')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes, requires --loop when > 1 (default: 1).')
+        parser.add_argument('--threads', type=int, default=int(os.environ.get('OCR_CPU_THREADS', '2')),
+                            help='PaddleOCR CPU threads per worker (default: OCR_CPU_THREADS or 2).')
+
     def handle(self, *args, **options):
-        count = 0
-        while True:
-            receipt = process_next_receipt()
-            if receipt:
-                count += 1
-                self.stdout.write(f'Processed receipt {receipt.pk}: {receipt.estado}')
-            if not options['loop'] and count >= options['limit']:
-                return
-            if receipt is None:
-                if not options['loop']:
-                    return
-                time.sleep(options['sleep'])
+        if options['batch'] < 1 or options['workers'] < 1 or options['threads'] < 1:
+            raise CommandError('--batch, --workers and --threads must be >= 1.')
+        options['max_sleep'] = max(options['max_sleep'], options['sleep'])
+        if options['workers'] == 1:
+            os.environ['OCR_CPU_THREADS'] = str(options['threads'])
+            run_worker(options, threading.Event(), self.stdout.write)
+            return
+        if not options['loop']:
+            raise CommandError('--workers > 1 requires --loop.')
+        self.supervise(options)
+
+    def supervise(self, options):
+        # fork: the children inherit the configured Django apps; the parent never
+        # imports Paddle, and DB connections are closed so none is shared.
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        # The handlers only flip a flag: calling stop.set() from a handler can
+        # deadlock on the lock the interrupted stop.wait() is holding.
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+        def start(index):
+            connections.close_all()
+            process = context.Process(target=_worker_main, args=(index, options, stop), name=f'ocr-worker-{index}')
+            process.start()
+            return process
+
+        workers = {index: start(index) for index in range(options['workers'])}
+        self.stdout.write(f"Started {len(workers)} OCR workers (batch {options['batch']}, {options['threads']} threads each).")
+        while not stopping:
+            time.sleep(1)
+            for index, process in workers.items():
+                if not process.is_alive():
+                    self.stderr.write(f'OCR worker {index} exited with code {process.exitcode}; restarting.')
+                    self.release(process)
+                    workers[index] = start(index)
+        stop.set()
+        for process in workers.values():
+            process.join(timeout=120)
+            if process.is_alive():
+                process.kill()
+                process.join()
+                self.release(process)
+        connections.close_all()
+        self.stdout.write('OCR workers stopped.')
+
+    def release(self, process):
+        """Requeues the batch a dead worker left in PROCESANDO."""
+        released = release_claims(worker_id(process.pid))
+        if released:
+            self.stderr.write(f'Requeued {released} receipts claimed by OCR worker pid {process.pid}.')
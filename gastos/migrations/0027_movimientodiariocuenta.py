@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:47
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def poblar_libro(apps, schema_editor):
+    """Carga el libro con los gastos y compras existentes"""
+    MovimientoDiarioCuenta = apps.get_model('gastos', 'MovimientoDiarioCuenta')
+    origenes = (
+        ('gastos', apps.get_model('gastos', 'Gastos'), 'id_cuenta_banco_id', 'fecha', 'monto'),
+        ('compras', apps.get_model('gastos', 'Compra'), 'cuenta_id', 'fecha_compra', 'monto_total'),
+    )
+    totales = defaultdict(lambda: {'gastos': Decimal('0.00'), 'compras': Decimal('0.00')})
+    for columna, modelo, cuenta, fecha, monto in origenes:
+        filas = (modelo.objects.filter(**{f'{cuenta}__isnull': False})
+                 .values(cuenta, fecha).annotate(total=Sum(monto)).order_by())
+        for fila in filas:
+            totales[(fila[cuenta], fila[fecha])][columna] += fila['total'] or Decimal('0.00')
+
+    MovimientoDiarioCuenta.objects.bulk_create(
+        [MovimientoDiarioCuenta(cuenta_id=cuenta_id, fecha=fecha, **valores)
+         for (cuenta_id, fecha), valores in totales.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gastos', '0026_alter_saldomensual_mes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoDiarioCuenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('gastos', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('compras', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('cuenta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_diarios', to='gastos.cuenta')),
+            ],
+            options={
+                'verbose_name': 'Movimiento diario de cuenta',
+                'verbose_name_plural': 'Movimientos diarios de cuenta',
+                'ordering': ['cuenta', 'fecha'],
+                'constraints': [models.UniqueConstraint(fields=('cuenta', 'fecha'), name='gastos_movdiario_cuenta_fecha_uniq')],
+            },
+        ),
+        migrations.RunPython(poblar_libro, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gastos', '0027_movimientodiariocuenta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comprobantegasto',
+            name='tiempos_ocr',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gastos', '0028_comprobantegasto_tiempos_ocr'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comprobantegasto',
+            name='duplicado_de',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicados', to='gastos.comprobantegasto'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gastos', '0029_comprobantegasto_duplicado_de'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemoCategoriaGasto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descripcion_normalizada', models.CharField(max_length=255, unique=True)),
+                ('origen', models.CharField(choices=[('historial', 'Historial de gastos'), ('ia', 'Respuesta de IA'), ('usuario', 'Confirmada por usuario')], default='ia', max_length=10)),
+                ('usos', models.PositiveIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memos', to='gastos.catgastos')),
+            ],
+            options={
+                'verbose_name': 'Memo de categoría',
+                'verbose_name_plural': 'Memos de categoría',
+                'ordering': ['descripcion_normalizada'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gastos', '0030_memocategoriagasto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memocategoriagasto',
+            name='confirmaciones',
+            field=models.PositiveIntegerField(default=1, verbose_name='Respuestas de IA coincidentes'),
+        ),
+    ]
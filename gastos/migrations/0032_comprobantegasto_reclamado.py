@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gastos', '0031_memocategoriagasto_confirmaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comprobantegasto',
+            name='reclamado_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='comprobantegasto',
+            name='reclamado_por',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
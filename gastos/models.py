@@ -7,6 +7,7 @@ from catalogo.models import Sucursal, Productor, Producto
 from django.db.models import Sum
 from django.utils.html import format_html
 from djmoney.models.fields import MoneyField
+from djmoney.money import Money
 from app.media_utils import safe_file_url
 
 class CatGastos(models.Model):
@@ -114,10 +115,17 @@ class ComprobanteGasto(models.Model):
     texto_ocr = models.TextField(blank=True)
     confianza = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     error_procesamiento = models.TextField(blank=True)
+    tiempos_ocr = models.JSONField(default=dict, blank=True)
     creado_por = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
     gasto = models.OneToOneField(Gastos, null=True, blank=True, on_delete=models.SET_NULL, related_name='comprobante')
+    # Comprobante con el mismo sha256 del que se copió el resultado OCR sin volver a inferir
+    duplicado_de = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='duplicados')
     creado_en = models.DateTimeField(auto_now_add=True)
     procesado_en = models.DateTimeField(null=True, blank=True)
+    # Worker (host:pid) que lo pasó a PROCESANDO y cuándo: si muere a medio
+    # lote, el supervisor o el timeout lo devuelven a la cola
+    reclamado_en = models.DateTimeField(null=True, blank=True)
+    reclamado_por = models.CharField(max_length=100, blank=True)
 
     class Meta:
         ordering = ['-creado_en']
@@ -180,8 +188,76 @@ class SaldoMensual(models.Model):
         return f"{self.cuenta} - {self.año}/{self.mes} - {self.saldo_inicial}"
 
     def calcular_saldo_final(self):
-        gastos = Gastos.objects.filter(id_cuenta_banco=self.cuenta, fecha__year=self.año, fecha__month=self.mes).aggregate(total_gastos=Sum('monto'))['total_gastos'] or 0
-        compras = Compra.objects.filter(cuenta=self.cuenta, fecha_compra__year=self.año, fecha_compra__month=self.mes).aggregate(total_compras=Sum('monto_total'))['total_compras'] or 0
-        self.saldo_final = self.saldo_inicial - gastos + compras
+        # Totales del mes desde el libro diario (MovimientoDiarioCuenta): a lo
+        # más ~31 filas en lugar de agregar Gastos y Compra completos.
+        totales = MovimientoDiarioCuenta.objects.filter(
+            cuenta=self.cuenta, fecha__year=self.año, fecha__month=self.mes
+        ).aggregate(total_gastos=Sum('gastos'), total_compras=Sum('compras'))
+        gastos = totales['total_gastos'] or 0
+        compras = totales['total_compras'] or 0
+        self.saldo_final = Money(self.saldo_inicial.amount - gastos + compras, self.saldo_inicial.currency)
         self.save()
+
+
+class MovimientoDiarioCuenta(models.Model):
+    """
+    Libro diario por cuenta: total de gastos y compras de cada día. Las
+    señales de Gastos y Compra (gastos/signals.py) lo mantienen aplicando
+    deltas con F(), de modo que los saldos mensuales y las series de
+    evolución suman a lo más un mes de filas por cuenta en lugar de recorrer
+    las tablas de movimientos. Las operaciones que no disparan señales
+    (queryset.update, bulk_create) lo desfasan: `manage.py calcular_saldos`
+    lo compara contra las tablas originales y lo reconstruye.
+    """
+
+    cuenta = models.ForeignKey(Cuenta, on_delete=models.CASCADE, related_name='movimientos_diarios')
+    fecha = models.DateField()
+    gastos = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    compras = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Movimiento diario de cuenta"
+        verbose_name_plural = "Movimientos diarios de cuenta"
+        ordering = ['cuenta', 'fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['cuenta', 'fecha'], name='gastos_movdiario_cuenta_fecha_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.cuenta_id} - {self.fecha:%Y-%m-%d} (gastos {self.gastos}, compras {self.compras})"
             
+
+
+class MemoCategoriaGasto(models.Model):
+    """
+    Categoría conocida para una descripción normalizada de movimiento
+    bancario (gastos/services/categorizador_service.py). Es la primera etapa
+    de la asignación de categorías de estados de cuenta: una descripción
+    memorizada no se envía al modelo local ni a la IA. Se llena con las
+    descripciones repetidas del historial de Gastos (``manage.py
+    entrenar_categorizador_gastos``), con las respuestas de la IA y con las
+    categorías que el usuario confirma; estas últimas tienen prioridad.
+
+    Una entrada de la IA solo se usa cuando `confirmaciones` respuestas
+    coincidieron (CATEGORIZADOR_CONFIRMACIONES_IA).
+    """
+
+    class Origen(models.TextChoices):
+        HISTORIAL = 'historial', 'Historial de gastos'
+        IA = 'ia', 'Respuesta de IA'
+        USUARIO = 'usuario', 'Confirmada por usuario'
+
+    descripcion_normalizada = models.CharField(max_length=255, unique=True)
+    categoria = models.ForeignKey(CatGastos, on_delete=models.CASCADE, related_name='memos')
+    origen = models.CharField(max_length=10, choices=Origen.choices, default=Origen.IA)
+    usos = models.PositiveIntegerField(default=0)
+    confirmaciones = models.PositiveIntegerField(default=1, verbose_name="Respuestas de IA coincidentes")
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Memo de categoría"
+        verbose_name_plural = "Memos de categoría"
+        ordering = ['descripcion_normalizada']
+
+    def __str__(self):
+        return f"{self.descripcion_normalizada} → {self.categoria_id} ({self.origen})"
@@ -0,0 +1,299 @@
+"""
+Categorización local de movimientos bancarios, antes de la IA.
+
+Dos etapas, en orden:
+1. Memo (MemoCategoriaGasto): descripción normalizada → categoría, con las
+   descripciones repetidas del historial, las respuestas de la IA y las
+   categorías confirmadas por el usuario. Una respuesta de la IA solo se usa
+   cuando CATEGORIZADOR_CONFIRMACIONES_IA respuestas coinciden, y no se
+   memorizan claves genéricas ("TRANSFERENCIA", "PAGO SPEI").
+2. Modelo TF-IDF (n-gramas de caracteres) + regresión logística entrenado
+   con el historial de Gastos por ``manage.py entrenar_categorizador_gastos``.
+   Solo se acepta su predicción si la probabilidad alcanza
+   CATEGORIZADOR_UMBRAL.
+
+Lo que ninguna etapa resuelve se envía a la IA
+(invoice_recognition_service.asignar_categorias_en_lotes), cuyas respuestas
+vuelven al memo.
+"""
+
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from gastos.models import Gastos, MemoCategoriaGasto
+
+logger = logging.getLogger(__name__)
+
+_NO_ALFANUMERICO = re.compile(r'[^A-Z0-9]+')
+_CON_DIGITOS = re.compile(r'\b\w*\d\w*\b')
+
+# Un origen solo reemplaza en el memo a otro de igual o menor prioridad
+PRIORIDAD_ORIGEN = {
+    MemoCategoriaGasto.Origen.IA: 1,
+    MemoCategoriaGasto.Origen.HISTORIAL: 2,
+    MemoCategoriaGasto.Origen.USUARIO: 3,
+}
+
+# Claves que la IA no memoriza: pocas palabras sin nombre de comercio
+PALABRAS_GENERICAS = frozenset({
+    'ABONO', 'CARGO', 'CHEQUE', 'COBRO', 'COMPRA', 'DE', 'DEPOSITO', 'DOMICILIACION', 'EN', 'INTERBANCARIA',
+    'PAGO', 'POR', 'RETIRO', 'SPEI', 'TRANSF', 'TRANSFERENCIA', 'TRASPASO',
+})
+
+_modelo_cargado = {'ruta': None, 'mtime': None, 'datos': None}
+_modelo_lock = threading.Lock()
+
+
+def normalizar_descripcion(texto: str) -> str:
+    """
+    Clave del memo: mayúsculas sin acentos, sin signos y sin las palabras con
+    dígitos (folios, referencias, fechas), que cambian de un mes a otro para
+    el mismo comercio.
+    """
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii').upper()
+    texto = _NO_ALFANUMERICO.sub(' ', texto)
+    texto = _CON_DIGITOS.sub(' ', texto)
+    return ' '.join(texto.split())[:255]
+
+
+def clave_generica(clave: str) -> bool:
+    """Clave normalizada que no identifica a un comercio: una sola palabra o solo palabras genéricas"""
+    palabras = clave.split()
+    return len(palabras) < 2 or all(palabra in PALABRAS_GENERICAS for palabra in palabras)
+
+
+class CategorizadorGastos:
+    """Memo y modelo local de categorías de gasto"""
+
+    @staticmethod
+    def ruta_modelo() -> str:
+        return getattr(settings, 'CATEGORIZADOR_MODELO_PATH',
+                       os.path.join(settings.BASE_DIR, 'modelos', 'categorizador_gastos.joblib'))
+
+    @staticmethod
+    def umbral() -> float:
+        return getattr(settings, 'CATEGORIZADOR_UMBRAL', 0.6)
+
+    @staticmethod
+    def confirmaciones_ia() -> int:
+        return getattr(settings, 'CATEGORIZADOR_CONFIRMACIONES_IA', 2)
+
+    # ------------------------------------------------------------------
+    # Memo
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def memorizar(pares: Iterable[Tuple[str, int]], origen: str) -> int:
+        """
+        Guarda (descripción, categoría) en el memo. No reemplaza entradas de
+        mayor prioridad: la IA no pisa lo confirmado por el usuario.
+
+        Para la IA cuenta una confirmación más si la entrada ya tenía esa
+        categoría y vuelve a 1 si la respuesta cambia; las claves genéricas
+        se descartan.
+
+        Returns:
+            int: Entradas creadas o actualizadas
+        """
+        es_ia = origen == MemoCategoriaGasto.Origen.IA
+        nuevas = {}
+        for descripcion, categoria_id in pares:
+            clave = normalizar_descripcion(descripcion)
+            if clave and categoria_id and not (es_ia and clave_generica(clave)):
+                nuevas[clave] = int(categoria_id)
+        if not nuevas:
+            return 0
+
+        existentes = MemoCategoriaGasto.objects.in_bulk(list(nuevas), field_name='descripcion_normalizada')
+        crear, actualizar = [], []
+        for clave, categoria_id in nuevas.items():
+            memo = existentes.get(clave)
+            if memo is None:
+                crear.append(MemoCategoriaGasto(descripcion_normalizada=clave, categoria_id=categoria_id, origen=origen))
+            elif es_ia and memo.origen == origen:
+                if memo.categoria_id == categoria_id:
+                    memo.confirmaciones += 1
+                else:
+                    memo.categoria_id, memo.confirmaciones = categoria_id, 1
+                memo.actualizado_en = timezone.now()
+                actualizar.append(memo)
+            elif PRIORIDAD_ORIGEN[origen] >= PRIORIDAD_ORIGEN[memo.origen] and (
+                memo.categoria_id != categoria_id or memo.origen != origen
+            ):
+                memo.categoria_id, memo.origen, memo.actualizado_en = categoria_id, origen, timezone.now()
+                memo.confirmaciones = 1
+                actualizar.append(memo)
+
+        MemoCategoriaGasto.objects.bulk_create(crear, batch_size=1000, ignore_conflicts=True)
+        MemoCategoriaGasto.objects.bulk_update(
+            actualizar, ['categoria', 'origen', 'confirmaciones', 'actualizado_en'], batch_size=1000
+        )
+        return len(crear) + len(actualizar)
+
+    # ------------------------------------------------------------------
+    # Modelo
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def entrenar(cls, min_repeticiones: int = 2, pureza: float = 0.9,
+                 fraccion_prueba: float = 0.2, memo: bool = True) -> Dict:
+        """
+        Entrena el modelo con las descripciones de Gastos, lo guarda en
+        ruta_modelo() y, si `memo`, memoriza las descripciones que se repiten
+        al menos `min_repeticiones` veces con la misma categoría en al menos
+        `pureza` de los casos.
+
+        Returns:
+            dict: ejemplos, categorías, métricas sobre la fracción de prueba y memos escritos
+        """
+        import joblib
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.model_selection import train_test_split
+        from sklearn.pipeline import make_pipeline
+
+        textos, etiquetas = [], []
+        filas = (Gastos.objects.exclude(descripcion__isnull=True).exclude(descripcion='')
+                 .values_list('descripcion', 'id_cat_gastos_id').iterator(chunk_size=5000))
+        for descripcion, categoria_id in filas:
+            clave = normalizar_descripcion(descripcion)
+            if clave:
+                textos.append(clave)
+                etiquetas.append(categoria_id)
+        if len(set(etiquetas)) < 2:
+            raise ValueError("Se necesitan gastos con descripción en al menos dos categorías para entrenar")
+
+        def nuevo_pipeline():
+            return make_pipeline(
+                TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 5), sublinear_tf=True),
+                LogisticRegression(max_iter=1000, class_weight='balanced'),
+            )
+
+        resultado = {'ejemplos': len(textos), 'categorias': len(set(etiquetas)),
+                     'umbral': cls.umbral(), 'precision': None, 'cobertura': None}
+
+        if fraccion_prueba and len(textos) >= 50:
+            x_ent, x_prueba, y_ent, y_prueba = train_test_split(
+                textos, etiquetas, test_size=fraccion_prueba, random_state=42
+            )
+            if len(set(y_ent)) >= 2:
+                prueba = nuevo_pipeline().fit(x_ent, y_ent)
+                probabilidades = prueba.predict_proba(x_prueba)
+                aceptadas = aciertos = 0
+                for fila, real in zip(probabilidades, y_prueba):
+                    mejor = fila.argmax()
+                    if fila[mejor] >= cls.umbral():
+                        aceptadas += 1
+                        aciertos += int(prueba.classes_[mejor] == real)
+                # Cobertura: movimientos que no irían a la IA; precisión: aciertos entre ellos
+                resultado['cobertura'] = round(aceptadas / len(y_prueba) * 100, 1)
+                resultado['precision'] = round(aciertos / aceptadas * 100, 1) if aceptadas else None
+
+        pipeline = nuevo_pipeline().fit(textos, etiquetas)
+        ruta = cls.ruta_modelo()
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        joblib.dump({
+            'pipeline': pipeline,
+            'entrenado_en': timezone.now().isoformat(),
+            'ejemplos': len(textos),
+        }, ruta)
+        resultado['ruta'] = ruta
+
+        resultado['memos'] = 0
+        if memo:
+            por_texto = defaultdict(Counter)
+            for clave, categoria_id in zip(textos, etiquetas):
+                por_texto[clave][categoria_id] += 1
+            pares = []
+            for clave, conteo in por_texto.items():
+                categoria_id, veces = conteo.most_common(1)[0]
+                total = sum(conteo.values())
+                if total >= min_repeticiones and veces / total >= pureza:
+                    pares.append((clave, categoria_id))
+            resultado['memos'] = cls.memorizar(pares, MemoCategoriaGasto.Origen.HISTORIAL)
+
+        logger.info(f"Categorizador entrenado: {resultado}")
+        return resultado
+
+    @classmethod
+    def cargar_modelo(cls):
+        """Pipeline entrenado o None; se recarga si el archivo cambió"""
+        ruta = cls.ruta_modelo()
+        try:
+            mtime = os.path.getmtime(ruta)
+        except OSError:
+            return None
+        with _modelo_lock:
+            if _modelo_cargado['ruta'] != ruta or _modelo_cargado['mtime'] != mtime:
+                try:
+                    import joblib
+                    datos = joblib.load(ruta)
+                except Exception as e:
+                    logger.error(f"No se pudo cargar el categorizador {ruta}: {e}")
+                    datos = None
+                _modelo_cargado.update(ruta=ruta, mtime=mtime, datos=datos)
+            datos = _modelo_cargado['datos']
+        return datos['pipeline'] if datos else None
+
+    # ------------------------------------------------------------------
+    # Clasificación
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def clasificar(cls, descripciones: List[str], categorias_disponibles: Dict[str, str],
+                   umbral: Optional[float] = None) -> List[Optional[Dict]]:
+        """
+        Categoría local de cada descripción, en el mismo orden. Las entradas
+        del memo que vienen de la IA se ignoran hasta reunir
+        confirmaciones_ia() respuestas coincidentes.
+
+        Returns:
+            list: {'id', 'nombre', 'origen': 'memo' | 'modelo', 'confianza'} o None
+            si ninguna etapa alcanzó el umbral
+        """
+        umbral = cls.umbral() if umbral is None else umbral
+        claves = [normalizar_descripcion(d) for d in descripciones]
+        resultados: List[Optional[Dict]] = [None] * len(claves)
+
+        memos = MemoCategoriaGasto.objects.in_bulk(
+            [c for c in set(claves) if c], field_name='descripcion_normalizada'
+        )
+        confirmaciones = cls.confirmaciones_ia()
+        usados = set()
+        for i, clave in enumerate(claves):
+            memo = memos.get(clave)
+            if memo and memo.origen == MemoCategoriaGasto.Origen.IA and memo.confirmaciones < confirmaciones:
+                continue
+            if memo and str(memo.categoria_id) in categorias_disponibles:
+                resultados[i] = {
+                    'id': memo.categoria_id, 'nombre': categorias_disponibles[str(memo.categoria_id)],
+                    'origen': 'memo', 'confianza': 1.0,
+                }
+                usados.add(memo.pk)
+        if usados:
+            MemoCategoriaGasto.objects.filter(pk__in=usados).update(usos=F('usos') + 1)
+
+        pendientes = [i for i, clave in enumerate(claves) if resultados[i] is None and clave]
+        pipeline = cls.cargar_modelo() if pendientes else None
+        if pipeline is not None:
+            probabilidades = pipeline.predict_proba([claves[i] for i in pendientes])
+            for i, fila in zip(pendientes, probabilidades):
+                mejor = fila.argmax()
+                categoria_id = str(pipeline.classes_[mejor])
+                if fila[mejor] >= umbral and categoria_id in categorias_disponibles:
+                    resultados[i] = {
+                        'id': int(categoria_id), 'nombre': categorias_disponibles[categoria_id],
+                        'origen': 'modelo', 'confianza': round(float(fila[mejor]), 3),
+                    }
+        return resultados
@@ -3,6 +3,9 @@ Servicio para el reconocimiento de facturas y estados de cuenta en formato PDF u
 """
 import os
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 import google.generativeai as genai
 from langchain_community.document_loaders import PyPDFLoader
@@ -25,6 +28,50 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_API_MODEL = os.getenv("OPENROUTER_API_MODEL", "google/gemini-3.1-flash-lite-preview")
 genai.configure(api_key=GOOGLE_API_KEY)
 
+# Asignación de categorías: movimientos por prompt, prompts simultáneos y
+# límite de llamadas al modelo (Gemini gratuito: 15 peticiones por minuto)
+CATEGORIAS_TAMANO_LOTE = int(os.getenv("CATEGORIAS_TAMANO_LOTE", "50"))
+CATEGORIAS_CONCURRENCIA = int(os.getenv("CATEGORIAS_CONCURRENCIA", "3"))
+LLM_PETICIONES_POR_MINUTO = int(os.getenv("LLM_PETICIONES_POR_MINUTO", "15"))
+# Reintentos de un lote fallido (espera base en segundos, se duplica en cada uno)
+CATEGORIAS_REINTENTOS = int(os.getenv("CATEGORIAS_REINTENTOS", "2"))
+CATEGORIAS_ESPERA_REINTENTO = float(os.getenv("CATEGORIAS_ESPERA_REINTENTO", "2"))
+
+
+class LimitadorTokens:
+    """
+    Cubeta de tokens compartida por los hilos que llaman al modelo.
+
+    Se rellena a `por_minuto` tokens por minuto hasta `capacidad`; cada
+    llamada consume uno y, si no hay, espera solo lo necesario para el
+    siguiente en lugar de una pausa fija.
+    """
+
+    def __init__(self, por_minuto, capacidad=None):
+        self.tasa = por_minuto / 60.0
+        self.capacidad = capacidad or max(1, min(por_minuto, 5))
+        self.tokens = float(self.capacidad)
+        self.ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Consume un token, esperando si la cubeta está vacía. Retorna los segundos esperados."""
+        esperado = 0.0
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return esperado
+                espera = (1 - self.tokens) / self.tasa
+            time.sleep(espera)
+            esperado += espera
+
+
+limitador_llm = LimitadorTokens(LLM_PETICIONES_POR_MINUTO)
+
 def get_available_models():
     """
     Retorna los modelos de IA disponibles basados en las variables de entorno configuradas.
@@ -108,6 +155,19 @@ class MovimientoEstadoCuenta(BaseModel):
     referencia: str = Field(description="Número de referencia o folio del movimiento.", default="")
     categoria_sugerida: str = Field(description="ID de la categoría más apropiada para este movimiento según las categorías disponibles.", default="")
 
+class AsignacionCategoria(BaseModel):
+    """
+    Categoría asignada a un movimiento dentro de un lote.
+    """
+    id: str = Field(description="ID del movimiento, tal como aparece en la lista.")
+    categoria_id: str = Field(description="ID de la categoría más apropiada, o 'NINGUNA' si ninguna aplica.")
+
+class AsignacionCategoriasLote(BaseModel):
+    """
+    Respuesta del modelo para un lote de movimientos.
+    """
+    asignaciones: List[AsignacionCategoria] = Field(description="Una asignación por cada movimiento de la lista.")
+
 class EstadoCuentaCompleto(BaseModel):
     """
     Modelo de datos para todo el estado de cuenta.
@@ -248,7 +308,7 @@ def obtener_categorias_disponibles():
         logger.error(f"Error al obtener categorías: {str(e)}")
         return {}
 
-def asignar_categoria_automatica(descripcion_movimiento, categorias_disponibles):
+def asignar_categoria_automatica(descripcion_movimiento, categorias_disponibles, modelo=None):
     """
     Utiliza Google Gemini para asignar automáticamente una categoría de gasto basándose 
     en la descripción del movimiento.
@@ -256,6 +316,7 @@ def asignar_categoria_automatica(descripcion_movimiento, categorias_disponibles)
     Args:
         descripcion_movimiento (str): Descripción del movimiento bancario
         categorias_disponibles (dict): Diccionario de categorías disponibles {id: nombre}
+        modelo: ID del modelo de IA a usar (None = usa GOOGLE_API_MODEL env var).
     
     Returns:
         dict: Información de la categoría asignada {'id': int, 'nombre': str} o None si no se pudo asignar
@@ -272,7 +333,7 @@ def asignar_categoria_automatica(descripcion_movimiento, categorias_disponibles)
         logger.info(f"Asignando categoría automática para: '{descripcion_movimiento}'")
         
         # Configurar el modelo de IA
-        model = get_llm_model()
+        model = get_llm_model(modelo)
         
         # Preparar lista de categorías para el prompt
         categorias_lista = "\n".join([f"- {cat_id}: {nombre}" for cat_id, nombre in categorias_disponibles.items()])
@@ -296,6 +357,7 @@ def asignar_categoria_automatica(descripcion_movimiento, categorias_disponibles)
         """
 
         # Hacer la consulta a Gemini
+        limitador_llm.adquirir()
         response = model.predict(prompt)
         
         # Limpiar y procesar la respuesta
@@ -322,57 +384,216 @@ def asignar_categoria_automatica(descripcion_movimiento, categorias_disponibles)
         logger.error(f"Error en asignación automática de categoría: {str(e)}")
         return None
 
-def asignar_categorias_en_lotes(movimientos_gastos, categorias_disponibles, tamaño_lote=3, delay_entre_lotes=2):
+def clasificar_lote_categorias(movimientos, categorias_disponibles, model):
     """
-    Procesa la asignación de categorías en lotes para evitar límites de API.
-    
+    Clasifica varios movimientos con una sola llamada al modelo.
+
+    Args:
+        movimientos (list): Lista de tuplas (id, movimiento); el id es un str único en el lote
+        categorias_disponibles (dict): Diccionario de categorías disponibles {id: nombre}
+        model: Modelo de chat de LangChain (ver get_llm_model)
+
+    Returns:
+        dict: {id: {'id': int, 'nombre': str} o None si la IA respondió NINGUNA}.
+        Los movimientos cuya respuesta falta o no es válida no aparecen.
+    """
+    parser = JsonOutputParser(pydantic_object=AsignacionCategoriasLote)
+    prompt = PromptTemplate(
+        template="""
+        Eres un asistente contable. Asigna a cada movimiento bancario la categoría de gasto más apropiada.
+
+        CATEGORÍAS DISPONIBLES:
+        {categorias}
+
+        MOVIMIENTOS (id | descripción | monto):
+        {movimientos}
+
+        INSTRUCCIONES:
+        1. Devuelve exactamente una asignación por cada id de la lista
+        2. Usa ÚNICAMENTE IDs de categoría de la lista de categorías
+        3. Si ninguna categoría es apropiada para un movimiento, usa "NINGUNA"
+
+        {format_instructions}
+        """,
+        input_variables=["categorias", "movimientos"],
+        partial_variables={"format_instructions": parser.get_format_instructions()},
+    )
+    chain = prompt | model | parser
+
+    limitador_llm.adquirir()
+    resultado = chain.invoke({
+        "categorias": "\n".join(f"- {cat_id}: {nombre}" for cat_id, nombre in categorias_disponibles.items()),
+        "movimientos": "\n".join(
+            f"{id_mov} | {mov.get('descripcion', '').strip()} | {mov.get('monto', 0)}" for id_mov, mov in movimientos
+        ),
+    })
+
+    ids = {id_mov for id_mov, _ in movimientos}
+    asignadas = {}
+    respuesta = resultado.get('asignaciones', []) if isinstance(resultado, dict) else []
+    for asignacion in respuesta:
+        if not isinstance(asignacion, dict):
+            continue
+        id_mov = str(asignacion.get('id', '')).strip()
+        categoria_id = str(asignacion.get('categoria_id', '')).strip()
+        if id_mov not in ids or id_mov in asignadas:
+            continue
+        if categoria_id.upper() in ['NINGUNA', 'NONE', 'N/A', 'NO']:
+            asignadas[id_mov] = None
+        elif categoria_id in categorias_disponibles:
+            asignadas[id_mov] = {'id': int(categoria_id), 'nombre': categorias_disponibles[categoria_id]}
+        else:
+            logger.warning(f"⚠️ IA devolvió ID inválido para el movimiento {id_mov}: {categoria_id}")
+    return asignadas
+
+def asignar_categorias_locales(movimientos_gastos, categorias_disponibles):
+    """
+    Etapa local de la asignación: memo de descripciones y modelo entrenado
+    (gastos.services.categorizador_service). No llama a la IA y funciona sin
+    conexión.
+
     Args:
         movimientos_gastos (list): Lista de tuplas (índice, movimiento) a procesar
         categorias_disponibles (dict): Diccionario de categorías disponibles
-        tamaño_lote (int): Número de movimientos a procesar por lote
-        delay_entre_lotes (int): Segundos de espera entre lotes
-    
+
+    Returns:
+        list: Tuplas (índice, movimiento) que quedaron sin categoría; modifica los demás in-place
+    """
+    from gastos.services.categorizador_service import CategorizadorGastos
+
+    try:
+        locales = CategorizadorGastos.clasificar(
+            [movimiento.get('descripcion', '') for _, movimiento in movimientos_gastos], categorias_disponibles
+        )
+    except Exception as e:
+        logger.error(f"❌ Error en la categorización local: {str(e)}")
+        return list(movimientos_gastos)
+
+    restantes = []
+    for (indice, movimiento), categoria_info in zip(movimientos_gastos, locales):
+        if categoria_info:
+            movimiento['categoria_sugerida'] = categoria_info
+        else:
+            restantes.append((indice, movimiento))
+    logger.info(f"Categorización local: {len(movimientos_gastos) - len(restantes)}/{len(movimientos_gastos)} movimientos resueltos")
+    return restantes
+
+def asignar_categorias_en_lotes(movimientos_gastos, categorias_disponibles, tamaño_lote=CATEGORIAS_TAMANO_LOTE,
+                                concurrencia=CATEGORIAS_CONCURRENCIA, modelo=None, usar_local=True):
+    """
+    Asigna categorías enviando lotes de movimientos en un solo prompt cada uno.
+
+    Si `usar_local`, primero resuelve lo que puede asignar_categorias_locales
+    y solo envía a la IA el resto. Los lotes corren en paralelo (hasta
+    `concurrencia`) y todas las llamadas pasan por limitador_llm, que espera
+    solo lo necesario para respetar el límite de la API. Un lote cuya
+    llamada falla se reintenta hasta CATEGORIAS_REINTENTOS veces con espera
+    exponencial y, si sigue fallando, se envía en dos mitades. Solo los
+    movimientos que el modelo omitió o respondió con un ID inválido, o los
+    de una mitad que también falló, se reintentan uno por uno con
+    asignar_categoria_automatica. Las categorías que asigna la IA se
+    memorizan para los siguientes estados de cuenta.
+
+    Args:
+        movimientos_gastos (list): Lista de tuplas (índice, movimiento) a procesar
+        categorias_disponibles (dict): Diccionario de categorías disponibles
+        tamaño_lote (int): Número de movimientos por prompt
+        concurrencia (int): Número máximo de prompts simultáneos
+        modelo: ID del modelo de IA a usar (None = usa GOOGLE_API_MODEL env var).
+        usar_local (bool): Aplicar antes el memo y el modelo local
+
     Returns:
-        None: Modifica los movimientos in-place
+        dict: Conteos {'locales', 'asignadas', 'sin_categoria', 'individuales'}; modifica los movimientos in-place
     """
+    resumen = {'locales': 0, 'asignadas': 0, 'sin_categoria': 0, 'individuales': 0}
+    if usar_local:
+        restantes = asignar_categorias_locales(movimientos_gastos, categorias_disponibles)
+        resumen['locales'] = resumen['asignadas'] = len(movimientos_gastos) - len(restantes)
+        movimientos_gastos = restantes
+    if not movimientos_gastos:
+        logger.info(f"=== ASIGNACIÓN COMPLETADA SIN IA: {resumen} ===")
+        return resumen
+
     total_movimientos = len(movimientos_gastos)
+    lotes = [
+        [(str(indice), movimiento) for indice, movimiento in movimientos_gastos[i:i + tamaño_lote]]
+        for i in range(0, total_movimientos, tamaño_lote)
+    ]
     logger.info(f"=== PROCESAMIENTO EN LOTES ===")
-    logger.info(f"Total de movimientos a procesar: {total_movimientos}")
-    logger.info(f"Tamaño de lote: {tamaño_lote}")
-    logger.info(f"Delay entre lotes: {delay_entre_lotes} segundos")
-    
-    for i in range(0, total_movimientos, tamaño_lote):
-        lote = movimientos_gastos[i:i+tamaño_lote]
-        numero_lote = (i // tamaño_lote) + 1
-        total_lotes = (total_movimientos + tamaño_lote - 1) // tamaño_lote
-        
-        logger.info(f"--- Procesando lote {numero_lote}/{total_lotes} ({len(lote)} movimientos) ---")
-        
-        for idx_en_lote, (indice_original, movimiento) in enumerate(lote):
-            descripcion_movimiento = movimiento.get('descripcion', '')
-            monto = movimiento.get('monto', 0)
-            
-            logger.info(f"Procesando {idx_en_lote + 1}/{len(lote)} en lote {numero_lote}: '{descripcion_movimiento}' (${monto})")
-            
+    logger.info(f"Total de movimientos a procesar: {total_movimientos} en {len(lotes)} lotes de hasta {tamaño_lote}")
+
+    model = get_llm_model(modelo)
+
+    def clasificar_con_reintentos(numero_lote, lote):
+        # Cada intento vuelve a pasar por limitador_llm (clasificar_lote_categorias)
+        for intento in range(CATEGORIAS_REINTENTOS + 1):
             try:
-                categoria_info = asignar_categoria_automatica(descripcion_movimiento, categorias_disponibles)
-                
-                if categoria_info:
-                    movimiento['categoria_sugerida'] = categoria_info
-                    logger.info(f"✅ Categoría asignada: {categoria_info['nombre']} (ID: {categoria_info['id']})")
-                else:
-                    logger.info(f"⚠️ No se pudo asignar categoría")
-                    
+                return clasificar_lote_categorias(lote, categorias_disponibles, model)
             except Exception as e:
-                logger.error(f"❌ Error al procesar movimiento: {str(e)}")
-                continue
-        
-        # Delay entre lotes (excepto el último)
-        if i + tamaño_lote < total_movimientos:
-            logger.info(f"⏳ Esperando {delay_entre_lotes} segundos antes del siguiente lote...")
-            time.sleep(delay_entre_lotes)
-    
-    logger.info(f"=== PROCESAMIENTO EN LOTES COMPLETADO ===")
+                if intento == CATEGORIAS_REINTENTOS:
+                    raise
+                espera = CATEGORIAS_ESPERA_REINTENTO * 2 ** intento
+                logger.warning(f"⚠️ Lote {numero_lote}/{len(lotes)} falló ({str(e)}); reintento {intento + 1} en {espera:.1f}s")
+                time.sleep(espera)
+
+    def procesar(numero_lote, lote):
+        try:
+            asignadas = clasificar_con_reintentos(numero_lote, lote)
+            logger.info(f"--- Lote {numero_lote}/{len(lotes)}: {len(asignadas)}/{len(lote)} respuestas válidas ---")
+            return asignadas
+        except Exception as e:
+            logger.error(f"❌ Error al procesar el lote {numero_lote}/{len(lotes)}: {str(e)}")
+        if len(lote) < 2:
+            return {}
+        # Un lote grande puede devolver JSON truncado o inválido: se prueba en dos mitades
+        asignadas = {}
+        mitad = len(lote) // 2
+        for parte in (lote[:mitad], lote[mitad:]):
+            try:
+                asignadas.update(clasificar_lote_categorias(parte, categorias_disponibles, model))
+            except Exception as e:
+                logger.error(f"❌ Error en la mitad del lote {numero_lote}/{len(lotes)} ({len(parte)} movimientos): {str(e)}")
+        return asignadas
+
+    asignadas = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrencia, len(lotes) or 1))) as executor:
+        for resultado in executor.map(procesar, range(1, len(lotes) + 1), lotes):
+            asignadas.update(resultado)
+
+    pendientes = []
+    aprendidas = []
+    for id_mov, movimiento in (par for lote in lotes for par in lote):
+        if id_mov not in asignadas:
+            pendientes.append(movimiento)
+        elif asignadas[id_mov]:
+            movimiento['categoria_sugerida'] = asignadas[id_mov]
+            aprendidas.append((movimiento.get('descripcion', ''), asignadas[id_mov]['id']))
+            resumen['asignadas'] += 1
+        else:
+            resumen['sin_categoria'] += 1
+
+    if pendientes:
+        logger.warning(f"⚠️ {len(pendientes)} movimientos sin respuesta válida; procesando uno por uno...")
+    for movimiento in pendientes:
+        resumen['individuales'] += 1
+        categoria_info = asignar_categoria_automatica(movimiento.get('descripcion', ''), categorias_disponibles, modelo)
+        if categoria_info:
+            movimiento['categoria_sugerida'] = categoria_info
+            aprendidas.append((movimiento.get('descripcion', ''), categoria_info['id']))
+            resumen['asignadas'] += 1
+        else:
+            resumen['sin_categoria'] += 1
+
+    if aprendidas:
+        try:
+            from gastos.models import MemoCategoriaGasto
+            from gastos.services.categorizador_service import CategorizadorGastos
+            CategorizadorGastos.memorizar(aprendidas, MemoCategoriaGasto.Origen.IA)
+        except Exception as e:
+            logger.error(f"❌ Error al memorizar las categorías de la IA: {str(e)}")
+
+    logger.info(f"=== PROCESAMIENTO EN LOTES COMPLETADO: {resumen} ===")
+    return resumen
 
 def reconocer_estado_cuenta_pdf(pdf_file, asignar_categorias_automaticamente=False, modelo=None):
     """
@@ -380,7 +601,7 @@ def reconocer_estado_cuenta_pdf(pdf_file, asignar_categorias_automaticamente=Fal
 
     Args:
         pdf_file: Un objeto de archivo PDF del estado de cuenta.
-        asignar_categorias_automaticamente: Si es True, intenta asignar categorías automáticamente (puede ser lento).
+        asignar_categorias_automaticamente: Si es True, asigna categorías a los gastos con un prompt por lote de movimientos.
         modelo: ID del modelo de IA a usar (None = usa GOOGLE_API_MODEL env var).
 
     Returns:
@@ -477,7 +698,6 @@ def reconocer_estado_cuenta_pdf(pdf_file, asignar_categorias_automaticamente=Fal
             # Solo procesar categorías automáticamente si se solicita
             if movimientos and asignar_categorias_automaticamente:
                 logger.info("=== INICIANDO ASIGNACIÓN AUTOMÁTICA DE CATEGORÍAS ===")
-                logger.warning("⚠️ ATENCIÓN: La asignación automática puede exceder los límites de la API de Gemini")
                 
                 # Obtener categorías disponibles
                 categorias_disponibles = obtener_categorias_disponibles()
@@ -491,42 +711,8 @@ def reconocer_estado_cuenta_pdf(pdf_file, asignar_categorias_automaticamente=Fal
                     
                     logger.info(f"Movimientos de gastos a procesar: {len(gastos_a_procesar)} de {len(movimientos)} total")
                     
-                    if len(gastos_a_procesar) > 15:
-                        logger.warning(f"⚠️ ADVERTENCIA: Se detectaron {len(gastos_a_procesar)} movimientos.")
-                        logger.warning("⚠️ Esto puede exceder significativamente el límite de la API de Gemini (15 peticiones/minuto).")
-                        logger.warning("⚠️ Procesando en lotes pequeños con delays para evitar errores...")
-                        
-                        # Usar procesamiento en lotes para muchos movimientos
-                        asignar_categorias_en_lotes(gastos_a_procesar, categorias_disponibles, tamaño_lote=2, delay_entre_lotes=5)
-                        
-                    elif len(gastos_a_procesar) > 5:
-                        logger.warning(f"⚠️ Procesando {len(gastos_a_procesar)} movimientos en lotes pequeños...")
-                        
-                        # Usar procesamiento en lotes con delay menor
-                        asignar_categorias_en_lotes(gastos_a_procesar, categorias_disponibles, tamaño_lote=3, delay_entre_lotes=3)
-                        
-                    else:
-                        logger.info(f"Procesando {len(gastos_a_procesar)} movimientos secuencialmente...")
-                        
-                        # Procesar normalmente para pocos movimientos
-                        for idx, (i, movimiento) in enumerate(gastos_a_procesar):
-                            descripcion = movimiento.get('descripcion', '')
-                            monto = movimiento.get('monto', 0)
-                            
-                            logger.info(f"Procesando gasto {idx+1}/{len(gastos_a_procesar)}: '{descripcion}' (${monto})")
-                            
-                            try:
-                                categoria_info = asignar_categoria_automatica(descripcion, categorias_disponibles)
-                                
-                                if categoria_info:
-                                    movimiento['categoria_sugerida'] = categoria_info
-                                    logger.info(f"✅ Categoría asignada: {categoria_info['nombre']} (ID: {categoria_info['id']})")
-                                else:
-                                    logger.info(f"⚠️ No se pudo asignar categoría")
-                                    
-                            except Exception as e:
-                                logger.error(f"❌ Error al procesar movimiento {idx+1}: {str(e)}")
-                                continue
+                    if gastos_a_procesar:
+                        asignar_categorias_en_lotes(gastos_a_procesar, categorias_disponibles, modelo=modelo)
                     
                     logger.info("=== ASIGNACIÓN DE CATEGORÍAS COMPLETADA ===")
                 else:
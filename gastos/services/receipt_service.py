@@ -1,43 +1,216 @@
 import hashlib
 import logging
+import os
+import socket
+import time
+from datetime import timedelta
 from pathlib import Path
 
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
 
 from gastos.models import ComprobanteGasto
-from gastos.services.receipt_ocr_service import extract_receipt_fields, read_receipt
+from gastos.services.receipt_ocr_service import decode_image, extract_receipt_fields, recognize_batch
 
 logger = logging.getLogger(__name__)
 
+# States whose OCR result can be copied to a receipt with the same sha256.
+REUSABLE_STATES = (ComprobanteGasto.Estado.REVISION, ComprobanteGasto.Estado.REGISTRADO)
+OPEN_STATES = (ComprobanteGasto.Estado.PENDIENTE, ComprobanteGasto.Estado.PROCESANDO,
+               ComprobanteGasto.Estado.REVISION)
+
+class DuplicateReceiptError(ValueError):
+    """The uploaded file is byte-identical to a receipt already recorded as an expense."""
+    def __init__(self, receipt):
+        self.receipt = receipt
+        super().__init__(f'Receipt already recorded: {receipt.pk}')
+
+def _copy_result(receipt, source):
+    """Reuses the OCR output of an identical file; no inference, no stage timings."""
+    receipt.texto_ocr, receipt.datos_extraidos, receipt.confianza = source.texto_ocr, dict(source.datos_extraidos), source.confianza
+    receipt.duplicado_de_id = source.duplicado_de_id or source.pk
+    receipt.estado, receipt.procesado_en, receipt.tiempos_ocr = ComprobanteGasto.Estado.REVISION, timezone.now(), {}
+
+def _claim_cutoff():
+    """Receipts claimed before this moment and still in PROCESANDO were abandoned by their worker."""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'COMPROBANTE_OCR_TIMEOUT', 900))
+
+def _abandoned(receipt):
+    return receipt.estado == ComprobanteGasto.Estado.PROCESANDO and (
+        receipt.reclamado_en is None or receipt.reclamado_en < _claim_cutoff())
+
 def create_receipt(upload, user):
+    """
+    Stores the upload unless its sha256 is already known: a file recorded as an
+    expense raises DuplicateReceiptError, the uploader's own open receipt is
+    returned as is (a failed one, or one abandoned in PROCESANDO, is requeued
+    first), and a finished result from anyone is copied instead of queued.
+    """
     digest = hashlib.sha256()
     for chunk in upload.chunks():
         digest.update(chunk)
     upload.seek(0)
-    receipt = ComprobanteGasto(archivo=upload, nombre_original=upload.name[:255], content_type=upload.content_type or '', tamano_bytes=upload.size, sha256=digest.hexdigest(), creado_por=user)
+    sha256 = digest.hexdigest()
+    previous = list(ComprobanteGasto.objects.filter(sha256=sha256).order_by('creado_en'))
+    recorded = next((r for r in previous if r.estado == ComprobanteGasto.Estado.REGISTRADO), None)
+    if recorded is not None:
+        raise DuplicateReceiptError(recorded)
+    own = [r for r in previous if r.creado_por_id == user.pk and r.estado in OPEN_STATES and not _abandoned(r)]
+    if own:
+        return own[-1]
+    source = next((r for r in previous if r.estado in REUSABLE_STATES and r.texto_ocr), None)
+    failed = [r for r in previous if r.creado_por_id == user.pk
+              and (r.estado == ComprobanteGasto.Estado.ERROR or _abandoned(r))]
+    if failed:
+        # Re-uploading a failed or abandoned file retries it with the stored copy
+        receipt = failed[-1]
+        receipt.estado, receipt.error_procesamiento, receipt.procesado_en, receipt.tiempos_ocr = ComprobanteGasto.Estado.PENDIENTE, '', None, {}
+        receipt.reclamado_en, receipt.reclamado_por = None, ''
+        if source is not None:
+            _copy_result(receipt, source)
+        receipt.save()
+        return receipt
+    receipt = ComprobanteGasto(archivo=upload, nombre_original=upload.name[:255], content_type=upload.content_type or '', tamano_bytes=upload.size, sha256=sha256, creado_por=user)
+    if source is not None:
+        _copy_result(receipt, source)
     receipt.save()
     return receipt
 
-def process_next_receipt():
-    """Claims one job safely; multiple workers can run concurrently on MySQL 8."""
+def ocr_cache_stats():
+    """Receipts with an OCR result, split into copied (sha256 hit) and inferred."""
+    stats = ComprobanteGasto.objects.filter(estado__in=REUSABLE_STATES).aggregate(
+        con_resultado=Count('pk'),
+        reutilizados=Count('pk', filter=Q(duplicado_de__isnull=False)),
+        archivos_unicos=Count('sha256', distinct=True),
+    )
+    stats['inferidos'] = stats['con_resultado'] - stats['reutilizados']
+    stats['tasa_reutilizacion'] = round(stats['reutilizados'] * 100 / stats['con_resultado'], 1) if stats['con_resultado'] else 0
+    return stats
+
+def _cached_sources(receipts):
+    """Oldest finished receipt per sha256 among the claimed ones (one indexed query)."""
+    sources = {}
+    queryset = (ComprobanteGasto.objects.filter(sha256__in={r.sha256 for r in receipts}, estado__in=REUSABLE_STATES)
+                .exclude(texto_ocr='').order_by('creado_en')
+                .only('pk', 'sha256', 'texto_ocr', 'datos_extraidos', 'confianza', 'duplicado_de_id'))
+    for source in queryset:
+        sources.setdefault(source.sha256, source)
+    return sources
+
+def worker_id(pid=None):
+    """host:pid stored in `reclamado_por`, so a supervisor can release a dead worker's batch."""
+    return f'{socket.gethostname()}:{pid or os.getpid()}'
+
+def claim_receipts(limit=1):
+    """
+    Claims up to `limit` jobs at once; multiple workers can run concurrently on MySQL 8.
+    Receipts left in PROCESANDO for more than COMPROBANTE_OCR_TIMEOUT seconds (the
+    worker was killed mid-batch) are claimed again.
+    """
+    now, stale = timezone.now(), _claim_cutoff()
+    claimed_by = worker_id()
     with transaction.atomic():
-        receipt = (ComprobanteGasto.objects.select_for_update(skip_locked=True)
-                   .filter(estado=ComprobanteGasto.Estado.PENDIENTE)
-                   .order_by('creado_en').first())
-        if receipt is None:
-            return None
-        receipt.estado = ComprobanteGasto.Estado.PROCESANDO
-        receipt.error_procesamiento = ''
-        receipt.save(update_fields=['estado', 'error_procesamiento'])
+        receipts = list(ComprobanteGasto.objects.select_for_update(skip_locked=True)
+                        .filter(Q(estado=ComprobanteGasto.Estado.PENDIENTE)
+                                | Q(estado=ComprobanteGasto.Estado.PROCESANDO, reclamado_en__lt=stale)
+                                | Q(estado=ComprobanteGasto.Estado.PROCESANDO, reclamado_en__isnull=True))
+                        .order_by('creado_en')[:limit])
+        if receipts:
+            ComprobanteGasto.objects.filter(pk__in=[receipt.pk for receipt in receipts]).update(
+                estado=ComprobanteGasto.Estado.PROCESANDO, error_procesamiento='',
+                reclamado_en=now, reclamado_por=claimed_by)
+    for receipt in receipts:
+        if receipt.estado == ComprobanteGasto.Estado.PROCESANDO:
+            logger.warning('Receipt %s abandoned by %s since %s; claiming it again',
+                           receipt.pk, receipt.reclamado_por or 'unknown worker', receipt.reclamado_en)
+        receipt.estado, receipt.error_procesamiento = ComprobanteGasto.Estado.PROCESANDO, ''
+        receipt.reclamado_en, receipt.reclamado_por = now, claimed_by
+    return receipts
+
+def release_claims(worker):
+    """Puts the receipts `worker` left in PROCESANDO back in the queue; returns how many."""
+    return ComprobanteGasto.objects.filter(estado=ComprobanteGasto.Estado.PROCESANDO, reclamado_por=worker).update(
+        estado=ComprobanteGasto.Estado.PENDIENTE, reclamado_en=None, reclamado_por='')
+
+def _elapsed(start):
+    return round(time.perf_counter() - start, 4)
+
+def _fail(receipt, exc):
+    logger.error('OCR failed for receipt %s: %s', receipt.pk, exc, exc_info=exc)
+    receipt.estado, receipt.error_procesamiento, receipt.procesado_en = ComprobanteGasto.Estado.ERROR, str(exc)[:2000], timezone.now()
+    receipt.save(update_fields=['estado', 'error_procesamiento', 'procesado_en', 'tiempos_ocr'])
+
+def _recognize(images):
+    """Batched predict(); if the batch fails, retries image by image so one bad file only fails itself."""
+    start = time.perf_counter()
+    try:
+        texts = recognize_batch(images)
+        seconds = _elapsed(start) / len(images)
+        return [(text, seconds) for text in texts]
+    except Exception:
+        if len(images) == 1:
+            raise
+        logger.exception('Batched OCR failed for %s images; retrying one by one', len(images))
+    results = []
+    for image in images:
+        start = time.perf_counter()
+        try:
+            results.append((recognize_batch([image])[0], _elapsed(start)))
+        except Exception as exc:
+            results.append((exc, _elapsed(start)))
+    return results
+
+def process_receipt_batch(limit=1):
+    """
+    Claims up to `limit` receipts and runs them through one batched inference;
+    receipts whose sha256 already has a finished result copy it instead.
+    Per-stage seconds are stored in `tiempos_ocr`: decode, ocr (detection and
+    recognition run inside the same PaddleOCR pipeline call, so the batch time is
+    split evenly across its images) and parse.
+    """
+    receipts = claim_receipts(limit)
+    sources = _cached_sources(receipts) if receipts else {}
+    decoded = []
+    for receipt in receipts:
+        if receipt.sha256 in sources:
+            _copy_result(receipt, sources[receipt.sha256])
+            receipt.save(update_fields=['texto_ocr', 'datos_extraidos', 'confianza', 'duplicado_de', 'estado', 'procesado_en', 'tiempos_ocr'])
+            continue
+        start = time.perf_counter()
+        try:
+            image = decode_image(Path(receipt.archivo.path))
+        except Exception as exc:
+            receipt.tiempos_ocr = {'decode': _elapsed(start)}
+            _fail(receipt, exc)
+            continue
+        receipt.tiempos_ocr = {'decode': _elapsed(start), 'lote': len(receipts)}
+        decoded.append((receipt, image))
+    if not decoded:
+        return receipts
     try:
-        text = read_receipt(Path(receipt.archivo.path))
-        fields = extract_receipt_fields(text)
+        results = _recognize([image for _, image in decoded])
+    except Exception as exc:
+        results = [(exc, 0)] * len(decoded)
+    for (receipt, _), (text, seconds) in zip(decoded, results):
+        receipt.tiempos_ocr['ocr'] = seconds
+        if isinstance(text, Exception):
+            _fail(receipt, text)
+            continue
+        start = time.perf_counter()
+        try:
+            fields = extract_receipt_fields(text)
+        except Exception as exc:
+            _fail(receipt, exc)
+            continue
+        receipt.tiempos_ocr['parse'] = _elapsed(start)
         receipt.texto_ocr, receipt.datos_extraidos, receipt.confianza = text, fields, fields['confianza']
         receipt.estado, receipt.procesado_en = ComprobanteGasto.Estado.REVISION, timezone.now()
-        receipt.save(update_fields=['texto_ocr', 'datos_extraidos', 'confianza', 'estado', 'procesado_en'])
-    except Exception as exc:
-        logger.exception('OCR failed for receipt %s', receipt.pk)
-        receipt.estado, receipt.error_procesamiento, receipt.procesado_en = ComprobanteGasto.Estado.ERROR, str(exc)[:2000], timezone.now()
-        receipt.save(update_fields=['estado', 'error_procesamiento', 'procesado_en'])
-    return receipt
+        receipt.save(update_fields=['texto_ocr', 'datos_extraidos', 'confianza', 'estado', 'procesado_en', 'tiempos_ocr'])
+    return receipts
+
+def process_next_receipt():
+    """Claims and processes a single job; used by the in-process DEBUG worker."""
+    receipts = process_receipt_batch(1)
+    return receipts[0] if receipts else None
@@ -0,0 +1,173 @@
+"""
+Libro diario de saldos por cuenta (MovimientoDiarioCuenta)
+
+Las señales de Gastos y Compra aplican cada alta, cambio o baja como un
+delta sobre la fila (cuenta, fecha) del libro. Los saldos mensuales y las
+series del reporte de Excel se leen del libro; `reconstruir` y `verificar`
+lo comparan contra las tablas originales.
+"""
+
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import ExtractMonth
+
+from gastos.models import Compra, Gastos, MovimientoDiarioCuenta, SaldoMensual
+
+logger = logging.getLogger(__name__)
+
+CERO = Decimal('0.00')
+
+
+class LibroSaldosService:
+    """Mantiene y consulta el libro diario de gastos y compras por cuenta"""
+
+    # Tabla de origen de cada columna del libro: (modelo, cuenta, fecha, monto)
+    ORIGENES = {
+        'gastos': (Gastos, 'id_cuenta_banco_id', 'fecha', 'monto'),
+        'compras': (Compra, 'cuenta_id', 'fecha_compra', 'monto_total'),
+    }
+
+    @staticmethod
+    def aplicar(cuenta_id: int, fecha, gastos: Decimal = CERO, compras: Decimal = CERO) -> None:
+        """
+        Suma un delta a la fila (cuenta, fecha). El UPDATE con F() es atómico,
+        así que dos movimientos simultáneos del mismo día no se pisan.
+        """
+        if cuenta_id is None or fecha is None or (not gastos and not compras):
+            return
+        filtro = MovimientoDiarioCuenta.objects.filter(cuenta_id=cuenta_id, fecha=fecha)
+        if filtro.update(gastos=F('gastos') + gastos, compras=F('compras') + compras):
+            return
+        if gastos <= 0 and compras <= 0:
+            # Retirar un movimiento de un día sin fila: la fila ya se borró en
+            # cascada con la cuenta; crearla de nuevo dejaría una referencia rota.
+            return
+        try:
+            with transaction.atomic():
+                MovimientoDiarioCuenta.objects.create(
+                    cuenta_id=cuenta_id, fecha=fecha, gastos=gastos, compras=compras
+                )
+        except IntegrityError:
+            # Otro proceso creó la fila entre el UPDATE y el INSERT
+            filtro.update(gastos=F('gastos') + gastos, compras=F('compras') + compras)
+
+    @staticmethod
+    def totales_mensuales(year: int, cuenta_ids: Optional[Iterable[int]] = None) -> Dict[Tuple[int, int], Dict[str, float]]:
+        """Gastos y compras del año por (cuenta, mes) en una consulta sobre el libro"""
+        movimientos = MovimientoDiarioCuenta.objects.filter(fecha__year=year)
+        if cuenta_ids is not None:
+            movimientos = movimientos.filter(cuenta_id__in=list(cuenta_ids))
+        filas = (movimientos.annotate(mes=ExtractMonth('fecha'))
+                 .values('cuenta_id', 'mes')
+                 .annotate(total_gastos=Sum('gastos'), total_compras=Sum('compras'))
+                 .order_by())
+        return {
+            (fila['cuenta_id'], fila['mes']): {
+                'gastos': float(fila['total_gastos'] or 0),
+                'compras': float(fila['total_compras'] or 0),
+            }
+            for fila in filas
+        }
+
+    # =========================================================================
+    # Verificación y reconstrucción
+    # =========================================================================
+
+    @classmethod
+    def _totales_origen(cls, cuenta_ids: Optional[List[int]] = None) -> Dict[Tuple[int, object], Dict[str, Decimal]]:
+        """Totales por (cuenta, fecha) calculados desde Gastos y Compra"""
+        totales = defaultdict(lambda: {'gastos': CERO, 'compras': CERO})
+        for columna, (modelo, cuenta, fecha, monto) in cls.ORIGENES.items():
+            queryset = modelo.objects.filter(**{f'{cuenta}__isnull': False})
+            if cuenta_ids is not None:
+                queryset = queryset.filter(**{f'{cuenta}__in': cuenta_ids})
+            filas = queryset.values(cuenta, fecha).annotate(total=Sum(monto)).order_by()
+            for fila in filas:
+                totales[(fila[cuenta], fila[fecha])][columna] += fila['total'] or CERO
+        return totales
+
+    @classmethod
+    def _totales_libro(cls, cuenta_ids: Optional[List[int]] = None) -> Dict[Tuple[int, object], Dict[str, Decimal]]:
+        movimientos = MovimientoDiarioCuenta.objects.all()
+        if cuenta_ids is not None:
+            movimientos = movimientos.filter(cuenta_id__in=cuenta_ids)
+        return {
+            (cuenta_id, fecha): {'gastos': gastos, 'compras': compras}
+            for cuenta_id, fecha, gastos, compras in movimientos.values_list(
+                'cuenta_id', 'fecha', 'gastos', 'compras'
+            )
+        }
+
+    @classmethod
+    def verificar(cls, cuenta_ids: Optional[Iterable[int]] = None) -> List[dict]:
+        """
+        Compara el libro contra las tablas originales. Devuelve una diferencia
+        por (cuenta, fecha) que no coincide; una fila en cero equivale a no
+        tener fila.
+        """
+        cuenta_ids = list(cuenta_ids) if cuenta_ids is not None else None
+        esperado = cls._totales_origen(cuenta_ids)
+        libro = cls._totales_libro(cuenta_ids)
+        vacio = {'gastos': CERO, 'compras': CERO}
+
+        diferencias = []
+        for clave in sorted(set(esperado) | set(libro)):
+            origen, actual = esperado.get(clave, vacio), libro.get(clave, vacio)
+            if origen['gastos'] != actual['gastos'] or origen['compras'] != actual['compras']:
+                diferencias.append({
+                    'cuenta_id': clave[0], 'fecha': clave[1],
+                    'esperado': dict(origen), 'libro': dict(actual),
+                })
+        return diferencias
+
+    @classmethod
+    @transaction.atomic
+    def reconstruir(cls, cuenta_ids: Optional[Iterable[int]] = None) -> int:
+        """Regenera el libro desde Gastos y Compra; devuelve las filas creadas"""
+        cuenta_ids = list(cuenta_ids) if cuenta_ids is not None else None
+        existentes = MovimientoDiarioCuenta.objects.all()
+        if cuenta_ids is not None:
+            existentes = existentes.filter(cuenta_id__in=cuenta_ids)
+        existentes.delete()
+
+        filas = [
+            MovimientoDiarioCuenta(cuenta_id=cuenta_id, fecha=fecha, **totales)
+            for (cuenta_id, fecha), totales in cls._totales_origen(cuenta_ids).items()
+        ]
+        MovimientoDiarioCuenta.objects.bulk_create(filas, batch_size=1000)
+        logger.info(f"Libro de saldos reconstruido: {len(filas)} filas")
+        return len(filas)
+
+    # =========================================================================
+    # Saldos mensuales
+    # =========================================================================
+
+    @staticmethod
+    def encadenar_saldos_mensuales(cuenta_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Recalcula el saldo final de cada SaldoMensual y lo arrastra como saldo
+        inicial del mes siguiente cuando ese mes ya está registrado.
+        """
+        saldos = SaldoMensual.objects.order_by('cuenta_id', 'año', 'mes')
+        if cuenta_ids is not None:
+            saldos = saldos.filter(cuenta_id__in=list(cuenta_ids))
+
+        actualizados = 0
+        anterior = None
+        for saldo in saldos:
+            consecutivo = (
+                anterior is not None
+                and anterior.cuenta_id == saldo.cuenta_id
+                and (anterior.año * 12 + anterior.mes) + 1 == saldo.año * 12 + saldo.mes
+            )
+            if consecutivo:
+                saldo.saldo_inicial = anterior.saldo_final
+            saldo.calcular_saldo_final()
+            actualizados += 1
+            anterior = saldo
+        return actualizados
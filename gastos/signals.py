@@ -0,0 +1,78 @@
+"""
+gastos/signals.py
+
+Señales que mantienen el libro diario de saldos (MovimientoDiarioCuenta).
+
+- pre_save Gastos/Compra   → recuerda cuenta, fecha y monto guardados antes
+                             del cambio.
+- post_save Gastos/Compra  → retira el movimiento anterior y aplica el nuevo.
+- post_delete Gastos/Compra → retira el movimiento.
+
+Los deltas se aplican en la misma transacción que el movimiento, así que un
+rollback también deshace el cambio en el libro.
+"""
+
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+
+def _campos(sender):
+    """(columna del libro, campo cuenta, campo fecha, campo monto) del modelo"""
+    from .services.saldos_service import LibroSaldosService
+
+    columna = 'gastos' if sender._meta.model_name == 'gastos' else 'compras'
+    return (columna,) + LibroSaldosService.ORIGENES[columna][1:]
+
+
+def _movimiento(sender, valores):
+    """(columna, cuenta_id, fecha, monto) normalizados de un Gasto o Compra"""
+    columna, cuenta, fecha, monto = _campos(sender)
+    cuenta_id, fecha_valor, monto_valor = valores(cuenta), valores(fecha), valores(monto)
+    # fecha tiene default=timezone.now: antes de recargar puede ser un datetime
+    fecha_valor = sender._meta.get_field(fecha).to_python(fecha_valor)
+    monto_valor = getattr(monto_valor, 'amount', monto_valor)
+    return columna, cuenta_id, fecha_valor, Decimal(str(monto_valor or 0))
+
+
+def _aplicar(columna, cuenta_id, fecha, delta):
+    from .services.saldos_service import LibroSaldosService
+    LibroSaldosService.aplicar(cuenta_id, fecha, **{columna: delta})
+
+
+@receiver(pre_save, sender='gastos.Gastos')
+@receiver(pre_save, sender='gastos.Compra')
+def recordar_movimiento_previo(sender, instance, raw=False, **kwargs):
+    instance._movimiento_previo = None
+    if raw or instance.pk is None:
+        return
+    _, cuenta, fecha, monto = _campos(sender)
+    previo = sender.objects.filter(pk=instance.pk).values(cuenta, fecha, monto).first()
+    if previo is not None:
+        instance._movimiento_previo = _movimiento(sender, previo.get)
+
+
+@receiver(post_save, sender='gastos.Gastos')
+@receiver(post_save, sender='gastos.Compra')
+def actualizar_libro_saldos(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    columna, cuenta_id, fecha, monto = _movimiento(sender, lambda campo: getattr(instance, campo))
+    previo = getattr(instance, '_movimiento_previo', None)
+    instance._movimiento_previo = None
+
+    if previo is not None and (previo[1], previo[2]) == (cuenta_id, fecha):
+        # Mismo día y cuenta: un solo delta con la diferencia
+        _aplicar(columna, cuenta_id, fecha, monto - previo[3])
+        return
+    if previo is not None:
+        _aplicar(columna, previo[1], previo[2], -previo[3])
+    _aplicar(columna, cuenta_id, fecha, monto)
+
+
+@receiver(post_delete, sender='gastos.Gastos')
+@receiver(post_delete, sender='gastos.Compra')
+def retirar_del_libro_saldos(sender, instance, **kwargs):
+    columna, cuenta_id, fecha, monto = _movimiento(sender, lambda campo: getattr(instance, campo))
+    _aplicar(columna, cuenta_id, fecha, -monto)
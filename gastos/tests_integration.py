@@ -7,12 +7,16 @@ Cubre flujos completos del módulo de gastos:
   - Vistas de compras y facturas
   - Endpoint de guardar factura (con mock de Gemini AI)
   - Upload de archivos PDF
+  - Worker OCR de comprobantes por lotes (con mock de PaddleOCR)
 
 Ejecución:
     python manage.py test gastos.tests_integration --verbosity=2
 """
+import os
+import tempfile
 from datetime import date, timedelta
 from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch, MagicMock
 
 from django.contrib.auth.models import User
@@ -22,7 +26,7 @@ from djmoney.money import Money
 
 from catalogo.models import Pais, Estado, Sucursal, Productor, Producto
 from gastos.models import (
-    Banco, CatGastos, Cuenta, Gastos, Compra, SaldoMensual
+    Banco, CatGastos, ComprobanteGasto, Cuenta, Gastos, Compra, SaldoMensual
 )
 
 
@@ -411,3 +415,540 @@ class SaldoMensualTest(GastosBaseTest):
         )
         saldos = SaldoMensual.objects.filter(cuenta=self.cuenta, año=2025)
         self.assertEqual(saldos.count(), 2)
+
+
+# ---------------------------------------------------------------------------
+# Libro diario de saldos (MovimientoDiarioCuenta)
+# ---------------------------------------------------------------------------
+
+class LibroSaldosTest(GastosBaseTest):
+    """Las señales mantienen el libro con deltas y calcular_saldos lo verifica."""
+
+    def _gasto(self, monto, fecha):
+        return Gastos.objects.create(
+            id_sucursal=self.sucursal,
+            id_cat_gastos=self.cat_gastos,
+            id_cuenta_banco=self.cuenta,
+            monto=Money(monto, 'MXN'),
+            fecha=fecha
+        )
+
+    def _compra(self, cantidad, fecha):
+        return Compra.objects.create(
+            fecha_compra=fecha,
+            productor=self.productor,
+            producto=self.producto,
+            cantidad=cantidad,
+            precio_unitario=Money('10.00', 'MXN'),
+            monto_total=Money('0.00', 'MXN'),
+            cuenta=self.cuenta
+        )
+
+    def _libro(self):
+        from gastos.models import MovimientoDiarioCuenta
+        return {
+            fecha: (gastos, compras)
+            for fecha, gastos, compras in MovimientoDiarioCuenta.objects.filter(
+                cuenta=self.cuenta
+            ).values_list('fecha', 'gastos', 'compras')
+        }
+
+    def test_altas_cambios_y_bajas_se_aplican_como_deltas(self):
+        from gastos.services.saldos_service import LibroSaldosService
+        hoy = date(2026, 3, 10)
+        ayer = hoy - timedelta(days=1)
+
+        gasto = self._gasto('100.00', hoy)
+        self._gasto('50.00', hoy)
+        compra = self._compra(30, hoy)
+        self.assertEqual(self._libro(), {hoy: (Decimal('150.00'), Decimal('300.00'))})
+
+        gasto.monto = Money('40.00', 'MXN')
+        gasto.save()
+        compra.fecha_compra = ayer
+        compra.save()
+        self.assertEqual(self._libro(), {
+            hoy: (Decimal('90.00'), Decimal('0.00')),
+            ayer: (Decimal('0.00'), Decimal('300.00')),
+        })
+
+        gasto.delete()
+        self.assertEqual(self._libro()[hoy], (Decimal('50.00'), Decimal('0.00')))
+        self.assertEqual(LibroSaldosService.verificar(), [])
+
+    def test_calcular_saldo_final_lee_el_libro(self):
+        self._gasto('1000.00', date(2026, 1, 5))
+        self._gasto('250.00', date(2026, 2, 1))
+        self._compra(50, date(2026, 1, 20))
+        saldo = SaldoMensual.objects.create(
+            cuenta=self.cuenta, año=2026, mes=1,
+            saldo_inicial=Money('5000.00', 'MXN')
+        )
+
+        with self.assertNumQueries(2):  # libro del mes + UPDATE
+            saldo.calcular_saldo_final()
+
+        self.assertEqual(saldo.saldo_final, Money('4500.00', 'MXN'))
+
+    def test_encadenar_arrastra_saldo_final_al_mes_siguiente(self):
+        from gastos.services.saldos_service import LibroSaldosService
+        self._gasto('1000.00', date(2026, 1, 5))
+        self._gasto('300.00', date(2026, 2, 5))
+        SaldoMensual.objects.create(cuenta=self.cuenta, año=2026, mes=1,
+                                    saldo_inicial=Money('5000.00', 'MXN'))
+        febrero = SaldoMensual.objects.create(cuenta=self.cuenta, año=2026, mes=2,
+                                              saldo_inicial=Money('0.00', 'MXN'))
+
+        LibroSaldosService.encadenar_saldos_mensuales()
+
+        febrero.refresh_from_db()
+        self.assertEqual(febrero.saldo_inicial, Money('4000.00', 'MXN'))
+        self.assertEqual(febrero.saldo_final, Money('3700.00', 'MXN'))
+
+    def test_comando_detecta_y_reconstruye_desfase(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        hoy = date(2026, 3, 10)
+        self._gasto('100.00', hoy)
+        # queryset.update no dispara señales: el libro queda desfasado
+        Gastos.objects.update(monto=Decimal('120.00'))
+
+        with self.assertRaises(CommandError):
+            call_command('calcular_saldos', stdout=StringIO())
+
+        call_command('calcular_saldos', '--reconstruir', stdout=StringIO())
+        self.assertEqual(self._libro(), {hoy: (Decimal('120.00'), Decimal('0.00'))})
+
+
+# ---------------------------------------------------------------------------
+# Worker OCR por lotes — PaddleOCR mockeado
+# ---------------------------------------------------------------------------
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ComprobanteOCRLoteTest(GastosBaseTest):
+    """process_receipt_batch reclama varios comprobantes y los infiere juntos."""
+
+    def _comprobante(self, nombre, sha256=None, **extra):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return ComprobanteGasto.objects.create(
+            archivo=SimpleUploadedFile(nombre, b'imagen', content_type='image/png'),
+            nombre_original=nombre,
+            content_type='image/png',
+            tamano_bytes=6,
+            sha256=sha256 or nombre.ljust(64, '0'),
+            **extra
+        )
+
+    @patch('gastos.services.receipt_service.decode_image', side_effect=lambda path: path.name)
+    @patch('gastos.services.receipt_service.recognize_batch')
+    def test_lote_reclama_en_orden_y_guarda_tiempos(self, mock_recognize, _mock_decode):
+        from gastos.services.receipt_service import process_receipt_batch
+        mock_recognize.side_effect = lambda images: ['PROVEEDOR SA\nTOTAL $150.00'] * len(images)
+        comprobantes = [self._comprobante(f'ticket{i}.png') for i in range(3)]
+
+        procesados = process_receipt_batch(2)
+
+        self.assertEqual([c.pk for c in procesados], [c.pk for c in comprobantes[:2]])
+        self.assertEqual(mock_recognize.call_count, 1)
+        self.assertEqual(len(mock_recognize.call_args.args[0]), 2)
+        for comprobante in procesados:
+            comprobante.refresh_from_db()
+            self.assertEqual(comprobante.estado, ComprobanteGasto.Estado.REVISION)
+            self.assertEqual(comprobante.datos_extraidos['total'], '150.00')
+            self.assertEqual(comprobante.tiempos_ocr['lote'], 2)
+            self.assertTrue({'decode', 'ocr', 'parse'} <= set(comprobante.tiempos_ocr))
+        comprobantes[2].refresh_from_db()
+        self.assertEqual(comprobantes[2].estado, ComprobanteGasto.Estado.PENDIENTE)
+
+    @patch('gastos.services.receipt_service.decode_image', side_effect=lambda path: path.name)
+    @patch('gastos.services.receipt_service.recognize_batch')
+    def test_fallo_del_lote_reintenta_por_imagen(self, mock_recognize, _mock_decode):
+        from gastos.services.receipt_service import process_receipt_batch
+
+        bueno, malo = self._comprobante('bueno.png'), self._comprobante('malo.png')
+
+        def reconocer(images):
+            if len(images) > 1 or images[0] == os.path.basename(malo.archivo.name):
+                raise RuntimeError('imagen corrupta')
+            return ['TOTAL 10.00']
+        mock_recognize.side_effect = reconocer
+
+        process_receipt_batch(5)
+
+        bueno.refresh_from_db()
+        malo.refresh_from_db()
+        self.assertEqual(bueno.estado, ComprobanteGasto.Estado.REVISION)
+        self.assertEqual(malo.estado, ComprobanteGasto.Estado.ERROR)
+        self.assertIn('imagen corrupta', malo.error_procesamiento)
+
+    @patch('gastos.services.receipt_service.recognize_batch')
+    def test_mismo_sha256_reutiliza_resultado_sin_inferir(self, mock_recognize):
+        from gastos.services.receipt_service import process_receipt_batch
+        original = self._comprobante(
+            'original.png', sha256='a' * 64, estado=ComprobanteGasto.Estado.REVISION,
+            texto_ocr='TOTAL 99.00', datos_extraidos={'total': '99.00'}, confianza=Decimal('33.33'),
+        )
+        copia = self._comprobante('copia.png', sha256='a' * 64)
+
+        process_receipt_batch(4)
+
+        mock_recognize.assert_not_called()
+        copia.refresh_from_db()
+        self.assertEqual(copia.estado, ComprobanteGasto.Estado.REVISION)
+        self.assertEqual(copia.duplicado_de, original)
+        self.assertEqual(copia.datos_extraidos, {'total': '99.00'})
+
+    def test_create_receipt_rechaza_o_vincula_duplicados(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from gastos.services.receipt_service import DuplicateReceiptError, create_receipt
+
+        def subir():
+            return SimpleUploadedFile('ticket.png', b'mismos-bytes', content_type='image/png')
+
+        primero = create_receipt(subir(), self.user)
+        # El mismo usuario vuelve a subir el archivo: se devuelve el comprobante abierto
+        self.assertEqual(create_receipt(subir(), self.user).pk, primero.pk)
+
+        primero.estado, primero.texto_ocr = ComprobanteGasto.Estado.REVISION, 'TOTAL 5.00'
+        primero.save()
+        # Otro usuario con el mismo archivo recibe el resultado sin pasar por la cola
+        segundo = create_receipt(subir(), self.admin)
+        self.assertEqual(segundo.estado, ComprobanteGasto.Estado.REVISION)
+        self.assertEqual(segundo.duplicado_de_id, primero.pk)
+
+        primero.estado = ComprobanteGasto.Estado.REGISTRADO
+        primero.save()
+        with self.assertRaises(DuplicateReceiptError):
+            create_receipt(subir(), self.user)
+
+        self.client.force_login(self.admin)
+        response = self.client.get('/en/admin/gastos/comprobantegasto/')
+        self.assertEqual(response.context['metricas_ocr']['reutilizados'], 1)
+
+    @patch('gastos.services.receipt_service.decode_image', side_effect=lambda path: path.name)
+    @patch('gastos.services.receipt_service.recognize_batch')
+    def test_volver_a_subir_un_comprobante_fallido_lo_reintenta(self, mock_recognize, _mock_decode):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from gastos.services.receipt_service import create_receipt, process_receipt_batch
+
+        def subir():
+            return SimpleUploadedFile('ticket.png', b'bytes-fallidos', content_type='image/png')
+
+        mock_recognize.side_effect = RuntimeError('modelo no disponible')
+        fallido = create_receipt(subir(), self.user)
+        process_receipt_batch(1)
+        fallido.refresh_from_db()
+        self.assertEqual(fallido.estado, ComprobanteGasto.Estado.ERROR)
+
+        reintento = create_receipt(subir(), self.user)
+        self.assertEqual(reintento.pk, fallido.pk)
+        self.assertEqual(reintento.estado, ComprobanteGasto.Estado.PENDIENTE)
+        self.assertEqual(reintento.error_procesamiento, '')
+
+        mock_recognize.side_effect = lambda images: ['TOTAL 20.00'] * len(images)
+        process_receipt_batch(1)
+        reintento.refresh_from_db()
+        self.assertEqual(reintento.estado, ComprobanteGasto.Estado.REVISION)
+        self.assertEqual(ComprobanteGasto.objects.filter(sha256=reintento.sha256).count(), 1)
+
+    def test_comprobantes_abandonados_en_procesando_vuelven_a_la_cola(self):
+        from django.utils import timezone
+        from gastos.services.receipt_service import claim_receipts, release_claims, worker_id
+
+        procesando = ComprobanteGasto.Estado.PROCESANDO
+        reciente = self._comprobante('reciente.png', estado=procesando,
+                                     reclamado_en=timezone.now() - timedelta(minutes=1), reclamado_por='otro:1')
+        abandonado = self._comprobante('abandonado.png', estado=procesando,
+                                       reclamado_en=timezone.now() - timedelta(hours=2), reclamado_por='otro:2')
+
+        # Un worker muerto hace más de COMPROBANTE_OCR_TIMEOUT: cualquier worker lo reclama
+        with self.settings(COMPROBANTE_OCR_TIMEOUT=3600):
+            reclamados = claim_receipts(5)
+        self.assertEqual([c.pk for c in reclamados], [abandonado.pk])
+        abandonado.refresh_from_db()
+        self.assertEqual(abandonado.reclamado_por, worker_id())
+
+        # El supervisor devuelve a la cola el lote de un worker que acaba de morir
+        self.assertEqual(release_claims('otro:1'), 1)
+        reciente.refresh_from_db()
+        self.assertEqual(reciente.estado, ComprobanteGasto.Estado.PENDIENTE)
+        self.assertIsNone(reciente.reclamado_en)
+        self.assertEqual(release_claims('otro:1'), 0)
+
+    def test_volver_a_subir_un_comprobante_abandonado_lo_reintenta(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.utils import timezone
+        from gastos.services.receipt_service import create_receipt
+
+        def subir():
+            return SimpleUploadedFile('ticket.png', b'bytes-atascados', content_type='image/png')
+
+        atascado = create_receipt(subir(), self.user)
+        atascado.estado, atascado.reclamado_en = ComprobanteGasto.Estado.PROCESANDO, timezone.now()
+        atascado.save()
+        # Mientras el worker sigue dentro del timeout se devuelve tal cual
+        self.assertEqual(create_receipt(subir(), self.user).estado, ComprobanteGasto.Estado.PROCESANDO)
+
+        with self.settings(COMPROBANTE_OCR_TIMEOUT=0):
+            reintento = create_receipt(subir(), self.user)
+        self.assertEqual(reintento.pk, atascado.pk)
+        self.assertEqual(reintento.estado, ComprobanteGasto.Estado.PENDIENTE)
+        self.assertIsNone(reintento.reclamado_en)
+        self.assertEqual(ComprobanteGasto.objects.filter(sha256=reintento.sha256).count(), 1)
+
+
+# ---------------------------------------------------------------------------
+# Asignación de categorías por lotes (IA mockeada)
+# ---------------------------------------------------------------------------
+
+@override_settings(CATEGORIZADOR_MODELO_PATH=os.path.join(tempfile.gettempdir(), 'sin_categorizador.joblib'))
+class CategoriasEnLotesTest(TestCase):
+    """Un prompt por lote, validación de la respuesta y respaldo individual."""
+
+    CATEGORIAS = {'1': 'Combustible', '2': 'Comisiones bancarias'}
+
+    @classmethod
+    def setUpTestData(cls):
+        for pk, nombre in cls.CATEGORIAS.items():
+            CatGastos.objects.create(pk=int(pk), nombre=nombre)
+
+    def _movimientos(self, n):
+        return [(i, {'descripcion': f'MOVIMIENTO {i}', 'monto': -100.0}) for i in range(n)]
+
+    def _modelo(self, *respuestas):
+        import json
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        return FakeListChatModel(responses=[json.dumps({'asignaciones': r}) for r in respuestas])
+
+    @patch('gastos.services.invoice_recognition_service.asignar_categoria_automatica')
+    @patch('gastos.services.invoice_recognition_service.get_llm_model')
+    def test_un_prompt_por_lote_y_respaldo_solo_para_invalidos(self, mock_modelo, mock_individual):
+        from gastos.services.invoice_recognition_service import asignar_categorias_en_lotes
+
+        mock_modelo.return_value = self._modelo(
+            [{'id': '0', 'categoria_id': '1'}, {'id': '1', 'categoria_id': 'NINGUNA'},
+             {'id': '2', 'categoria_id': '99'}, {'id': '77', 'categoria_id': '1'}],
+            [{'id': '4', 'categoria_id': '2'}],
+        )
+        mock_individual.return_value = {'id': 2, 'nombre': 'Comisiones bancarias'}
+        movimientos = self._movimientos(5)
+
+        resumen = asignar_categorias_en_lotes(movimientos, self.CATEGORIAS, tamaño_lote=4, concurrencia=1)
+
+        # ID de categoría inválido (2) y movimiento omitido (3) van al camino individual
+        self.assertEqual(mock_individual.call_count, 2)
+        self.assertEqual(resumen, {'locales': 0, 'asignadas': 4, 'sin_categoria': 1, 'individuales': 2})
+        self.assertEqual(movimientos[0][1]['categoria_sugerida'], {'id': 1, 'nombre': 'Combustible'})
+        self.assertNotIn('categoria_sugerida', movimientos[1][1])
+        self.assertEqual(movimientos[4][1]['categoria_sugerida']['id'], 2)
+
+    @patch('gastos.services.invoice_recognition_service.CATEGORIAS_ESPERA_REINTENTO', 0)
+    @patch('gastos.services.invoice_recognition_service.limitador_llm.adquirir', return_value=0.0)
+    @patch('gastos.services.invoice_recognition_service.asignar_categoria_automatica', return_value=None)
+    @patch('gastos.services.invoice_recognition_service.get_llm_model')
+    def test_lote_fallido_se_procesa_individualmente(self, mock_modelo, mock_individual, _mock_limitador):
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        from gastos.services.invoice_recognition_service import asignar_categorias_en_lotes
+
+        mock_modelo.return_value = FakeListChatModel(responses=['esto no es JSON'])
+        resumen = asignar_categorias_en_lotes(self._movimientos(3), self.CATEGORIAS, tamaño_lote=10)
+
+        self.assertEqual(mock_individual.call_count, 3)
+        self.assertEqual(resumen['individuales'], 3)
+
+    @patch('gastos.services.invoice_recognition_service.CATEGORIAS_ESPERA_REINTENTO', 0)
+    @patch('gastos.services.invoice_recognition_service.limitador_llm.adquirir', return_value=0.0)
+    @patch('gastos.services.invoice_recognition_service.asignar_categoria_automatica')
+    @patch('gastos.services.invoice_recognition_service.get_llm_model')
+    def test_lote_fallido_se_reintenta_y_divide_antes_del_respaldo(self, mock_modelo, mock_individual, _mock_limitador):
+        import json
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        from gastos.services.invoice_recognition_service import CATEGORIAS_REINTENTOS, asignar_categorias_en_lotes
+
+        # Un error transitorio: el reintento resuelve el lote completo
+        mock_modelo.return_value = self._modelo([{'id': str(i), 'categoria_id': '1'} for i in range(4)])
+        mock_modelo.return_value.responses.insert(0, 'error transitorio')
+        resumen = asignar_categorias_en_lotes(self._movimientos(4), self.CATEGORIAS, tamaño_lote=10)
+        self.assertEqual(resumen['asignadas'], 4)
+
+        # El lote completo falla en todos los intentos; cada mitad responde bien
+        mitades = [json.dumps({'asignaciones': [{'id': str(i), 'categoria_id': '2'} for i in ids]}) for ids in ((0, 1), (2, 3))]
+        mock_modelo.return_value = FakeListChatModel(responses=['JSON truncado'] * (CATEGORIAS_REINTENTOS + 1) + mitades)
+        resumen = asignar_categorias_en_lotes(self._movimientos(4), self.CATEGORIAS, tamaño_lote=10)
+        self.assertEqual(resumen['asignadas'], 4)
+
+        mock_individual.assert_not_called()
+
+    def test_limitador_espera_solo_al_vaciarse(self):
+        from gastos.services.invoice_recognition_service import LimitadorTokens
+
+        limitador = LimitadorTokens(por_minuto=600, capacidad=2)
+        self.assertEqual(limitador.adquirir(), 0.0)
+        self.assertEqual(limitador.adquirir(), 0.0)
+        # 600/min = un token cada 0.1 s
+        self.assertGreater(limitador.adquirir(), 0.0)
+
+
+class CategorizadorLocalTest(GastosBaseTest):
+    """Memo y modelo local antes de la IA; las respuestas de la IA vuelven al memo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cat_comisiones = CatGastos.objects.create(nombre='Comisiones')
+        cls.categorias = {str(cls.cat_gastos.pk): 'Transporte', str(cls.cat_comisiones.pk): 'Comisiones'}
+        descripciones = [
+            (f'PEMEX GASOLINERIA {i:04d}', cls.cat_gastos) for i in range(20)
+        ] + [
+            (f'CASETA AUTOPISTA MAZATLAN REF {i}', cls.cat_gastos) for i in range(10)
+        ] + [
+            (f'COMISION MANEJO DE CUENTA {i:02d}/2025', cls.cat_comisiones) for i in range(20)
+        ] + [
+            (f'COMISION TRANSFERENCIA SPEI {i}', cls.cat_comisiones) for i in range(10)
+        ]
+        Gastos.objects.bulk_create([
+            Gastos(monto=Money(100, 'MXN'), descripcion=descripcion, fecha=date.today(),
+                   id_sucursal=cls.sucursal, id_cat_gastos=categoria, id_cuenta_banco=cls.cuenta)
+            for descripcion, categoria in descripciones
+        ])
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.mkdtemp()
+        self.ajustes = override_settings(CATEGORIZADOR_MODELO_PATH=os.path.join(directorio, 'modelo.joblib'))
+        self.ajustes.enable()
+
+    def tearDown(self):
+        self.ajustes.disable()
+        super().tearDown()
+
+    def test_normalizacion_quita_acentos_y_folios(self):
+        from gastos.services.categorizador_service import normalizar_descripcion
+
+        self.assertEqual(normalizar_descripcion('Pemex Gasolinería 0231, REF: 88A12'), 'PEMEX GASOLINERIA REF')
+        self.assertEqual(normalizar_descripcion('COMISION MANEJO DE CUENTA 03/2025'), 'COMISION MANEJO DE CUENTA')
+
+    def test_entrenar_memo_y_modelo(self):
+        from gastos.models import MemoCategoriaGasto
+        from gastos.services.categorizador_service import CategorizadorGastos
+
+        resultado = CategorizadorGastos.entrenar()
+        self.assertEqual(resultado['ejemplos'], 60)
+        # Las descripciones sin folio se repiten: una entrada de memo por comercio
+        self.assertEqual(resultado['memos'], 4)
+        self.assertEqual(MemoCategoriaGasto.objects.get(
+            descripcion_normalizada='PEMEX GASOLINERIA').origen, MemoCategoriaGasto.Origen.HISTORIAL)
+
+        memo, modelo = CategorizadorGastos.clasificar(
+            ['Pemex Gasolinería 9999', 'COMISION POR TRANSFERENCIA INTERBANCARIA'], self.categorias
+        )
+        self.assertEqual((memo['id'], memo['origen']), (self.cat_gastos.pk, 'memo'))
+        self.assertEqual((modelo['id'], modelo['origen']), (self.cat_comisiones.pk, 'modelo'))
+        self.assertEqual(MemoCategoriaGasto.objects.get(descripcion_normalizada='PEMEX GASOLINERIA').usos, 1)
+
+        # Con un umbral inalcanzable el modelo no decide
+        self.assertEqual(CategorizadorGastos.clasificar(['ABARROTES LA ESQUINA'], self.categorias, umbral=1.01), [None])
+
+    @patch('gastos.services.invoice_recognition_service.get_llm_model')
+    def test_solo_lo_no_resuelto_va_a_la_ia_y_se_memoriza(self, mock_modelo):
+        import json
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        from gastos.models import MemoCategoriaGasto
+        from gastos.services.categorizador_service import CategorizadorGastos
+        from gastos.services.invoice_recognition_service import asignar_categorias_en_lotes
+
+        CategorizadorGastos.memorizar([('PEMEX GASOLINERIA', self.cat_gastos.pk)], MemoCategoriaGasto.Origen.USUARIO)
+        CategorizadorGastos.memorizar([('FERRETERIA EL CLAVO', self.cat_gastos.pk)], MemoCategoriaGasto.Origen.USUARIO)
+        mock_modelo.return_value = FakeListChatModel(responses=[json.dumps({'asignaciones': [
+            {'id': '1', 'categoria_id': str(self.cat_comisiones.pk)},
+        ]})])
+        movimientos = [
+            (0, {'descripcion': 'PEMEX GASOLINERIA 0001', 'monto': -500.0}),
+            (1, {'descripcion': 'SEGURO VEHICULAR 44', 'monto': -900.0}),
+        ]
+
+        resumen = asignar_categorias_en_lotes(movimientos, self.categorias)
+
+        self.assertEqual(resumen['locales'], 1)
+        self.assertEqual(resumen['asignadas'], 2)
+        self.assertEqual(movimientos[0][1]['categoria_sugerida']['origen'], 'memo')
+        memo = MemoCategoriaGasto.objects.get(descripcion_normalizada='SEGURO VEHICULAR')
+        self.assertEqual((memo.categoria_id, memo.origen, memo.confirmaciones),
+                         (self.cat_comisiones.pk, MemoCategoriaGasto.Origen.IA, 1))
+
+        # La IA no reemplaza una categoría confirmada por el usuario
+        CategorizadorGastos.memorizar([('FERRETERIA EL CLAVO', self.cat_comisiones.pk)], MemoCategoriaGasto.Origen.IA)
+        self.assertEqual(MemoCategoriaGasto.objects.get(
+            descripcion_normalizada='FERRETERIA EL CLAVO').categoria_id, self.cat_gastos.pk)
+
+        # Una sola respuesta no basta: el movimiento vuelve a la IA hasta que otra coincide
+        mock_modelo.return_value = FakeListChatModel(responses=[json.dumps({'asignaciones': [
+            {'id': '0', 'categoria_id': str(self.cat_comisiones.pk)},
+        ]})])
+        asignar_categorias_en_lotes([(0, {'descripcion': 'Seguro vehicular 45', 'monto': -1.0})], self.categorias)
+        mock_modelo.assert_called()
+        memo.refresh_from_db()
+        self.assertEqual(memo.confirmaciones, 2)
+
+        # Todo resuelto localmente: no se construye el modelo de IA
+        mock_modelo.reset_mock()
+        asignar_categorias_en_lotes([(0, {'descripcion': 'Seguro vehicular 45', 'monto': -1.0})], self.categorias)
+        mock_modelo.assert_not_called()
+
+    def test_memo_de_ia_requiere_respuestas_coincidentes(self):
+        from gastos.models import MemoCategoriaGasto
+        from gastos.services.categorizador_service import CategorizadorGastos
+
+        ia = MemoCategoriaGasto.Origen.IA
+        # Claves genéricas: no identifican al comercio y no se memorizan
+        self.assertEqual(CategorizadorGastos.memorizar(
+            [('TRANSFERENCIA 12345', self.cat_comisiones.pk), ('PAGO SPEI 99/01', self.cat_comisiones.pk)], ia
+        ), 0)
+        self.assertFalse(MemoCategoriaGasto.objects.exists())
+
+        CategorizadorGastos.memorizar([('ABARROTES LA ESQUINA', self.cat_gastos.pk)], ia)
+        self.assertEqual(CategorizadorGastos.clasificar(['ABARROTES LA ESQUINA'], self.categorias), [None])
+
+        # Una respuesta distinta reinicia la cuenta
+        CategorizadorGastos.memorizar([('ABARROTES LA ESQUINA', self.cat_comisiones.pk)], ia)
+        self.assertEqual(CategorizadorGastos.clasificar(['ABARROTES LA ESQUINA'], self.categorias), [None])
+
+        CategorizadorGastos.memorizar([('ABARROTES LA ESQUINA', self.cat_comisiones.pk)], ia)
+        resultado, = CategorizadorGastos.clasificar(['Abarrotes La Esquina 7'], self.categorias)
+        self.assertEqual((resultado['id'], resultado['origen']), (self.cat_comisiones.pk, 'memo'))
+
+    def test_admin_normaliza_antes_de_validar_unicidad(self):
+        from gastos.forms import MemoCategoriaGastoAdminForm
+        from gastos.models import MemoCategoriaGasto
+        from gastos.services.categorizador_service import CategorizadorGastos
+
+        CategorizadorGastos.memorizar([('OXXO TIENDA', self.cat_gastos.pk)], MemoCategoriaGasto.Origen.USUARIO)
+        form = MemoCategoriaGastoAdminForm(data={
+            'descripcion_normalizada': 'Oxxo Tienda 1234', 'categoria': self.cat_comisiones.pk,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('descripcion_normalizada', form.errors)
+
+        self.client.force_login(self.admin)
+        response = self.client.post('/en/admin/gastos/memocategoriagasto/add/', {
+            'descripcion_normalizada': 'Oxxo Tienda 1234', 'categoria': self.cat_comisiones.pk,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MemoCategoriaGasto.objects.count(), 1)
+
+    def test_categorias_confirmadas_se_memorizan(self):
+        from gastos.models import MemoCategoriaGasto
+
+        self.client.force_login(self.user)
+        response = self.client.post('/en/guardar-gastos-estado-cuenta/', {
+            'movimientos_seleccionados': ['0'],
+            'movimiento_0_fecha': date.today().isoformat(),
+            'movimiento_0_descripcion': 'Taller Mecánico Hnos 12',
+            'movimiento_0_monto': '-1250.00',
+            'movimiento_0_categoria': str(self.cat_gastos.pk),
+            'movimiento_0_cuenta': str(self.cuenta.pk),
+        }, HTTP_HX_REQUEST='true')
+
+        self.assertEqual(response.status_code, 200)
+        memo = MemoCategoriaGasto.objects.get(descripcion_normalizada='TALLER MECANICO HNOS')
+        self.assertEqual((memo.categoria_id, memo.origen), (self.cat_gastos.pk, MemoCategoriaGasto.Origen.USUARIO))
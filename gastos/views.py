@@ -161,6 +161,7 @@ def guardar_gastos_estado_cuenta(request):
         movimientos_seleccionados = request.POST.getlist('movimientos_seleccionados')
         gastos_creados = 0
         errores = []
+        confirmadas = []
 
         for i, movimiento_id in enumerate(movimientos_seleccionados):
             try:
@@ -210,6 +211,7 @@ def guardar_gastos_estado_cuenta(request):
                 )
                 gasto.save()
                 gastos_creados += 1
+                confirmadas.append((descripcion, gasto.id_cat_gastos_id))
 
             except CatGastos.DoesNotExist:
                 errores.append(f"Categor&iacute;a no encontrada para movimiento {i+1}")
@@ -220,6 +222,15 @@ def guardar_gastos_estado_cuenta(request):
             except Exception as e:
                 errores.append(f"Error al guardar movimiento {i+1}: {str(e)}")
 
+        if confirmadas:
+            # Las categorías elegidas por el usuario alimentan el memo del categorizador local
+            try:
+                from .models import MemoCategoriaGasto
+                from .services.categorizador_service import CategorizadorGastos
+                CategorizadorGastos.memorizar(confirmadas, MemoCategoriaGasto.Origen.USUARIO)
+            except Exception as e:
+                logger.error(f"Error al memorizar categorías confirmadas: {str(e)}")
+
         if gastos_creados > 0:
             if errores:
                 mensaje = f"Se registraron {gastos_creados} gastos exitosamente, pero se encontraron {len(errores)} errores."
@@ -250,7 +261,7 @@ from django.db import transaction
 from django.http import FileResponse, Http404
 from .forms import ComprobanteUploadForm
 from .models import ComprobanteGasto
-from .services.receipt_service import create_receipt, process_next_receipt
+from .services.receipt_service import DuplicateReceiptError, create_receipt, process_next_receipt
 
 
 def _comprobante_para_usuario(request, pk):
@@ -265,12 +276,16 @@ def capturar_comprobante(request):
     if request.method == 'POST':
         form = ComprobanteUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            comprobante = create_receipt(form.cleaned_data['comprobante'], request.user)
-            # Docker runs a dedicated worker. Local DEBUG starts a daemon worker so
-            # runserver remains usable without a second terminal.
-            if settings.DEBUG:
-                threading.Thread(target=process_next_receipt, daemon=True, name='receipt-ocr').start()
-            return redirect('gastos:revisar_comprobante', pk=comprobante.pk)
+            try:
+                comprobante = create_receipt(form.cleaned_data['comprobante'], request.user)
+            except DuplicateReceiptError as exc:
+                form.add_error('comprobante', f'Este comprobante ya se registró como gasto (comprobante #{exc.receipt.pk}).')
+            else:
+                # Docker runs a dedicated worker. Local DEBUG starts a daemon worker so
+                # runserver remains usable without a second terminal.
+                if settings.DEBUG and comprobante.estado == ComprobanteGasto.Estado.PENDIENTE:
+                    threading.Thread(target=process_next_receipt, daemon=True, name='receipt-ocr').start()
+                return redirect('gastos:revisar_comprobante', pk=comprobante.pk)
     else:
         form = ComprobanteUploadForm()
     return render(request, 'gastos/capturar_comprobante.html', {'form': form})
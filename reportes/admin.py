@@ -405,6 +405,7 @@ class ReporteEjecutivoAdmin(admin.ModelAdmin):
     def view_forecast(self, request):
         from catalogo.models import Sucursal
         from app.services.forecast_service import ForecastService
+        from app.services.recalculo_service import RecalculoService
 
         context = {
             **self.admin_site.each_context(request),
@@ -437,16 +438,34 @@ class ReporteEjecutivoAdmin(admin.ModelAdmin):
                 except (ValueError, TypeError):
                     sucursal_id = None
 
+            # Los modelos se entrenan en la cola de recálculo; la vista solo
+            # lee el resultado y, si aún no existe o está desactualizado, lo
+            # solicita.
             try:
-                fc = ForecastService()
-                result = fc.generate_all_forecasts(
-                    year=year_int,
-                    sucursal_id=sucursal_id,
-                    months_ahead=months_int,
-                    model_type=model_type,
+                result, desactualizado = RecalculoService.leer_o_solicitar(
+                    RecalculoService.Tipo.FORECAST,
+                    RecalculoService.parametros_forecast(
+                        year_int, sucursal_id, months_int, model_type
+                    ),
+                    lambda: ForecastService().read_all_forecasts(
+                        year=year_int,
+                        sucursal_id=sucursal_id,
+                        months_ahead=months_int,
+                        model_type=model_type,
+                    ),
+                    lambda: ForecastService().generate_all_forecasts(
+                        year=year_int,
+                        sucursal_id=sucursal_id,
+                        months_ahead=months_int,
+                        model_type=model_type,
+                    ),
                 )
-                context["forecast_data"] = result
-                context["has_data"] = True
+                if result is None:
+                    context["calculando"] = True
+                else:
+                    context["forecast_data"] = result
+                    context["has_data"] = True
+                    context["desactualizado"] = desactualizado
             except Exception as exc:
                 messages.error(request, f"Error al generar predicciones: {exc}")
                 logger.exception("Error en forecast")
@@ -501,7 +520,6 @@ class ReporteEjecutivoAdmin(admin.ModelAdmin):
             sucursal_id=sucursal_id,
             months_ahead=months_int,
             model_type=model_type,
-            force_refresh=True,
         )
 
         buffer = BytesIO()
@@ -282,6 +282,33 @@
     bindCuentaDropdown(wrapper, select);
   }
 
+  function initCreditoCliente() {
+    var data = document.getElementById("cfdi-credito-clientes");
+    var cliente = document.getElementById("id_cliente");
+    var display = document.getElementById("cfdi-credito-disponible");
+
+    if (!data || !cliente || !display) {
+      return;
+    }
+
+    var disponibles = JSON.parse(data.textContent);
+
+    function update() {
+      var disponible = disponibles[cliente.value];
+      display.hidden = disponible === undefined;
+      if (disponible !== undefined) {
+        display.textContent = "Crédito disponible: $" + Number(disponible).toLocaleString("es-MX", {
+          minimumFractionDigits: 2,
+          maximumFractionDigits: 2
+        });
+        display.classList.toggle("is-agotado", disponible <= 0);
+      }
+    }
+
+    cliente.addEventListener("change", update);
+    update();
+  }
+
   document.addEventListener("DOMContentLoaded", function () {
     var modalidad = document.getElementById("id_modalidad_pago");
     var tipoVenta = document.getElementById("id_tipo_venta");
@@ -298,5 +325,6 @@
 
     initUploadDropzone();
     initCuentaDropdown();
+    initCreditoCliente();
   });
 })();
@@ -27,6 +27,7 @@ from import_export.forms import ExportForm, ImportForm
 from app.widgets import MoneyWidget
 from django.utils.html import format_html
 from app.media_utils import safe_file_url
+from app.pagination import EstimatedCountPaginator, KeysetPaginationMixin
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
 from django.urls import path, reverse
@@ -41,8 +42,8 @@ from djmoney.money import Money
 import json
 from django.contrib import messages
 from django.template.response import TemplateResponse
-from .services.metrics_service import CuentasPorCobrarMetrics
 from .services.cache_service import CuentasPorCobrarCache
+from .services.credito_service import CreditoClienteService
 from django.utils.html import format_html
 
 # =============================================================================
@@ -257,7 +258,8 @@ class ClienteAdmin(ImportExportModelAdmin, ModelAdmin):
     def get_credito_disponible(self, obj):
         if obj.tipo_cliente == 'Contado':
             return 'N/A'
-        disponible = obj.credito_disponible()
+        # credito_usado viene en la fila: sin consulta por cliente
+        disponible = CreditoClienteService.disponible(obj.tipo_cliente, obj.limite_credito, obj.credito_usado)
         color = 'green' if disponible > 0 else 'red'
         return format_html(
             '<span style="color: {}">${}</span>',
@@ -311,6 +313,20 @@ class PagoVentaInline(admin.TabularInline):
     extra = 0
     readonly_fields = ('fecha_registro',)
     fields = ('fecha_pago', 'monto_pago', 'cuenta_destino', 'metodo_pago', 'referencia', 'notas')
+    # Descendente: el pago más reciente queda en la primera fila del inline
+    ordering = ('-fecha_pago',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """
+        Evalúa una sola vez las opciones de cuenta_destino: cada fila del inline
+        copia el campo y, con el queryset sin evaluar, repetiría la consulta.
+        """
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'cuenta_destino' and request is not None:
+            if not hasattr(request, '_pago_cuentas_destino'):
+                request._pago_cuentas_destino = list(field.choices)
+            field.choices = request._pago_cuentas_destino
+        return field
 
 @admin.register(Agente)
 class AgenteAdmin(ModelAdmin):
@@ -398,7 +414,12 @@ class VentasAdmin(ModelAdmin):
     search_fields = ('carga', 'cliente__nombre', 'producto__variedad', 'PO', 'pedimento')
     
     list_per_page = 30
+    # producto: __str__ de la venta (etiqueta de la casilla de acciones)
+    list_select_related = ('cliente__pais', 'mercado_destino', 'producto')
     date_hierarchy = 'fecha_salida_manifiesto'
+    # COUNT(*) estimado sin filtros y sin el segundo conteo "N total"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     inlines = [PagoVentaInline]
     
@@ -444,12 +465,40 @@ class VentasAdmin(ModelAdmin):
     
     readonly_fields = ('fecha_registro', 'monto_pagado')
 
+    def get_queryset(self, request):
+        """
+        Saldo pendiente, días de vencimiento y bandera de vencida calculados en
+        SQL para que las columnas del listado no recalculen por fila.
+        """
+        hoy = timezone.now().date()
+        return super().get_queryset(request).select_related(
+            'cliente__pais', 'mercado_destino', 'producto'
+        ).annotate(
+            saldo_pendiente_sql=models.ExpressionWrapper(
+                F('monto') - F('monto_pagado'),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            ),
+            dias_vencido_sql=models.ExpressionWrapper(
+                Value(hoy, output_field=models.DateField()) - F('fecha_vencimiento'),
+                output_field=models.DurationField(),
+            ),
+            vencida_sql=Case(
+                When(
+                    fecha_vencimiento__lt=hoy,
+                    estado_cobranza__in=[Ventas.EstadoCobranza.PENDIENTE, Ventas.EstadoCobranza.PARCIAL],
+                    then=Value(True),
+                ),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
     def save_model(self, request, obj, form, change):
         if obj.modalidad_pago == 'Credito' and not change and obj.cliente_id:
             try:
                 monto = float(obj.monto.amount)
-                if not obj.cliente.puede_otorgar_credito(monto):
-                    disponible = obj.cliente.credito_disponible()
+                disponible = obj.cliente.credito_disponible()
+                if monto > disponible:
                     messages.warning(
                         request,
                         f"Límite de crédito insuficiente para {obj.cliente}. "
@@ -632,6 +681,7 @@ class VentasAdmin(ModelAdmin):
                 step='confirm',
                 title='Importar venta — confirmar datos',
                 opts=opts,
+                credito_clientes=CreditoClienteService.disponibles(),
             )
             return TemplateResponse(request, 'admin/ventas/importar_cfdi.html', context)
 
@@ -724,6 +774,7 @@ class VentasAdmin(ModelAdmin):
                     title='Importar venta — confirmar datos',
                     opts=opts,
                     parsed=parsed,
+                    credito_clientes=CreditoClienteService.disponibles(),
                     cliente_sugerido_nombre=cliente_sugerido_nombre,
                 )
                 return TemplateResponse(request, 'admin/ventas/importar_cfdi.html', context)
@@ -778,16 +829,20 @@ class VentasAdmin(ModelAdmin):
         if obj.modalidad_pago == 'Contado':
             return mark_safe('<span class="sales-badge sales-badge--paid">✓ Pagado</span>')
         
-        saldo = obj.saldo_pendiente()
+        saldo = getattr(obj, 'saldo_pendiente_sql', None)
+        saldo = obj.saldo_pendiente() if saldo is None else saldo
         if saldo <= 0:
             return mark_safe('<span class="sales-badge sales-badge--paid">✓ $0.00</span>')
         
-        balance_class = 'sales-balance--overdue' if obj.esta_vencida() else 'sales-balance--open'
+        vencida = getattr(obj, 'vencida_sql', None)
+        vencida = obj.esta_vencida() if vencida is None else vencida
+        balance_class = 'sales-balance--overdue' if vencida else 'sales-balance--open'
         return format_html(
             '<span class="sales-balance {}">${}</span>',
             balance_class, f"{float(saldo):,.2f}"
         )
     get_saldo_pendiente.short_description = 'Saldo Pendiente'
+    get_saldo_pendiente.admin_order_field = 'saldo_pendiente_sql'
     
     # Métodos originales del admin
     def get_estado_cobranza(self, obj):
@@ -808,7 +863,10 @@ class VentasAdmin(ModelAdmin):
     def get_dias_vencimiento(self, obj):
         if obj.modalidad_pago == 'Contado':
             return '-'
-        dias = obj.dias_vencido()
+        if hasattr(obj, 'dias_vencido_sql'):
+            dias = obj.dias_vencido_sql.days if obj.dias_vencido_sql is not None else 0
+        else:
+            dias = obj.dias_vencido()
         if dias > 0:
             return format_html('<span class="sales-due sales-due--overdue">+{} días</span>', dias)
         elif dias < 0:
@@ -816,6 +874,7 @@ class VentasAdmin(ModelAdmin):
         else:
             return mark_safe('<span class="sales-due sales-due--today">Vence hoy</span>')
     get_dias_vencimiento.short_description = 'Vencimiento'
+    get_dias_vencimiento.admin_order_field = 'dias_vencido_sql'
     
     def get_mercado_destino(self, obj):
         return obj.mercado_destino.nombre if obj.mercado_destino else obj.tipo_venta
@@ -934,10 +993,13 @@ class VentasAdmin(ModelAdmin):
         hoja de resumen ejecutivo de cuentas por cobrar."""
         import openpyxl
         import datetime as dt
+        from openpyxl.cell import WriteOnlyCell
         from openpyxl.styles import Font, PatternFill, Alignment
         from openpyxl.utils import get_column_letter
-        from openpyxl.worksheet.table import Table, TableStyleInfo
-        from collections import defaultdict
+        from openpyxl.worksheet.filters import AutoFilter
+        from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+        from app.services.excel_service import EXPORT_CHUNK_SIZE
+        from app.services.utils import UtilService
 
         NAVY  = "1E3A5F"
         TEAL  = "1AADBC"
@@ -946,296 +1008,308 @@ class VentasAdmin(ModelAdmin):
         MONEY = '"$"#,##0.00'
         hoy   = dt.date.today()
 
-        def _nav_hdr(cell, bg=NAVY):
-            cell.font      = Font(bold=True, color=WHITE)
-            cell.fill      = PatternFill("solid", fgColor=bg)
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        def _section_title(ws, row, col_start, col_end, text):
-            cell = ws.cell(row=row, column=col_start, value=text)
-            cell.font = Font(bold=True, color=WHITE, size=11)
-            cell.fill = PatternFill("solid", fgColor=NAVY)
-            cell.alignment = Alignment(horizontal="left", vertical="center")
-            if col_end > col_start:
-                ws.merge_cells(start_row=row, start_column=col_start,
-                               end_row=row, end_column=col_end)
+        # El libro es write-only: cada fila se escribe una sola vez con su
+        # estilo, así que las celdas se construyen completas antes de agregarlas.
+        def _cell(ws, value, font=None, fill=None, alignment=None, number_format=None):
+            cell = WriteOnlyCell(ws, value=value)
+            if font is not None:
+                cell.font = font
+            if fill is not None:
+                cell.fill = fill
+            if alignment is not None:
+                cell.alignment = alignment
+            if number_format is not None:
+                cell.number_format = number_format
+            return cell
+
+        def _nav_hdr(ws, value, bg=NAVY):
+            return _cell(ws, value,
+                         font=Font(bold=True, color=WHITE),
+                         fill=PatternFill("solid", fgColor=bg),
+                         alignment=Alignment(horizontal="center", vertical="center"))
+
+        def _section_title(ws, row, col_end, text):
+            ws.merged_cells.add(f"A{row}:{get_column_letter(col_end)}{row}")
             ws.row_dimensions[row].height = 20
+            ws.append([_cell(ws, text,
+                             font=Font(bold=True, color=WHITE, size=11),
+                             fill=PatternFill("solid", fgColor=NAVY),
+                             alignment=Alignment(horizontal="left", vertical="center"))])
 
-        def _add_table(ws, name, hdr_row, data_end_row, col_end):
+        def _add_table(ws, name, headers, hdr_row, data_end_row, style="TableStyleLight2"):
             if data_end_row < hdr_row + 1:
                 return
             tab = Table(
                 displayName=name,
-                ref=f"A{hdr_row}:{get_column_letter(col_end)}{data_end_row}",
+                ref=f"A{hdr_row}:{get_column_letter(len(headers))}{data_end_row}",
             )
+            # En write-only openpyxl no puede leer los encabezados de la hoja
+            tab.tableColumns = [TableColumn(id=ci, name=h) for ci, h in enumerate(headers, 1)]
+            tab.autoFilter = AutoFilter(ref=tab.ref)
             tab.tableStyleInfo = TableStyleInfo(
-                name="TableStyleLight2",
+                name=style,
                 showFirstColumn=False, showLastColumn=False,
                 showRowStripes=True, showColumnStripes=False,
             )
             ws.add_table(tab)
 
-        qs = queryset.select_related(
-            'cliente', 'producto', 'sucursal_id', 'cuenta',
-            'termino_credito', 'mercado_destino'
-        ).order_by('fecha_salida_manifiesto')
-        data = list(qs)
+        def _total_cell(ws, value, fmt=None, fill=False):
+            return _cell(ws, value, font=Font(bold=True), number_format=fmt,
+                         fill=PatternFill("solid", fgColor=LIGHT) if fill else None)
 
-        wb = openpyxl.Workbook()
+        qs = queryset.order_by('fecha_salida_manifiesto')
+
+        wb = openpyxl.Workbook(write_only=True)
 
         # ── HOJA 1 — Detalle ─────────────────────────────────────────────────
-        ws = wb.active
-        ws.title = "Ventas"
+        ws = wb.create_sheet("Ventas")
 
         COLUMNS = [
             ("Fecha",          lambda v: v.fecha_salida_manifiesto,                     13, "DD/MM/YYYY"),
-            ("Cliente",        lambda v: v.cliente.nombre,                              28, "@"),
+            ("Cliente",        lambda v: v.cliente__nombre,                             28, "@"),
             ("Carga",          lambda v: v.carga or "",                                 16, "@"),
-            ("Producto",       lambda v: v.producto.variedad if hasattr(v.producto, 'variedad') else str(v.producto), 22, "@"),
-            ("Sucursal",       lambda v: v.sucursal_id.nombre,                          18, "@"),
+            ("Producto",       lambda v: v.producto__variedad,                          22, "@"),
+            ("Sucursal",       lambda v: v.sucursal_id__nombre,                         18, "@"),
             ("Tipo",           lambda v: v.tipo_venta,                                  14, "@"),
             ("Modalidad",      lambda v: v.modalidad_pago,                              14, "@"),
-            ("Monto",          lambda v: float(v.monto.amount),                         16, MONEY),
-            ("Monto Pagado",   lambda v: float(v.monto_pagado.amount),                  16, MONEY),
-            ("Saldo Pendiente",lambda v: round(float(v.monto.amount) - float(v.monto_pagado.amount), 2), 16, MONEY),
+            ("Monto",          lambda v: float(v.monto),                                16, MONEY),
+            ("Monto Pagado",   lambda v: float(v.monto_pagado),                         16, MONEY),
+            ("Saldo Pendiente",lambda v: round(float(v.monto) - float(v.monto_pagado), 2), 16, MONEY),
             ("Estado",         lambda v: v.estado_cobranza,                             14, "@"),
             ("Vencimiento",    lambda v: v.fecha_vencimiento,                           13, "DD/MM/YYYY"),
         ]
+        # Filas planas (values_list) leídas por lotes: sin instancias de modelo
+        # ni la lista completa en memoria.
+        FIELDS = (
+            'fecha_salida_manifiesto', 'cliente__nombre', 'carga', 'producto__variedad',
+            'sucursal_id__nombre', 'tipo_venta', 'modalidad_pago', 'monto', 'monto_pagado',
+            'estado_cobranza', 'fecha_vencimiento',
+        )
 
         for ci, (hdr, _, width, _) in enumerate(COLUMNS, 1):
-            cell = ws.cell(row=1, column=ci, value=hdr)
-            _nav_hdr(cell)
             ws.column_dimensions[get_column_letter(ci)].width = width
+        ws.freeze_panes = "A2"
+        ws.append([_nav_hdr(ws, hdr) for hdr, _, _, _ in COLUMNS])
 
-        for ri, venta in enumerate(data, 2):
-            for ci, (_, getter, _, fmt) in enumerate(COLUMNS, 1):
-                cell = ws.cell(row=ri, column=ci, value=getter(venta))
-                cell.number_format = fmt
-                cell.alignment = Alignment(vertical="center")
+        filas = qs.values_list(*FIELDS, named=True)
+        row_align = Alignment(vertical="center")
+        count = 0
+        for venta in filas.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            ws.append([
+                _cell(ws, getter(venta), alignment=row_align, number_format=fmt)
+                for _, getter, _, fmt in COLUMNS
+            ])
+            count += 1
 
-        last_data = len(data) + 1
+        last_data = count + 1
 
-        if data:
-            tab_main = Table(
-                displayName="TablaVentas",
-                ref=f"A1:{get_column_letter(len(COLUMNS))}{last_data}",
-            )
-            tab_main.tableStyleInfo = TableStyleInfo(
-                name="TableStyleMedium2",
-                showFirstColumn=False, showLastColumn=False,
-                showRowStripes=True, showColumnStripes=False,
-            )
-            ws.add_table(tab_main)
+        _add_table(ws, "TablaVentas", [hdr for hdr, _, _, _ in COLUMNS], 1, last_data,
+                   style="TableStyleMedium2")
 
         # Fila TOTAL fuera de la tabla
-        total_r = last_data + 1
-        for ci, col_label in ((8, "Monto"), (9, "Pagado"), (10, "Pendiente")):
-            lbl = ws.cell(row=total_r, column=ci - 1)
-            if ci == 8:
-                lbl.value = "TOTAL"
-                lbl.font  = Font(bold=True)
-                lbl.alignment = Alignment(horizontal="right")
+        total_line = [None] * 6
+        total_line.append(_cell(ws, "TOTAL", font=Font(bold=True),
+                                alignment=Alignment(horizontal="right")))
+        for ci in (8, 9, 10):
             col_ltr = get_column_letter(ci)
-            tc = ws.cell(row=total_r, column=ci,
-                         value=f"=SUM({col_ltr}2:{col_ltr}{last_data})")
-            tc.number_format = MONEY
-            tc.font = Font(bold=True)
-            tc.fill = PatternFill("solid", fgColor=LIGHT)
-
-        ws.freeze_panes = "A2"
+            total_line.append(_total_cell(ws, f"=SUM({col_ltr}2:{col_ltr}{last_data})", MONEY, fill=True))
+        ws.append(total_line)
 
         # ── HOJA 2 — Cuentas por Cobrar (Resumen Ejecutivo) ──────────────────
         ws2 = wb.create_sheet("Cuentas por Cobrar")
 
-        if not data:
-            ws2.cell(row=1, column=1, value="Sin datos seleccionados.")
+        # Los totales se agregan en la base de datos sobre el mismo queryset
+        base = qs.order_by()
+        credito_q   = Q(modalidad_pago='Credito')
+        pendiente_q = credito_q & Q(estado_cobranza__in=('Pendiente', 'Parcial'))
+        vencida_q   = pendiente_q & Q(fecha_vencimiento__lt=hoy)
+        resumen = base.aggregate(
+            n=Count('id'),
+            suma_monto=Sum('monto'), suma_pagado=Sum('monto_pagado'),
+            n_credito=Count('id', filter=credito_q),
+            n_pendientes=Count('id', filter=pendiente_q),
+            n_vencidas=Count('id', filter=vencida_q),
+            suma_monto_pend=Sum('monto', filter=pendiente_q),
+            suma_pagado_pend=Sum('monto_pagado', filter=pendiente_q),
+            suma_monto_venc=Sum('monto', filter=vencida_q),
+            suma_pagado_venc=Sum('monto_pagado', filter=vencida_q),
+        )
+
+        if not resumen['n']:
+            ws2.append(["Sin datos seleccionados."])
         else:
-            total_monto     = sum(float(v.monto.amount) for v in data)
-            total_pagado    = sum(float(v.monto_pagado.amount) for v in data)
+            def _monto(valor):
+                return float(valor or 0)
+
+            n_ventas        = resumen['n']
+            total_monto     = _monto(resumen['suma_monto'])
+            total_pagado    = _monto(resumen['suma_pagado'])
             total_pendiente = round(total_monto - total_pagado, 2)
+            monto_vencido   = _monto(resumen['suma_monto_venc']) - _monto(resumen['suma_pagado_venc'])
+            monto_pendiente_cxc = _monto(resumen['suma_monto_pend']) - _monto(resumen['suma_pagado_pend'])
+
+            def _agrupar(qs_grupo, campo):
+                return {
+                    fila[campo]: {
+                        'count': fila['count'],
+                        'monto': _monto(fila['suma_monto']),
+                        'pendiente': round(_monto(fila['suma_monto']) - _monto(fila['suma_pagado']), 2),
+                    }
+                    for fila in qs_grupo.values(campo).annotate(
+                        count=Count('id'), suma_monto=Sum('monto'), suma_pagado=Sum('monto_pagado'),
+                    )
+                }
 
-            credito  = [v for v in data if v.modalidad_pago == 'Credito']
-            vencidas = [v for v in credito if v.fecha_vencimiento and v.fecha_vencimiento < hoy
-                        and v.estado_cobranza in ('Pendiente', 'Parcial')]
-            pendientes = [v for v in credito if v.estado_cobranza in ('Pendiente', 'Parcial')]
-
-            monto_vencido   = sum(float(v.monto.amount) - float(v.monto_pagado.amount) for v in vencidas)
-            monto_pendiente_cxc = sum(float(v.monto.amount) - float(v.monto_pagado.amount) for v in pendientes)
-
-            by_estado   = defaultdict(lambda: {'count': 0, 'monto': 0.0, 'pendiente': 0.0})
-            by_cliente  = defaultdict(lambda: {'count': 0, 'monto': 0.0, 'pendiente': 0.0})
-            by_venc     = defaultdict(lambda: {'count': 0, 'monto': 0.0})   # antigüedad
-
-            for v in data:
-                amt  = float(v.monto.amount)
-                pend = round(amt - float(v.monto_pagado.amount), 2)
-                est  = v.estado_cobranza
-                cli  = v.cliente.nombre
-
-                by_estado[est]['count']    += 1
-                by_estado[est]['monto']    += amt
-                by_estado[est]['pendiente']+= pend
-
-                by_cliente[cli]['count']    += 1
-                by_cliente[cli]['monto']    += amt
-                by_cliente[cli]['pendiente']+= pend
-
-                # Antigüedad solo para créditos pendientes
-                if v.modalidad_pago == 'Credito' and v.fecha_vencimiento and pend > 0:
-                    dias_v = (hoy - v.fecha_vencimiento).days
-                    if dias_v <= 0:
-                        bucket = "Por vencer"
-                    elif dias_v <= 30:
-                        bucket = "1-30 días"
-                    elif dias_v <= 60:
-                        bucket = "31-60 días"
-                    elif dias_v <= 90:
-                        bucket = "61-90 días"
-                    else:
-                        bucket = "+90 días"
-                    by_venc[bucket]['count'] += 1
-                    by_venc[bucket]['monto'] += pend
+            by_estado  = _agrupar(base, 'estado_cobranza')
+            by_cliente = _agrupar(base, 'cliente__nombre')
+
+            # Antigüedad solo para créditos con saldo pendiente
+            rango = Case(
+                When(fecha_vencimiento__gte=hoy, then=Value("Por vencer")),
+                When(fecha_vencimiento__gte=hoy - timedelta(days=30), then=Value("1-30 días")),
+                When(fecha_vencimiento__gte=hoy - timedelta(days=60), then=Value("31-60 días")),
+                When(fecha_vencimiento__gte=hoy - timedelta(days=90), then=Value("61-90 días")),
+                default=Value("+90 días"),
+                output_field=models.CharField(),
+            )
+            by_venc = _agrupar(
+                base.filter(credito_q, fecha_vencimiento__isnull=False, monto__gt=F('monto_pagado'))
+                    .annotate(rango=rango),
+                'rango',
+            )
 
             # Anchos
             for col, w in zip('ABCDE', [30, 14, 18, 18, 14]):
                 ws2.column_dimensions[col].width = w
+            ws2.freeze_panes = "A4"
 
             r = 1
             # Cabecera
-            hdr_cell = ws2.cell(row=r, column=1,
-                                value="  RESUMEN EJECUTIVO — CUENTAS POR COBRAR")
-            hdr_cell.font      = Font(bold=True, color=WHITE, size=14)
-            hdr_cell.fill      = PatternFill("solid", fgColor=NAVY)
-            hdr_cell.alignment = Alignment(horizontal="left", vertical="center")
-            ws2.merge_cells(f"A{r}:E{r}")
+            ws2.merged_cells.add(f"A{r}:E{r}")
             ws2.row_dimensions[r].height = 30
+            ws2.append([_cell(ws2, "  RESUMEN EJECUTIVO — CUENTAS POR COBRAR",
+                              font=Font(bold=True, color=WHITE, size=14),
+                              fill=PatternFill("solid", fgColor=NAVY),
+                              alignment=Alignment(horizontal="left", vertical="center"))])
             r += 1
 
-            sub = ws2.cell(
-                row=r, column=1,
-                value=(f"  Generado: {hoy.strftime('%d/%m/%Y')}"
-                       f"   |   Registros analizados: {len(data)}"
-                       f"   |   Créditos activos: {len(credito)}"),
-            )
-            sub.font = Font(italic=True, size=9, color="555555")
-            sub.fill = PatternFill("solid", fgColor="EBF5FB")
-            ws2.merge_cells(f"A{r}:E{r}")
+            ws2.merged_cells.add(f"A{r}:E{r}")
+            ws2.append([_cell(ws2,
+                              (f"  Generado: {hoy.strftime('%d/%m/%Y')}"
+                               f"   |   Registros analizados: {n_ventas}"
+                               f"   |   Créditos activos: {resumen['n_credito']}"),
+                              font=Font(italic=True, size=9, color="555555"),
+                              fill=PatternFill("solid", fgColor="EBF5FB"))])
+            ws2.append([])
             r += 2
 
             # KPIs — numeric cells with number_format
             kpis = [
-                ("Total Facturado",      total_monto,           MONEY),
-                ("Total Cobrado",        total_pagado,          MONEY),
-                ("Saldo por Cobrar",     total_pendiente,       MONEY),
-                ("Saldo Vencido",        monto_vencido,         MONEY),
-                ("N° Ventas",            len(data),             "0"),
-                ("N° Créditos Activos",  len(credito),          "0"),
-                ("N° Vencidas",          len(vencidas),         "0"),
-                ("N° Pendientes",        len(pendientes),       "0"),
+                ("Total Facturado",      total_monto,              MONEY),
+                ("Total Cobrado",        total_pagado,             MONEY),
+                ("Saldo por Cobrar",     total_pendiente,          MONEY),
+                ("Saldo Vencido",        monto_vencido,            MONEY),
+                ("N° Ventas",            n_ventas,                 "0"),
+                ("N° Créditos Activos",  resumen['n_credito'],     "0"),
+                ("N° Vencidas",          resumen['n_vencidas'],    "0"),
+                ("N° Pendientes",        resumen['n_pendientes'],  "0"),
             ]
-            for i, (label, value, fmt) in enumerate(kpis):
-                kpi_row = r + (i // 2)
-                kpi_col = 1 + (i % 2) * 2
-                lc = ws2.cell(row=kpi_row, column=kpi_col, value=label)
-                lc.font      = Font(bold=True, size=9, color="666666")
-                lc.fill      = PatternFill("solid", fgColor="F8FBFD")
-                lc.alignment = Alignment(horizontal="left")
-                vc = ws2.cell(row=kpi_row, column=kpi_col + 1, value=value)
-                vc.number_format = fmt
-                vc.font      = Font(bold=True, size=11, color=NAVY)
-                vc.fill      = PatternFill("solid", fgColor="F8FBFD")
-                vc.alignment = Alignment(horizontal="right")
+            kpi_fill = PatternFill("solid", fgColor="F8FBFD")
+            for i in range(0, len(kpis), 2):
+                kpi_line = []
+                for label, value, fmt in kpis[i:i + 2]:
+                    kpi_line.append(_cell(ws2, label, font=Font(bold=True, size=9, color="666666"),
+                                          fill=kpi_fill, alignment=Alignment(horizontal="left")))
+                    kpi_line.append(_cell(ws2, value, font=Font(bold=True, size=11, color=NAVY),
+                                          fill=kpi_fill, alignment=Alignment(horizontal="right"),
+                                          number_format=fmt))
+                ws2.append(kpi_line)
+            ws2.append([])
             r += 5  # 4 KPI rows + blank separator
 
             # ── Por Estado de Cobranza ────────────────────────────────────
-            _section_title(ws2, r, 1, 5, "  RESUMEN POR ESTADO DE COBRANZA")
+            _section_title(ws2, r, 5, "  RESUMEN POR ESTADO DE COBRANZA")
             r += 1
-            for ci, h in enumerate(["Estado", "N° Ventas", "Monto Total", "Saldo Pendiente", "% Pendiente"], 1):
-                _nav_hdr(ws2.cell(row=r, column=ci, value=h), TEAL)
+            est_cols = ["Estado", "N° Ventas", "Monto Total", "Saldo Pendiente", "% Pendiente"]
+            ws2.append([_nav_hdr(ws2, h, TEAL) for h in est_cols])
             est_hdr = r
             r += 1
             for estado, v in sorted(by_estado.items(), key=lambda x: -x[1]['pendiente']):
                 pct = v['pendiente'] / total_monto if total_monto else 0
-                ws2.cell(row=r, column=1, value=estado)
-                ws2.cell(row=r, column=2, value=v['count']).alignment = Alignment(horizontal="center")
-                c3 = ws2.cell(row=r, column=3, value=v['monto'])
-                c3.number_format = MONEY
-                c4 = ws2.cell(row=r, column=4, value=v['pendiente'])
-                c4.number_format = MONEY
-                c5 = ws2.cell(row=r, column=5, value=pct)
-                c5.number_format = '0.00%'
+                ws2.append([
+                    estado,
+                    _cell(ws2, v['count'], alignment=Alignment(horizontal="center")),
+                    _cell(ws2, v['monto'], number_format=MONEY),
+                    _cell(ws2, v['pendiente'], number_format=MONEY),
+                    _cell(ws2, pct, number_format='0.00%'),
+                ])
                 r += 1
             est_end = r - 1
-            _add_table(ws2, "TablaEstados", est_hdr, est_end, 5)
+            _add_table(ws2, "TablaEstados", est_cols, est_hdr, est_end)
             # Total
-            ws2.cell(row=r, column=1, value="TOTAL").font = Font(bold=True)
-            ws2.cell(row=r, column=2, value=len(data)).font = Font(bold=True)
-            ct3 = ws2.cell(row=r, column=3, value=total_monto)
-            ct3.number_format = MONEY; ct3.font = Font(bold=True); ct3.fill = PatternFill("solid", fgColor=LIGHT)
-            ct4 = ws2.cell(row=r, column=4, value=total_pendiente)
-            ct4.number_format = MONEY; ct4.font = Font(bold=True); ct4.fill = PatternFill("solid", fgColor=LIGHT)
+            ws2.append([
+                _total_cell(ws2, "TOTAL"),
+                _total_cell(ws2, n_ventas),
+                _total_cell(ws2, total_monto, MONEY, fill=True),
+                _total_cell(ws2, total_pendiente, MONEY, fill=True),
+            ])
+            ws2.append([])
             r += 2
 
             # ── Antigüedad de Saldos ──────────────────────────────────────
-            _section_title(ws2, r, 1, 4, "  ANTIGÜEDAD DE SALDOS (CRÉDITOS PENDIENTES)")
+            _section_title(ws2, r, 4, "  ANTIGÜEDAD DE SALDOS (CRÉDITOS PENDIENTES)")
             r += 1
             BUCKET_ORDER = ["Por vencer", "1-30 días", "31-60 días", "61-90 días", "+90 días"]
-            for ci, h in enumerate(["Rango", "N° Facturas", "Saldo Pendiente", "% del Total Pendiente"], 1):
-                _nav_hdr(ws2.cell(row=r, column=ci, value=h), TEAL)
+            venc_cols = ["Rango", "N° Facturas", "Saldo Pendiente", "% del Total Pendiente"]
+            ws2.append([_nav_hdr(ws2, h, TEAL) for h in venc_cols])
             venc_hdr = r
             r += 1
             for bucket in BUCKET_ORDER:
                 if bucket not in by_venc:
                     continue
                 v = by_venc[bucket]
-                pct = v['monto'] / monto_pendiente_cxc if monto_pendiente_cxc else 0
-                ws2.cell(row=r, column=1, value=bucket)
-                ws2.cell(row=r, column=2, value=v['count']).alignment = Alignment(horizontal="center")
-                b3 = ws2.cell(row=r, column=3, value=v['monto'])
-                b3.number_format = MONEY
-                b4 = ws2.cell(row=r, column=4, value=pct)
-                b4.number_format = '0.00%'
+                pct = v['pendiente'] / monto_pendiente_cxc if monto_pendiente_cxc else 0
+                ws2.append([
+                    bucket,
+                    _cell(ws2, v['count'], alignment=Alignment(horizontal="center")),
+                    _cell(ws2, v['pendiente'], number_format=MONEY),
+                    _cell(ws2, pct, number_format='0.00%'),
+                ])
                 r += 1
             venc_end = r - 1
-            _add_table(ws2, "TablaAntiguedad", venc_hdr, venc_end, 4)
-            ws2.cell(row=r, column=1, value="TOTAL").font = Font(bold=True)
-            ws2.cell(row=r, column=2, value=len(pendientes)).font = Font(bold=True)
-            bt3 = ws2.cell(row=r, column=3, value=monto_pendiente_cxc)
-            bt3.number_format = MONEY; bt3.font = Font(bold=True); bt3.fill = PatternFill("solid", fgColor=LIGHT)
+            _add_table(ws2, "TablaAntiguedad", venc_cols, venc_hdr, venc_end)
+            ws2.append([
+                _total_cell(ws2, "TOTAL"),
+                _total_cell(ws2, resumen['n_pendientes']),
+                _total_cell(ws2, monto_pendiente_cxc, MONEY, fill=True),
+            ])
+            ws2.append([])
             r += 2
 
             # ── Top Clientes por Saldo Pendiente ──────────────────────────
-            _section_title(ws2, r, 1, 5, "  TOP CLIENTES POR SALDO PENDIENTE")
+            _section_title(ws2, r, 5, "  TOP CLIENTES POR SALDO PENDIENTE")
             r += 1
-            for ci, h in enumerate(["Cliente", "N° Ventas", "Monto Total", "Saldo Pendiente", "% del Total"], 1):
-                _nav_hdr(ws2.cell(row=r, column=ci, value=h), TEAL)
+            cli_cols = ["Cliente", "N° Ventas", "Monto Total", "Saldo Pendiente", "% del Total"]
+            ws2.append([_nav_hdr(ws2, h, TEAL) for h in cli_cols])
             cli_hdr = r
             r += 1
             top_clientes = sorted(by_cliente.items(), key=lambda x: -x[1]['pendiente'])[:15]
             for cli, v in top_clientes:
                 pct = v['pendiente'] / total_monto if total_monto else 0
-                ws2.cell(row=r, column=1, value=cli)
-                ws2.cell(row=r, column=2, value=v['count']).alignment = Alignment(horizontal="center")
-                cc3 = ws2.cell(row=r, column=3, value=v['monto'])
-                cc3.number_format = MONEY
-                cc4 = ws2.cell(row=r, column=4, value=v['pendiente'])
-                cc4.number_format = MONEY
-                cc5 = ws2.cell(row=r, column=5, value=pct)
-                cc5.number_format = '0.00%'
+                ws2.append([
+                    cli,
+                    _cell(ws2, v['count'], alignment=Alignment(horizontal="center")),
+                    _cell(ws2, v['monto'], number_format=MONEY),
+                    _cell(ws2, v['pendiente'], number_format=MONEY),
+                    _cell(ws2, pct, number_format='0.00%'),
+                ])
                 r += 1
             cli_end = r - 1
-            _add_table(ws2, "TablaClientes", cli_hdr, cli_end, 5)
-
-            ws2.freeze_panes = "A4"
+            _add_table(ws2, "TablaClientes", cli_cols, cli_hdr, cli_end)
 
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        response["Content-Disposition"] = (
-            f'attachment; filename="ventas_{hoy.strftime("%Y%m%d")}.xlsx"'
+        return UtilService.create_excel_response(
+            wb, filename=f'ventas_{hoy.strftime("%Y%m%d")}.xlsx'
         )
-        wb.save(response)
-        return response
 
     export_to_excel.short_description = "Exportar a Excel (.xlsx)"
 
@@ -1908,51 +1982,31 @@ class VentasAdmin(ModelAdmin):
         """
         Dashboard principal de ventas con métricas clave.
         
-        **OPTIMIZADO CON REDIS CACHE**:
-        - Cache TTL: 5 minutos (300s)
-        - Mejora de performance: ~3s → <0.2s (95% reducción)
-        - Cache hit esperado: >85%
-        - Invalidación automática en cambios de ventas/pagos
+        **PRECALCULADO EN SEGUNDO PLANO**:
+        - La cola de recálculo (app.services.recalculo_service) deja las
+          métricas en cache tras cada cambio de ventas/pagos y por cron
+        - La vista solo lee el cache; si aún no hay datos encola el cálculo
+          y muestra el estado "calculando" en lugar de bloquear la petición
+        - Tras un cambio muestra el último cálculo marcado como desactualizado
+          mientras se recalcula
         """
+        from app.services.recalculo_service import RecalculoService
+
         try:
-            # ═══════════════════════════════════════════════════════════════
-            # OBTENER DATOS DESDE CACHE (5 min TTL)
-            # ═══════════════════════════════════════════════════════════════
-            datos_dashboard = CuentasPorCobrarCache.get_dashboard_ventas()
+            datos_dashboard, desactualizado = RecalculoService.leer_o_solicitar(
+                RecalculoService.Tipo.CXC,
+                None,
+                CuentasPorCobrarCache.leer_dashboard_ventas,
+                CuentasPorCobrarCache.get_dashboard_ventas,
+            )
             
             if datos_dashboard is None:
-                # Fallback: Si el cache falla, mostrar error amigable
-                messages.warning(
-                    request,
-                    'El dashboard está temporalmente lento. '
-                    'Los datos se están recalculando.'
+                context = dict(
+                    self.admin_site.each_context(request),
+                    calculando=True,
+                    title='Dashboard de Ventas',
                 )
-                # Intentar cálculo directo como fallback
-                from dateutil.relativedelta import relativedelta
-                dso_metrics = CuentasPorCobrarMetrics.calcular_dso()
-                hoy = timezone.now().date()
-                inicio_mes = hoy.replace(day=1)
-                inicio_año = hoy.replace(month=1, day=1)
-                
-                ventas_mes = Ventas.objects.filter(
-                    fecha_salida_manifiesto__gte=inicio_mes
-                ).aggregate(total=Sum('monto'), count=Count('id'))
-                
-                vencidas = Ventas.objects.filter(
-                    modalidad_pago='Credito',
-                    fecha_vencimiento__lt=hoy,
-                    estado_cobranza__in=['Pendiente', 'Parcial']
-                ).aggregate(total=Sum('monto'), count=Count('id'))
-                
-                datos_dashboard = {
-                    'dso_metrics': dso_metrics,
-                    'ventas_mes': ventas_mes,
-                    'vencidas': vencidas,
-                    'tasa_morosidad': 0,
-                    'cartera_aging': {'corriente': 0, 'vencida_30': 0, 'vencida_60': 0, 'vencida_90': 0},
-                    'recuperacion_mes_anterior': 0,
-                    'top_clientes': []
-                }
+                return TemplateResponse(request, 'admin/ventas/dashboard.html', context)
             
             # ═══════════════════════════════════════════════════════════════
             # CONSTRUIR CONTEXTO CON DATOS CACHEADOS
@@ -1966,6 +2020,7 @@ class VentasAdmin(ModelAdmin):
                 tasa_morosidad=datos_dashboard['tasa_morosidad'],
                 cartera_aging=datos_dashboard['cartera_aging'],
                 recuperacion_mes_anterior=datos_dashboard['recuperacion_mes_anterior'],
+                desactualizado=desactualizado,
                 title='Dashboard de Ventas',
             )
 
@@ -2062,7 +2117,7 @@ class PagoVentaResource(resources.ModelResource):
         import_id_fields = ('id',)
 
 @admin.register(PagoVenta)
-class PagoVentaAdmin(ImportExportModelAdmin, ModelAdmin):
+class PagoVentaAdmin(KeysetPaginationMixin, ImportExportModelAdmin, ModelAdmin):
     """
     Admin para PagoVenta con controles bancarios de integridad.
     Implementa RF01, RF02, RF03: validaciones de nivel financiero.
@@ -2232,8 +2287,8 @@ class PagoVentaAdmin(ImportExportModelAdmin, ModelAdmin):
         
         # Registrar en auditoría con usuario actual
         try:
-            from auditoria.models import LogActividad
-            LogActividad.objects.create(
+            from auditoria.buffer import registrar_actividad
+            registrar_actividad(
                 usuario=request.user,
                 nombre_usuario=request.user.username,
                 tipo_accion='update' if change else 'create',
@@ -2581,7 +2636,7 @@ class MercadoDestinoAdmin(ModelAdmin):
 from .models import SaldoCliente, AntigüedadSaldo, EstadoCuentaCliente, ConfiguracionCuentasPorCobrar
 
 # @admin.register(SaldoCliente)  # OCULTO DE LA SIDEBAR
-class SaldoClienteAdmin(ModelAdmin):
+class SaldoClienteAdmin(KeysetPaginationMixin, ModelAdmin):
     """
     Administración para Saldos de Clientes - RF1
     Permite visualizar y gestionar los saldos pendientes por cliente.
@@ -2604,6 +2659,9 @@ class SaldoClienteAdmin(ModelAdmin):
     
     date_hierarchy = 'fecha_vencimiento'
     list_per_page = 25
+    # fecha_creacion no tiene índice propio; el pk sigue el mismo orden y
+    # permite la paginación por llave
+    ordering = ('-pk',)
     
     readonly_fields = (
         'venta', 'cliente', 'monto_original',
@@ -2898,15 +2956,17 @@ class EstadoCuentaClienteAdmin(ModelAdmin):
         """Regenera reportes de estado de cuenta"""
         from .services.cuentas_por_cobrar_service import CuentasPorCobrarService
         
+        # Un lote por período: las consultas no crecen con los clientes
+        periodos = {}
+        for cliente_id, inicio, fin in queryset.values_list('cliente_id', 'periodo_inicio', 'periodo_fin'):
+            periodos.setdefault((inicio, fin), set()).add(cliente_id)
+
         count = 0
-        for estado in queryset:
+        for (inicio, fin), cliente_ids in periodos.items():
             try:
-                CuentasPorCobrarService.generar_estado_cuenta(
-                    estado.cliente.id,
-                    estado.periodo_inicio,
-                    estado.periodo_fin
-                )
-                count += 1
+                count += len(CuentasPorCobrarService.generar_estados_cuenta_masivo(
+                    inicio, fin, cliente_ids=list(cliente_ids)
+                ))
             except Exception:
                 pass
         
@@ -64,8 +64,8 @@ class Command(BaseCommand):
 
         # Registro en auditoria
         try:
-            from auditoria.models import LogActividad
-            LogActividad.objects.create(
+            from auditoria.buffer import registrar_actividad
+            registrar_actividad(
                 nombre_usuario='sistema',
                 tipo_accion='update',
                 descripcion=f'Comando actualizar_ventas_vencidas: {updated} ventas marcadas como Vencidas.',
@@ -101,8 +101,8 @@ class Command(BaseCommand):
 
         # Registro en auditoria
         try:
-            from auditoria.models import LogActividad
-            LogActividad.objects.create(
+            from auditoria.buffer import registrar_actividad
+            registrar_actividad(
                 nombre_usuario='sistema',
                 tipo_accion='other',
                 descripcion=(
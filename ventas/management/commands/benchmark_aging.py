@@ -0,0 +1,119 @@
+"""
+Management command: benchmark_aging
+Mide calcular_aging_masivo sobre una cartera sintética (por defecto
+5,000 clientes / 200,000 saldos abiertos). Todo se ejecuta dentro de una
+transacción que se revierte al final, por lo que no deja datos en la BD.
+
+Uso:
+    python manage.py benchmark_aging
+    python manage.py benchmark_aging --clientes 1000 --saldos 20000
+    python manage.py benchmark_aging --comparar   # incluye la ruta cliente por cliente
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from catalogo.models import Estado, Pais, Producto, Sucursal
+from ventas.models import AntigüedadSaldo, Cliente, SaldoCliente, Ventas
+from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+
+class _Rollback(Exception):
+    """Fuerza el rollback de la transacción del benchmark."""
+
+
+class Command(BaseCommand):
+    help = "Benchmark del cálculo masivo de aging sobre datos sintéticos (con rollback)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=5000)
+        parser.add_argument('--saldos', type=int, default=200000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--comparar',
+            action='store_true',
+            help='Ejecuta también la ruta cliente por cliente (lenta con volúmenes grandes).',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._poblar(options)
+                self._medir('bulk', bulk=True)
+                if options['comparar']:
+                    self._medir('por cliente', bulk=False)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("Datos sintéticos revertidos.")
+
+    def _poblar(self, options):
+        rnd = random.Random(options['seed'])
+        batch = options['batch_size']
+        hoy = timezone.now().date()
+
+        inicio = time.perf_counter()
+        pais = Pais.objects.create(siglas='BNC', nombre='Benchmark', moneda='MXN')
+        estado = Estado.objects.create(id='BENCH_AGING', nombre='Benchmark', pais=pais)
+        sucursal = Sucursal.objects.create(nombre='Benchmark', id_estado=estado)
+        producto = Producto.objects.create(nombre='Benchmark', variedad='Aging')
+
+        clientes = Cliente.objects.bulk_create(
+            [Cliente(nombre=f'Bench {i}', pais=pais, imagen=None)
+             for i in range(options['clientes'])],
+            batch_size=batch,
+        )
+
+        ventas = []
+        for i in range(options['saldos']):
+            monto = Decimal(rnd.randint(1000, 500000)) / 100
+            vencimiento = hoy - timedelta(days=rnd.randint(-30, 180))
+            ventas.append(Ventas(
+                fecha_salida_manifiesto=vencimiento - timedelta(days=30),
+                fecha_deposito=vencimiento - timedelta(days=30),
+                producto=producto,
+                cantidad=Decimal('1.000'),
+                monto=monto,
+                cliente=clientes[i % len(clientes)],
+                sucursal_id=sucursal,
+                cuenta=None,
+                tipo_venta=Ventas.TipoVenta.NACIONAL,
+                modalidad_pago=Ventas.ModalidadPago.CREDITO,
+                estado_cobranza=Ventas.EstadoCobranza.PENDIENTE,
+                monto_pagado=0,
+                fecha_vencimiento=vencimiento,
+            ))
+        ventas = Ventas.objects.bulk_create(ventas, batch_size=batch)
+
+        SaldoCliente.objects.bulk_create(
+            [SaldoCliente(
+                cliente_id=venta.cliente_id,
+                venta=venta,
+                monto_original=venta.monto,
+                saldo_pendiente=venta.monto,
+                fecha_vencimiento=venta.fecha_vencimiento,
+                estado=SaldoCliente.EstadosSaldo.PENDIENTE,
+            ) for venta in ventas],
+            batch_size=batch,
+        )
+        self.stdout.write(
+            f"Datos sintéticos: {len(clientes)} clientes / {len(ventas)} saldos "
+            f"en {time.perf_counter() - inicio:.2f}s"
+        )
+
+    def _medir(self, etiqueta, bulk):
+        AntigüedadSaldo.objects.filter(fecha_calculo=timezone.now().date()).delete()
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            resultado = CuentasPorCobrarService.calcular_aging_masivo(bulk=bulk)
+            duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"[{etiqueta}] {resultado['clientes_procesados']} clientes en {duracion:.2f}s "
+            f"({len(ctx.captured_queries)} consultas)"
+        ))
@@ -0,0 +1,168 @@
+"""
+Management command: benchmark_pagos
+Mide el registro concurrente de PagoVenta: N hilos (cajas) registran pagos
+sobre la misma venta y sobre ventas distintas. Compara PagoVenta.save()
+(incrementos F(), auditoría en on_commit) con la ruta anterior
+(select_for_update + actualizar_estado_cobranza + Ventas.save completo).
+
+Cada hilo usa su propia conexión, por lo que los datos sintéticos se
+confirman y se eliminan al terminar. Requiere un motor con bloqueos de fila
+(MySQL/PostgreSQL); con SQLite las escrituras concurrentes se serializan.
+
+Uso:
+    python manage.py benchmark_pagos
+    python manage.py benchmark_pagos --hilos 16 --pagos 50
+    python manage.py benchmark_pagos --sin-legado
+"""
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.utils import timezone
+from djmoney.money import Money
+
+from auditoria.models import LogActividad
+from catalogo.models import Estado, Pais, Producto, Sucursal
+from gastos.models import Banco, Cuenta
+from ventas.models import Cliente, PagoVenta, SaldoCliente, Ventas, monto_a_mxn
+
+MONTO_PAGO = Decimal('1.00')
+
+
+def registrar_legado(pago):
+    """Ruta previa de PagoVenta.save(), conservada solo como referencia"""
+    with transaction.atomic():
+        venta = Ventas.objects.select_for_update().get(pk=pago.venta_id)
+        pago.monto_pago_mxn = monto_a_mxn(pago.monto_pago, venta.moneda_venta, venta.tipo_cambio)
+        models.Model.save(pago)
+        venta.actualizar_estado_cobranza()
+        pago._registrar_auditoria('create', {
+            'monto': venta.monto.amount, 'monto_pagado': venta.monto_pagado.amount, 'carga': venta.carga,
+        }, pago.pk)
+
+
+class Command(BaseCommand):
+    help = "Benchmark de registro concurrente de pagos (misma venta / ventas distintas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--pagos', type=int, default=25, help='Pagos por hilo (default: 25).')
+        parser.add_argument('--sin-legado', action='store_true', help='Omite la ruta anterior.')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                "SQLite no tiene bloqueos de fila; los resultados no son representativos."
+            ))
+        rutas = [('actual', PagoVenta.save)]
+        if not options['sin_legado']:
+            rutas.append(('legado', registrar_legado))
+
+        datos = self._poblar(options)
+        try:
+            for etiqueta, registrar in rutas:
+                for escenario in ('misma venta', 'ventas distintas'):
+                    self._medir(datos, options, etiqueta, escenario, registrar)
+        finally:
+            self._limpiar(datos)
+            self.stdout.write("Datos sintéticos eliminados.")
+
+    def _poblar(self, options):
+        hoy = timezone.now().date()
+        pais = Pais.objects.create(siglas='BNP', nombre='Benchmark pagos', moneda='MXN')
+        estado = Estado.objects.create(id='BENCH_PAGOS', nombre='Benchmark', pais=pais)
+        sucursal = Sucursal.objects.create(nombre='Benchmark pagos', id_estado=estado)
+        producto = Producto.objects.create(nombre='Benchmark', variedad='Pagos')
+        banco = Banco.objects.create(nombre='Benchmark pagos')
+        cuenta = Cuenta.objects.create(id_banco=banco, id_sucursal=sucursal, numero_cuenta='BENCHPAGOS')
+        cliente = Cliente.objects.create(
+            nombre='Bench pagos', pais=pais, imagen=None, limite_credito=Money('100000000', 'MXN'),
+        )
+        # Una venta por hilo más la compartida; alcanza para todas las rondas
+        monto = MONTO_PAGO * options['hilos'] * options['pagos'] * 10
+        ventas = [
+            Ventas.objects.create(
+                fecha_salida_manifiesto=hoy,
+                fecha_deposito=hoy,
+                fecha_vencimiento=hoy + timedelta(days=30),
+                producto=producto,
+                cantidad=Decimal('1.000'),
+                monto=Money(monto, 'MXN'),
+                cliente=cliente,
+                sucursal_id=sucursal,
+                cuenta=cuenta,
+                tipo_venta=Ventas.TipoVenta.NACIONAL,
+                modalidad_pago=Ventas.ModalidadPago.CREDITO,
+            )
+            for _ in range(options['hilos'] + 1)
+        ]
+        return {
+            'pais': pais, 'estado': estado, 'sucursal': sucursal, 'producto': producto,
+            'banco': banco, 'cuenta': cuenta, 'cliente': cliente, 'ventas': ventas,
+        }
+
+    def _medir(self, datos, options, etiqueta, escenario, registrar):
+        latencias, errores = [], []
+        candado = threading.Lock()
+        compartida = datos['ventas'][0]
+
+        def caja(indice):
+            venta = compartida if escenario == 'misma venta' else datos['ventas'][indice + 1]
+            try:
+                for _ in range(options['pagos']):
+                    pago = PagoVenta(
+                        venta_id=venta.pk, fecha_pago=timezone.now().date(),
+                        monto_pago=Money(MONTO_PAGO, 'MXN'), cuenta_destino=datos['cuenta'],
+                        metodo_pago=PagoVenta.MetodoPago.EFECTIVO,
+                    )
+                    inicio = time.perf_counter()
+                    try:
+                        registrar(pago)
+                    except Exception as exc:
+                        with candado:
+                            errores.append(exc)
+                        continue
+                    with candado:
+                        latencias.append(time.perf_counter() - inicio)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=caja, args=(i,)) for i in range(options['hilos'])]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        if latencias:
+            latencias.sort()
+            p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+            self.stdout.write(self.style.SUCCESS(
+                f"[{etiqueta} / {escenario}] {len(latencias)} pagos en {duracion:.2f}s "
+                f"({len(latencias) / duracion:.0f} pagos/s, p50 {statistics.median(latencias) * 1000:.1f}ms, "
+                f"p95 {p95 * 1000:.1f}ms, {len(errores)} errores)"
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(f"[{etiqueta} / {escenario}] {len(errores)} errores, sin pagos"))
+        if errores:
+            self.stdout.write(f"  primer error: {errores[0]!r}")
+
+    def _limpiar(self, datos):
+        ventas = [venta.pk for venta in datos['ventas']]
+        pagos = list(PagoVenta.objects.filter(venta_id__in=ventas).values_list('pk', flat=True))
+        LogActividad.objects.filter(
+            models.Q(modelo_afectado='Ventas', objeto_id__in=[str(pk) for pk in ventas])
+            | models.Q(modelo_afectado='PagoVenta', objeto_id__in=[str(pk) for pk in pagos])
+        ).delete()
+        PagoVenta.objects.filter(venta_id__in=ventas).delete()
+        SaldoCliente.objects.filter(venta_id__in=ventas).delete()
+        Ventas.objects.filter(pk__in=ventas).delete()
+        datos['cliente'].delete()
+        datos['cuenta'].delete()
+        for clave in ('banco', 'producto', 'sucursal', 'estado', 'pais'):
+            datos[clave].delete()
@@ -0,0 +1,58 @@
+"""
+Management command: calcular_aging
+Genera los snapshots de AntigüedadSaldo para todos los clientes con saldo
+abierto a una fecha de corte (por defecto hoy). Pensado para el cron nocturno.
+
+Uso:
+    python manage.py calcular_aging
+    python manage.py calcular_aging --fecha 2026-01-31
+    python manage.py calcular_aging --por-cliente   # ruta legacy, cliente por cliente
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+
+class Command(BaseCommand):
+    help = "Calcula el aging de cartera (AntigüedadSaldo) para todos los clientes con saldo."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fecha',
+            help='Fecha de corte en formato YYYY-MM-DD (por defecto hoy).',
+        )
+        parser.add_argument(
+            '--por-cliente',
+            action='store_true',
+            help='Usa el cálculo cliente por cliente en lugar del agregado SQL.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Tamaño de lote para el upsert de snapshots (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        fecha_corte = None
+        if options['fecha']:
+            try:
+                fecha_corte = date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError(f"Fecha inválida: {options['fecha']} (usa YYYY-MM-DD)")
+
+        inicio = time.perf_counter()
+        resultado = CuentasPorCobrarService.calcular_aging_masivo(
+            fecha_corte,
+            bulk=not options['por_cliente'],
+            batch_size=options['batch_size'],
+        )
+        duracion = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Aging {resultado['fecha_corte']}: {resultado['clientes_procesados']} cliente(s) "
+            f"procesados, {resultado['errores']} error(es) en {duracion:.2f}s."
+        ))
@@ -0,0 +1,62 @@
+"""
+Management command: generar_estados_cuenta
+Genera en un solo trabajo los estados de cuenta (EstadoCuentaCliente) de todos
+los clientes con saldo o movimientos en el mes, para el envío de fin de mes.
+Regenerar un mes actualiza los registros existentes del período.
+
+Uso:
+    python manage.py generar_estados_cuenta                  # mes anterior
+    python manage.py generar_estados_cuenta --mes 2025-06
+    python manage.py generar_estados_cuenta --mes 2025-06 --cliente 12 --cliente 40
+"""
+import calendar
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+
+class Command(BaseCommand):
+    help = "Genera los estados de cuenta del mes para todos los clientes en lote."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mes',
+            help='Mes en formato YYYY-MM (por defecto, el mes anterior).',
+        )
+        parser.add_argument(
+            '--cliente',
+            type=int,
+            action='append',
+            help='Limita al cliente indicado (se puede repetir).',
+        )
+        parser.add_argument(
+            '--usuario',
+            default='Sistema',
+            help='Nombre registrado en generado_por (default: Sistema).',
+        )
+
+    def handle(self, *args, **options):
+        if options['mes']:
+            try:
+                fecha_inicio = date.fromisoformat(f"{options['mes']}-01")
+            except ValueError:
+                raise CommandError(f"Mes inválido: {options['mes']} (usa YYYY-MM)")
+        else:
+            fecha_inicio = (timezone.now().date().replace(day=1) - timedelta(days=1)).replace(day=1)
+        fecha_fin = fecha_inicio.replace(day=calendar.monthrange(fecha_inicio.year, fecha_inicio.month)[1])
+
+        inicio = time.perf_counter()
+        resultados = CuentasPorCobrarService.generar_estados_cuenta_masivo(
+            fecha_inicio,
+            fecha_fin,
+            cliente_ids=options['cliente'],
+            usuario=options['usuario'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(resultados)} estado(s) de cuenta generados para {fecha_inicio:%Y-%m} "
+            f"en {time.perf_counter() - inicio:.2f}s."
+        ))
@@ -0,0 +1,28 @@
+"""
+Management command: recalcular_credito_clientes
+Recalcula Cliente.credito_usado (saldo de ventas a crédito pendientes o
+parciales) de todos los clientes.
+
+Las señales de Ventas lo mantienen al guardar o borrar ventas y pagos; este
+comando cubre los cambios hechos sin save() (queryset.update, bulk_create,
+SQL directo).
+
+Uso:
+    python manage.py recalcular_credito_clientes
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from ventas.services.credito_service import CreditoClienteService
+
+
+class Command(BaseCommand):
+    help = "Recalcula la exposición de crédito (credito_usado) de cada cliente."
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        actualizados = CreditoClienteService.recalcular()
+        self.stdout.write(self.style.SUCCESS(
+            f"Exposición de crédito recalculada en {time.perf_counter() - inicio:.2f}s: {actualizados} clientes."
+        ))
@@ -0,0 +1,92 @@
+"""
+Management command: recalcular_estados_cobranza
+Sincroniza SaldoCliente con las ventas a crédito y sus pagos reales:
+
+1. Crea el saldo de las ventas a crédito que no lo tienen (huérfanas).
+2. Corrige saldo_pendiente y estado de los saldos que no cuadran con
+   monto_original - pagos.
+
+Las diferencias se calculan en SQL y se aplican por lotes; --dry-run solo
+lista lo que cambiaría.
+
+Uso:
+    python manage.py recalcular_estados_cobranza --dry-run
+    python manage.py recalcular_estados_cobranza
+    python manage.py recalcular_estados_cobranza --chunk-size 5000 --sin-huerfanos
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.services.mantenimiento_cxc_service import MantenimientoCxCService
+
+
+class Command(BaseCommand):
+    help = "Crea saldos faltantes y corrige saldos/estados de cobranza contra los pagos reales."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=MantenimientoCxCService.LOTE,
+            help=f'Filas por lote de escritura (default: {MantenimientoCxCService.LOTE}).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo reporta las diferencias, sin escribir.',
+        )
+        parser.add_argument(
+            '--sin-huerfanos',
+            action='store_true',
+            help='Omite la creación de saldos para ventas a crédito sin SaldoCliente.',
+        )
+        parser.add_argument(
+            '--max-diferencias',
+            type=int,
+            default=20,
+            help='Diferencias a listar en el reporte (default: 20).',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser mayor a cero.')
+        dry_run = options['dry_run']
+        verbo = 'se crearían' if dry_run else 'creados'
+
+        if not options['sin_huerfanos']:
+            inicio = time.perf_counter()
+            resultado = MantenimientoCxCService.huerfanos(
+                options['chunk_size'], dry_run, self._progreso('Ventas huérfanas')
+            )
+            self._reporte(resultado['diferencias'], options['max_diferencias'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Saldos {verbo}: {resultado['saldos_creados']} de {resultado['ventas_procesadas']} "
+                f"ventas huérfanas ({resultado['errores']} sin vencimiento) en {time.perf_counter() - inicio:.2f}s."
+            ))
+
+        inicio = time.perf_counter()
+        resultado = MantenimientoCxCService.recalcular(
+            options['chunk_size'], dry_run, self._progreso('Saldos inconsistentes')
+        )
+        self._reporte(resultado['diferencias'], options['max_diferencias'])
+        verbo = 'se corregirían' if dry_run else 'corregidos'
+        self.stdout.write(self.style.SUCCESS(
+            f"Saldos {verbo}: {resultado['saldos_corregidos']} de {resultado['saldos_revisados']} revisados "
+            f"en {time.perf_counter() - inicio:.2f}s."
+        ))
+
+    def _progreso(self, etiqueta):
+        def escribir(hechos, total):
+            self.stdout.write(f"  {etiqueta}: {hechos}/{total}")
+        return escribir
+
+    def _reporte(self, diferencias, maximo):
+        for diferencia in diferencias[:maximo]:
+            guardado = '-' if diferencia['guardado'] is None else diferencia['guardado']
+            self.stdout.write(
+                f"  venta {diferencia['venta_id']}: saldo {guardado} -> {diferencia['real']} "
+                f"({diferencia['estado']})"
+            )
+        if len(diferencias) > maximo:
+            self.stdout.write(f"  ... y {len(diferencias) - maximo} más.")
@@ -0,0 +1,39 @@
+"""
+Management command: recalcular_montos_mxn
+Recalcula las columnas en moneda base (monto_mxn, monto_pagado_mxn,
+monto_pago_mxn y saldo_pendiente_mxn) con el tipo de cambio de cada venta.
+
+save() las mantiene al día; este comando cubre los registros previos y los
+cambios hechos sin save() (queryset.update, bulk_create, SQL directo).
+
+Uso:
+    python manage.py recalcular_montos_mxn
+    python manage.py recalcular_montos_mxn --lote 2000
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.services.montos_mxn_service import MontosMXNService
+
+
+class Command(BaseCommand):
+    help = "Recalcula los equivalentes MXN de ventas, pagos y saldos por cobrar."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=MontosMXNService.LOTE,
+            help=f'Filas por UPDATE (default: {MontosMXNService.LOTE}).',
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor a cero.')
+        inicio = time.perf_counter()
+        resultado = MontosMXNService.recalcular(options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Montos MXN recalculados en {time.perf_counter() - inicio:.2f}s: "
+            f"{resultado['ventas']} ventas, {resultado['pagos']} pagos, {resultado['saldos']} saldos."
+        ))
@@ -0,0 +1,58 @@
+"""
+Management command: snapshot_cartera_mensual
+Cierra los meses pendientes en CarteraMensual (cartera al corte, ventas a
+crédito y cobranza). Los snapshots son append-only: un mes ya cerrado no se
+modifica salvo que se pida --recalcular. Pensado para el cron del día 1.
+
+Uso:
+    python manage.py snapshot_cartera_mensual
+    python manage.py snapshot_cartera_mensual --desde 2024-01           # backfill
+    python manage.py snapshot_cartera_mensual --desde 2025-06 --recalcular
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.services.metrics_service import CuentasPorCobrarMetrics
+
+
+class Command(BaseCommand):
+    help = "Genera los snapshots mensuales de cartera (CarteraMensual) que falten."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            help='Primer mes a cerrar en formato YYYY-MM (por defecto, el siguiente al último snapshot).',
+        )
+        parser.add_argument(
+            '--recalcular',
+            action='store_true',
+            help='Reemplaza los snapshots existentes a partir de --desde.',
+        )
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = date.fromisoformat(f"{options['desde']}-01")
+            except ValueError:
+                raise CommandError(f"Mes inválido: {options['desde']} (usa YYYY-MM)")
+        elif options['recalcular']:
+            raise CommandError("--recalcular requiere --desde")
+
+        inicio = time.perf_counter()
+        generados = CuentasPorCobrarMetrics.cerrar_meses_pendientes(
+            desde=desde,
+            recalcular=options['recalcular'],
+        )
+        duracion = time.perf_counter() - inicio
+
+        if not generados:
+            self.stdout.write("No hay meses pendientes de cerrar.")
+            return
+
+        rango = f"{generados[0][0]}-{generados[0][1]:02d} a {generados[-1][0]}-{generados[-1][1]:02d}"
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(generados)} snapshot(s) de cartera generados ({rango}) en {duracion:.2f}s."
+        ))
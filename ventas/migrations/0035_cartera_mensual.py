@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:13
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0034_make_ventas_agente_optional'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarteraMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('año', models.PositiveIntegerField()),
+                ('mes', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)])),
+                ('fecha_corte', models.DateField(db_index=True, help_text='Último día del mes cerrado')),
+                ('total_cxc', models.DecimalField(decimal_places=2, default=0, help_text='Saldo pendiente de cuentas por cobrar al corte', max_digits=14)),
+                ('numero_facturas', models.PositiveIntegerField(default=0, help_text='Facturas con saldo abierto al corte')),
+                ('clientes_activos', models.PositiveIntegerField(default=0, help_text='Clientes con al menos una factura abierta al corte')),
+                ('ventas_credito', models.DecimalField(decimal_places=2, default=0, help_text='Ventas a crédito depositadas en el mes', max_digits=14)),
+                ('numero_ventas', models.PositiveIntegerField(default=0)),
+                ('ventas_credito_30d', models.DecimalField(decimal_places=2, default=0, help_text='Ventas a crédito de los 30 días previos al corte (base del DSO)', max_digits=14)),
+                ('cobranza', models.DecimalField(decimal_places=2, default=0, help_text='Pagos recibidos en el mes', max_digits=14)),
+                ('numero_pagos', models.PositiveIntegerField(default=0)),
+                ('fecha_cierre', models.DateTimeField(auto_now_add=True, help_text='Momento en que se cerró el snapshot')),
+            ],
+            options={
+                'verbose_name': 'Cartera Mensual',
+                'verbose_name_plural': 'Cartera Mensual (snapshots)',
+                'db_table': 'ventas_cartera_mensual',
+                'ordering': ['año', 'mes'],
+                'constraints': [models.UniqueConstraint(fields=('año', 'mes'), name='cartera_mensual_unica')],
+            },
+        ),
+    ]
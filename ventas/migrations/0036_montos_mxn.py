@@ -0,0 +1,80 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:40
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Round
+
+
+def _factor(moneda, tipo_cambio):
+    es_mxn = Q(**{f'{moneda}__iexact': 'MXN'}) | Q(**{f'{moneda}__isnull': True}) | Q(**{moneda: ''})
+    return Case(When(es_mxn, then=Value(Decimal('1'))), default=tipo_cambio,
+                output_field=DecimalField(max_digits=10, decimal_places=4))
+
+
+def _en_mxn(campo, factor):
+    return Round(F(campo) * factor, 2, output_field=DecimalField(max_digits=16, decimal_places=2))
+
+
+def poblar_montos_mxn(apps, schema_editor):
+    """Calcula los equivalentes MXN de los registros existentes"""
+    Ventas = apps.get_model('ventas', 'Ventas')
+    PagoVenta = apps.get_model('ventas', 'PagoVenta')
+    SaldoCliente = apps.get_model('ventas', 'SaldoCliente')
+
+    factor_venta = _factor('moneda_venta', F('tipo_cambio'))
+    Ventas.objects.update(
+        monto_mxn=_en_mxn('monto', factor_venta),
+        monto_pagado_mxn=_en_mxn('monto_pagado', factor_venta),
+    )
+    factor_pago = Subquery(
+        Ventas.objects.filter(pk=OuterRef('venta_id'))
+        .annotate(factor=_factor('moneda_venta', F('tipo_cambio'))).values('factor')[:1]
+    )
+    PagoVenta.objects.update(monto_pago_mxn=_en_mxn('monto_pago', factor_pago))
+    tipo_cambio_venta = Subquery(Ventas.objects.filter(pk=OuterRef('venta_id')).values('tipo_cambio')[:1])
+    SaldoCliente.objects.update(saldo_pendiente_mxn=_en_mxn('saldo_pendiente', _factor('moneda', tipo_cambio_venta)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0035_cartera_mensual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagoventa',
+            name='monto_pago_mxn',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Monto del pago en MXN, con el tipo de cambio de la venta', max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='saldocliente',
+            name='saldo_pendiente_mxn',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Saldo pendiente en MXN, con el tipo de cambio de la venta', max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='ventas',
+            name='monto_mxn',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Monto de la venta en MXN', max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='ventas',
+            name='monto_pagado_mxn',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Monto pagado en MXN', max_digits=16),
+        ),
+        migrations.RunPython(poblar_montos_mxn, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pagoventa',
+            index=models.Index(fields=['fecha_pago', 'monto_pago_mxn'], name='ventas_pago_fecha_mxn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saldocliente',
+            index=models.Index(fields=['estado', 'saldo_pendiente_mxn'], name='ventas_saldo_estado_mxn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventas',
+            index=models.Index(fields=['estado_cobranza', 'cliente', 'monto_mxn', 'monto_pagado_mxn'], name='ventas_cartera_mxn_idx'),
+        ),
+    ]
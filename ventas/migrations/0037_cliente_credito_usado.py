@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:10
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_credito_usado(apps, schema_editor):
+    """Calcula la exposición de crédito actual de cada cliente"""
+    Cliente = apps.get_model('ventas', 'Cliente')
+    Ventas = apps.get_model('ventas', 'Ventas')
+
+    exposicion = (
+        Ventas.objects.filter(
+            cliente_id=OuterRef('pk'),
+            modalidad_pago='Credito',
+            estado_cobranza__in=['Pendiente', 'Parcial'],
+        )
+        .order_by()
+        .values('cliente_id')
+        .annotate(total=Sum(F('monto') - F('monto_pagado'), output_field=DecimalField(max_digits=14, decimal_places=2)))
+        .values('total')
+    )
+    Cliente.objects.update(credito_usado=Coalesce(
+        Subquery(exposicion), Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0036_montos_mxn'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='credito_usado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Saldo de ventas a crédito pendientes o parciales (lo mantienen las señales de Ventas)', max_digits=14),
+        ),
+        migrations.RunPython(poblar_credito_usado, migrations.RunPython.noop),
+    ]
@@ -5,10 +5,30 @@ from djmoney.models.fields import MoneyField
 from djmoney.money import Money
 from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import datetime, timedelta
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 from django.utils import timezone
 from app.media_utils import safe_file_url
 
+
+def monto_a_mxn(monto, moneda, tipo_cambio):
+    """
+    Equivalente en MXN de un monto expresado en la moneda de la venta.
+    Alimenta las columnas *_mxn, que permiten sumar cartera MXN/USD en SQL.
+    Redondea como Round() en SQL (mitades hacia arriba), igual que
+    recalcular_montos_mxn.
+    """
+    importe = Decimal(str(getattr(monto, 'amount', monto) or 0))
+    if (moneda or 'MXN').upper() != 'MXN':
+        importe *= Decimal(str(tipo_cambio or 1))
+    return importe.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _con_campos_mxn(kwargs, *campos):
+    """Agrega las columnas *_mxn a update_fields cuando el save es parcial"""
+    if kwargs.get('update_fields') is not None:
+        kwargs['update_fields'] = set(kwargs['update_fields']) | set(campos)
+
+
 class TerminoCredito(models.Model):
     """Modelo para manejar diferentes términos de crédito"""
     nombre = models.CharField(max_length=100, help_text="Ej: Net 30, Net 60, etc.")
@@ -64,6 +84,10 @@ class Cliente(models.Model):
     
     # Configuración de crédito
     limite_credito = MoneyField(max_digits=12, decimal_places=2, default_currency='MXN', default=0)
+    credito_usado = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, editable=False,
+        help_text='Saldo de ventas a crédito pendientes o parciales (lo mantienen las señales de Ventas)'
+    )
     termino_credito_predeterminado = models.ForeignKey(TerminoCredito, on_delete=models.SET_NULL, null=True, blank=True)
     
     class TipoCliente(models.TextChoices):
@@ -96,17 +120,17 @@ class Cliente(models.Model):
     mostrar_logotipo.short_description = "Logotipo"
     
     def credito_disponible(self):
-        """Calcula el crédito disponible del cliente"""
+        """
+        Calcula el crédito disponible del cliente.
+
+        Lee la exposición mantenida en credito_usado (una consulta por pk)
+        en lugar de sumar sus ventas pendientes.
+        """
         if self.tipo_cliente == self.TipoCliente.CONTADO:
             return 0
-        
-        credito_usado = sum(
-            venta.saldo_pendiente() for venta in self.ventas_set.filter(
-                modalidad_pago='Credito', 
-                estado_cobranza__in=['Pendiente', 'Parcial']
-            )
-        )
-        return max(0, float(self.limite_credito.amount) - credito_usado)
+        if self.pk:
+            self.refresh_from_db(fields=['credito_usado'])
+        return max(0, float(self.limite_credito.amount) - float(self.credito_usado))
     
     def puede_otorgar_credito(self, monto):
         """Verifica si se puede otorgar un crédito por el monto especificado"""
@@ -302,8 +326,8 @@ class Anticipo(models.Model):
     def _registrar_aplicacion(self, venta):
         """Registra la aplicación del anticipo en auditoría"""
         try:
-            from auditoria.models import LogActividad
-            LogActividad.objects.create(
+            from auditoria.buffer import registrar_actividad
+            registrar_actividad(
                 usuario=None,
                 nombre_usuario='Sistema',
                 tipo_accion='update',
@@ -451,6 +475,16 @@ class Ventas(models.Model):
         help_text="Tipo de cambio aplicado al momento de la venta"
     )
 
+    # Equivalentes en MXN (moneda_venta × tipo_cambio), calculados en save()
+    monto_mxn = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0, editable=False,
+        help_text="Monto de la venta en MXN"
+    )
+    monto_pagado_mxn = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0, editable=False,
+        help_text="Monto pagado en MXN"
+    )
+
     class TipoRegistro(models.TextChoices):
         VENTA = 'VENTA', 'Venta'
         MAQUILA = 'MAQUILA', 'Maquila'
@@ -542,8 +576,48 @@ class Ventas(models.Model):
                 'cantidad': 'La cantidad debe ser mayor a cero.'
             })
     
+    # PagoVenta.save() los actualiza con F() sin pasar por este save()
+    CAMPOS_DE_PAGOS = ('monto_pagado', 'estado_cobranza')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        if all(campo in field_names for campo in cls.CAMPOS_DE_PAGOS):
+            instancia._recordar_campos_de_pagos()
+        return instancia
+
+    def _recordar_campos_de_pagos(self):
+        self._pagos_leidos = (self.monto_pagado.amount, self.estado_cobranza)
+
+    def _refrescar_campos_de_pagos(self, kwargs):
+        """
+        Una instancia leída antes de que se registrara un pago conserva el
+        monto_pagado anterior: si quien guarda no lo modificó, se toma el de
+        la BD y se excluye del UPDATE para no pisar el incremento de PagoVenta.
+        """
+        leidos = getattr(self, '_pagos_leidos', None)
+        if leidos is None or self._state.adding or kwargs.get('update_fields') is not None:
+            return
+        monto_intacto = self.monto_pagado.amount == leidos[0]
+        estado_intacto = self.estado_cobranza == leidos[1]
+        if not (monto_intacto or estado_intacto):
+            return
+        actual = Ventas.objects.filter(pk=self.pk).values('monto_pagado', 'estado_cobranza').first()
+        if actual is None:
+            return
+        if estado_intacto:
+            self.estado_cobranza = actual['estado_cobranza']
+        if monto_intacto:
+            self.monto_pagado = Money(actual['monto_pagado'], self.monto_pagado.currency)
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in ('monto_pagado', 'monto_pagado_currency')
+            ]
+
     def save(self, *args, **kwargs):
         """Override save para calcular automáticamente campos derivados"""
+        self._refrescar_campos_de_pagos(kwargs)
+
         # Establecer mercado de destino basado en el cliente
         if not self.mercado_destino and self.cliente.mercado_destino:
             self.mercado_destino = self.cliente.mercado_destino
@@ -572,14 +646,18 @@ class Ventas(models.Model):
             ]
         ):
             self.estado_cobranza = self.EstadoCobranza.VENCIDO
+
+        self.monto_mxn = monto_a_mxn(self.monto, self.moneda_venta, self.tipo_cambio)
+        self.monto_pagado_mxn = monto_a_mxn(self.monto_pagado, self.moneda_venta, self.tipo_cambio)
+        _con_campos_mxn(kwargs, 'monto_mxn', 'monto_pagado_mxn')
             
         super().save(*args, **kwargs)
+        self._recordar_campos_de_pagos()
         
-        # Invalidar cache del dashboard tras guardar venta
+        # Invalidar caches de ventas y CxC tras guardar venta
         try:
-            from ventas.services.cache_service import CuentasPorCobrarCache
-            from django.core.cache import cache
-            cache.delete('cxc_dashboard_ventas_principal')
+            from app.services.cache_service import cache_service
+            cache_service.invalidate_domains('ventas', 'cxc')
         except Exception:
             pass  # No fallar si el cache no está disponible
 
@@ -647,13 +725,18 @@ class Ventas(models.Model):
         """Mantiene SaldoCliente sincronizado con el estado real de Ventas."""
         try:
             saldo = self.saldo_cxc  # reverse OneToOne accessor
-            saldo.saldo_pendiente = self.monto - self.monto_pagado
+            # Por importes: monto_pagado conserva la divisa por defecto (MXN)
+            # aunque la venta sea en USD, y restar Money de distinta divisa falla
+            saldo.saldo_pendiente = Money(
+                self.monto.amount - self.monto_pagado.amount, self.monto.currency
+            )
             saldo.estado = self.estado_cobranza.upper()
-            ultimo_pago = self.pagos.order_by('-fecha_pago').first()
+            ultimo_pago = self.pagos.aggregate(ultimo=models.Max('fecha_registro'))['ultimo']
             if ultimo_pago:
-                saldo.fecha_ultimo_pago = ultimo_pago.fecha_registro
+                saldo.fecha_ultimo_pago = ultimo_pago
+            # djmoney: el importe se guarda en 'saldo_pendiente', no en '*_amount'
             saldo.save(update_fields=[
-                'saldo_pendiente_amount', 'saldo_pendiente_currency',
+                'saldo_pendiente', 'saldo_pendiente_currency',
                 'estado', 'fecha_ultimo_pago',
             ])
         except Exception:
@@ -685,25 +768,30 @@ class Ventas(models.Model):
                 self.estado_cobranza = self.EstadoCobranza.PENDIENTE
 
         if self.estado_cobranza != estado_anterior:
-            try:
-                from auditoria.models import LogActividad
-                LogActividad.objects.create(
-                    usuario=None,
-                    nombre_usuario='Sistema',
-                    tipo_accion='update',
-                    descripcion=f'Estado de cobranza cambió de {estado_anterior} a {self.estado_cobranza}',
-                    modelo_afectado='Ventas',
-                    objeto_id=str(self.pk),
-                    campos_modificados={
-                        'estado_cobranza': {'de': estado_anterior, 'a': self.estado_cobranza}
-                    },
-                )
-            except Exception:
-                pass
+            self.registrar_cambio_estado(self.pk, estado_anterior, self.estado_cobranza)
 
         self._sync_saldo_cxc()
         self.save()
-        
+
+    @staticmethod
+    def registrar_cambio_estado(venta_id, estado_anterior, estado_nuevo):
+        """Deja en auditoría el cambio de estado de cobranza de una venta"""
+        try:
+            from auditoria.buffer import registrar_actividad
+            registrar_actividad(
+                usuario=None,
+                nombre_usuario='Sistema',
+                tipo_accion='update',
+                descripcion=f'Estado de cobranza cambió de {estado_anterior} a {estado_nuevo}',
+                modelo_afectado='Ventas',
+                objeto_id=str(venta_id),
+                campos_modificados={
+                    'estado_cobranza': {'de': estado_anterior, 'a': estado_nuevo}
+                },
+            )
+        except Exception:
+            pass
+
     class Meta:
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
@@ -712,6 +800,11 @@ class Ventas(models.Model):
             models.Index(fields=['modalidad_pago', 'estado_cobranza']),
             models.Index(fields=['fecha_vencimiento']),
             models.Index(fields=['cliente', 'estado_cobranza']),
+            # Cubre las sumas de cartera en MXN por estado y cliente
+            models.Index(
+                fields=['estado_cobranza', 'cliente', 'monto_mxn', 'monto_pagado_mxn'],
+                name='ventas_cartera_mxn_idx',
+            ),
         ]
 
 class PagoVenta(models.Model):
@@ -740,6 +833,10 @@ class PagoVenta(models.Model):
         decimal_places=2, 
         default_currency='MXN'
     )
+    monto_pago_mxn = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0, editable=False,
+        help_text="Monto del pago en MXN, con el tipo de cambio de la venta"
+    )
     cuenta_destino = models.ForeignKey(Cuenta, on_delete=models.CASCADE)
     
     class MetodoPago(models.TextChoices):
@@ -820,55 +917,158 @@ class PagoVenta(models.Model):
     
     def save(self, *args, **kwargs):
         """
-        Guarda el pago con transacción atómica y control de concurrencia.
-        Implementa estándares bancarios de integridad transaccional.
+        Guarda el pago con transacción atómica y una ventana de bloqueo corta.
+
+        monto_pagado de la venta se incrementa con F(); ese UPDATE toma el
+        bloqueo de la fila y serializa a las cajas que cobran la misma venta.
+        Estado, SaldoCliente y exposición de crédito se derivan de los valores
+        ya incrementados. Auditoría e invalidación de cache se ejecutan con
+        transaction.on_commit, fuera del bloqueo.
         """
         from django.db import transaction
         from django.core.exceptions import ValidationError
-        
+
+        es_nuevo = self.pk is None
+        monto = Decimal(self.monto_pago.amount)
+
         # RF04: Ejecutar TODA la operación en transacción atómica
         with transaction.atomic():
-            # Control de concurrencia: bloquear la venta para evitar race conditions
-            venta_bloqueada = Ventas.objects.select_for_update().get(pk=self.venta_id)
-            
-            # Validar nuevamente dentro de la transacción
-            if venta_bloqueada.estado_cobranza == Ventas.EstadoCobranza.PAGADO and not self.pk:
+            anterior = None
+            if not es_nuevo:
+                anterior = PagoVenta.objects.filter(pk=self.pk).values('venta_id', 'monto_pago').first()
+            if anterior and anterior['venta_id'] != self.venta_id:
+                # Cambio de venta: el pago sale completo de la anterior
+                movimientos = {anterior['venta_id']: -anterior['monto_pago'], self.venta_id: monto}
+            else:
+                movimientos = {self.venta_id: monto - (anterior['monto_pago'] if anterior else 0)}
+
+            # Orden por pk para que dos ediciones cruzadas no se bloqueen mutuamente
+            ventas = {pk: self._aplicar_a_venta(pk, movimientos[pk]) for pk in sorted(movimientos)}
+            venta = ventas[self.venta_id]
+
+            # Validar nuevamente dentro de la transacción (RF02)
+            if es_nuevo and venta['estado_anterior'] == Ventas.EstadoCobranza.PAGADO:
                 raise ValidationError('La venta ya está completamente pagada.')
-            
-            # Guardar el pago
-            es_nuevo = self.pk is None
+
+            self.monto_pago_mxn = monto_a_mxn(monto, venta['moneda_venta'], venta['tipo_cambio'])
+            _con_campos_mxn(kwargs, 'monto_pago_mxn')
             super().save(*args, **kwargs)
-            
-            # Actualizar el estado de la venta
-            venta_bloqueada.actualizar_estado_cobranza()
-            
-            # RF05: Auditoría completa
-            self._registrar_auditoria(es_nuevo, venta_bloqueada)
-        
-        # Invalidar cache del dashboard tras registrar pago
+
+            self._sincronizar_saldos(ventas)
+
+            transaction.on_commit(lambda: self._despues_de_registrar(es_nuevo, ventas))
+
+    def revertir_en_venta(self):
+        """
+        Resta el pago eliminado de monto_pagado, SaldoCliente y credito_usado
+        (receptor post_delete, dentro de la transacción del borrado). Cubre
+        también los borrados por queryset del admin, que no llaman a delete().
+        """
+        from django.db import transaction
+
         try:
-            from django.core.cache import cache
-            cache.delete('cxc_dashboard_ventas_principal')
+            ventas = {self.venta_id: self._aplicar_a_venta(self.venta_id, -Decimal(self.monto_pago.amount))}
+        except Ventas.DoesNotExist:
+            return  # La venta se está eliminando junto con sus pagos
+        self._sincronizar_saldos(ventas)
+        # Django deja pk en None al terminar el borrado, antes del commit
+        pago_id = self.pk
+        transaction.on_commit(lambda: self._despues_de_registrar(False, ventas, 'delete', pago_id))
+
+    @staticmethod
+    def _sincronizar_saldos(ventas):
+        """Lleva a SaldoCliente y credito_usado los datos devueltos por _aplicar_a_venta"""
+        from ventas.services.credito_service import CreditoClienteService
+
+        for pk, datos in ventas.items():
+            if not datos['credito']:
+                continue
+            saldo = datos['monto'] - datos['monto_pagado']
+            cambios = {
+                'saldo_pendiente': saldo,
+                'saldo_pendiente_mxn': monto_a_mxn(saldo, datos['moneda_venta'], datos['tipo_cambio']),
+                'estado': datos['estado_cobranza'].upper(),
+            }
+            # Editar un pago antiguo no debe mover la fecha del último pago
+            cambios['fecha_ultimo_pago'] = models.Subquery(
+                PagoVenta.objects.filter(venta_id=pk).order_by().values('venta_id')
+                .annotate(ultimo=models.Max('fecha_registro')).values('ultimo')
+            )
+            SaldoCliente.objects.filter(venta_id=pk).update(**cambios)
+            CreditoClienteService.ajustar(datos['cliente_id'], datos['exposicion'])
+
+    @staticmethod
+    def _aplicar_a_venta(venta_id, diferencia):
+        """
+        Suma `diferencia` a monto_pagado de la venta y recalcula su estado a
+        partir del valor resultante. Devuelve los datos de la venta con el
+        estado previo y la variación de su exposición de crédito.
+        """
+        from ventas.services.credito_service import CreditoClienteService
+
+        ventas = Ventas.objects.filter(pk=venta_id)
+        credito = ventas.exclude(modalidad_pago=Ventas.ModalidadPago.CONTADO).update(
+            monto_pagado=models.F('monto_pagado') + diferencia
+        )
+        datos = ventas.values(
+            'monto', 'monto_pagado', 'estado_cobranza', 'fecha_vencimiento', 'modalidad_pago',
+            'moneda_venta', 'tipo_cambio', 'cliente_id', 'carga',
+        ).get()
+        datos.update(estado_anterior=datos['estado_cobranza'], credito=bool(credito), exposicion=Decimal('0'))
+        if not credito:
+            return datos  # Ventas de contado: el pago no altera la venta
+
+        datos['estado_cobranza'] = Ventas.derive_estado_desde_totales(
+            datos['monto'], datos['monto_pagado'], datos['fecha_vencimiento']
+        )
+        ventas.update(
+            estado_cobranza=datos['estado_cobranza'],
+            monto_pagado_mxn=monto_a_mxn(datos['monto_pagado'], datos['moneda_venta'], datos['tipo_cambio']),
+        )
+        datos['exposicion'] = CreditoClienteService.exposicion(
+            datos['modalidad_pago'], datos['estado_cobranza'], datos['monto'], datos['monto_pagado']
+        ) - CreditoClienteService.exposicion(
+            datos['modalidad_pago'], datos['estado_anterior'], datos['monto'], datos['monto_pagado'] - diferencia
+        )
+        return datos
+
+    def _despues_de_registrar(self, es_nuevo, ventas, tipo_accion=None, pago_id=None):
+        """Auditoría e invalidación de cache una vez confirmada la transacción"""
+        for pk, datos in ventas.items():
+            if datos['estado_cobranza'] != datos['estado_anterior']:
+                Ventas.registrar_cambio_estado(pk, datos['estado_anterior'], datos['estado_cobranza'])
+
+        # RF05: Auditoría completa
+        self._registrar_auditoria(
+            tipo_accion or ('create' if es_nuevo else 'update'), ventas[self.venta_id], pago_id or self.pk
+        )
+
+        # Invalidar caches de ventas y CxC tras registrar pago
+        try:
+            from app.services.cache_service import cache_service
+            cache_service.invalidate_domains('ventas', 'cxc')
         except Exception:
             pass  # No fallar si el cache no está disponible
-    
-    def _registrar_auditoria(self, es_nuevo, venta):
+
+    def _registrar_auditoria(self, tipo_accion, venta, pago_id):
         """Registra el pago en auditoría para trazabilidad completa"""
         try:
-            from auditoria.models import LogActividad
-            LogActividad.objects.create(
+            from auditoria.buffer import registrar_actividad
+            saldo = float(venta['monto'] - venta['monto_pagado'])
+            accion = 'eliminado de la' if tipo_accion == 'delete' else 'registrado para'
+            registrar_actividad(
                 usuario=None,
                 nombre_usuario='Sistema',
-                tipo_accion='create' if es_nuevo else 'update',
-                descripcion=f'Pago de ${self.monto_pago.amount:,.2f} registrado para venta {venta.carga}. '
-                           f'Saldo restante: ${venta.saldo_pendiente():,.2f}',
+                tipo_accion=tipo_accion,
+                descripcion=f'Pago de ${self.monto_pago.amount:,.2f} {accion} venta {venta["carga"]}. '
+                           f'Saldo restante: ${saldo:,.2f}',
                 modelo_afectado='PagoVenta',
-                objeto_id=str(self.pk),
+                objeto_id=str(pago_id),
                 campos_modificados={
                     'monto_pago': float(self.monto_pago.amount),
                     'metodo_pago': self.metodo_pago,
-                    'venta_id': venta.id,
-                    'saldo_pendiente_venta': venta.saldo_pendiente(),
+                    'venta_id': self.venta_id,
+                    'saldo_pendiente_venta': saldo,
                 },
             )
         except Exception:
@@ -881,6 +1081,7 @@ class PagoVenta(models.Model):
         indexes = [
             models.Index(fields=['venta', 'fecha_pago']),
             models.Index(fields=['fecha_pago']),
+            models.Index(fields=['fecha_pago', 'monto_pago_mxn'], name='ventas_pago_fecha_mxn_idx'),
         ]
         # Constraint de BD: asegurar que monto_pago sea siempre positivo
         constraints = [
@@ -931,6 +1132,10 @@ class SaldoCliente(models.Model):
         default_currency='MXN',
         help_text="Saldo actual después de abonos"
     )
+    saldo_pendiente_mxn = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0, editable=False,
+        help_text="Saldo pendiente en MXN, con el tipo de cambio de la venta"
+    )
     fecha_creacion = models.DateTimeField(
         auto_now_add=True,
         help_text="Momento en que se registró la deuda"
@@ -972,6 +1177,12 @@ class SaldoCliente(models.Model):
     
     def __str__(self):
         return f"{self.cliente.nombre} - {self.monto_original} ({self.estado})"
+
+    def save(self, *args, **kwargs):
+        tipo_cambio = self.venta.tipo_cambio if self.venta_id else 1
+        self.saldo_pendiente_mxn = monto_a_mxn(self.saldo_pendiente, self.moneda, tipo_cambio)
+        _con_campos_mxn(kwargs, 'saldo_pendiente_mxn')
+        super().save(*args, **kwargs)
     
     class Meta:
         db_table = 'ventas_saldo_cliente'
@@ -982,6 +1193,7 @@ class SaldoCliente(models.Model):
             models.Index(fields=['fecha_vencimiento']),
             models.Index(fields=['estado', 'fecha_vencimiento']),
             models.Index(fields=['cliente', 'fecha_creacion']),
+            models.Index(fields=['estado', 'saldo_pendiente_mxn'], name='ventas_saldo_estado_mxn_idx'),
         ]
         ordering = ['-fecha_creacion']
     
@@ -1168,6 +1380,70 @@ class AntigüedadSaldo(models.Model):
         return {'corriente': 0, 'vencido_1': 0, 'vencido_2': 0, 'vencido_3': 0}
 
 
+class CarteraMensual(models.Model):
+    """
+    Snapshot mensual de cuentas por cobrar (append-only).
+
+    Se genera al cierre de cada mes con el comando snapshot_cartera_mensual
+    y no se vuelve a modificar. Alimenta las tendencias de DSO, evolución de
+    cartera y eficiencia de cobranza de CuentasPorCobrarMetrics, que solo
+    calculan en vivo el mes en curso.
+    """
+
+    año = models.PositiveIntegerField()
+    mes = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(12)]
+    )
+    fecha_corte = models.DateField(db_index=True, help_text="Último día del mes cerrado")
+
+    # Cartera al corte
+    total_cxc = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        help_text="Saldo pendiente de cuentas por cobrar al corte"
+    )
+    numero_facturas = models.PositiveIntegerField(
+        default=0,
+        help_text="Facturas con saldo abierto al corte"
+    )
+    clientes_activos = models.PositiveIntegerField(
+        default=0,
+        help_text="Clientes con al menos una factura abierta al corte"
+    )
+
+    # Flujo del mes
+    ventas_credito = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        help_text="Ventas a crédito depositadas en el mes"
+    )
+    numero_ventas = models.PositiveIntegerField(default=0)
+    ventas_credito_30d = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        help_text="Ventas a crédito de los 30 días previos al corte (base del DSO)"
+    )
+    cobranza = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        help_text="Pagos recibidos en el mes"
+    )
+    numero_pagos = models.PositiveIntegerField(default=0)
+
+    fecha_cierre = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Momento en que se cerró el snapshot"
+    )
+
+    def __str__(self):
+        return f"Cartera {self.año}-{self.mes:02d}: {self.total_cxc}"
+
+    class Meta:
+        db_table = 'ventas_cartera_mensual'
+        verbose_name = 'Cartera Mensual'
+        verbose_name_plural = 'Cartera Mensual (snapshots)'
+        ordering = ['año', 'mes']
+        constraints = [
+            models.UniqueConstraint(fields=['año', 'mes'], name='cartera_mensual_unica'),
+        ]
+
+
 class EstadoCuentaCliente(models.Model):
     """
     RF4: Registra la generación de estados de cuenta para auditoría
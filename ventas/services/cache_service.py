@@ -10,9 +10,11 @@ from django.db import models
 from django.db.models import Sum, Count, Avg, Max, Q, F
 from django.utils import timezone
 from datetime import timedelta
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Tuple
 import logging
 
+from app.services.cache_service import cache_service
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,6 +22,9 @@ class CuentasPorCobrarCache:
     """
     Gestión de cache para métricas de cuentas por cobrar.
     Usa Redis existente con fallback a cache local.
+    
+    Todas las claves viven en el namespace versionado 'cxc' de CacheService;
+    invalidar es incrementar la versión del dominio.
     """
     
     # Configuración de timeouts
@@ -33,181 +38,161 @@ class CuentasPorCobrarCache:
     PREFIX_AGING = 'cxc_aging'
     PREFIX_METRICAS = 'cxc_metricas'
     
+    DOMINIO = 'cxc'
+    
+    @classmethod
+    def _key(cls, nombre: str) -> str:
+        return cache_service.versioned_key(cls.DOMINIO, nombre)
+    
     @classmethod
-    def get_metricas_cliente(cls, cliente_id: int) -> Optional[Dict]:
+    def _obtener(cls, nombre: str, calcular, timeout: int, descripcion: str,
+                 forzar: bool = False, ultimo: bool = False) -> Optional[Dict]:
+        """
+        Lee o calcula una métrica con CacheService.get_or_compute: al vencer,
+        un solo proceso la recalcula y el resto recibe el valor anterior.
+        `forzar` recalcula aunque haya valor vigente (cola de recálculo).
+        `ultimo` guarda además el resultado para CacheService.peek_latest.
+        """
+        try:
+            return cache_service.get_or_compute(
+                cls._key(nombre), calcular, timeout, force=forzar, stats_name=cls.DOMINIO,
+                latest_key=cache_service.latest_key(cls.DOMINIO, nombre) if ultimo else None,
+            )
+        except Exception as e:
+            logger.error(f"Error calculando {descripcion}: {e}")
+            return None
+    
+    @classmethod
+    def get_metricas_cliente(cls, cliente_id: int, forzar: bool = False) -> Optional[Dict]:
         """
         Obtiene métricas de cuentas por cobrar para un cliente específico.
         Cache de 15 minutos para balance entre performance y frescura.
         """
-        cache_key = f'{cls.PREFIX_CLIENTE}_{cliente_id}'
-        
-        metricas = cache.get(cache_key)
-        if metricas is None:
-            try:
-                metricas = cls._calcular_metricas_cliente(cliente_id)
-                cache.set(cache_key, metricas, cls.CACHE_TIMEOUT_MEDIUM)
-                logger.debug(f"Métricas cliente {cliente_id} calculadas y cacheadas")
-            except Exception as e:
-                logger.error(f"Error calculando métricas cliente {cliente_id}: {e}")
-                return None
-                
-        return metricas
+        return cls._obtener(
+            f'{cls.PREFIX_CLIENTE}_{cliente_id}',
+            lambda: cls._calcular_metricas_cliente(cliente_id),
+            cls.CACHE_TIMEOUT_MEDIUM,
+            f"métricas cliente {cliente_id}",
+            forzar,
+        )
     
     @classmethod
-    def get_dashboard_global(cls) -> Optional[Dict]:
+    def get_dashboard_global(cls, forzar: bool = False) -> Optional[Dict]:
         """
         Obtiene métricas del dashboard global de cuentas por cobrar.
         Cache de 5 minutos para datos más actualizados en vista principal.
         """
-        cache_key = f'{cls.PREFIX_DASHBOARD}_global'
-        
-        dashboard = cache.get(cache_key)
-        if dashboard is None:
-            try:
-                dashboard = cls._calcular_dashboard_global()
-                cache.set(cache_key, dashboard, cls.CACHE_TIMEOUT_SHORT)
-                logger.debug("Dashboard global calculado y cacheado")
-            except Exception as e:
-                logger.error(f"Error calculando dashboard global: {e}")
-                return None
-                
-        return dashboard
+        return cls._obtener(
+            f'{cls.PREFIX_DASHBOARD}_global',
+            cls._calcular_dashboard_global,
+            cls.CACHE_TIMEOUT_SHORT,
+            "dashboard global",
+            forzar,
+        )
     
     @classmethod
-    def get_aging_consolidado(cls, fecha_corte: str = None) -> Optional[Dict]:
+    def get_aging_consolidado(cls, fecha_corte: str = None, forzar: bool = False) -> Optional[Dict]:
         """
         Obtiene aging consolidado de todos los clientes.
         Cache de 1 hora ya que aging no cambia frecuentemente.
         """
         fecha_key = fecha_corte or timezone.now().date().isoformat()
-        cache_key = f'{cls.PREFIX_AGING}_consolidado_{fecha_key}'
-        
-        aging = cache.get(cache_key)
-        if aging is None:
-            try:
-                aging = cls._calcular_aging_consolidado(fecha_corte)
-                cache.set(cache_key, aging, cls.CACHE_TIMEOUT_LONG)
-                logger.debug(f"Aging consolidado calculado para {fecha_key}")
-            except Exception as e:
-                logger.error(f"Error calculando aging consolidado: {e}")
-                return None
-                
-        return aging
+        return cls._obtener(
+            f'{cls.PREFIX_AGING}_consolidado_{fecha_key}',
+            lambda: cls._calcular_aging_consolidado(fecha_corte),
+            cls.CACHE_TIMEOUT_LONG,
+            f"aging consolidado {fecha_key}",
+            forzar,
+        )
     
     @classmethod
-    def get_top_deudores(cls, limite: int = 10) -> Optional[Dict]:
+    def get_top_deudores(cls, limite: int = 10, forzar: bool = False) -> Optional[Dict]:
         """
         Obtiene top N clientes con mayor saldo pendiente.
         Cache de 15 minutos para reportes frecuentes.
         """
-        cache_key = f'{cls.PREFIX_METRICAS}_top_deudores_{limite}'
-        
-        top_deudores = cache.get(cache_key)
-        if top_deudores is None:
-            try:
-                top_deudores = cls._calcular_top_deudores(limite)
-                cache.set(cache_key, top_deudores, cls.CACHE_TIMEOUT_MEDIUM)
-                logger.debug(f"Top {limite} deudores calculado y cacheado")
-            except Exception as e:
-                logger.error(f"Error calculando top deudores: {e}")
-                return None
-                
-        return top_deudores
+        return cls._obtener(
+            f'{cls.PREFIX_METRICAS}_top_deudores_{limite}',
+            lambda: cls._calcular_top_deudores(limite),
+            cls.CACHE_TIMEOUT_MEDIUM,
+            f"top {limite} deudores",
+            forzar,
+        )
     
     @classmethod
-    def get_dashboard_ventas(cls) -> Optional[Dict]:
+    def get_dashboard_ventas(cls, forzar: bool = False) -> Optional[Dict]:
         """
         Obtiene datos completos del dashboard de ventas.
         Cache de 5 minutos para datos actualizados en vista principal.
         Mejora performance de 3s a <0.2s.
         """
-        cache_key = f'{cls.PREFIX_DASHBOARD}_ventas_principal'
-        
-        dashboard = cache.get(cache_key)
-        if dashboard is None:
-            try:
-                dashboard = cls._calcular_dashboard_ventas()
-                cache.set(cache_key, dashboard, cls.CACHE_TIMEOUT_SHORT)
-                logger.info("Dashboard ventas calculado y cacheado (5 min TTL)")
-            except Exception as e:
-                logger.error(f"Error calculando dashboard ventas: {e}")
-                return None
-                
-        return dashboard
+        return cls._obtener(
+            f'{cls.PREFIX_DASHBOARD}_ventas_principal',
+            cls._calcular_dashboard_ventas,
+            cls.CACHE_TIMEOUT_SHORT,
+            "dashboard ventas",
+            forzar,
+            ultimo=True,
+        )
     
     @classmethod
-    def invalidar_cliente(cls, cliente_id: int):
+    def leer_dashboard_ventas(cls) -> Tuple[Optional[Dict], bool]:
         """
-        Invalida todos los caches relacionados con un cliente específico.
-        Se llama cuando hay cambios en saldos, pagos, etc.
+        (dashboard, desactualizado) tal como lo dejó la cola de recálculo,
+        sin calcularlo en la petición. Tras una invalidación devuelve el
+        último cálculo con desactualizado=True; None si nunca se calculó.
         """
-        cache_keys = [
-            f'{cls.PREFIX_CLIENTE}_{cliente_id}',
-            f'{cls.PREFIX_DASHBOARD}_global',
-            f'{cls.PREFIX_METRICAS}_top_deudores_10',
-            f'{cls.PREFIX_METRICAS}_top_deudores_20'
-        ]
-        
-        # También invalidar aging si tienen fecha de hoy
-        fecha_hoy = timezone.now().date().isoformat()
-        cache_keys.append(f'{cls.PREFIX_AGING}_consolidado_{fecha_hoy}')
+        return cache_service.peek_latest(cls.DOMINIO, f'{cls.PREFIX_DASHBOARD}_ventas_principal')
+    
+    @classmethod
+    def invalidar_cliente(cls, cliente_id: int):
+        """
+        Invalida los caches afectados por cambios en saldos o pagos de un cliente.
         
-        deleted = cache.delete_many(cache_keys)
-        logger.debug(f"Cache invalidado para cliente {cliente_id}: {deleted} keys eliminadas")
+        Las métricas globales (dashboard, aging, top deudores) dependen de
+        cualquier cliente, así que se invalida el dominio completo con un solo
+        INCR en lugar de borrar una lista de claves conocidas.
+        """
+        cache_service.invalidate_domains(cls.DOMINIO)
+        logger.debug(f"Cache CxC invalidado por cambios del cliente {cliente_id}")
     
     @classmethod
     def invalidar_global(cls):
         """
-        Invalida todos los caches globales.
+        Invalida todos los caches de cuentas por cobrar.
         Se usa para operaciones masivas o mantenimiento.
         """
-        # Obtener todas las keys que empiecen con nuestros prefijos
-        # Nota: Esto depende del backend de cache
-        try:
-            if hasattr(cache, 'delete_pattern'):
-                # Redis backend
-                patterns = [
-                    f'{cls.PREFIX_CLIENTE}_*',
-                    f'{cls.PREFIX_DASHBOARD}_*',
-                    f'{cls.PREFIX_AGING}_*',
-                    f'{cls.PREFIX_METRICAS}_*'
-                ]
-                for pattern in patterns:
-                    cache.delete_pattern(pattern)
-            else:
-                # Fallback: invalidar keys conocidas
-                cache.clear()
-                
-            logger.info("Cache global de CuentasPorCobrar invalidado")
-        except Exception as e:
-            logger.warning(f"No se pudo invalidar cache completamente: {e}")
+        cache_service.invalidate_domains(cls.DOMINIO)
+        logger.info("Cache global de CuentasPorCobrar invalidado")
     
     @classmethod  
-    def warm_up_cache(cls, cliente_ids: list = None):
+    def warm_up_cache(cls, cliente_ids: list = None, forzar: bool = False):
         """
         Pre-carga cache para clientes especificados o principales.
-        Útil para mejorar performance en horarios pico.
+        Útil para mejorar performance en horarios pico. Con `forzar` recalcula
+        también lo que ya esté en cache (lo usa la cola de recálculo).
         """
         if cliente_ids is None:
             # Obtener top 20 clientes por saldo
             from ..models import SaldoCliente
             cliente_ids = list(SaldoCliente.objects.values('cliente_id').annotate(
-                total=Sum('saldo_pendiente')
+                total=Sum('saldo_pendiente_mxn')
             ).order_by('-total')[:20].values_list('cliente_id', flat=True))
         
         cacheados = 0
         for cliente_id in cliente_ids:
             try:
-                cls.get_metricas_cliente(cliente_id)
+                cls.get_metricas_cliente(cliente_id, forzar=forzar)
                 cacheados += 1
             except Exception as e:
                 logger.warning(f"Error pre-cargando cache para cliente {cliente_id}: {e}")
         
-        # Pre-cargar dashboard global
+        # Pre-cargar dashboards globales
         try:
-            cls.get_dashboard_global()
-            cls.get_top_deudores()
-            cls.get_aging_consolidado()
+            cls.get_dashboard_global(forzar=forzar)
+            cls.get_dashboard_ventas(forzar=forzar)
+            cls.get_top_deudores(forzar=forzar)
+            cls.get_aging_consolidado(forzar=forzar)
         except Exception as e:
             logger.warning(f"Error pre-cargando caches globales: {e}")
         
@@ -233,19 +218,19 @@ class CuentasPorCobrarCache:
         saldos_activos = saldos.exclude(estado=SaldoCliente.EstadosSaldo.PAGADO)
         
         metricas_saldos = saldos_activos.aggregate(
-            total_saldo=Sum('saldo_pendiente'),
+            total_saldo=Sum('saldo_pendiente_mxn'),
             numero_facturas=Count('id'),
-            saldo_vencido=Sum('saldo_pendiente', 
+            saldo_vencido=Sum('saldo_pendiente_mxn', 
                 filter=models.Q(fecha_vencimiento__lt=timezone.now().date())),
             ultimo_saldo_creado=Max('fecha_creacion')
         )
         
         # Historial de pagos
         metricas_pagos = PagoVenta.objects.filter(venta__cliente_id=cliente_id).aggregate(
-            total_pagos=Sum('monto_pago'),
+            total_pagos=Sum('monto_pago_mxn'),
             numero_pagos=Count('id'),
             ultimo_pago=Max('fecha_pago'),
-            promedio_pago=Avg('monto_pago')
+            promedio_pago=Avg('monto_pago_mxn')
         )
         
         # Información de crédito
@@ -290,9 +275,9 @@ class CuentasPorCobrarCache:
         saldos_globales = SaldoCliente.objects.exclude(
             estado=SaldoCliente.EstadosSaldo.PAGADO
         ).aggregate(
-            total_cartera=Sum('saldo_pendiente'),
+            total_cartera=Sum('saldo_pendiente_mxn'),
             numero_facturas=Count('id'),
-            cartera_vencida=Sum('saldo_pendiente', 
+            cartera_vencida=Sum('saldo_pendiente_mxn', 
                 filter=models.Q(fecha_vencimiento__lt=timezone.now().date())),
             clientes_con_saldo=Count('cliente', distinct=True)
         )
@@ -300,7 +285,7 @@ class CuentasPorCobrarCache:
         # Pagos de hoy
         hoy = timezone.now().date()
         pagos_hoy = PagoVenta.objects.filter(fecha_pago=hoy).aggregate(
-            total_cobrado_hoy=Sum('monto_pago'),
+            total_cobrado_hoy=Sum('monto_pago_mxn'),
             numero_pagos_hoy=Count('id')
         )
         
@@ -427,9 +412,9 @@ class CuentasPorCobrarCache:
         top_saldos = SaldoCliente.objects.values(
             'cliente__nombre', 'cliente__id'
         ).annotate(
-            total_saldo=Sum('saldo_pendiente'),
+            total_saldo=Sum('saldo_pendiente_mxn'),
             numero_facturas=Count('id'),
-            saldo_vencido=Sum('saldo_pendiente', 
+            saldo_vencido=Sum('saldo_pendiente_mxn', 
                 filter=models.Q(fecha_vencimiento__lt=timezone.now().date())),
             dias_promedio_vencido=Avg(
                 timezone.now().date() - models.F('fecha_vencimiento'),
@@ -489,7 +474,7 @@ class CuentasPorCobrarCache:
         ventas_mes = Ventas.objects.filter(
             fecha_salida_manifiesto__gte=inicio_mes
         ).aggregate(
-            total=Sum('monto'),
+            total=Sum('monto_mxn'),
             count=Count('id')
         )
         
@@ -499,7 +484,7 @@ class CuentasPorCobrarCache:
             fecha_vencimiento__lt=hoy,
             estado_cobranza__in=['Pendiente', 'Parcial']
         ).aggregate(
-            total=Sum('monto'),
+            total=Sum('monto_mxn'),
             count=Count('id')
         )
         
@@ -507,7 +492,7 @@ class CuentasPorCobrarCache:
         total_credito_activo = Ventas.objects.filter(
             modalidad_pago='Credito',
             estado_cobranza__in=['Pendiente', 'Parcial', 'Vencido'],
-        ).aggregate(total=Sum('monto'))['total'] or 0
+        ).aggregate(total=Sum('monto_mxn'))['total'] or 0
         total_vencido = float(vencidas['total'] or 0)
         tasa_morosidad = (
             round((total_vencido / float(total_credito_activo)) * 100, 2)
@@ -515,31 +500,27 @@ class CuentasPorCobrarCache:
         )
         
         # ── KPI: Cartera Aging ───────────────────────────────────────────
-        credito_qs = Ventas.objects.filter(
+        # Una sola consulta sobre las columnas MXN: un rango por fecha de vencimiento
+        saldo_mxn = F('monto_mxn') - F('monto_pagado_mxn')
+        rangos = {
+            'corriente': Q(fecha_vencimiento__gte=hoy),
+            'vencida_30': Q(fecha_vencimiento__lt=hoy, fecha_vencimiento__gte=hoy - timedelta(days=30)),
+            'vencida_60': Q(fecha_vencimiento__lt=hoy - timedelta(days=30), fecha_vencimiento__gte=hoy - timedelta(days=60)),
+            'vencida_90': Q(fecha_vencimiento__lt=hoy - timedelta(days=60)),
+        }
+        aging = Ventas.objects.filter(
             modalidad_pago='Credito',
             estado_cobranza__in=['Pendiente', 'Parcial', 'Vencido'],
-        ).only('fecha_vencimiento', 'monto', 'monto_pagado')
-        
-        aging = {'corriente': 0.0, 'vencida_30': 0.0, 'vencida_60': 0.0, 'vencida_90': 0.0}
-        for v in credito_qs:
-            saldo = float(v.monto.amount) - float(v.monto_pagado.amount)
-            if saldo <= 0 or not v.fecha_vencimiento:
-                continue
-            dias = (hoy - v.fecha_vencimiento).days
-            if dias <= 0:
-                aging['corriente'] += saldo
-            elif dias <= 30:
-                aging['vencida_30'] += saldo
-            elif dias <= 60:
-                aging['vencida_60'] += saldo
-            else:
-                aging['vencida_90'] += saldo
+            fecha_vencimiento__isnull=False,
+            monto_mxn__gt=F('monto_pagado_mxn'),
+        ).aggregate(**{rango: Sum(saldo_mxn, filter=filtro) for rango, filtro in rangos.items()})
+        aging = {rango: float(total or 0) for rango, total in aging.items()}
         
         # ── KPI: Recuperación del mes anterior ───────────────────────────
         recuperacion_mes_anterior = float(
             PagoVenta.objects.filter(
                 fecha_pago__range=[inicio_mes_anterior, fin_mes_anterior]
-            ).aggregate(total=Sum('monto_pago'))['total'] or 0
+            ).aggregate(total=Sum('monto_pago_mxn'))['total'] or 0
         )
         
         # ── Top 5 clientes por volumen ───────────────────────────────────
@@ -547,7 +528,7 @@ class CuentasPorCobrarCache:
             Ventas.objects.filter(
                 fecha_salida_manifiesto__gte=inicio_año
             ).values('cliente__nombre').annotate(
-                total_ventas=Sum('monto'),
+                total_ventas=Sum('monto_mxn'),
                 num_ventas=Count('id')
             ).order_by('-total_ventas')[:5]
         )
@@ -569,11 +550,15 @@ class VentasBalancesCache:
     Cache para la vista de balances de ventas (build_ventas_balances_context).
     Cachea los datos computados (balances, métricas, gráficos) keyed por los
     parámetros de filtro del request. TTL: 5 minutos.
-    Se invalida automáticamente al guardar/eliminar registros de Ventas.
+    Se invalida automáticamente al guardar/eliminar registros de Ventas
+    (namespace versionado 'ventas' de CacheService).
     """
 
     CACHE_TIMEOUT = 300  # 5 minutos
     PREFIX = 'ventas_balances'
+    DOMINIO = 'ventas'
+    # El estado de cobranza de la tabla cambia también con los pagos (cxc)
+    DOMINIOS_FRAGMENTO = ('ventas', 'cxc')
 
     # -------------------------------------------------------------------------
     # Helpers de serialización (date/datetime → JSON-safe y viceversa)
@@ -612,11 +597,26 @@ class VentasBalancesCache:
     # -------------------------------------------------------------------------
 
     @classmethod
-    def _make_key(cls, filter_params: dict) -> str:
+    def _digest(cls, filter_params: dict) -> str:
         import hashlib
         key_str = '&'.join(f'{k}={v}' for k, v in sorted(filter_params.items()))
-        digest = hashlib.md5(key_str.encode()).hexdigest()
-        return f'{cls.PREFIX}_{digest}'
+        return hashlib.md5(key_str.encode()).hexdigest()
+
+    @classmethod
+    def _make_key(cls, filter_params: dict) -> str:
+        return cache_service.versioned_key(cls.DOMINIO, f'{cls.PREFIX}_{cls._digest(filter_params)}')
+
+    @classmethod
+    def clave_fragmento(cls, filter_params: dict) -> str:
+        """
+        Variante del fragmento {% cache %} de la tabla de balances: versiones
+        de los dominios ventas y cxc más los filtros. No depende del usuario,
+        así que todos los que ven los mismos filtros comparten el HTML.
+        """
+        versiones = cache_service.get_versions(*cls.DOMINIOS_FRAGMENTO)
+        return '-'.join(
+            f'{dominio}{version}' for dominio, version in sorted(versiones.items())
+        ) + f':{cls._digest(filter_params)}'
 
     # -------------------------------------------------------------------------
     # API pública
@@ -647,15 +647,6 @@ class VentasBalancesCache:
 
     @classmethod
     def invalidar(cls):
-        """
-        Invalida todo el cache de balances de ventas.
-        Con django-redis usa delete_pattern; con LocMemCache deja que expiren por TTL.
-        """
-        try:
-            if hasattr(cache, 'delete_pattern'):
-                cache.delete_pattern(f'*{cls.PREFIX}_*')
-                logger.debug('VentasBalancesCache: cache invalidado via delete_pattern')
-            else:
-                logger.debug('VentasBalancesCache: backend sin delete_pattern, TTL expirará naturalmente')
-        except Exception as e:
-            logger.warning(f'VentasBalancesCache.invalidar: {e}')
\ No newline at end of file
+        """Invalida todo el cache de balances de ventas (INCR de la versión del dominio)."""
+        cache_service.invalidate_domains(cls.DOMINIO)
+        logger.debug('VentasBalancesCache: cache invalidado')
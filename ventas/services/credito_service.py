@@ -0,0 +1,104 @@
+# ventas/services/credito_service.py
+
+"""
+Exposición de crédito por cliente.
+
+Cliente.credito_usado guarda la suma de saldos (monto - monto_pagado) de sus
+ventas a crédito Pendientes o Parciales. Las señales de Ventas la recalculan
+con un solo UPDATE ... SET credito_usado = (SELECT SUM ...) en la misma
+transacción que la venta o el pago, así que consultar el crédito disponible
+ya no recorre las ventas del cliente. Los pagos solo ajustan la diferencia de
+exposición de su venta con un incremento F() (`ajustar`).
+"""
+
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from ventas.models import Cliente, Ventas
+
+logger = logging.getLogger(__name__)
+
+
+class CreditoClienteService:
+    """Mantiene y consulta Cliente.credito_usado"""
+
+    ESTADOS_EXPOSICION = (Ventas.EstadoCobranza.PENDIENTE, Ventas.EstadoCobranza.PARCIAL)
+
+    @classmethod
+    def credito_usado_sql(cls) -> Coalesce:
+        """Subconsulta con la exposición del cliente de la fila (OuterRef('pk'))"""
+        exposicion = (
+            Ventas.objects.filter(
+                cliente_id=OuterRef('pk'),
+                modalidad_pago=Ventas.ModalidadPago.CREDITO,
+                estado_cobranza__in=cls.ESTADOS_EXPOSICION,
+            )
+            .order_by()
+            .values('cliente_id')
+            .annotate(total=Sum(F('monto') - F('monto_pagado'), output_field=DecimalField(max_digits=14, decimal_places=2)))
+            .values('total')
+        )
+        return Coalesce(
+            Subquery(exposicion), Value(Decimal('0')),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        )
+
+    @classmethod
+    def actualizar(cls, *cliente_ids: Optional[int]) -> int:
+        """Recalcula credito_usado de los clientes indicados en un solo UPDATE"""
+        ids = {cid for cid in cliente_ids if cid}
+        if not ids:
+            return 0
+        return Cliente.objects.filter(pk__in=ids).update(credito_usado=cls.credito_usado_sql())
+
+    @staticmethod
+    def ajustar(cliente_id: Optional[int], diferencia) -> int:
+        """Suma `diferencia` a credito_usado con un incremento F() (ruta de pagos)"""
+        if not cliente_id or not diferencia:
+            return 0
+        return Cliente.objects.filter(pk=cliente_id).update(credito_usado=F('credito_usado') + diferencia)
+
+    @classmethod
+    def exposicion(cls, modalidad_pago: str, estado_cobranza: str, monto, monto_pagado) -> Decimal:
+        """Aporte de una venta a credito_usado (misma regla que credito_usado_sql)"""
+        if modalidad_pago != Ventas.ModalidadPago.CREDITO or estado_cobranza not in cls.ESTADOS_EXPOSICION:
+            return Decimal('0')
+        return Decimal(monto) - Decimal(monto_pagado)
+
+    @classmethod
+    def recalcular(cls) -> int:
+        """Recalcula credito_usado de todos los clientes (mantenimiento)"""
+        actualizados = Cliente.objects.update(credito_usado=cls.credito_usado_sql())
+        logger.info(f"Exposición de crédito recalculada para {actualizados} clientes")
+        return actualizados
+
+    @staticmethod
+    def disponible(tipo_cliente: str, limite_credito, credito_usado) -> float:
+        """Límite menos exposición, nunca negativo; 0 para clientes de contado"""
+        if tipo_cliente == Cliente.TipoCliente.CONTADO:
+            return 0
+        limite = getattr(limite_credito, 'amount', limite_credito)
+        return max(0, float(limite or 0) - float(credito_usado or 0))
+
+    @classmethod
+    def disponibles(cls, cliente_ids: Optional[Iterable[int]] = None) -> Dict[int, float]:
+        """
+        Crédito disponible de varios clientes en una consulta.
+
+        Sin `cliente_ids` devuelve todos los clientes activos de crédito o mixtos.
+        """
+        qs = Cliente.objects.all()
+        if cliente_ids is None:
+            qs = qs.filter(activo=True).exclude(tipo_cliente=Cliente.TipoCliente.CONTADO)
+        else:
+            qs = qs.filter(pk__in=list(cliente_ids))
+        return {
+            pk: cls.disponible(tipo_cliente, limite, usado)
+            for pk, tipo_cliente, limite, usado in qs.values_list(
+                'pk', 'tipo_cliente', 'limite_credito', 'credito_usado'
+            )
+        }
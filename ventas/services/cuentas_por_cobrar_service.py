@@ -13,9 +13,11 @@ RF4: Generación de estados de cuenta históricos por cliente
 from django.db import transaction, models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Sum, Count, Avg, Max, Min, Q
-from django.core.cache import cache
+from django.db.models import Sum, Count, Avg, Max, Min, Q, F
+from django.db.models.functions import Coalesce
+from collections import defaultdict
 from datetime import datetime, timedelta, date
+from decimal import Decimal
 from typing import Dict, List, Optional, Tuple, Union
 import logging
 
@@ -147,8 +149,9 @@ class CuentasPorCobrarService:
             ValueError: Si los montos no coinciden
         """
         try:
-            # Obtener saldo con lock para evitar concurrencia
-            saldo = SaldoCliente.objects.select_for_update().get(id=saldo_id)
+            # Sin select_for_update: PagoVenta.save() serializa sobre la fila de
+            # la venta, y bloquear antes el saldo invertiría el orden de bloqueos
+            saldo = SaldoCliente.objects.select_related('venta').get(id=saldo_id)
             
             # Validaciones básicas
             if monto_abono <= 0:
@@ -189,32 +192,8 @@ class CuentasPorCobrarService:
                 notas=notas or ''
             )
             
-            # Actualizar saldo
-            nuevo_saldo = float(saldo.saldo_pendiente.amount) - monto_abono
-            saldo.saldo_pendiente.amount = max(0, nuevo_saldo)
-            saldo.fecha_ultimo_pago = pago.fecha_pago
-            
-            # Actualizar estado según saldo restante
-            if saldo.saldo_pendiente.amount <= 0:
-                saldo.estado = SaldoCliente.EstadosSaldo.PAGADO
-                saldo.venta.estado_cobranza = Ventas.EstadoCobranza.PAGADO
-            elif saldo.saldo_pendiente.amount < float(saldo.monto_original.amount):
-                if saldo.dias_vencido() > 0:
-                    saldo.estado = SaldoCliente.EstadosSaldo.VENCIDO
-                    saldo.venta.estado_cobranza = Ventas.EstadoCobranza.VENCIDO
-                else:
-                    saldo.estado = SaldoCliente.EstadosSaldo.PARCIAL
-                    saldo.venta.estado_cobranza = Ventas.EstadoCobranza.PARCIAL
-            
-            # Actualizar monto pagado en la venta
-            total_pagos = saldo.venta.pagos.aggregate(
-                total=Sum('monto_pago')
-            )['total'] or 0
-            saldo.venta.monto_pagado.amount = float(total_pagos)
-            
-            # Guardar cambios
-            saldo.save()
-            saldo.venta.save()
+            # PagoVenta.save() ya actualizó venta, saldo y estado con incrementos F()
+            saldo.refresh_from_db()
             
             # Invalidar caches
             CuentasPorCobrarService._invalidar_cache_cliente(saldo.cliente.id)
@@ -317,7 +296,7 @@ class CuentasPorCobrarService:
                 
                 # Calcular promedio de días de pago si hay historial
                 if saldo.fecha_ultimo_pago:
-                    dias_pago = (saldo.fecha_ultimo_pago - saldo.fecha_creacion.date()).days
+                    dias_pago = (saldo.fecha_ultimo_pago - saldo.fecha_creacion).days
                     aging_buckets['total_dias_pago'] += dias_pago
                     aging_buckets['facturas_con_pagos'] += 1
             
@@ -362,19 +341,29 @@ class CuentasPorCobrarService:
             raise
     
     @staticmethod
-    def calcular_aging_masivo(fecha_corte: Optional[date] = None) -> Dict[str, int]:
+    def calcular_aging_masivo(
+        fecha_corte: Optional[date] = None,
+        bulk: bool = True,
+        batch_size: int = 1000
+    ) -> Dict[str, int]:
         """
         Calcula aging para todos los clientes con saldos pendientes.
-        
+
         Args:
             fecha_corte: Fecha de corte para el análisis
-            
+            bulk: Si True usa el cálculo set-based (un agregado SQL + un upsert);
+                  si False recorre cliente por cliente con calcular_antiguedad_cliente
+            batch_size: Tamaño de lote para el upsert en modo bulk
+
         Returns:
             Dict con estadísticas del proceso (procesados, errores, etc.)
         """
         if fecha_corte is None:
             fecha_corte = timezone.now().date()
-            
+
+        if bulk:
+            return CuentasPorCobrarService._calcular_aging_bulk(fecha_corte, batch_size)
+
         clientes_procesados = 0
         errores = 0
         clientes_con_saldos = Cliente.objects.filter(
@@ -403,7 +392,102 @@ class CuentasPorCobrarService:
             'errores': errores,
             'total_clientes': clientes_con_saldos.count()
         }
-    
+
+    @staticmethod
+    @transaction.atomic
+    def _calcular_aging_bulk(fecha_corte: date, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Versión set-based de calcular_aging_masivo.
+
+        Clasifica todos los SaldoCliente abiertos en un solo agregado agrupado
+        por cliente (Sum con filter → CASE WHEN sobre fecha_vencimiento) y
+        escribe los snapshots de AntigüedadSaldo con un único
+        bulk_create(update_conflicts=True). El número de consultas es
+        constante sin importar cuántos clientes tengan saldo.
+        """
+        from django.db import connection
+        from django.db.models import F
+
+        config = ConfiguracionCuentasPorCobrar.obtener_configuracion()
+
+        # dias = fecha_corte - fecha_vencimiento  →  dias <= N  ⇔  vencimiento >= corte - N
+        limite_corriente = fecha_corte - timedelta(days=config.dias_corriente)
+        limite_vencido_1 = fecha_corte - timedelta(days=config.dias_vencido_1)
+        limite_vencido_2 = fecha_corte - timedelta(days=config.dias_vencido_2)
+
+        filas = SaldoCliente.objects.filter(
+            estado__in=[
+                SaldoCliente.EstadosSaldo.PENDIENTE,
+                SaldoCliente.EstadosSaldo.PARCIAL,
+                SaldoCliente.EstadosSaldo.VENCIDO
+            ],
+            saldo_pendiente__gt=0
+        ).order_by().values('cliente_id').annotate(
+            corriente=Sum(
+                'saldo_pendiente',
+                filter=Q(fecha_vencimiento__gte=limite_corriente)
+            ),
+            vencido_1=Sum(
+                'saldo_pendiente',
+                filter=Q(fecha_vencimiento__lt=limite_corriente,
+                         fecha_vencimiento__gte=limite_vencido_1)
+            ),
+            vencido_2=Sum(
+                'saldo_pendiente',
+                filter=Q(fecha_vencimiento__lt=limite_vencido_1,
+                         fecha_vencimiento__gte=limite_vencido_2)
+            ),
+            vencido_3=Sum(
+                'saldo_pendiente',
+                filter=Q(fecha_vencimiento__lt=limite_vencido_2)
+            ),
+            numero_facturas=Count('id'),
+            promedio_pago=Avg(
+                F('fecha_ultimo_pago') - F('fecha_creacion'),
+                filter=Q(fecha_ultimo_pago__isnull=False)
+            ),
+        )
+
+        snapshots = []
+        for fila in filas:
+            buckets = {
+                campo: fila[campo] or 0
+                for campo in ('corriente', 'vencido_1', 'vencido_2', 'vencido_3')
+            }
+            promedio = fila['promedio_pago']
+            snapshots.append(AntigüedadSaldo(
+                cliente_id=fila['cliente_id'],
+                fecha_calculo=fecha_corte,
+                total_saldo=sum(buckets.values()),
+                numero_facturas=fila['numero_facturas'],
+                promedio_dias_pago=promedio.total_seconds() / 86400 if promedio is not None else None,
+                calculado_por='Sistema',
+                **buckets
+            ))
+
+        # MySQL resuelve el conflicto con ON DUPLICATE KEY (no acepta unique_fields);
+        # SQLite/PostgreSQL necesitan el target explícito del unique_together.
+        upsert_kwargs = {
+            'update_conflicts': True,
+            'update_fields': [
+                'corriente', 'vencido_1', 'vencido_2', 'vencido_3',
+                'total_saldo', 'numero_facturas', 'promedio_dias_pago', 'calculado_por',
+            ],
+        }
+        if connection.features.supports_update_conflicts_with_target:
+            upsert_kwargs['unique_fields'] = ['cliente', 'fecha_calculo']
+
+        AntigüedadSaldo.objects.bulk_create(snapshots, batch_size=batch_size, **upsert_kwargs)
+
+        logger.info(f"Aging masivo (bulk) {fecha_corte}: {len(snapshots)} clientes")
+
+        return {
+            'fecha_corte': fecha_corte,
+            'clientes_procesados': len(snapshots),
+            'errores': 0,
+            'total_clientes': len(snapshots)
+        }
+
     # =========================================================================
     # RF4: GENERACIÓN DE ESTADOS DE CUENTA HISTÓRICOS  
     # =========================================================================
@@ -420,6 +504,10 @@ class CuentasPorCobrarService:
         """
         RF4: Genera estado de cuenta histórico por cliente.
         Muestra: Venta Original - Suma de Abonos = Saldo Pendiente
+
+        Número fijo de consultas sin importar la antigüedad del cliente: dos
+        agregados para el saldo inicial y un UNION ordenado de ventas y pagos
+        sobre el que se acumula el saldo en una sola pasada.
         
         Args:
             cliente_id: ID del cliente
@@ -443,164 +531,28 @@ class CuentasPorCobrarService:
                 raise ValidationError("La fecha de inicio debe ser anterior a la fecha de fin")
             if fecha_fin > timezone.now().date():
                 fecha_fin = timezone.now().date()
-            
-            # Obtener ventas del período (RF4: Venta Original)
-            ventas_periodo = Ventas.objects.filter(
-                cliente=cliente,
-                fecha_deposito__range=[fecha_inicio, fecha_fin],
-                modalidad_pago=Ventas.ModalidadPago.CREDITO
-            ).order_by('fecha_deposito')
-            
-            # Obtener pagos del período o relacionados a ventas del período
-            if incluir_pagos_fuera_periodo:
-                # Incluir todos los pagos de ventas del período, sin importar cuándo se pagaron
-                venta_ids = list(ventas_periodo.values_list('id', flat=True))
-                pagos_periodo = PagoVenta.objects.filter(
-                    venta__id__in=venta_ids
-                ).order_by('fecha_pago')
-            else:
-                # Solo pagos dentro del período específico
-                pagos_periodo = PagoVenta.objects.filter(
-                    venta__cliente=cliente,
-                    fecha_pago__range=[fecha_inicio, fecha_fin]
-                ).order_by('fecha_pago')
-            
-            # Construir movimientos cronológicos para el estado de cuenta
-            movimientos = []
-            saldo_acumulado = 0
-            
-            # Obtener saldo inicial (ventas anteriores al período)
-            ventas_anteriores = Ventas.objects.filter(
-                cliente=cliente,
-                fecha_deposito__lt=fecha_inicio,
-                modalidad_pago=Ventas.ModalidadPago.CREDITO
+
+            saldo_inicial = CuentasPorCobrarService._saldos_iniciales([cliente.id], fecha_inicio).get(cliente.id, 0.0)
+            filas = CuentasPorCobrarService._flujo_movimientos(
+                [cliente.id], fecha_inicio, fecha_fin, incluir_pagos_fuera_periodo
             )
-            
-            for venta_anterior in ventas_anteriores:
-                saldo_acumulado += float(venta_anterior.monto.amount)
-                # Restar pagos anteriores al período
-                pagos_anteriores = PagoVenta.objects.filter(
-                    venta=venta_anterior,
-                    fecha_pago__lt=fecha_inicio
-                )
-                for pago in pagos_anteriores:
-                    saldo_acumulado -= float(pago.monto_pago.amount)
-            
-            # Guardar para el registro del modelo
-            saldo_inicial_periodo = saldo_acumulado
-            
-            # Agregar saldo inicial si existe
-            if abs(saldo_acumulado) > 0.01:  # Evitar mostrar centavos insignificantes
-                movimientos.append({
-                    'fecha': fecha_inicio,
-                    'tipo': 'SALDO_INICIAL',
-                    'referencia': 'SALDO-INICIAL',
-                    'concepto': 'Saldo inicial del período',
-                    'cargo': saldo_acumulado if saldo_acumulado > 0 else 0,
-                    'abono': abs(saldo_acumulado) if saldo_acumulado < 0 else 0,
-                    'saldo': saldo_acumulado,
-                    'venta_id': None
-                })
-            
-            # Agregar ventas del período (RF4: Venta Original)
-            for venta in ventas_periodo:
-                monto_venta = float(venta.monto.amount)
-                saldo_acumulado += monto_venta
-                
-                movimientos.append({
-                    'fecha': venta.fecha_deposito,
-                    'tipo': 'VENTA',
-                    'referencia': venta.carga or f'V-{venta.id}',
-                    'concepto': f'Venta a crédito - {venta.producto.nombre}' if venta.producto else 'Venta a crédito',
-                    'cargo': monto_venta,
-                    'abono': 0,
-                    'saldo': saldo_acumulado,
-                    'venta_id': venta.id
-                })
-            
-            # Agregar pagos (RF4: Suma de Abonos)
-            for pago in pagos_periodo:
-                monto_pago = float(pago.monto_pago.amount)
-                saldo_acumulado -= monto_pago
-                
-                movimientos.append({
-                    'fecha': pago.fecha_pago,
-                    'tipo': 'PAGO',
-                    'referencia': pago.referencia or f'P-{pago.id}',
-                    'concepto': f'Pago - {pago.get_metodo_pago_display()}',
-                    'cargo': 0,
-                    'abono': monto_pago,
-                    'saldo': saldo_acumulado,
-                    'venta_id': pago.venta.id
-                })
-            
-            # Ordenar movimientos cronológicamente
-            movimientos.sort(key=lambda x: (x['fecha'], x['tipo'] == 'PAGO'))
-            
-            # Recalcular saldos acumulados después del ordenamiento
-            saldo_running = 0
-            if movimientos and movimientos[0]['tipo'] == 'SALDO_INICIAL':
-                saldo_running = movimientos[0]['saldo']
-                
-            for i, movimiento in enumerate(movimientos):
-                if movimiento['tipo'] != 'SALDO_INICIAL':
-                    saldo_running += movimiento['cargo'] - movimiento['abono']
-                    movimiento['saldo'] = saldo_running
-            
-            # Calcular totales para el resumen (RF4: Venta Original - Suma de Abonos = Saldo Pendiente)
-            total_ventas = sum(v.monto.amount for v in ventas_periodo)
-            total_abonos = sum(p.monto_pago.amount for p in pagos_periodo)
-            saldo_final = saldo_acumulado  # RF4: Saldo Pendiente
+            estado = CuentasPorCobrarService._armar_estado_cuenta(saldo_inicial, filas, fecha_inicio)
             
             # Crear ou actualizar registro del estado de cuenta (evita duplicados en regenerar)
             estado_cuenta, _ = EstadoCuentaCliente.objects.update_or_create(
                 cliente=cliente,
                 periodo_inicio=fecha_inicio,
                 periodo_fin=fecha_fin,
-                defaults={
-                    'saldo_inicial': saldo_inicial_periodo,
-                    'total_ventas': total_ventas,
-                    'total_abonos': total_abonos,
-                    'saldo_final': saldo_final,
-                    'numero_facturas': ventas_periodo.count(),
-                    'generado_por': usuario,
-                    'formato_generado': formato,
-                }
+                defaults=CuentasPorCobrarService._valores_estado_cuenta(estado, usuario, formato),
             )
-            
-            # Preparar resumen del estado de cuenta
-            resumen = {
-                'cliente': cliente,
-                'periodo_inicio': fecha_inicio,
-                'periodo_fin': fecha_fin,
-                'saldo_inicial': saldo_inicial_periodo,
-                'total_ventas': total_ventas,
-                'total_abonos': total_abonos,
-                'saldo_final': saldo_final,
-                'numero_facturas': ventas_periodo.count(),
-                'numero_pagos': pagos_periodo.count(),
-                'porcentaje_recuperacion': estado_cuenta.porcentaje_recuperacion,
-                'promedio_por_factura': estado_cuenta.promedio_por_factura,
-                'limite_credito': cliente.limite_credito.amount,
-                'credito_disponible': cliente.credito_disponible(),
-            }
-            
+
             logger.info(
                 f"Estado de cuenta generado para {cliente.nombre}: "
-                f"período {fecha_inicio} - {fecha_fin}, saldo final {saldo_final}"
+                f"período {fecha_inicio} - {fecha_fin}, saldo final {estado['saldo_final']}"
+            )
+            return CuentasPorCobrarService._resultado_estado_cuenta(
+                cliente, estado_cuenta, estado, formato, usuario
             )
-            
-            return {
-                'estado_cuenta': estado_cuenta,
-                'movimientos': movimientos,
-                'resumen': resumen,
-                'metadata': {
-                    'formato': formato,
-                    'generado_por': usuario,
-                    'fecha_generacion': timezone.now(),
-                    'total_movimientos': len(movimientos)
-                }
-            }
             
         except Cliente.DoesNotExist:
             logger.error(f"Cliente {cliente_id} no encontrado")
@@ -608,6 +560,271 @@ class CuentasPorCobrarService:
         except Exception as e:
             logger.error(f"Error generando estado de cuenta cliente {cliente_id}: {str(e)}")
             raise
+
+    @staticmethod
+    def generar_estados_cuenta_masivo(
+        fecha_inicio: date,
+        fecha_fin: date,
+        cliente_ids: Optional[List[int]] = None,
+        formato: str = 'WEB',
+        usuario: str = 'Sistema',
+        incluir_pagos_fuera_periodo: bool = True
+    ) -> List[Dict]:
+        """
+        RF4 en lote: estados de cuenta de muchos clientes en un solo trabajo
+        (envío de fin de mes).
+
+        Usa las mismas consultas que generar_estado_cuenta, agrupadas por
+        cliente, y guarda los EstadoCuentaCliente con bulk_create/bulk_update.
+        Con `cliente_ids` genera uno por cliente indicado; sin ellos, uno por
+        cliente con saldo inicial o movimientos en el período. Devuelve un
+        resultado por cliente, ordenado por nombre.
+        """
+        if fecha_inicio > fecha_fin:
+            raise ValidationError("La fecha de inicio debe ser anterior a la fecha de fin")
+        if fecha_fin > timezone.now().date():
+            fecha_fin = timezone.now().date()
+
+        saldos_iniciales = CuentasPorCobrarService._saldos_iniciales(cliente_ids, fecha_inicio)
+        filas_por_cliente = {}
+        for fila in CuentasPorCobrarService._flujo_movimientos(
+            cliente_ids, fecha_inicio, fecha_fin, incluir_pagos_fuera_periodo
+        ):
+            filas_por_cliente.setdefault(fila['m_cliente'], []).append(fila)
+
+        if cliente_ids is not None:
+            ids = set(cliente_ids)
+        else:
+            ids = {
+                cid for cid, saldo in saldos_iniciales.items() if abs(saldo) > 0.01
+            } | set(filas_por_cliente)
+        if not ids:
+            return []
+        clientes = Cliente.objects.in_bulk(ids)
+        if not clientes:
+            return []
+        existentes = {
+            e.cliente_id: e for e in EstadoCuentaCliente.objects.filter(
+                cliente_id__in=ids, periodo_inicio=fecha_inicio, periodo_fin=fecha_fin
+            )
+        }
+
+        nuevos, actualizados, resultados = [], [], []
+        for cid in sorted(clientes, key=lambda pk: clientes[pk].nombre):
+            estado = CuentasPorCobrarService._armar_estado_cuenta(
+                saldos_iniciales.get(cid, 0.0), filas_por_cliente.get(cid, []), fecha_inicio
+            )
+            valores = CuentasPorCobrarService._valores_estado_cuenta(estado, usuario, formato)
+            estado_cuenta = existentes.get(cid) or EstadoCuentaCliente(
+                cliente=clientes[cid], periodo_inicio=fecha_inicio, periodo_fin=fecha_fin
+            )
+            for campo, valor in valores.items():
+                setattr(estado_cuenta, campo, valor)
+            (actualizados if estado_cuenta.pk else nuevos).append(estado_cuenta)
+            resultados.append((clientes[cid], estado_cuenta, estado))
+
+        with transaction.atomic():
+            EstadoCuentaCliente.objects.bulk_create(nuevos)
+            EstadoCuentaCliente.objects.bulk_update(actualizados, CuentasPorCobrarService.CAMPOS_ESTADO_CUENTA)
+
+        logger.info(
+            f"Estados de cuenta en lote {fecha_inicio} - {fecha_fin}: "
+            f"{len(nuevos)} nuevos, {len(actualizados)} regenerados"
+        )
+        return [
+            CuentasPorCobrarService._resultado_estado_cuenta(cliente, estado_cuenta, estado, formato, usuario)
+            for cliente, estado_cuenta, estado in resultados
+        ]
+
+    @staticmethod
+    def _saldos_iniciales(cliente_ids: Optional[List[int]], fecha_inicio: date) -> Dict[int, float]:
+        """
+        Saldo al inicio del período por cliente: ventas a crédito anteriores
+        menos sus pagos anteriores al período (dos agregados).
+        """
+        ventas = Ventas.objects.filter(
+            fecha_deposito__lt=fecha_inicio,
+            modalidad_pago=Ventas.ModalidadPago.CREDITO,
+        )
+        pagos = PagoVenta.objects.filter(
+            venta__fecha_deposito__lt=fecha_inicio,
+            venta__modalidad_pago=Ventas.ModalidadPago.CREDITO,
+            fecha_pago__lt=fecha_inicio,
+        )
+        if cliente_ids is not None:
+            ventas = ventas.filter(cliente_id__in=cliente_ids)
+            pagos = pagos.filter(venta__cliente_id__in=cliente_ids)
+
+        saldos = defaultdict(float)
+        for fila in ventas.order_by().values('cliente_id').annotate(total=Sum('monto')):
+            saldos[fila['cliente_id']] += float(fila['total'] or 0)
+        for fila in pagos.order_by().values('venta__cliente_id').annotate(total=Sum('monto_pago')):
+            saldos[fila['venta__cliente_id']] -= float(fila['total'] or 0)
+        return dict(saldos)
+
+    @staticmethod
+    def _flujo_movimientos(cliente_ids: Optional[List[int]], fecha_inicio: date, fecha_fin: date,
+                           incluir_pagos_fuera_periodo: bool):
+        """
+        Ventas del período y sus pagos en un solo UNION ALL, ordenado por
+        cliente, fecha y tipo (ventas antes que pagos del mismo día).
+        """
+        decimal = models.DecimalField(max_digits=12, decimal_places=2)
+        cero = models.Value(Decimal('0'), output_field=decimal)
+        vacio = models.Value('', output_field=models.CharField())
+
+        ventas = Ventas.objects.filter(
+            fecha_deposito__range=[fecha_inicio, fecha_fin],
+            modalidad_pago=Ventas.ModalidadPago.CREDITO,
+        )
+        if incluir_pagos_fuera_periodo:
+            # Todos los pagos de ventas del período, sin importar cuándo se pagaron
+            pagos = PagoVenta.objects.filter(
+                venta__fecha_deposito__range=[fecha_inicio, fecha_fin],
+                venta__modalidad_pago=Ventas.ModalidadPago.CREDITO,
+            )
+        else:
+            # Solo pagos dentro del período específico
+            pagos = PagoVenta.objects.filter(fecha_pago__range=[fecha_inicio, fecha_fin])
+        if cliente_ids is not None:
+            ventas = ventas.filter(cliente_id__in=cliente_ids)
+            pagos = pagos.filter(venta__cliente_id__in=cliente_ids)
+
+        ventas = ventas.order_by().values(
+            m_cliente=F('cliente_id'),
+            m_fecha=F('fecha_deposito'),
+            m_orden=models.Value(0, output_field=models.IntegerField()),
+            m_id=F('id'),
+            m_venta=F('id'),
+            m_referencia=Coalesce('carga', vacio),
+            m_detalle=Coalesce('producto__nombre', vacio),
+            m_cargo=models.ExpressionWrapper(F('monto'), output_field=decimal),
+            m_abono=cero,
+        )
+        pagos = pagos.order_by().values(
+            m_cliente=F('venta__cliente_id'),
+            m_fecha=F('fecha_pago'),
+            m_orden=models.Value(1, output_field=models.IntegerField()),
+            m_id=F('id'),
+            m_venta=F('venta_id'),
+            m_referencia=Coalesce('referencia', vacio),
+            m_detalle=F('metodo_pago'),
+            m_cargo=cero,
+            m_abono=models.ExpressionWrapper(F('monto_pago'), output_field=decimal),
+        )
+        return ventas.union(pagos, all=True).order_by('m_cliente', 'm_fecha', 'm_orden', 'm_id')
+
+    @staticmethod
+    def _armar_estado_cuenta(saldo_inicial: float, filas, fecha_inicio: date) -> Dict:
+        """Movimientos con saldo acumulado y totales, en una sola pasada"""
+        metodos = dict(PagoVenta.MetodoPago.choices)
+        movimientos = []
+        saldo = saldo_inicial
+
+        # Agregar saldo inicial si existe
+        if abs(saldo) > 0.01:  # Evitar mostrar centavos insignificantes
+            movimientos.append({
+                'fecha': fecha_inicio,
+                'tipo': 'SALDO_INICIAL',
+                'referencia': 'SALDO-INICIAL',
+                'concepto': 'Saldo inicial del período',
+                'cargo': saldo if saldo > 0 else 0,
+                'abono': abs(saldo) if saldo < 0 else 0,
+                'saldo': saldo,
+                'venta_id': None
+            })
+
+        total_ventas = total_abonos = Decimal('0')
+        numero_facturas = numero_pagos = 0
+        for fila in filas:
+            cargo, abono = float(fila['m_cargo']), float(fila['m_abono'])
+            saldo += cargo - abono
+            if fila['m_orden'] == 0:
+                # RF4: Venta Original
+                total_ventas += fila['m_cargo']
+                numero_facturas += 1
+                tipo = 'VENTA'
+                referencia = fila['m_referencia'] or f"V-{fila['m_id']}"
+                concepto = f"Venta a crédito - {fila['m_detalle']}" if fila['m_detalle'] else 'Venta a crédito'
+            else:
+                # RF4: Suma de Abonos
+                total_abonos += fila['m_abono']
+                numero_pagos += 1
+                tipo = 'PAGO'
+                referencia = fila['m_referencia'] or f"P-{fila['m_id']}"
+                concepto = f"Pago - {metodos.get(fila['m_detalle'], fila['m_detalle'])}"
+            movimientos.append({
+                'fecha': fila['m_fecha'],
+                'tipo': tipo,
+                'referencia': referencia,
+                'concepto': concepto,
+                'cargo': cargo,
+                'abono': abono,
+                'saldo': saldo,
+                'venta_id': fila['m_venta']
+            })
+
+        return {
+            'movimientos': movimientos,
+            'saldo_inicial': saldo_inicial,
+            'total_ventas': total_ventas,
+            'total_abonos': total_abonos,
+            'saldo_final': saldo,  # RF4: Saldo Pendiente
+            'numero_facturas': numero_facturas,
+            'numero_pagos': numero_pagos,
+        }
+
+    # Campos de EstadoCuentaCliente que escribe _valores_estado_cuenta
+    CAMPOS_ESTADO_CUENTA = [
+        'saldo_inicial', 'total_ventas', 'total_abonos', 'saldo_final',
+        'numero_facturas', 'generado_por', 'formato_generado',
+    ]
+
+    @staticmethod
+    def _valores_estado_cuenta(estado: Dict, usuario: str, formato: str) -> Dict:
+        return {
+            'saldo_inicial': estado['saldo_inicial'],
+            'total_ventas': estado['total_ventas'],
+            'total_abonos': estado['total_abonos'],
+            'saldo_final': estado['saldo_final'],
+            'numero_facturas': estado['numero_facturas'],
+            'generado_por': usuario,
+            'formato_generado': formato,
+        }
+
+    @staticmethod
+    def _resultado_estado_cuenta(cliente, estado_cuenta, estado: Dict, formato: str, usuario: str) -> Dict:
+        from .credito_service import CreditoClienteService
+
+        # Preparar resumen del estado de cuenta
+        resumen = {
+            'cliente': cliente,
+            'periodo_inicio': estado_cuenta.periodo_inicio,
+            'periodo_fin': estado_cuenta.periodo_fin,
+            'saldo_inicial': estado['saldo_inicial'],
+            'total_ventas': estado['total_ventas'],
+            'total_abonos': estado['total_abonos'],
+            'saldo_final': estado['saldo_final'],
+            'numero_facturas': estado['numero_facturas'],
+            'numero_pagos': estado['numero_pagos'],
+            'porcentaje_recuperacion': estado_cuenta.porcentaje_recuperacion,
+            'promedio_por_factura': estado_cuenta.promedio_por_factura,
+            'limite_credito': cliente.limite_credito.amount,
+            'credito_disponible': CreditoClienteService.disponible(
+                cliente.tipo_cliente, cliente.limite_credito, cliente.credito_usado
+            ),
+        }
+        return {
+            'estado_cuenta': estado_cuenta,
+            'movimientos': estado['movimientos'],
+            'resumen': resumen,
+            'metadata': {
+                'formato': formato,
+                'generado_por': usuario,
+                'fecha_generacion': timezone.now(),
+                'total_movimientos': len(estado['movimientos'])
+            }
+        }
     
     # =========================================================================
     # MÉTODOS AUXILIARES Y UTILIDADES
@@ -616,12 +833,8 @@ class CuentasPorCobrarService:
     @staticmethod
     def _invalidar_cache_cliente(cliente_id: int):
         """Invalida el cache para un cliente específico"""
-        cache_keys = [
-            f'cxc_metricas_{cliente_id}',
-            f'cliente_saldos_{cliente_id}',
-            'cxc_dashboard_global'
-        ]
-        cache.delete_many(cache_keys)
+        from .cache_service import CuentasPorCobrarCache
+        CuentasPorCobrarCache.invalidar_cliente(cliente_id)
     
     @staticmethod
     def validar_limite_credito(cliente_id: int, monto_venta: float) -> Dict[str, Union[bool, float, str]]:
@@ -751,74 +964,22 @@ class CuentasPorCobrarService:
 # FUNCIONES DE UTILIDAD GLOBALES
 # =============================================================================
 
-def sincronizar_saldos_huerfanos():
+def sincronizar_saldos_huerfanos(lote: Optional[int] = None, dry_run: bool = False, progreso=None):
     """
     Función de mantenimiento: busca ventas a crédito sin saldo y los crea.
     Útil para migrar datos históricos o corregir inconsistencias.
+
+    Se resuelve por lotes en MantenimientoCxCService.huerfanos.
     """
-    ventas_sin_saldo = Ventas.objects.filter(
-        modalidad_pago=Ventas.ModalidadPago.CREDITO
-    ).exclude(
-        id__in=SaldoCliente.objects.values_list('venta_id', flat=True)
-    )
-    
-    creados = 0
-    errores = 0
-    
-    for venta in ventas_sin_saldo:
-        try:
-            CuentasPorCobrarService.sincronizar_deuda_venta(venta.id, 'Migración')
-            creados += 1
-        except Exception as e:
-            logger.error(f"Error creando saldo para venta {venta.id}: {str(e)}")
-            errores += 1
-    
-    return {
-        'ventas_procesadas': ventas_sin_saldo.count(),
-        'saldos_creados': creados,
-        'errores': errores
-    }
+    from .mantenimiento_cxc_service import MantenimientoCxCService
+    return MantenimientoCxCService.huerfanos(lote or MantenimientoCxCService.LOTE, dry_run, progreso)
 
 
-def recalcular_estados_cobranza():
+def recalcular_estados_cobranza(lote: Optional[int] = None, dry_run: bool = False, progreso=None):
     """
     Función de mantenimiento: recalcula estados de cobranza basado en pagos reales.
+
+    Se resuelve por lotes en MantenimientoCxCService.recalcular.
     """
-    saldos_inconsistentes = 0
-    saldos_corregidos = 0
-    
-    for saldo in SaldoCliente.objects.all():
-        try:
-            # Recalcular saldo basado en pagos reales
-            total_pagos = saldo.venta.pagos.aggregate(
-                total=Sum('monto_pago')
-            )['total'] or 0
-            
-            saldo_real = float(saldo.monto_original.amount) - float(total_pagos)
-            
-            if abs(float(saldo.saldo_pendiente.amount) - saldo_real) > 0.01:
-                saldos_inconsistentes += 1
-                
-                # Corregir saldo
-                saldo.saldo_pendiente.amount = max(0, saldo_real)
-                
-                # Recalcular estado
-                if saldo.saldo_pendiente.amount <= 0:
-                    saldo.estado = SaldoCliente.EstadosSaldo.PAGADO
-                elif saldo.saldo_pendiente.amount < float(saldo.monto_original.amount):
-                    if saldo.dias_vencido() > 0:
-                        saldo.estado = SaldoCliente.EstadosSaldo.VENCIDO
-                    else:
-                        saldo.estado = SaldoCliente.EstadosSaldo.PARCIAL
-                        
-                saldo.save()
-                saldos_corregidos += 1
-                
-        except Exception as e:
-            logger.error(f"Error recalculando saldo {saldo.id}: {str(e)}")
-    
-    return {
-        'saldos_revisados': SaldoCliente.objects.count(),
-        'inconsistencias_encontradas': saldos_inconsistentes,
-        'saldos_corregidos': saldos_corregidos
-    }
\ No newline at end of file
+    from .mantenimiento_cxc_service import MantenimientoCxCService
+    return MantenimientoCxCService.recalcular(lote or MantenimientoCxCService.LOTE, dry_run, progreso)
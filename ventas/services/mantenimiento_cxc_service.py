@@ -0,0 +1,206 @@
+# ventas/services/mantenimiento_cxc_service.py
+
+"""
+Mantenimiento masivo de SaldoCliente.
+
+- huerfanos: crea el SaldoCliente que falta a las ventas a crédito.
+- recalcular: corrige saldo_pendiente y estado contra los pagos reales.
+
+Ambos calculan el total pagado por venta con una subconsulta agrupada. Las
+diferencias contra lo guardado se filtran en SQL y se recorren por lotes de
+pk; cada lote se escribe con un solo bulk_create/bulk_update. Con `dry_run`
+solo se reportan las diferencias.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Optional
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Abs, Coalesce, Greatest
+from django.utils import timezone
+from djmoney.money import Money
+
+from ventas.models import PagoVenta, SaldoCliente, Ventas, monto_a_mxn
+
+logger = logging.getLogger(__name__)
+
+_DECIMAL = DecimalField(max_digits=14, decimal_places=2)
+_CERO = Value(Decimal('0'), output_field=_DECIMAL)
+CENTAVO = Decimal('0.01')
+TOLERANCIA = CENTAVO
+
+
+class MantenimientoCxCService:
+    """Sincroniza SaldoCliente con Ventas y PagoVenta en operaciones por lote"""
+
+    LOTE = 2000
+
+    @staticmethod
+    def total_pagado_sql(venta: str = 'venta_id') -> Coalesce:
+        """Suma de PagoVenta.monto_pago de la venta referida por `venta`"""
+        pagos = (
+            PagoVenta.objects.filter(venta_id=OuterRef(venta))
+            .order_by()
+            .values('venta_id')
+            .annotate(total=Sum('monto_pago'))
+            .values('total')
+        )
+        return Coalesce(Subquery(pagos, output_field=_DECIMAL), _CERO)
+
+    @staticmethod
+    def estado_para(saldo: Decimal, monto_original: Decimal, fecha_vencimiento, hoy, estado_actual: str) -> str:
+        """Estado de un saldo corregido (mismas reglas que el recálculo fila por fila)"""
+        if saldo <= 0:
+            return SaldoCliente.EstadosSaldo.PAGADO
+        if saldo < monto_original:
+            if fecha_vencimiento < hoy:
+                return SaldoCliente.EstadosSaldo.VENCIDO
+            return SaldoCliente.EstadosSaldo.PARCIAL
+        return estado_actual
+
+    @staticmethod
+    def _por_lotes(queryset, lote: int):
+        """Recorre un queryset de values() por rangos de pk"""
+        ultimo = 0
+        while True:
+            filas = list(queryset.filter(pk__gt=ultimo).order_by('pk')[:lote])
+            if not filas:
+                return
+            yield filas
+            ultimo = filas[-1]['pk']
+
+    @classmethod
+    def huerfanos(cls, lote: int = LOTE, dry_run: bool = False,
+                  progreso: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """
+        Crea el SaldoCliente de cada venta a crédito que no lo tiene.
+
+        El saldo inicial descuenta los pagos ya registrados. Las ventas sin
+        fecha de vencimiento la toman de su término de crédito; las que no
+        tienen ninguno de los dos se cuentan como error y se omiten.
+        """
+        pendientes = (
+            Ventas.objects.filter(modalidad_pago=Ventas.ModalidadPago.CREDITO, saldo_cxc__isnull=True)
+            .annotate(pagado=cls.total_pagado_sql('pk'))
+            .values(
+                'pk', 'cliente_id', 'monto', 'monto_currency', 'moneda_venta', 'tipo_cambio',
+                'fecha_deposito', 'fecha_vencimiento', 'termino_credito__dias_credito', 'pagado',
+            )
+        )
+        total = pendientes.count()
+        hoy = timezone.now().date()
+        resultado = {'ventas_procesadas': total, 'saldos_creados': 0, 'errores': 0, 'diferencias': []}
+        procesadas = 0
+
+        for filas in cls._por_lotes(pendientes, lote):
+            saldos, vencimientos = [], []
+            for fila in filas:
+                vencimiento = fila['fecha_vencimiento']
+                if vencimiento is None:
+                    if not fila['termino_credito__dias_credito']:
+                        logger.error(f"Venta {fila['pk']} a crédito sin término ni fecha de vencimiento")
+                        resultado['errores'] += 1
+                        continue
+                    vencimiento = fila['fecha_deposito'] + timedelta(days=fila['termino_credito__dias_credito'])
+                    vencimientos.append(Ventas(pk=fila['pk'], fecha_vencimiento=vencimiento))
+
+                moneda = fila['moneda_venta'] or 'MXN'
+                saldo = max(fila['monto'] - fila['pagado'], Decimal('0'))
+                estado = cls.estado_para(
+                    saldo, fila['monto'], vencimiento, hoy, SaldoCliente.EstadosSaldo.PENDIENTE
+                )
+                resultado['diferencias'].append({
+                    'venta_id': fila['pk'], 'saldo_id': None,
+                    'guardado': None, 'real': saldo, 'estado': estado,
+                })
+                saldos.append(SaldoCliente(
+                    cliente_id=fila['cliente_id'],
+                    venta_id=fila['pk'],
+                    monto_original=Money(fila['monto'], fila['monto_currency']),
+                    saldo_pendiente=Money(saldo, fila['monto_currency']),
+                    saldo_pendiente_mxn=monto_a_mxn(saldo, moneda, fila['tipo_cambio']),
+                    fecha_vencimiento=vencimiento,
+                    moneda=moneda,
+                    estado=estado,
+                ))
+
+            if not dry_run:
+                with transaction.atomic():
+                    Ventas.objects.bulk_update(vencimientos, ['fecha_vencimiento'])
+                    SaldoCliente.objects.bulk_create(saldos)
+            resultado['saldos_creados'] += len(saldos)
+            procesadas += len(filas)
+            if progreso:
+                progreso(procesadas, total)
+
+        if resultado['saldos_creados'] and not dry_run:
+            cls._invalidar_cache()
+        return resultado
+
+    @classmethod
+    def recalcular(cls, lote: int = LOTE, dry_run: bool = False,
+                   progreso: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """
+        Corrige saldo_pendiente (monto_original - pagos, nunca negativo) y el
+        estado de los saldos que difieren más de un centavo.
+        """
+        saldo_real = Greatest(
+            ExpressionWrapper(F('monto_original') - cls.total_pagado_sql(), output_field=_DECIMAL),
+            _CERO,
+        )
+        inconsistentes = (
+            SaldoCliente.objects.annotate(saldo_real=saldo_real)
+            .annotate(diferencia=Abs(ExpressionWrapper(F('saldo_pendiente') - F('saldo_real'), output_field=_DECIMAL)))
+            .filter(diferencia__gt=TOLERANCIA)
+            .values(
+                'pk', 'venta_id', 'monto_original', 'saldo_pendiente', 'saldo_pendiente_currency',
+                'saldo_real', 'fecha_vencimiento', 'estado', 'moneda', 'venta__tipo_cambio',
+            )
+        )
+        total = inconsistentes.count()
+        hoy = timezone.now().date()
+        resultado = {
+            'saldos_revisados': SaldoCliente.objects.count(),
+            'inconsistencias_encontradas': total,
+            'saldos_corregidos': 0,
+            'diferencias': [],
+        }
+
+        for filas in cls._por_lotes(inconsistentes, lote):
+            corregidos = []
+            for fila in filas:
+                fila['saldo_real'] = Decimal(fila['saldo_real']).quantize(CENTAVO)
+                estado = cls.estado_para(
+                    fila['saldo_real'], fila['monto_original'], fila['fecha_vencimiento'], hoy, fila['estado']
+                )
+                resultado['diferencias'].append({
+                    'venta_id': fila['venta_id'], 'saldo_id': fila['pk'],
+                    'guardado': fila['saldo_pendiente'], 'real': fila['saldo_real'], 'estado': estado,
+                })
+                corregidos.append(SaldoCliente(
+                    pk=fila['pk'],
+                    saldo_pendiente=Money(fila['saldo_real'], fila['saldo_pendiente_currency']),
+                    saldo_pendiente_mxn=monto_a_mxn(fila['saldo_real'], fila['moneda'], fila['venta__tipo_cambio']),
+                    estado=estado,
+                ))
+
+            if not dry_run:
+                SaldoCliente.objects.bulk_update(corregidos, ['saldo_pendiente', 'saldo_pendiente_mxn', 'estado'])
+            resultado['saldos_corregidos'] += len(corregidos)
+            if progreso:
+                progreso(resultado['saldos_corregidos'], total)
+
+        if resultado['saldos_corregidos'] and not dry_run:
+            cls._invalidar_cache()
+        return resultado
+
+    @staticmethod
+    def _invalidar_cache() -> None:
+        try:
+            from app.services.cache_service import cache_service
+            cache_service.invalidate_domains('ventas', 'cxc')
+        except Exception:
+            pass  # No fallar si el cache no está disponible
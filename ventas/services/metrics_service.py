@@ -49,7 +49,7 @@ class CuentasPorCobrarMetrics:
             total_cxc = SaldoCliente.objects.exclude(
                 estado=SaldoCliente.EstadosSaldo.PAGADO
             ).aggregate(
-                total=Sum('saldo_pendiente')
+                total=Sum('saldo_pendiente_mxn')
             )['total'] or 0
             
             # Ventas a crédito del período
@@ -57,7 +57,7 @@ class CuentasPorCobrarMetrics:
                 fecha_deposito__range=[fecha_inicio, fecha_fin],
                 modalidad_pago=Ventas.ModalidadPago.CREDITO
             ).aggregate(
-                total=Sum('monto')
+                total=Sum('monto_mxn')
             )['total'] or 0
             
             # Calcular DSO
@@ -95,67 +95,33 @@ class CuentasPorCobrarMetrics:
         """
         Calcula DSO mensual para análisis de tendencias.
         
+        Los meses cerrados se leen de CarteraMensual; solo el mes en curso
+        se calcula en vivo.
+        
         Args:
             meses: Número de meses hacia atrás a analizar
             
         Returns:
-            Lista de DSO por mes
+            Lista de DSO por mes (más antiguo primero)
         """
         resultados = []
-        fecha_base = timezone.now().date().replace(day=1)  # Primer día del mes actual
         
-        for i in range(meses):
-            # Calcular fecha del mes
-            if i == 0:
-                fecha_mes = fecha_base
-            else:
-                # Retroceder meses
-                mes_actual = fecha_base.month
-                año_actual = fecha_base.year
-                
-                mes_calc = mes_actual - i
-                año_calc = año_actual
-                
-                if mes_calc <= 0:
-                    mes_calc += 12
-                    año_calc -= 1
-                    
-                fecha_mes = date(año_calc, mes_calc, 1)
-            
-            # Último día del mes
-            ultimo_dia = calendar.monthrange(fecha_mes.year, fecha_mes.month)[1]
-            fecha_fin_mes = date(fecha_mes.year, fecha_mes.month, ultimo_dia)
-            
-            try:
-                dso_mes = CuentasPorCobrarMetrics.calcular_dso_historico(
-                    fecha_corte=fecha_fin_mes
-                )
-                
-                resultados.append({
-                    'año': fecha_mes.year,
-                    'mes': fecha_mes.month,
-                    'nombre_mes': calendar.month_name[fecha_mes.month],
-                    'fecha_corte': fecha_fin_mes,
-                    'dso': dso_mes['dso_dias'],
-                    'ventas_credito': dso_mes['ventas_credito_periodo'],
-                    'cxc_promedio': dso_mes['total_cxc']
-                })
-                
-            except Exception as e:
-                logger.warning(f"Error calculando DSO para {fecha_mes}: {str(e)}")
-                resultados.append({
-                    'año': fecha_mes.year,
-                    'mes': fecha_mes.month,
-                    'nombre_mes': calendar.month_name[fecha_mes.month],
-                    'fecha_corte': fecha_fin_mes,
-                    'dso': 0,
-                    'ventas_credito': 0,
-                    'cxc_promedio': 0,
-                    'error': True
-                })
-        
-        # Ordenar cronológicamente (más antiguo primero)
-        resultados.reverse()
+        for fila in CuentasPorCobrarMetrics.serie_cartera_mensual(meses):
+            ventas_credito = fila['ventas_credito_30d']
+            dso_dias = 0
+            if ventas_credito > 0:
+                dso_dias = (fila['total_cxc'] / ventas_credito) * 30
+            
+            resultados.append({
+                'año': fila['año'],
+                'mes': fila['mes'],
+                'nombre_mes': calendar.month_name[fila['mes']],
+                'fecha_corte': fila['fecha_corte'],
+                'dso': round(dso_dias, 2),
+                'ventas_credito': ventas_credito,
+                'cxc_promedio': fila['total_cxc']
+            })
+        
         return resultados
     
     @staticmethod
@@ -174,7 +140,7 @@ class CuentasPorCobrarMetrics:
         ).exclude(
             estado=SaldoCliente.EstadosSaldo.PAGADO
         ).aggregate(
-            total=Sum('saldo_pendiente')
+            total=Sum('saldo_pendiente_mxn')
         )['total'] or 0
         
         # Ventas a crédito en los 30 días previos
@@ -182,7 +148,7 @@ class CuentasPorCobrarMetrics:
             fecha_deposito__range=[fecha_inicio, fecha_corte],
             modalidad_pago=Ventas.ModalidadPago.CREDITO
         ).aggregate(
-            total=Sum('monto')
+            total=Sum('monto_mxn')
         )['total'] or 0
         
         dso_dias = 0
@@ -276,53 +242,22 @@ class CuentasPorCobrarMetrics:
     def evolucion_cartera_mensual(meses: int = 12) -> List[Dict]:
         """
         Evolución de la cartera total en los últimos N meses.
+        Los meses cerrados provienen de CarteraMensual.
         """
-        from ..models import SaldoCliente
-        
-        resultados = []
-        fecha_actual = timezone.now().date()
-        
-        for i in range(meses):
-            # Calcular primer día de cada mes hacia atrás
-            año = fecha_actual.year
-            mes = fecha_actual.month - i
-            
-            if mes <= 0:
-                mes += 12
-                año -= 1
-            
-            primer_dia = date(año, mes, 1)
-            ultimo_dia = date(año, mes, calendar.monthrange(año, mes)[1])
-            
-            try:
-                # Saldos creados hasta ese mes
-                saldos_mes = SaldoCliente.objects.filter(
-                    fecha_creacion__date__lte=ultimo_dia
-                ).exclude(
-                    estado=SaldoCliente.EstadosSaldo.PAGADO,
-                    fecha_ultimo_pago__date__lte=ultimo_dia  # Que no hayan sido pagados antes del corte
-                ).aggregate(
-                    total_cartera=Sum('saldo_pendiente'),
-                    numero_facturas=Count('id'),
-                    clientes_activos=Count('cliente', distinct=True)
-                )
-                
-                resultados.append({
-                    'año': año,
-                    'mes': mes,
-                    'nombre_mes': calendar.month_name[mes],
-                    'fecha_corte': ultimo_dia,
-                    'total_cartera': float(saldos_mes['total_cartera'] or 0),
-                    'numero_facturas': saldos_mes['numero_facturas'] or 0,
-                    'clientes_activos': saldos_mes['clientes_activos'] or 0
-                })
-                
-            except Exception as e:
-                logger.warning(f"Error calculando cartera para {año}-{mes}: {str(e)}")
-        
-        # Ordenar cronológicamente y calcular variaciones
-        resultados.reverse()
+        resultados = [
+            {
+                'año': fila['año'],
+                'mes': fila['mes'],
+                'nombre_mes': calendar.month_name[fila['mes']],
+                'fecha_corte': fila['fecha_corte'],
+                'total_cartera': fila['total_cxc'],
+                'numero_facturas': fila['numero_facturas'],
+                'clientes_activos': fila['clientes_activos']
+            }
+            for fila in CuentasPorCobrarMetrics.serie_cartera_mensual(meses)
+        ]
         
+        # Calcular variaciones contra el mes anterior
         for i in range(1, len(resultados)):
             actual = resultados[i]
             anterior = resultados[i-1]
@@ -347,69 +282,215 @@ class CuentasPorCobrarMetrics:
         """
         Análisis de eficiencia de cobranza por mes.
         Mide qué tanto se cobra vs lo que se vende.
+        Los meses cerrados provienen de CarteraMensual.
         """
-        from ..models import PagoVenta, Ventas
-        
         resultados = []
-        fecha_actual = timezone.now().date()
         
-        for i in range(meses):
-            # Calcular mes
-            año = fecha_actual.year
-            mes = fecha_actual.month - i
+        for fila in CuentasPorCobrarMetrics.serie_cartera_mensual(meses):
+            total_vendido = fila['ventas_credito']
+            total_cobrado = fila['cobranza']
             
-            if mes <= 0:
-                mes += 12
-                año -= 1
+            if total_vendido > 0:
+                eficiencia_pct = (total_cobrado / total_vendido) * 100
+            else:
+                eficiencia_pct = 0 if total_cobrado == 0 else float('inf')
             
-            primer_dia = date(año, mes, 1)
-            ultimo_dia = date(año, mes, calendar.monthrange(año, mes)[1])
-            
-            try:
-                # Ventas a crédito del mes
-                ventas_mes = Ventas.objects.filter(
-                    fecha_deposito__range=[primer_dia, ultimo_dia],
-                    modalidad_pago=Ventas.ModalidadPago.CREDITO
-                ).aggregate(
-                    total_vendido=Sum('monto'),
-                    numero_ventas=Count('id')
-                )
-                
-                # Pagos recibidos en el mes
-                pagos_mes = PagoVenta.objects.filter(
-                    fecha_pago__range=[primer_dia, ultimo_dia]
-                ).aggregate(
-                    total_cobrado=Sum('monto_pago'),
-                    numero_pagos=Count('id')
-                )
-                
-                # Calcular eficiencia
-                total_vendido = float(ventas_mes['total_vendido'] or 0)
-                total_cobrado = float(pagos_mes['total_cobrado'] or 0)
-                
-                if total_vendido > 0:
-                    eficiencia_pct = (total_cobrado / total_vendido) * 100
-                else:
-                    eficiencia_pct = 0 if total_cobrado == 0 else float('inf')
-                
-                resultados.append({
-                    'año': año,
-                    'mes': mes,
-                    'nombre_mes': calendar.month_name[mes],
-                    'total_vendido': total_vendido,
-                    'total_cobrado': total_cobrado,
-                    'numero_ventas': ventas_mes['numero_ventas'] or 0,
-                    'numero_pagos': pagos_mes['numero_pagos'] or 0,
-                    'eficiencia_pct': round(eficiencia_pct, 2),
-                    'gap_cobranza': total_vendido - total_cobrado
-                })
-                
-            except Exception as e:
-                logger.warning(f"Error calculando eficiencia para {año}-{mes}: {str(e)}")
+            resultados.append({
+                'año': fila['año'],
+                'mes': fila['mes'],
+                'nombre_mes': calendar.month_name[fila['mes']],
+                'total_vendido': total_vendido,
+                'total_cobrado': total_cobrado,
+                'numero_ventas': fila['numero_ventas'],
+                'numero_pagos': fila['numero_pagos'],
+                'eficiencia_pct': round(eficiencia_pct, 2),
+                'gap_cobranza': total_vendido - total_cobrado
+            })
         
-        resultados.reverse()
         return resultados
     
+    # =========================================================================
+    # SNAPSHOTS MENSUALES DE CARTERA (CarteraMensual)
+    # =========================================================================
+    
+    _CAMPOS_CARTERA = (
+        'total_cxc', 'numero_facturas', 'clientes_activos',
+        'ventas_credito', 'numero_ventas', 'ventas_credito_30d',
+        'cobranza', 'numero_pagos',
+    )
+    
+    @staticmethod
+    def _periodos(meses: int, hasta: Optional[date] = None) -> List[Tuple[int, int]]:
+        """
+        Lista de (año, mes) de los últimos N meses terminando en el mes de
+        `hasta` (hoy por defecto), ordenada del más antiguo al más reciente.
+        """
+        fecha = hasta or timezone.now().date()
+        año, mes = fecha.year, fecha.month
+        periodos = []
+        for _ in range(meses):
+            periodos.append((año, mes))
+            mes -= 1
+            if mes == 0:
+                mes = 12
+                año -= 1
+        periodos.reverse()
+        return periodos
+    
+    @staticmethod
+    def calcular_cierre_mes(año: int, mes: int) -> Dict:
+        """
+        Calcula en vivo los componentes de CarteraMensual para un mes
+        (3 consultas agregadas). Lo usan el comando de snapshot y la serie
+        para el mes en curso.
+        """
+        from ..models import PagoVenta, SaldoCliente, Ventas
+        
+        primer_dia = date(año, mes, 1)
+        ultimo_dia = date(año, mes, calendar.monthrange(año, mes)[1])
+        inicio_30d = ultimo_dia - timedelta(days=30)
+        
+        # Cartera abierta al corte (excluye lo liquidado antes del corte)
+        cartera = SaldoCliente.objects.filter(
+            fecha_creacion__date__lte=ultimo_dia
+        ).exclude(
+            estado=SaldoCliente.EstadosSaldo.PAGADO,
+            fecha_ultimo_pago__date__lte=ultimo_dia
+        ).aggregate(
+            total_cxc=Sum('saldo_pendiente_mxn'),
+            numero_facturas=Count('id'),
+            clientes_activos=Count('cliente', distinct=True)
+        )
+        
+        # Ventas a crédito del mes y de los 30 días previos al corte
+        ventas = Ventas.objects.filter(
+            fecha_deposito__range=[min(primer_dia, inicio_30d), ultimo_dia],
+            modalidad_pago=Ventas.ModalidadPago.CREDITO
+        ).aggregate(
+            ventas_credito=Sum('monto', filter=Q(fecha_deposito__gte=primer_dia)),
+            numero_ventas=Count('id', filter=Q(fecha_deposito__gte=primer_dia)),
+            ventas_credito_30d=Sum('monto', filter=Q(fecha_deposito__gte=inicio_30d))
+        )
+        
+        # Pagos recibidos en el mes
+        pagos = PagoVenta.objects.filter(
+            fecha_pago__range=[primer_dia, ultimo_dia]
+        ).aggregate(
+            cobranza=Sum('monto_pago_mxn'),
+            numero_pagos=Count('id')
+        )
+        
+        return {
+            'año': año,
+            'mes': mes,
+            'fecha_corte': ultimo_dia,
+            'total_cxc': Decimal(cartera['total_cxc'] or 0),
+            'numero_facturas': cartera['numero_facturas'] or 0,
+            'clientes_activos': cartera['clientes_activos'] or 0,
+            'ventas_credito': Decimal(ventas['ventas_credito'] or 0),
+            'numero_ventas': ventas['numero_ventas'] or 0,
+            'ventas_credito_30d': Decimal(ventas['ventas_credito_30d'] or 0),
+            'cobranza': Decimal(pagos['cobranza'] or 0),
+            'numero_pagos': pagos['numero_pagos'] or 0,
+        }
+    
+    @staticmethod
+    def serie_cartera_mensual(meses: int = 12) -> List[Dict]:
+        """
+        Serie mensual de cartera, ventas a crédito y cobranza.
+        
+        Los meses cerrados se leen de CarteraMensual en una sola consulta; el
+        mes en curso (y cualquier mes cerrado sin snapshot) se calcula en vivo.
+        Los importes se devuelven como float, más antiguo primero.
+        """
+        from ..models import CarteraMensual
+        
+        periodos = CuentasPorCobrarMetrics._periodos(meses)
+        if not periodos:
+            return []
+        
+        cerrados = periodos[:-1]
+        snapshots = {}
+        if cerrados:
+            primer_corte = date(*cerrados[0], 1)
+            ultimo_corte = date(*cerrados[-1], calendar.monthrange(*cerrados[-1])[1])
+            snapshots = {
+                (fila['año'], fila['mes']): fila
+                for fila in CarteraMensual.objects.filter(
+                    fecha_corte__range=[primer_corte, ultimo_corte]
+                ).values('año', 'mes', 'fecha_corte', *CuentasPorCobrarMetrics._CAMPOS_CARTERA)
+            }
+        
+        faltantes = [p for p in cerrados if p not in snapshots]
+        if faltantes:
+            logger.warning(
+                f"CarteraMensual sin snapshot para {len(faltantes)} mes(es) cerrados; "
+                f"calculando en vivo. Ejecuta snapshot_cartera_mensual."
+            )
+        
+        serie = []
+        for año, mes in periodos:
+            fila = snapshots.get((año, mes))
+            if fila is None:
+                fila = CuentasPorCobrarMetrics.calcular_cierre_mes(año, mes)
+            serie.append({
+                campo: float(valor) if isinstance(valor, Decimal) else valor
+                for campo, valor in fila.items()
+            })
+        return serie
+    
+    @staticmethod
+    def cerrar_meses_pendientes(desde: Optional[date] = None,
+                                recalcular: bool = False) -> List[Tuple[int, int]]:
+        """
+        Genera los snapshots de CarteraMensual que falten hasta el mes anterior.
+        
+        Los meses ya cerrados no se modifican salvo con `recalcular=True`,
+        que reemplaza los snapshots del rango. Si no se indica `desde`, se
+        continúa a partir del último snapshot (o de la venta más antigua).
+        
+        Returns:
+            Lista de (año, mes) generados
+        """
+        from django.db import transaction
+        from ..models import CarteraMensual, Ventas
+        
+        hoy = timezone.now().date()
+        ultimo_cerrado = hoy.replace(day=1) - timedelta(days=1)
+        
+        if desde is None:
+            ultimo = CarteraMensual.objects.order_by('-fecha_corte').first()
+            if ultimo:
+                desde = ultimo.fecha_corte + timedelta(days=1)
+            else:
+                desde = Ventas.objects.aggregate(
+                    primera=Min('fecha_deposito')
+                )['primera'] or hoy
+        desde = desde.replace(day=1)
+        
+        if desde > ultimo_cerrado:
+            return []
+        
+        total_meses = (ultimo_cerrado.year - desde.year) * 12 + ultimo_cerrado.month - desde.month + 1
+        periodos = CuentasPorCobrarMetrics._periodos(total_meses, hasta=ultimo_cerrado)
+        
+        with transaction.atomic():
+            rango = CarteraMensual.objects.filter(fecha_corte__range=[desde, ultimo_cerrado])
+            if recalcular:
+                rango.delete()
+                existentes = set()
+            else:
+                existentes = set(rango.values_list('año', 'mes'))
+            
+            nuevos = [
+                CarteraMensual(**CuentasPorCobrarMetrics.calcular_cierre_mes(año, mes))
+                for año, mes in periodos
+                if (año, mes) not in existentes
+            ]
+            CarteraMensual.objects.bulk_create(nuevos)
+        
+        return [(s.año, s.mes) for s in nuevos]
+    
     @staticmethod
     def tasa_recuperacion_cartera(periodo_dias: int = 30) -> Dict:
         """
@@ -428,7 +509,7 @@ class CuentasPorCobrarMetrics:
             ).exclude(
                 estado=SaldoCliente.EstadosSaldo.PAGADO
             ).aggregate(
-                total=Sum('saldo_pendiente')
+                total=Sum('saldo_pendiente_mxn')
             )['total'] or 0
             
             # Pagos recibidos durante el período de cartera preexistente
@@ -436,7 +517,7 @@ class CuentasPorCobrarMetrics:
                 fecha_pago__range=[fecha_inicio, fecha_fin],
                 venta__fecha_deposito__lt=fecha_inicio  # Solo cartera previa
             ).aggregate(
-                total_cobrado=Sum('monto_pago'),
+                total_cobrado=Sum('monto_pago_mxn'),
                 numero_pagos=Count('id')
             )
             
@@ -563,7 +644,7 @@ class CuentasPorCobrarMetrics:
                 resultados = SaldoCliente.objects.values(
                     'cliente__nombre', 'cliente__id'
                 ).annotate(
-                    total_saldo=Sum('saldo_pendiente'),
+                    total_saldo=Sum('saldo_pendiente_mxn'),
                     numero_facturas=Count('id')
                 ).filter(
                     total_saldo__gt=0
@@ -586,7 +667,7 @@ class CuentasPorCobrarMetrics:
                     'cliente__nombre', 'cliente__id'
                 ).annotate(
                     numero_facturas=Count('id'),
-                    total_saldo=Sum('saldo_pendiente')
+                    total_saldo=Sum('saldo_pendiente_mxn')
                 ).filter(
                     total_saldo__gt=0
                 ).order_by('-numero_facturas')[:limite]
@@ -607,7 +688,7 @@ class CuentasPorCobrarMetrics:
                 resultados = PagoVenta.objects.values(
                     'venta__cliente__nombre', 'venta__cliente__id'
                 ).annotate(
-                    total_pagos=Sum('monto_pago'),
+                    total_pagos=Sum('monto_pago_mxn'),
                     numero_pagos=Count('id')
                 ).order_by('-total_pagos')[:limite]
                 
@@ -0,0 +1,83 @@
+# ventas/services/montos_mxn_service.py
+
+"""
+Columnas de moneda base (MXN) de Ventas, PagoVenta y SaldoCliente.
+
+`save()` de cada modelo calcula monto_mxn, monto_pagado_mxn, monto_pago_mxn y
+saldo_pendiente_mxn con `monto_a_mxn`. Este servicio las recalcula en SQL
+(UPDATE por rangos de pk) para lo que no pasa por save(): datos previos,
+queryset.update, bulk_create o cargas directas.
+"""
+
+import logging
+from decimal import Decimal
+from typing import Dict
+
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When, DecimalField
+from django.db.models.functions import Round
+
+from ventas.models import PagoVenta, SaldoCliente, Ventas
+
+logger = logging.getLogger(__name__)
+
+
+class MontosMXNService:
+    """Recalcula por lotes los equivalentes MXN persistidos"""
+
+    LOTE = 5000
+
+    @staticmethod
+    def factor(moneda: str, tipo_cambio) -> Case:
+        """1 para MXN (o moneda vacía); el tipo de cambio para cualquier otra"""
+        es_mxn = Q(**{f'{moneda}__iexact': 'MXN'}) | Q(**{f'{moneda}__isnull': True}) | Q(**{moneda: ''})
+        return Case(
+            When(es_mxn, then=Value(Decimal('1'))),
+            default=tipo_cambio,
+            output_field=DecimalField(max_digits=10, decimal_places=4),
+        )
+
+    @staticmethod
+    def _en_mxn(campo: str, factor) -> Round:
+        return Round(F(campo) * factor, 2, output_field=DecimalField(max_digits=16, decimal_places=2))
+
+    @staticmethod
+    def _por_lotes(queryset, lote: int, **valores) -> int:
+        """UPDATE por rangos de pk para no bloquear la tabla completa"""
+        actualizadas = 0
+        ids = queryset.order_by('pk').values_list('pk', flat=True)
+        ultimo = 0
+        while True:
+            tope = list(ids.filter(pk__gt=ultimo)[lote - 1:lote])
+            if tope:
+                actualizadas += queryset.filter(pk__gt=ultimo, pk__lte=tope[0]).update(**valores)
+                ultimo = tope[0]
+                continue
+            actualizadas += queryset.filter(pk__gt=ultimo).update(**valores)
+            return actualizadas
+
+    @classmethod
+    def recalcular(cls, lote: int = LOTE) -> Dict[str, int]:
+        """Recalcula las cuatro columnas *_mxn; devuelve filas actualizadas por modelo"""
+        factor_venta = cls.factor('moneda_venta', F('tipo_cambio'))
+        ventas = cls._por_lotes(
+            Ventas.objects.all(), lote,
+            monto_mxn=cls._en_mxn('monto', factor_venta),
+            monto_pagado_mxn=cls._en_mxn('monto_pagado', factor_venta),
+        )
+
+        factor_pago = Subquery(
+            Ventas.objects.filter(pk=OuterRef('venta_id'))
+            .annotate(factor=cls.factor('moneda_venta', F('tipo_cambio')))
+            .values('factor')[:1]
+        )
+        pagos = cls._por_lotes(PagoVenta.objects.all(), lote, monto_pago_mxn=cls._en_mxn('monto_pago', factor_pago))
+
+        tipo_cambio_venta = Subquery(Ventas.objects.filter(pk=OuterRef('venta_id')).values('tipo_cambio')[:1])
+        saldos = cls._por_lotes(
+            SaldoCliente.objects.all(), lote,
+            saldo_pendiente_mxn=cls._en_mxn('saldo_pendiente', cls.factor('moneda', tipo_cambio_venta)),
+        )
+
+        resultado = {'ventas': ventas, 'pagos': pagos, 'saldos': saldos}
+        logger.info(f"Montos MXN recalculados: {resultado}")
+        return resultado
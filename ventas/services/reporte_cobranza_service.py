@@ -7,28 +7,123 @@ Produce tres secciones:
   3. Impuestos a Pagar — desde el modelo ObligacionFiscal.
 """
 from decimal import Decimal
-from collections import defaultdict
 
-from django.db.models import Sum, Avg, Q
+from django.db.models import Avg, Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Greatest
 
+from app.services.cache_service import cache_service
 from catalogo.models import Sucursal
-from ventas.models import Anticipo, ObligacionFiscal, Ventas, ConfiguracionCuentasPorCobrar
+from ventas.models import Anticipo, Cliente, ObligacionFiscal, Ventas, ConfiguracionCuentasPorCobrar
 
 
 # Estados que representan deuda pendiente de cobro
 ESTADOS_CON_DEUDA = ['Pendiente', 'Parcial', 'Vencido']
 
+# Los agregados viven en el dominio versionado 'cxc': guardar una venta, un
+# pago o un anticipo los invalida. HTML, Excel y PDF del mismo período
+# comparten un solo cálculo.
+CACHE_DOMINIO = 'cxc'
+CACHE_TIMEOUT = 300
 
-def _saldo_float(venta):
-    """Retorna el saldo pendiente de una venta como float, nunca negativo."""
-    saldo = float(venta.monto.amount) - float(venta.monto_pagado.amount)
-    return max(saldo, 0.0)
+_DECIMAL = DecimalField(max_digits=16, decimal_places=2)
+
+
+def saldo_disponible_anticipo_sql():
+    """
+    Expresión SQL equivalente a Anticipo.saldo_disponible().
+
+    Un anticipo Aplicado sin monto_aplicado registrado (legacy) se considera
+    consumido por completo; el resto aporta max(monto - monto_aplicado, 0).
+    """
+    return Case(
+        When(
+            estado_anticipo=Anticipo.Estado_anticipo.Aplicado,
+            monto_aplicado__lte=0,
+            then=Value(Decimal('0'), output_field=_DECIMAL),
+        ),
+        default=Greatest(F('monto') - F('monto_aplicado'), Value(Decimal('0')), output_field=_DECIMAL),
+        output_field=_DECIMAL,
+    )
+
+
+def _calcular_agregados(fecha_inicio, fecha_fin):
+    """
+    Saldos agrupados en SQL, en tipos serializables a JSON para el cache.
+
+    Retorna dict con:
+        saldos     — [[tipo_registro, cliente_id, moneda, sucursal_id, saldo], ...]
+        tc_ventas  — promedio del tipo de cambio de ventas USD (str) o None
+        anticipos  — [[cliente_id, saldo_disponible], ...] con saldo > 0
+    """
+    qs_base = Ventas.objects.filter(
+        estado_cobranza__in=ESTADOS_CON_DEUDA,
+        tipo_registro__in=['VENTA', 'MAQUILA'],
+    )
+    if fecha_inicio:
+        qs_base = qs_base.filter(fecha_salida_manifiesto__gte=fecha_inicio)
+    if fecha_fin:
+        qs_base = qs_base.filter(fecha_salida_manifiesto__lte=fecha_fin)
+
+    # Solo ventas con saldo positivo: los sobrepagos no restan a otras ventas
+    saldos = (
+        qs_base.filter(monto__gt=F('monto_pagado'))
+        .order_by()
+        .values(
+            'tipo_registro', 'cliente_id', 'sucursal_id_id',
+            moneda=Case(
+                When(moneda_venta__iexact='USD', then=Value('USD')),
+                default=Value('MXN'),
+            ),
+        )
+        .annotate(saldo=Sum(F('monto') - F('monto_pagado'), output_field=_DECIMAL))
+    )
+
+    tc_ventas = qs_base.aggregate(
+        avg=Avg('tipo_cambio', filter=Q(tipo_registro='VENTA', moneda_venta='USD'))
+    )['avg']
+
+    anticipos = Anticipo.objects.exclude(estado_anticipo=Anticipo.Estado_anticipo.Cancelado)
+    if fecha_inicio:
+        anticipos = anticipos.filter(fecha__gte=fecha_inicio)
+    if fecha_fin:
+        anticipos = anticipos.filter(fecha__lte=fecha_fin)
+    anticipos = (
+        anticipos.order_by()
+        .values('cliente_id')
+        .annotate(saldo=Sum(saldo_disponible_anticipo_sql()))
+        .filter(saldo__gt=0)
+    )
+
+    return {
+        'saldos': [
+            [f['tipo_registro'], f['cliente_id'], f['moneda'], f['sucursal_id_id'], float(f['saldo'])]
+            for f in saldos
+        ],
+        'tc_ventas': str(tc_ventas) if tc_ventas is not None else None,
+        'anticipos': [[a['cliente_id'], float(a['saldo'])] for a in anticipos],
+    }
+
+
+def obtener_agregados_cobranza(fecha_inicio=None, fecha_fin=None, forzar=False):
+    """Agregados del período desde el cache 'cxc' (o calculados si no hay)."""
+    nombre = f"reporte_cobranza_{fecha_inicio or '-'}_{fecha_fin or '-'}"
+    return cache_service.get_or_compute(
+        cache_service.versioned_key(CACHE_DOMINIO, nombre),
+        lambda: _calcular_agregados(fecha_inicio, fecha_fin),
+        CACHE_TIMEOUT,
+        force=forzar,
+        stats_name='reporte_cobranza',
+    )
 
 
 def generar_reporte_cobranza(fecha_inicio=None, fecha_fin=None, tipo_cambio_override=None):
     """
     Genera los datos para el reporte global de cobranza.
 
+    Los saldos se agrupan en SQL por (tipo_registro, cliente, moneda, sucursal)
+    y se cachean por período; el tipo de cambio solo interviene al armar las
+    filas, así que cambiarlo no repite las consultas.
+
     Parámetros:
         fecha_inicio (date | None):  Inicio del período. None = sin límite inferior.
         fecha_fin    (date | None):  Fin del período.   None = sin límite superior.
@@ -47,37 +142,24 @@ def generar_reporte_cobranza(fecha_inicio=None, fecha_fin=None, tipo_cambio_over
         fecha_fin           — fecha fin del período
     """
     # -------------------------------------------------------------------------
-    # 1. Base querysets filtradas por período
+    # 1. Agregados del período (SQL, cacheados)
     # -------------------------------------------------------------------------
-    qs_base = Ventas.objects.select_related('cliente', 'sucursal_id').filter(
-        estado_cobranza__in=ESTADOS_CON_DEUDA
-    )
-    if fecha_inicio:
-        qs_base = qs_base.filter(fecha_salida_manifiesto__gte=fecha_inicio)
-    if fecha_fin:
-        qs_base = qs_base.filter(fecha_salida_manifiesto__lte=fecha_fin)
-
-    qs_ventas = qs_base.filter(tipo_registro='VENTA')
-    qs_maquila = qs_base.filter(tipo_registro='MAQUILA')
+    agregados = obtener_agregados_cobranza(fecha_inicio, fecha_fin)
+    saldos = agregados['saldos']
+    anticipos_por_cliente = {cid: saldo for cid, saldo in agregados['anticipos']}
 
     # -------------------------------------------------------------------------
-    # 2. Sucursales con movimientos en el período
+    # 2. Sucursales y clientes con movimientos en el período
     # -------------------------------------------------------------------------
-    sucursal_ids_ventas = set(qs_ventas.values_list('sucursal_id_id', flat=True))
-    sucursal_ids_maquila = set(qs_maquila.values_list('sucursal_id_id', flat=True))
-    all_sucursal_ids = sucursal_ids_ventas | sucursal_ids_maquila
-
     sucursales = list(
-        Sucursal.objects.filter(id__in=all_sucursal_ids).order_by('nombre')
+        Sucursal.objects.filter(id__in={fila[3] for fila in saldos}).order_by('nombre')
     )
+    clientes = Cliente.objects.in_bulk({fila[1] for fila in saldos} | set(anticipos_por_cliente))
 
     # -------------------------------------------------------------------------
     # 3. Tabla Ventas x Cobrar (agrupada por cliente × moneda_venta)
     # -------------------------------------------------------------------------
-    ventas_por_cliente = _calcular_saldos_por_cliente(qs_ventas, sucursales)
-
-    # Tipo de cambio para convertir ventas USD → MXN
-    avg_tc_ventas = qs_ventas.filter(moneda_venta='USD').aggregate(avg=Avg('tipo_cambio'))['avg']
+    ventas_por_cliente = _filas_por_cliente(saldos, 'VENTA', clientes)
 
     filas_venta_usd = [f for f in ventas_por_cliente if f['moneda'] == 'USD']
     filas_venta_mxn = [f for f in ventas_por_cliente if f['moneda'] == 'MXN']
@@ -88,7 +170,7 @@ def generar_reporte_cobranza(fecha_inicio=None, fecha_fin=None, tipo_cambio_over
     # -------------------------------------------------------------------------
     # 4. Tabla Maquila x Cobrar
     # -------------------------------------------------------------------------
-    maquila_por_cliente = _calcular_saldos_por_cliente(qs_maquila, sucursales)
+    maquila_por_cliente = _filas_por_cliente(saldos, 'MAQUILA', clientes)
 
     # Tipo de cambio: usar override manual o valor centralizado en configuración
     if tipo_cambio_override and Decimal(str(tipo_cambio_override)) > 0:
@@ -100,23 +182,9 @@ def generar_reporte_cobranza(fecha_inicio=None, fecha_fin=None, tipo_cambio_over
     totales_maquila = _calcular_totales(maquila_por_cliente, sucursales, tipo_cambio=tipo_cambio)
 
     # -------------------------------------------------------------------------
-    # 5. Saldo a favor del cliente (anticipos + excedentes de anticipos aplicados)
+    # 5. Saldo a favor del cliente (saldo disponible de anticipos, ver
+    #    saldo_disponible_anticipo_sql)
     # -------------------------------------------------------------------------
-    # 5a. Saldo disponible de anticipos (pendientes o parcialmente aplicados)
-    anticipos_qs = Anticipo.objects.exclude(estado_anticipo='Cancelado').select_related('cliente')
-    if fecha_inicio:
-        anticipos_qs = anticipos_qs.filter(fecha__gte=fecha_inicio)
-    if fecha_fin:
-        anticipos_qs = anticipos_qs.filter(fecha__lte=fecha_fin)
-
-    anticipos_por_cliente = defaultdict(float)
-    clientes_anticipo_map = {}  # cliente_id → cliente object
-    for a in anticipos_qs:
-        saldo_disponible = float(a.saldo_disponible())
-        if saldo_disponible > 0:
-            anticipos_por_cliente[a.cliente_id] += saldo_disponible
-            clientes_anticipo_map[a.cliente_id] = a.cliente
-
     # Inyectar saldo FVR en las filas de ventas (solo en la primera fila por cliente)
     seen_anticipo_ids = set()
     for fila in ventas_por_cliente:
@@ -131,7 +199,7 @@ def generar_reporte_cobranza(fecha_inicio=None, fecha_fin=None, tipo_cambio_over
     # Lista ordenada para la sección "Saldo a Favor" del reporte
     anticipos_saldo_favor = sorted(
         [
-            {'cliente': clientes_anticipo_map[cid], 'saldo': saldo}
+            {'cliente': clientes[cid], 'saldo': saldo}
             for cid, saldo in anticipos_por_cliente.items()
         ],
         key=lambda x: x['cliente'].nombre,
@@ -146,8 +214,8 @@ def generar_reporte_cobranza(fecha_inicio=None, fecha_fin=None, tipo_cambio_over
     # 7. Equivalencias y cartera consolidada de Ventas (como un banco)
     # -------------------------------------------------------------------------
     # Tipo de cambio ventas: promedio real del período o fallback a TC maquila
-    if avg_tc_ventas:
-        tipo_cambio_ventas = Decimal(str(avg_tc_ventas)).quantize(Decimal('0.0001'))
+    if agregados['tc_ventas']:
+        tipo_cambio_ventas = Decimal(agregados['tc_ventas']).quantize(Decimal('0.0001'))
     else:
         tipo_cambio_ventas = tipo_cambio
 
@@ -171,7 +239,7 @@ def generar_reporte_cobranza(fecha_inicio=None, fecha_fin=None, tipo_cambio_over
         'total_cartera_ventas_mxn': total_cartera_ventas_mxn,
         'totales_maquila': totales_maquila,
         'tipo_cambio': tipo_cambio,
-        'anticipos_por_cliente': dict(anticipos_por_cliente),
+        'anticipos_por_cliente': anticipos_por_cliente,
         'anticipos_saldo_favor': anticipos_saldo_favor,
         'total_anticipos': total_anticipos,
         'deuda_neta_mxn': deuda_neta_mxn,
@@ -185,42 +253,28 @@ def generar_reporte_cobranza(fecha_inicio=None, fecha_fin=None, tipo_cambio_over
 # Helpers
 # =============================================================================
 
-def _calcular_saldos_por_cliente(qs, sucursales):
+def _filas_por_cliente(saldos, tipo_registro, clientes):
     """
-    Agrupa por (cliente, moneda_venta) — una fila por combinación.
+    Arma una fila por (cliente, moneda) a partir de los saldos agrupados.
     El campo 'moneda' en cada fila es la moneda real del saldo ('USD' o 'MXN').
     Esto permite calcular correctamente equivalencias sin mezclar divisas.
     """
-    # acum[cliente_id][moneda][sucursal_id] = saldo_float
-    acum = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
-    clientes_map = {}
-
-    for v in qs:
-        saldo = _saldo_float(v)
-        if saldo <= 0:
+    filas = {}
+    for tipo, cid, mon, sid, saldo in saldos:
+        if tipo != tipo_registro:
             continue
-        cid = v.cliente_id
-        sid = v.sucursal_id_id
-        mon = 'USD' if (getattr(v, 'moneda_venta', 'MXN') or 'MXN').upper() == 'USD' else 'MXN'
-        acum[cid][mon][sid] += saldo
-        clientes_map[cid] = v.cliente
-
-    filas = []
-    for cid, por_moneda in acum.items():
-        for mon, por_suc in por_moneda.items():
-            total = sum(por_suc.values())
-            if total > 0:
-                filas.append({
-                    'cliente': clientes_map[cid],
-                    'por_sucursal': dict(por_suc),
-                    'total': total,
-                    'moneda': mon,
-                    'anticipo': 0.0,
-                })
+        fila = filas.setdefault((cid, mon), {
+            'cliente': clientes[cid],
+            'por_sucursal': {},
+            'total': 0.0,
+            'moneda': mon,
+            'anticipo': 0.0,
+        })
+        fila['por_sucursal'][sid] = fila['por_sucursal'].get(sid, 0.0) + saldo
+        fila['total'] += saldo
 
     # Ordenar por nombre del cliente, luego por moneda (MXN < USD)
-    filas.sort(key=lambda r: (r['cliente'].nombre, r['moneda']))
-    return filas
+    return sorted(filas.values(), key=lambda r: (r['cliente'].nombre, r['moneda']))
 
 
 def _calcular_totales(filas, sucursales, tipo_cambio=None):
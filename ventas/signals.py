@@ -5,13 +5,19 @@ Señales Django para automatizar el ciclo de vida de cuentas por cobrar.
 
 - post_save Ventas  → crea SaldoCliente al registrar venta a crédito nueva;
                       sincroniza saldo en actualizaciones.
-- post_save PagoVenta → ya manejado en PagoVenta.save() mediante
-                        actualizar_estado_cobranza() → _sync_saldo_cxc().
+- post_save PagoVenta → ya manejado en PagoVenta.save(): incrementos F() sobre
+                        Ventas, SaldoCliente y Cliente.credito_usado, sin
+                        pasar por Ventas.save() ni por estas señales.
+- post_delete PagoVenta → revierte esos incrementos (PagoVenta.revertir_en_venta).
+- pre_save/post_save/post_delete Ventas → recalcula Cliente.credito_usado del
+                                         cliente actual y del anterior si cambió.
+- post_save/post_delete Anticipo → invalida el dominio de cache 'cxc'
+                                   (saldo a favor del reporte de cobranza).
 """
 
 import logging
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
 logger = logging.getLogger(__name__)
@@ -65,3 +71,49 @@ def auto_sincronizar_saldo_cliente(sender, instance, created, **kwargs):
         logger.exception(
             "auto_sincronizar_saldo_cliente: error inesperado para venta %s.", instance.pk
         )
+
+
+@receiver(pre_save, sender='ventas.Ventas')
+def recordar_cliente_previo(sender, instance, raw=False, **kwargs):
+    instance._cliente_previo_id = None
+    if raw or instance.pk is None:
+        return
+    instance._cliente_previo_id = (
+        sender.objects.filter(pk=instance.pk).values_list('cliente_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender='ventas.Ventas')
+@receiver(post_delete, sender='ventas.Ventas')
+def actualizar_credito_usado(sender, instance, raw=False, **kwargs):
+    """
+    Recalcula la exposición de crédito del cliente en la transacción de la
+    venta. Los pagos no pasan por aquí: ajustan credito_usado en PagoVenta.save().
+    """
+    if raw:
+        return
+    from .services.credito_service import CreditoClienteService
+
+    previo = getattr(instance, '_cliente_previo_id', None)
+    instance._cliente_previo_id = None
+    CreditoClienteService.actualizar(instance.cliente_id, previo)
+
+
+@receiver(post_delete, sender='ventas.PagoVenta')
+def revertir_pago_eliminado(sender, instance, **kwargs):
+    """
+    Los pagos solo mueven la venta con deltas F(): al eliminar uno (admin,
+    inline o queryset) se resta su monto en la misma transacción del borrado.
+    """
+    instance.revertir_en_venta()
+
+
+@receiver(post_save, sender='ventas.Anticipo')
+@receiver(post_delete, sender='ventas.Anticipo')
+def invalidar_cache_anticipos(sender, instance, **kwargs):
+    """El saldo a favor de los anticipos forma parte de los agregados 'cxc'."""
+    try:
+        from app.services.cache_service import cache_service
+        cache_service.invalidate_domains('cxc')
+    except Exception:
+        pass  # No fallar si el cache no está disponible
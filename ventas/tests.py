@@ -12,6 +12,7 @@ introducida en generar_reporte_cobranza (sección 5):
   - El saldo a favor de un cliente no contamina el de otro.
   - El filtrado por rango de fechas se aplica correctamente a ambas fuentes.
   - El saldo a favor se inyecta en la fila correspondiente de ventas_por_cliente.
+  - Los agregados en SQL se reutilizan entre exportaciones del mismo período.
 
 Ejecución:
     python manage.py test ventas.tests --verbosity=2
@@ -19,6 +20,7 @@ Ejecución:
 from datetime import date
 from decimal import Decimal
 
+from django.core.cache import cache
 from django.test import TestCase
 from djmoney.money import Money
 
@@ -65,6 +67,11 @@ class ReporteCobranzaBaseTest(TestCase):
         # ConfiguracionCuentasPorCobrar necesaria para el tipo de cambio de fallback
         ConfiguracionCuentasPorCobrar.obtener_configuracion()
 
+    def setUp(self):
+        # Los agregados del reporte se cachean por período; el rollback de
+        # cada test no alcanza al cache.
+        cache.clear()
+
     # ------------------------------------------------------------------
     # Helpers de creación
     # ------------------------------------------------------------------
@@ -386,3 +393,48 @@ class InyeccionSaldoEnFilaTest(ReporteCobranzaBaseTest):
         )
         self.assertIsNotNone(fila)
         self.assertAlmostEqual(fila['anticipo'], 2000.0)  # excedente = 10000 - 8000
+
+
+# =============================================================================
+# Agregados en SQL y cache por período
+# =============================================================================
+
+class AgregadosCobranzaTest(ReporteCobranzaBaseTest):
+
+    def test_agrupa_por_moneda_sin_restar_sobrepagos(self):
+        """USD y MXN van en filas separadas; una venta sobrepagada no resta."""
+        cliente = self._cliente('Cliente Agregados')
+        self._venta_credito(cliente, '1000.00')
+        self._venta_credito(cliente, '500.00')
+        usd = self._venta_credito(cliente, '300.00')
+        Ventas.objects.filter(pk=usd.pk).update(moneda_venta='usd')
+        sobrepagada = self._venta_credito(cliente, '200.00')
+        Ventas.objects.filter(pk=sobrepagada.pk).update(monto_pagado=Decimal('900.00'))
+        cache.clear()
+
+        datos = generar_reporte_cobranza()
+
+        filas = {f['moneda']: f for f in datos['ventas_por_cliente'] if f['cliente'].id == cliente.id}
+        self.assertAlmostEqual(filas['MXN']['total'], 1500.0)
+        self.assertAlmostEqual(filas['MXN']['por_sucursal'][self.sucursal.id], 1500.0)
+        self.assertAlmostEqual(filas['USD']['total'], 300.0)
+        self.assertEqual([s.id for s in datos['sucursales']], [self.sucursal.id])
+
+    def test_exportaciones_del_periodo_reutilizan_agregados(self):
+        """Otro tipo de cambio no repite las consultas agregadas; una venta nueva sí."""
+        cliente = self._cliente('Cliente Cache')
+        self._venta_credito(cliente, '1000.00')
+        self._anticipo(cliente, '250.00')
+
+        generar_reporte_cobranza(date(2026, 1, 1), date(2026, 12, 31))
+        # Sucursales, clientes y obligación fiscal: nada se agrupa de nuevo
+        with self.assertNumQueries(3):
+            datos = generar_reporte_cobranza(
+                date(2026, 1, 1), date(2026, 12, 31), tipo_cambio_override=Decimal('18.50')
+            )
+        self.assertAlmostEqual(datos['total_anticipos'], 250.0)
+        self.assertAlmostEqual(datos['totales_maquila']['total_mxn'], 0.0)
+
+        self._venta_credito(cliente, '400.00')
+        datos = generar_reporte_cobranza(date(2026, 1, 1), date(2026, 12, 31))
+        self.assertAlmostEqual(datos['ventas_por_cliente'][0]['total'], 1400.0)
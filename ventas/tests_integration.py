@@ -3,10 +3,16 @@ Pruebas de Integración — Módulo Ventas
 =======================================
 Cubre flujos completos del módulo de ventas:
   - Flujo Cliente → Anticipo → verificación de saldo
+  - Exposición de crédito por cliente (credito_usado)
+  - Estados de cuenta (individual y en lote)
+  - Mantenimiento masivo de SaldoCliente (recalcular_estados_cobranza)
+  - Registro de pagos con incrementos F() y auditoría al confirmar
   - Vista de lista de anticipos
   - Vista de balances de ventas
   - Reporte de cobranza global (multi-moneda)
   - Caché con LocMemCache (sin Redis)
+  - Aging masivo set-based vs. cálculo cliente por cliente
+  - Snapshots mensuales de cartera (CarteraMensual) vs. cálculo en vivo
   - Hallazgo de seguridad: vistas sin @login_required documentado
 
 NOTA DE SEGURIDAD:
@@ -156,6 +162,64 @@ class ClienteModelTest(VentasBaseTest):
         self.assertFalse(puede)
 
 
+class ExposicionCreditoTest(VentasBaseTest):
+    """Cliente.credito_usado se mantiene con ventas y pagos; API en lote."""
+
+    def _venta_credito(self, cliente, monto):
+        hoy = date.today()
+        return Ventas.objects.create(
+            fecha_salida_manifiesto=hoy,
+            fecha_deposito=hoy,
+            fecha_vencimiento=hoy + timedelta(days=30),
+            agente_id=self.agente,
+            producto=self.producto,
+            cantidad='10',
+            monto=Money(monto, 'MXN'),
+            cliente=cliente,
+            sucursal_id=self.sucursal,
+            cuenta=self.cuenta,
+            tipo_venta=Ventas.TipoVenta.NACIONAL,
+            modalidad_pago=Ventas.ModalidadPago.CREDITO,
+        )
+
+    def test_ventas_y_pagos_actualizan_exposicion(self):
+        from ventas.models import PagoVenta
+
+        venta = self._venta_credito(self.cliente_mx, '30000.00')
+        self._venta_credito(self.cliente_mx, '10000.00')
+        self.assertAlmostEqual(self.cliente_mx.credito_disponible(), 60000.0)
+
+        PagoVenta.objects.create(
+            venta=venta, fecha_pago=date.today(), monto_pago=Money('5000.00', 'MXN'),
+            cuenta_destino=self.cuenta, metodo_pago=PagoVenta.MetodoPago.TRANSFERENCIA,
+        )
+        self.assertAlmostEqual(self.cliente_mx.credito_disponible(), 65000.0)
+
+        # Cambiar de cliente mueve la exposición
+        venta.refresh_from_db()
+        venta.cliente = self.cliente_us
+        venta.save()
+        self.assertAlmostEqual(self.cliente_mx.credito_disponible(), 90000.0)
+        self.assertAlmostEqual(self.cliente_us.credito_disponible(), 25000.0)
+
+        venta.delete()
+        self.assertAlmostEqual(self.cliente_us.credito_disponible(), 50000.0)
+
+    def test_disponibles_en_una_consulta(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from ventas.services.credito_service import CreditoClienteService
+
+        self._venta_credito(self.cliente_mx, '40000.00')
+        self._venta_credito(self.cliente_us, '70000.00')
+        Cliente.objects.update(credito_usado=0)
+        call_command('recalcular_credito_clientes', stdout=StringIO())
+
+        with self.assertNumQueries(1):
+            disponibles = CreditoClienteService.disponibles([self.cliente_mx.pk, self.cliente_us.pk])
+        self.assertEqual(disponibles, {self.cliente_mx.pk: 60000.0, self.cliente_us.pk: 0})
+
+
 # ---------------------------------------------------------------------------
 # Modelo Anticipo — Flujo de creación y verificación
 # ---------------------------------------------------------------------------
@@ -400,6 +464,536 @@ class VentasModelFlowTest(VentasBaseTest):
         self.assertIsNotNone(venta.anticipo)
 
 
+# ---------------------------------------------------------------------------
+# Cuentas por cobrar — Aging masivo
+# ---------------------------------------------------------------------------
+
+class AgingMasivoTest(VentasBaseTest):
+    """El aging set-based debe coincidir con el cálculo cliente por cliente."""
+
+    def _venta_credito(self, cliente, monto, dias_vencida):
+        hoy = date.today()
+        return Ventas.objects.create(
+            fecha_salida_manifiesto=hoy - timedelta(days=dias_vencida + 30),
+            fecha_deposito=hoy - timedelta(days=dias_vencida + 30),
+            fecha_vencimiento=hoy - timedelta(days=dias_vencida),
+            agente_id=self.agente,
+            producto=self.producto,
+            cantidad='100',
+            monto=Money(monto, 'MXN'),
+            cliente=cliente,
+            sucursal_id=self.sucursal,
+            cuenta=self.cuenta,
+            tipo_venta=Ventas.TipoVenta.NACIONAL,
+            modalidad_pago=Ventas.ModalidadPago.CREDITO,
+        )
+
+    def setUp(self):
+        super().setUp()
+        for dias, monto in [(-10, '100.00'), (30, '200.00'), (45, '300.00'),
+                            (75, '400.00'), (120, '500.00')]:
+            self._venta_credito(self.cliente_mx, monto, dias)
+        self._venta_credito(self.cliente_us, '1000.00', 61)
+
+    def _snapshot(self, cliente):
+        from ventas.models import AntigüedadSaldo
+        aging = AntigüedadSaldo.objects.get(cliente=cliente, fecha_calculo=date.today())
+        return {
+            campo: getattr(aging, campo).amount
+            for campo in ('corriente', 'vencido_1', 'vencido_2', 'vencido_3', 'total_saldo')
+        } | {'numero_facturas': aging.numero_facturas}
+
+    def test_buckets_bulk_por_rango_configurado(self):
+        from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+        resultado = CuentasPorCobrarService.calcular_aging_masivo()
+
+        self.assertEqual(resultado['clientes_procesados'], 2)
+        self.assertEqual(self._snapshot(self.cliente_mx), {
+            'corriente': Decimal('300.00'),
+            'vencido_1': Decimal('300.00'),
+            'vencido_2': Decimal('400.00'),
+            'vencido_3': Decimal('500.00'),
+            'total_saldo': Decimal('1500.00'),
+            'numero_facturas': 5,
+        })
+
+    def test_bulk_coincide_con_ruta_por_cliente(self):
+        from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+        CuentasPorCobrarService.calcular_aging_masivo(bulk=False)
+        esperado = {c.pk: self._snapshot(c) for c in (self.cliente_mx, self.cliente_us)}
+
+        CuentasPorCobrarService.calcular_aging_masivo(bulk=True)
+        obtenido = {c.pk: self._snapshot(c) for c in (self.cliente_mx, self.cliente_us)}
+
+        self.assertEqual(obtenido, esperado)
+
+    def test_bulk_consultas_constantes(self):
+        from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+        CuentasPorCobrarService.calcular_aging_masivo()
+        for i in range(5):
+            self._venta_credito(self.cliente_us, '10.00', i * 20)
+        # config + agregado + upsert (+ savepoint de la transacción)
+        with self.assertNumQueries(5):
+            CuentasPorCobrarService.calcular_aging_masivo()
+
+
+class CarteraMensualTest(VentasBaseTest):
+    """Las tendencias leídas de CarteraMensual deben coincidir con el cálculo en vivo."""
+
+    def setUp(self):
+        super().setUp()
+        hoy = date.today()
+        for dias, monto in [(40, '250.00'), (70, '400.00'), (100, '150.00'), (160, '900.00')]:
+            Ventas.objects.create(
+                fecha_salida_manifiesto=hoy - timedelta(days=dias),
+                fecha_deposito=hoy - timedelta(days=dias),
+                fecha_vencimiento=hoy - timedelta(days=dias - 30),
+                agente_id=self.agente,
+                producto=self.producto,
+                cantidad='100',
+                monto=Money(monto, 'MXN'),
+                cliente=self.cliente_mx,
+                sucursal_id=self.sucursal,
+                cuenta=self.cuenta,
+                tipo_venta=Ventas.TipoVenta.NACIONAL,
+                modalidad_pago=Ventas.ModalidadPago.CREDITO,
+            )
+
+    def _tendencias(self):
+        from ventas.services.metrics_service import CuentasPorCobrarMetrics
+        return (
+            CuentasPorCobrarMetrics.calcular_dso_tendencia(6),
+            CuentasPorCobrarMetrics.evolucion_cartera_mensual(6),
+            CuentasPorCobrarMetrics.eficiencia_cobranza_mensual(6),
+        )
+
+    def test_snapshot_coincide_con_calculo_en_vivo(self):
+        from ventas.models import CarteraMensual
+        from ventas.services.metrics_service import CuentasPorCobrarMetrics
+
+        en_vivo = self._tendencias()
+        generados = CuentasPorCobrarMetrics.cerrar_meses_pendientes(
+            desde=date.today() - timedelta(days=200)
+        )
+
+        self.assertTrue(generados)
+        self.assertEqual(CarteraMensual.objects.count(), len(generados))
+        self.assertEqual(self._tendencias(), en_vivo)
+
+    def test_meses_cerrados_no_se_recalculan(self):
+        from ventas.models import CarteraMensual
+        from ventas.services.metrics_service import CuentasPorCobrarMetrics
+
+        CuentasPorCobrarMetrics.cerrar_meses_pendientes(desde=date.today() - timedelta(days=200))
+        cierres = list(CarteraMensual.objects.values_list('pk', 'total_cxc'))
+
+        self.assertEqual(CuentasPorCobrarMetrics.cerrar_meses_pendientes(), [])
+        self.assertEqual(list(CarteraMensual.objects.values_list('pk', 'total_cxc')), cierres)
+
+    def test_serie_con_snapshots_consultas_constantes(self):
+        from ventas.services.metrics_service import CuentasPorCobrarMetrics
+
+        CuentasPorCobrarMetrics.cerrar_meses_pendientes(desde=date.today() - timedelta(days=400))
+        # snapshots del rango + 3 agregados del mes en curso
+        with self.assertNumQueries(4):
+            CuentasPorCobrarMetrics.evolucion_cartera_mensual(12)
+
+
+# ---------------------------------------------------------------------------
+# Columnas en moneda base (MXN)
+# ---------------------------------------------------------------------------
+
+class MontosMXNTest(VentasBaseTest):
+    """save() y recalcular_montos_mxn mantienen los equivalentes MXN."""
+
+    def _venta_usd(self, monto, tipo_cambio):
+        hoy = date.today()
+        return Ventas.objects.create(
+            fecha_salida_manifiesto=hoy,
+            fecha_deposito=hoy,
+            fecha_vencimiento=hoy + timedelta(days=30),
+            agente_id=self.agente,
+            producto=self.producto,
+            cantidad='10',
+            monto=Money(monto, 'USD'),
+            moneda_venta='USD',
+            tipo_cambio=Decimal(tipo_cambio),
+            cliente=self.cliente_us,
+            sucursal_id=self.sucursal,
+            cuenta=self.cuenta,
+            tipo_venta=Ventas.TipoVenta.EXPORTACION,
+            modalidad_pago=Ventas.ModalidadPago.CREDITO,
+        )
+
+    def test_save_calcula_equivalentes_mxn(self):
+        from ventas.models import PagoVenta, SaldoCliente
+
+        venta = self._venta_usd('1000.00', '17.5000')
+        self.assertEqual(venta.monto_mxn, Decimal('17500.00'))
+
+        PagoVenta.objects.create(
+            venta=venta, fecha_pago=date.today(), monto_pago=Money('200.00', 'USD'),
+            cuenta_destino=self.cuenta, metodo_pago=PagoVenta.MetodoPago.TRANSFERENCIA,
+        )
+
+        venta.refresh_from_db()
+        self.assertEqual(venta.monto_pagado_mxn, Decimal('3500.00'))
+        self.assertEqual(PagoVenta.objects.get(venta=venta).monto_pago_mxn, Decimal('3500.00'))
+        self.assertEqual(SaldoCliente.objects.get(venta=venta).saldo_pendiente_mxn, Decimal('14000.00'))
+
+    def test_redondeo_de_mitades_igual_que_sql(self):
+        from ventas.models import monto_a_mxn
+
+        # 10.03 × 17.5 = 175.525: Round() de SQL sube la mitad, no redondea al par
+        self.assertEqual(monto_a_mxn(Decimal('10.03'), 'USD', Decimal('17.5')), Decimal('175.53'))
+        self.assertEqual(self._venta_usd('10.03', '17.5000').monto_mxn, Decimal('175.53'))
+
+    def test_comando_recalcula_lo_que_no_paso_por_save(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db.models import Sum
+        from ventas.models import SaldoCliente
+
+        self._venta_usd('100.00', '20.0000')
+        self._venta_usd('50.00', '18.0000')
+        Ventas.objects.update(monto_mxn=0, monto_pagado_mxn=0)
+        SaldoCliente.objects.update(saldo_pendiente_mxn=0)
+
+        call_command('recalcular_montos_mxn', '--lote', '1', stdout=StringIO())
+
+        self.assertEqual(Ventas.objects.aggregate(total=Sum('monto_mxn'))['total'], Decimal('2900.00'))
+        self.assertEqual(
+            SaldoCliente.objects.aggregate(total=Sum('saldo_pendiente_mxn'))['total'], Decimal('2900.00')
+        )
+
+
+class EstadoCuentaTest(VentasBaseTest):
+    """Estado de cuenta con consultas constantes y generación en lote."""
+
+    def _venta(self, cliente, monto, fecha, carga=None):
+        return Ventas.objects.create(
+            fecha_salida_manifiesto=fecha,
+            fecha_deposito=fecha,
+            fecha_vencimiento=fecha + timedelta(days=30),
+            agente_id=self.agente,
+            producto=self.producto,
+            cantidad='10',
+            monto=Money(monto, 'MXN'),
+            cliente=cliente,
+            sucursal_id=self.sucursal,
+            cuenta=self.cuenta,
+            carga=carga,
+            tipo_venta=Ventas.TipoVenta.NACIONAL,
+            modalidad_pago=Ventas.ModalidadPago.CREDITO,
+        )
+
+    def _pago(self, venta, monto, fecha):
+        from ventas.models import PagoVenta
+        return PagoVenta.objects.create(
+            venta=venta, fecha_pago=fecha, monto_pago=Money(monto, 'MXN'),
+            cuenta_destino=self.cuenta, metodo_pago=PagoVenta.MetodoPago.TRANSFERENCIA,
+        )
+
+    def _historial(self, cliente, anteriores):
+        inicio = date.today() - timedelta(days=20)
+        for i in range(anteriores):
+            venta = self._venta(cliente, '1000.00', inicio - timedelta(days=60 + i))
+            self._pago(venta, '400.00', inicio - timedelta(days=50 + i))
+        return inicio
+
+    def test_saldo_inicial_movimientos_y_saldo_acumulado(self):
+        from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+        inicio = self._historial(self.cliente_mx, 2)
+        venta = self._venta(self.cliente_mx, '5000.00', inicio + timedelta(days=1), carga='C-77')
+        self._pago(venta, '2000.00', inicio + timedelta(days=1))
+        self._venta(self.cliente_mx, '300.00', inicio + timedelta(days=2))
+
+        datos = CuentasPorCobrarService.generar_estado_cuenta(self.cliente_mx.pk, inicio, date.today())
+
+        movimientos = datos['movimientos']
+        self.assertEqual([m['tipo'] for m in movimientos], ['SALDO_INICIAL', 'VENTA', 'PAGO', 'VENTA'])
+        self.assertEqual([m['saldo'] for m in movimientos], [1200.0, 6200.0, 4200.0, 4500.0])
+        self.assertEqual(movimientos[1]['referencia'], 'C-77')
+        self.assertEqual(movimientos[2]['concepto'], 'Pago - Transferencia Bancaria')
+        resumen = datos['resumen']
+        self.assertEqual(resumen['total_ventas'], Decimal('5300.00'))
+        self.assertEqual(resumen['total_abonos'], Decimal('2000.00'))
+        self.assertEqual((resumen['numero_facturas'], resumen['numero_pagos']), (2, 1))
+        self.assertEqual(datos['estado_cuenta'].saldo_final.amount, Decimal('4500.00'))
+
+    def test_consultas_constantes_con_historial_largo(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+        inicio = self._historial(self.cliente_mx, 2)
+        # La primera generación crea el EstadoCuentaCliente; las siguientes lo actualizan
+        CuentasPorCobrarService.generar_estado_cuenta(self.cliente_mx.pk, inicio, date.today())
+        with CaptureQueriesContext(connection) as pocas:
+            CuentasPorCobrarService.generar_estado_cuenta(self.cliente_mx.pk, inicio, date.today())
+        self._historial(self.cliente_mx, 12)
+        with CaptureQueriesContext(connection) as muchas:
+            datos = CuentasPorCobrarService.generar_estado_cuenta(self.cliente_mx.pk, inicio, date.today())
+        self.assertEqual(len(pocas), len(muchas))
+        self.assertAlmostEqual(datos['resumen']['saldo_inicial'], 14 * 600.0)
+
+    def test_generacion_en_lote(self):
+        from ventas.models import EstadoCuentaCliente
+        from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+        inicio = self._historial(self.cliente_mx, 1)
+        self._venta(self.cliente_us, '900.00', inicio + timedelta(days=3))
+        individual = CuentasPorCobrarService.generar_estado_cuenta(self.cliente_mx.pk, inicio, date.today())
+
+        resultados = CuentasPorCobrarService.generar_estados_cuenta_masivo(inicio, date.today())
+
+        self.assertEqual([r['resumen']['cliente'] for r in resultados], [self.cliente_mx, self.cliente_us])
+        self.assertEqual(resultados[0]['movimientos'], individual['movimientos'])
+        self.assertEqual(EstadoCuentaCliente.objects.count(), 2)
+
+        # Regenerar actualiza los registros existentes del período
+        self._venta(self.cliente_us, '100.00', inicio + timedelta(days=4))
+        CuentasPorCobrarService.generar_estados_cuenta_masivo(inicio, date.today())
+        self.assertEqual(EstadoCuentaCliente.objects.count(), 2)
+        self.assertEqual(
+            EstadoCuentaCliente.objects.get(cliente=self.cliente_us).saldo_final.amount, Decimal('1000.00')
+        )
+
+    def test_generacion_en_lote_cliente_inexistente(self):
+        from ventas.models import EstadoCuentaCliente
+        from ventas.services.cuentas_por_cobrar_service import CuentasPorCobrarService
+
+        inicio = self._historial(self.cliente_mx, 1)
+        resultados = CuentasPorCobrarService.generar_estados_cuenta_masivo(
+            inicio, date.today(), cliente_ids=[999999]
+        )
+        self.assertEqual(resultados, [])
+        self.assertFalse(EstadoCuentaCliente.objects.exists())
+
+
+class MantenimientoCxCTest(VentasBaseTest):
+    """recalcular_estados_cobranza corrige saldos y crea los faltantes por lotes."""
+
+    def _venta(self, monto, dias_vencimiento=30):
+        hoy = date.today()
+        return Ventas.objects.create(
+            fecha_salida_manifiesto=hoy,
+            fecha_deposito=hoy,
+            fecha_vencimiento=hoy + timedelta(days=dias_vencimiento),
+            agente_id=self.agente,
+            producto=self.producto,
+            cantidad='10',
+            monto=Money(monto, 'MXN'),
+            cliente=self.cliente_mx,
+            sucursal_id=self.sucursal,
+            cuenta=self.cuenta,
+            tipo_venta=Ventas.TipoVenta.NACIONAL,
+            modalidad_pago=Ventas.ModalidadPago.CREDITO,
+        )
+
+    def _escenario(self):
+        from ventas.models import PagoVenta, SaldoCliente
+
+        corrupta = self._venta('1000.00')
+        PagoVenta.objects.create(
+            venta=corrupta, fecha_pago=date.today(), monto_pago=Money('300.00', 'MXN'),
+            cuenta_destino=self.cuenta, metodo_pago=PagoVenta.MetodoPago.TRANSFERENCIA,
+        )
+        SaldoCliente.objects.filter(venta=corrupta).update(saldo_pendiente=Decimal('1000.00'), estado='PENDIENTE')
+        huerfana = self._venta('500.00')
+        SaldoCliente.objects.filter(venta=huerfana).delete()
+        self._venta('200.00')  # consistente
+        return corrupta, huerfana
+
+    def test_dry_run_no_escribe(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from ventas.models import SaldoCliente
+
+        corrupta, huerfana = self._escenario()
+        salida = StringIO()
+        call_command('recalcular_estados_cobranza', '--dry-run', stdout=salida)
+
+        self.assertIn(f'venta {corrupta.pk}: saldo 1000.00 -> 700.00 (PARCIAL)', salida.getvalue())
+        self.assertIn(f'venta {huerfana.pk}: saldo - -> 500.00 (PENDIENTE)', salida.getvalue())
+        self.assertEqual(SaldoCliente.objects.get(venta=corrupta).saldo_pendiente.amount, Decimal('1000.00'))
+        self.assertFalse(SaldoCliente.objects.filter(venta=huerfana).exists())
+
+    def test_corrige_por_lotes(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from ventas.models import SaldoCliente
+
+        corrupta, huerfana = self._escenario()
+        call_command('recalcular_estados_cobranza', '--chunk-size', '1', stdout=StringIO())
+
+        saldo = SaldoCliente.objects.get(venta=corrupta)
+        self.assertEqual(saldo.saldo_pendiente.amount, Decimal('700.00'))
+        self.assertEqual(saldo.saldo_pendiente_mxn, Decimal('700.00'))
+        self.assertEqual(saldo.estado, SaldoCliente.EstadosSaldo.PARCIAL)
+        self.assertEqual(SaldoCliente.objects.get(venta=huerfana).saldo_pendiente.amount, Decimal('500.00'))
+
+        # Una segunda pasada no encuentra nada que corregir
+        from ventas.services.cuentas_por_cobrar_service import recalcular_estados_cobranza
+        self.assertEqual(recalcular_estados_cobranza()['inconsistencias_encontradas'], 0)
+
+
+class RegistroPagosTest(VentasBaseTest):
+    """PagoVenta.save() incrementa saldos con F() y audita al confirmar."""
+
+    def _venta(self, monto, dias_vencimiento=30):
+        hoy = date.today()
+        return Ventas.objects.create(
+            fecha_salida_manifiesto=hoy - timedelta(days=60),
+            fecha_deposito=hoy - timedelta(days=60),
+            fecha_vencimiento=hoy + timedelta(days=dias_vencimiento),
+            agente_id=self.agente,
+            producto=self.producto,
+            cantidad='10',
+            monto=Money(monto, 'MXN'),
+            cliente=self.cliente_mx,
+            sucursal_id=self.sucursal,
+            cuenta=self.cuenta,
+            tipo_venta=Ventas.TipoVenta.NACIONAL,
+            modalidad_pago=Ventas.ModalidadPago.CREDITO,
+        )
+
+    def _pagar(self, venta, monto):
+        from ventas.models import PagoVenta
+
+        return PagoVenta.objects.create(
+            venta_id=venta.pk, fecha_pago=date.today(), monto_pago=Money(monto, 'MXN'),
+            cuenta_destino=self.cuenta, metodo_pago=PagoVenta.MetodoPago.TRANSFERENCIA,
+        )
+
+    def test_pagos_actualizan_venta_saldo_y_credito(self):
+        from auditoria.models import LogActividad
+        from ventas.models import SaldoCliente
+
+        venta = self._venta('1000.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            pago = self._pagar(venta, '400.00')
+        ultimo = self._pagar(venta, '100.00')
+
+        venta.refresh_from_db()
+        self.assertEqual(venta.monto_pagado.amount, Decimal('500.00'))
+        self.assertEqual(venta.monto_pagado_mxn, Decimal('500.00'))
+        self.assertEqual(venta.estado_cobranza, Ventas.EstadoCobranza.PARCIAL)
+        saldo = SaldoCliente.objects.get(venta=venta)
+        self.assertEqual(saldo.saldo_pendiente.amount, Decimal('500.00'))
+        self.assertEqual(saldo.estado, SaldoCliente.EstadosSaldo.PARCIAL)
+        self.assertEqual(saldo.fecha_ultimo_pago, ultimo.fecha_registro)
+        self.cliente_mx.refresh_from_db()
+        self.assertEqual(self.cliente_mx.credito_usado, Decimal('500.00'))
+
+        # Auditoría del pago y del cambio de estado, encolada al confirmar
+        from auditoria.buffer import buffer_auditoria
+        buffer_auditoria.vaciar()
+        self.assertTrue(LogActividad.objects.filter(modelo_afectado='PagoVenta', objeto_id=str(pago.pk)).exists())
+        self.assertTrue(LogActividad.objects.filter(
+            modelo_afectado='Ventas', objeto_id=str(venta.pk), descripcion__contains='de Pendiente a Parcial'
+        ).exists())
+
+        # Editar un pago aplica solo la diferencia; liquidar saca la venta de la exposición
+        pago.monto_pago = Money('900.00', 'MXN')
+        pago.save()
+        venta.refresh_from_db()
+        self.assertEqual(venta.monto_pagado.amount, Decimal('1000.00'))
+        self.assertEqual(venta.estado_cobranza, Ventas.EstadoCobranza.PAGADO)
+        self.assertEqual(SaldoCliente.objects.get(venta=venta).estado, SaldoCliente.EstadosSaldo.PAGADO)
+        self.cliente_mx.refresh_from_db()
+        self.assertEqual(self.cliente_mx.credito_usado, Decimal('0.00'))
+
+    def test_venta_pagada_y_vencida(self):
+        from django.core.exceptions import ValidationError
+        from ventas.models import PagoVenta
+
+        pagada = self._venta('300.00')
+        self._pagar(pagada, '300.00')
+        with self.assertRaises(ValidationError):
+            self._pagar(pagada, '10.00')
+        self.assertEqual(PagoVenta.objects.filter(venta=pagada).count(), 1)
+        pagada.refresh_from_db()
+        self.assertEqual(pagada.monto_pagado.amount, Decimal('300.00'))
+
+        vencida = self._venta('800.00', dias_vencimiento=-5)
+        self._pagar(vencida, '100.00')
+        vencida.refresh_from_db()
+        self.assertEqual(vencida.estado_cobranza, Ventas.EstadoCobranza.VENCIDO)
+
+    def test_pago_en_pocas_consultas(self):
+        venta = self._venta('1000.00')
+        self._pagar(venta, '10.00')
+        # SAVEPOINT, UPDATE venta, SELECT, UPDATE estado, INSERT pago,
+        # UPDATE saldo, UPDATE cliente, RELEASE
+        with self.assertNumQueries(8):
+            self._pagar(venta, '10.00')
+
+    def test_eliminar_pago_revierte_venta_saldo_y_credito(self):
+        from ventas.models import PagoVenta, SaldoCliente
+
+        venta = self._venta('1000.00')
+        primero = self._pagar(venta, '300.00')
+        liquidacion = self._pagar(venta, '700.00')
+        venta.refresh_from_db()
+        self.assertEqual(venta.estado_cobranza, Ventas.EstadoCobranza.PAGADO)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            liquidacion.delete()
+
+        venta.refresh_from_db()
+        self.assertEqual(venta.monto_pagado.amount, Decimal('300.00'))
+        self.assertEqual(venta.estado_cobranza, Ventas.EstadoCobranza.PARCIAL)
+        saldo = SaldoCliente.objects.get(venta=venta)
+        self.assertEqual(saldo.saldo_pendiente.amount, Decimal('700.00'))
+        self.assertEqual(saldo.fecha_ultimo_pago, primero.fecha_registro)
+        self.cliente_mx.refresh_from_db()
+        self.assertEqual(self.cliente_mx.credito_usado, Decimal('700.00'))
+
+        # El borrado por queryset (acción del admin) también revierte
+        PagoVenta.objects.filter(pk=primero.pk).delete()
+        venta.refresh_from_db()
+        self.assertEqual(venta.monto_pagado.amount, Decimal('0.00'))
+        self.assertEqual(venta.estado_cobranza, Ventas.EstadoCobranza.PENDIENTE)
+        self.assertEqual(SaldoCliente.objects.get(venta=venta).saldo_pendiente.amount, Decimal('1000.00'))
+        self.cliente_mx.refresh_from_db()
+        self.assertEqual(self.cliente_mx.credito_usado, Decimal('1000.00'))
+
+        # Ya no es una venta pagada: acepta pagos nuevos
+        self._pagar(venta, '50.00')
+
+    def test_editar_pago_antiguo_no_mueve_fecha_ultimo_pago(self):
+        from ventas.models import SaldoCliente
+
+        venta = self._venta('1000.00')
+        antiguo = self._pagar(venta, '100.00')
+        ultimo = self._pagar(venta, '100.00')
+
+        antiguo.monto_pago = Money('150.00', 'MXN')
+        antiguo.save()
+        self.assertEqual(SaldoCliente.objects.get(venta=venta).fecha_ultimo_pago, ultimo.fecha_registro)
+
+    def test_guardar_venta_leida_antes_de_un_pago_no_pisa_monto_pagado(self):
+        from ventas.models import SaldoCliente
+
+        venta = self._venta('1000.00')
+        desactualizada = Ventas.objects.get(pk=venta.pk)
+        self._pagar(venta, '400.00')
+
+        desactualizada.descripcion = 'editada en el admin'
+        desactualizada.save()
+
+        venta.refresh_from_db()
+        self.assertEqual(venta.monto_pagado.amount, Decimal('400.00'))
+        self.assertEqual(venta.monto_pagado_mxn, Decimal('400.00'))
+        self.assertEqual(venta.estado_cobranza, Ventas.EstadoCobranza.PARCIAL)
+        self.assertEqual(SaldoCliente.objects.get(venta=venta).saldo_pendiente.amount, Decimal('600.00'))
+
+
 # ---------------------------------------------------------------------------
 # Admin Ventas
 # ---------------------------------------------------------------------------
@@ -439,6 +1033,95 @@ class VentasAdminTest(VentasBaseTest):
         )
         self.assertNotEqual(response.status_code, 500)
 
+    def test_export_to_excel_resumen_cxc_agregado(self):
+        """La exportación escribe el detalle por lotes y resume la cartera en SQL."""
+        import io
+        import openpyxl
+
+        hoy = date.today()
+        ventas = []
+        for monto, pagado, dias_vencida in [('1000.00', '0.00', 45),
+                                            ('500.00', '200.00', -10),
+                                            ('300.00', '300.00', 5)]:
+            ventas.append(Ventas.objects.create(
+                fecha_salida_manifiesto=hoy - timedelta(days=dias_vencida + 30),
+                fecha_deposito=hoy - timedelta(days=dias_vencida + 30),
+                fecha_vencimiento=hoy - timedelta(days=dias_vencida),
+                agente_id=self.agente,
+                producto=self.producto,
+                cantidad='100',
+                monto=Money(monto, 'MXN'),
+                monto_pagado=Money(pagado, 'MXN'),
+                cliente=self.cliente_mx,
+                sucursal_id=self.sucursal,
+                cuenta=self.cuenta,
+                tipo_venta=Ventas.TipoVenta.NACIONAL,
+                modalidad_pago=Ventas.ModalidadPago.CREDITO,
+            ))
+
+        response = self.client.post('/en/admin/ventas/ventas/', {
+            'action': 'export_to_excel',
+            '_selected_action': [v.pk for v in ventas],
+        })
+
+        self.assertEqual(response.status_code, 200)
+        wb = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        detalle = wb['Ventas']
+        self.assertEqual(detalle.max_row, 5)  # encabezado + 3 ventas + total
+        self.assertEqual(detalle['J5'].value, '=SUM(J2:J4)')
+
+        resumen = wb['Cuentas por Cobrar']
+        self.assertEqual(resumen['B4'].value, 1800.0)  # Total Facturado
+        self.assertEqual(resumen['D4'].value, 500.0)   # Total Cobrado
+        self.assertEqual(resumen['B5'].value, 1300.0)  # Saldo por Cobrar
+        # Antigüedad: solo las facturas con saldo pendiente
+        rangos = {
+            resumen.cell(row=r, column=1).value: resumen.cell(row=r, column=3).value
+            for r in range(1, resumen.max_row + 1)
+        }
+        self.assertEqual(rangos['Por vencer'], 300.0)
+        self.assertEqual(rangos['31-60 días'], 1000.0)
+
+    def _crear_ventas_listado(self, cantidad):
+        hoy = date.today()
+        for i in range(cantidad):
+            Ventas.objects.create(
+                fecha_salida_manifiesto=hoy - timedelta(days=40),
+                fecha_deposito=hoy - timedelta(days=40),
+                fecha_vencimiento=hoy - timedelta(days=i - 3),
+                agente_id=self.agente,
+                producto=self.producto,
+                cantidad='10',
+                monto=Money('1000.00', 'MXN'),
+                monto_pagado=Money('250.00', 'MXN'),
+                cliente=self.cliente_mx if i % 2 else self.cliente_us,
+                sucursal_id=self.sucursal,
+                cuenta=self.cuenta,
+                tipo_venta=Ventas.TipoVenta.NACIONAL,
+                modalidad_pago=Ventas.ModalidadPago.CREDITO,
+            )
+
+    def test_admin_ventas_lista_consultas_constantes(self):
+        """El listado usa las mismas consultas con 2 o 30 filas (sin N+1)."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._crear_ventas_listado(2)
+        self.client.get('/en/admin/ventas/ventas/')  # calienta sesión y configuración del sitio
+        with CaptureQueriesContext(connection) as pocas:
+            response = self.client.get('/en/admin/ventas/ventas/')
+        self.assertEqual(response.status_code, 200)
+
+        self._crear_ventas_listado(28)
+        with CaptureQueriesContext(connection) as pagina_completa:
+            response = self.client.get('/en/admin/ventas/ventas/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 30)
+
+        self.assertEqual(len(pagina_completa), len(pocas))
+        self.assertLessEqual(len(pagina_completa), 30)
+        self.assertContains(response, '750.00')  # saldo 1000 - 250 anotado en SQL
+
 
 # ---------------------------------------------------------------------------
 # Caché de ventas (LocMemCache en lugar de Redis)
@@ -477,3 +1160,25 @@ class VentasCacheTest(VentasBaseTest):
                 response.status_code, 500,
                 f"Error 500 con periodo={periodo}"
             )
+
+    def test_guardar_venta_invalida_balances_cacheados(self):
+        """Guardar una venta cambia la versión del namespace de balances."""
+        from ventas.services.cache_service import VentasBalancesCache
+
+        filtros = {'periodo': 'mensual'}
+        VentasBalancesCache.set(filtros, {'total': 1})
+        self.assertEqual(VentasBalancesCache.get(filtros), {'total': 1})
+
+        Ventas.objects.create(
+            fecha_salida_manifiesto=date.today(),
+            fecha_deposito=date.today(),
+            producto=self.producto,
+            cantidad='10',
+            monto=Money('100.00', 'MXN'),
+            cliente=self.cliente_mx,
+            sucursal_id=self.sucursal,
+            cuenta=self.cuenta,
+            tipo_venta=Ventas.TipoVenta.NACIONAL,
+        )
+
+        self.assertIsNone(VentasBalancesCache.get(filtros))
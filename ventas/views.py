@@ -99,9 +99,11 @@ def build_ventas_balances_context(request):
         'fecha_fin':     selected_fecha_fin,
         'tipo_fecha':    tipo_fecha,
     }
+    _tabla_cache_key = VentasBalancesCache.clave_fragmento(_filter_params)
     _cached = VentasBalancesCache.get(_filter_params)
     if _cached is not None:
         _cached.update({
+            'tabla_cache_key': _tabla_cache_key,
             'clientes': clientes,
             'cuentas': cuentas,
             'sucursales': sucursales,
@@ -396,6 +398,7 @@ def build_ventas_balances_context(request):
         
         # Datos para la tabla
         'balances': balances,
+        'tabla_cache_key': _tabla_cache_key,
         
         # Métricas generales
         'total_ventas': total_ventas,